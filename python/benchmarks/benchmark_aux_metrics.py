@@ -0,0 +1,63 @@
+"""
+Micro-benchmark for the vectorized auxiliary metrics computation in aux_metrics_helper
+
+Compares `aux_metrics_helper.compute_aux_metrics_on_queries` against applying
+`compute_aux_metrics_on_query_group` to each query group.
+
+Usage: python -m benchmarks.benchmark_aux_metrics --num_queries 5000 --max_sequence_size 25
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from ml4ir.applications.ranking.model.metrics.helpers.aux_metrics_helper import (
+    compute_aux_metrics_on_queries, compute_aux_metrics_on_query_group)
+from benchmarks.utils import time_fn, report
+
+
+def generate_batch(num_queries: int, max_sequence_size: int, seed: int = 123):
+    """Generate a random batch of ranked queries with a single click and an aux label"""
+    rng = np.random.default_rng(seed)
+    query_lengths = rng.integers(1, max_sequence_size + 1, size=num_queries)
+    query_ids = np.repeat(np.arange(num_queries), query_lengths)
+    query_starts = np.r_[0, np.cumsum(query_lengths)[:-1]]
+    positions = np.arange(query_ids.size) - np.repeat(query_starts, query_lengths)
+
+    click = np.zeros(query_ids.size)
+    click[query_starts + rng.integers(0, query_lengths)] = 1.
+
+    return pd.DataFrame({
+        "query_id": query_ids,
+        "old_rank": positions + 1,
+        "new_rank": np.argsort(np.argsort(rng.random(query_ids.size) + query_ids)) - np.repeat(
+            query_starts, query_lengths) + 1,
+        "click": click,
+        "aux_label": rng.choice([0., 1., 2., 5., 10.], size=query_ids.size),
+        "group": query_ids % 100,
+    })
+
+
+def main(args):
+    df = generate_batch(args.num_queries, args.max_sequence_size)
+    print("Batch with {} rows and {} queries".format(df.shape[0], args.num_queries))
+
+    kwargs = dict(label_col="click", old_rank_col="old_rank", new_rank_col="new_rank",
+                  aux_label="aux_label", group_keys=["group"])
+    reference_time = time_fn(
+        lambda: df.groupby("query_id").apply(
+            lambda grp: compute_aux_metrics_on_query_group(query_group=grp, **kwargs)),
+        num_runs=1)
+    new_time = time_fn(
+        lambda: compute_aux_metrics_on_queries(df=df, query_key_col="query_id", **kwargs),
+        num_runs=args.num_runs)
+
+    report("compute_aux_metrics_on_queries", reference_time, new_time)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num_queries", type=int, default=5000)
+    parser.add_argument("--max_sequence_size", type=int, default=25)
+    parser.add_argument("--num_runs", type=int, default=5)
+    main(parser.parse_args())
@@ -0,0 +1,96 @@
+"""
+Training step benchmark for the query-level factorization of the context features in the DNN
+
+Compares a compiled training step of a DNN whose first dense layer processes a copy of a large query
+embedding tiled to every record against the same step with `factorize_context_features` enabled,
+where the query embedding is not tiled and is projected once per query and broadcast-added to the records.
+
+Usage: python -m benchmarks.benchmark_context_factorization --query_embedding_size 512 --max_sequence_size 100
+"""
+import argparse
+from unittest.mock import MagicMock
+
+import numpy as np
+import tensorflow as tf
+
+from ml4ir.base.config.keys import FeatureTypeKey
+from ml4ir.base.features.feature_config import SequenceExampleFeatureConfig
+from ml4ir.base.model.architectures.dnn import DNN, DNNLayerKey
+from benchmarks.utils import time_fn, report
+
+
+def get_batches(args):
+    """Generate batches with a query embedding of shape [batch_size, 1, query_embedding_size] for each query"""
+    rng = np.random.default_rng(123)
+    shape = (args.batch_size, args.max_sequence_size)
+    batches = []
+    for _ in range(args.num_batches):
+        batches.append(({
+            FeatureTypeKey.TRAIN: {
+                "query_embedding": tf.constant(rng.random((args.batch_size, 1, args.query_embedding_size)),
+                                               dtype=tf.float32),
+                "record_features": tf.constant(rng.random(shape + (args.num_features,)), dtype=tf.float32)
+            },
+            FeatureTypeKey.METADATA: {FeatureTypeKey.MASK: tf.ones(shape)}
+        }, tf.constant(rng.integers(0, 2, shape), dtype=tf.float32)))
+    return batches
+
+
+def get_train_step(factorize_context_features: bool, args):
+    """Get a compiled training step of the DNN architecture with a softmax cross entropy loss"""
+    feature_config = MagicMock(spec=SequenceExampleFeatureConfig)
+    feature_config.get_context_features.return_value = ["query_embedding"]
+    model = DNN(model_config={
+        DNNLayerKey.LAYERS: [
+            {"type": "dense", "units": args.units, "activation": "relu"},
+            {"type": "dense", "units": args.units // 4, "activation": "relu"},
+            {"type": "dense", "units": 1}
+        ],
+        DNNLayerKey.FACTORIZE_CONTEXT_FEATURES: factorize_context_features
+    }, feature_config=feature_config, file_io=MagicMock())
+    optimizer = tf.keras.optimizers.Adam()
+
+    @tf.function
+    def train_step(inputs, labels):
+        if not factorize_context_features:
+            # The interaction model tiles the context features to all the records unless they are factorized
+            train_features = dict(inputs[FeatureTypeKey.TRAIN])
+            train_features["query_embedding"] = tf.tile(train_features["query_embedding"],
+                                                        [1, args.max_sequence_size, 1])
+            inputs = {**inputs, FeatureTypeKey.TRAIN: train_features}
+        with tf.GradientTape() as tape:
+            scores = model(inputs, training=True)
+            loss = tf.reduce_mean(tf.nn.softmax_cross_entropy_with_logits(labels, scores))
+        gradients = tape.gradient(loss, model.trainable_variables)
+        optimizer.apply_gradients(zip(gradients, model.trainable_variables))
+        return loss
+
+    return train_step
+
+
+def main(args):
+    batches = get_batches(args)
+
+    def run(train_step):
+        for inputs, labels in batches:
+            train_step(inputs, labels)
+
+    reference_step, new_step = get_train_step(False, args), get_train_step(True, args)
+    run(reference_step)
+    run(new_step)
+
+    reference_time = time_fn(lambda: run(reference_step), num_runs=args.num_runs)
+    new_time = time_fn(lambda: run(new_step), num_runs=args.num_runs)
+    report("dnn training steps", reference_time, new_time)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch_size", type=int, default=128)
+    parser.add_argument("--max_sequence_size", type=int, default=100)
+    parser.add_argument("--query_embedding_size", type=int, default=512)
+    parser.add_argument("--num_features", type=int, default=16)
+    parser.add_argument("--units", type=int, default=256)
+    parser.add_argument("--num_batches", type=int, default=20)
+    parser.add_argument("--num_runs", type=int, default=3)
+    main(parser.parse_args())
@@ -0,0 +1,60 @@
+"""
+Wall clock benchmark for computing the extended evaluation metrics on worker threads
+
+Compares `RankingModel.evaluate` computing the grouped stats of each batch synchronously (`num_workers=0`)
+against computing them on a pool of threads while the model predicts the next batches,
+on the ranking test data repeated to get more batches.
+
+Usage: python -m benchmarks.benchmark_evaluate_workers --num_repeats 20 --num_workers 2
+"""
+import argparse
+import tempfile
+
+from ml4ir.applications.ranking.config.parse_args import get_args
+from ml4ir.applications.ranking.pipeline import RankingPipeline
+from ml4ir.base.config.eval_config import EvalConfigConstants
+from benchmarks.utils import time_fn, report
+
+DATA_DIR = "ml4ir/applications/ranking/tests/data/tfrecord"
+FEATURE_CONFIG_PATH = "ml4ir/applications/ranking/tests/data/configs/feature_config.yaml"
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pipeline = RankingPipeline(args=get_args([
+            "--data_dir", DATA_DIR,
+            "--data_format", "tfrecord",
+            "--feature_config", FEATURE_CONFIG_PATH,
+            "--execution_mode", "inference_evaluate",
+            "--batch_size", str(args.batch_size),
+            "--models_dir", tmp_dir,
+            "--logs_dir", tmp_dir,
+            "--run_id", "benchmark",
+        ]))
+        relevance_dataset = pipeline.get_relevance_dataset()
+        relevance_model = pipeline.get_relevance_model()
+        relevance_model.build(relevance_dataset)
+
+        test_dataset = relevance_dataset.test.repeat(args.num_repeats)
+        relevance_model.eval_config = {
+            "mode": "extended",
+            "power_analysis": {"metrics": "MRR, NDCG", "power": 0.8, "pvalue": 0.1},
+        }
+
+        def evaluate(num_workers: int):
+            relevance_model.eval_config[EvalConfigConstants.NUM_WORKERS] = num_workers
+            relevance_model.evaluate(test_dataset=test_dataset)
+
+        reference_time = time_fn(lambda: evaluate(0), num_runs=args.num_runs)
+        for num_workers in range(1, args.num_workers + 1):
+            new_time = time_fn(lambda: evaluate(num_workers), num_runs=args.num_runs)
+            report("evaluate num_workers={}".format(num_workers), reference_time, new_time)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch_size", type=int, default=128)
+    parser.add_argument("--num_repeats", type=int, default=20)
+    parser.add_argument("--num_workers", type=int, default=2)
+    parser.add_argument("--num_runs", type=int, default=3)
+    main(parser.parse_args())
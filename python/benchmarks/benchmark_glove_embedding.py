@@ -0,0 +1,62 @@
+"""
+Micro-benchmark for the GloVe query embeddings computed in graph
+
+Compares `GloveStaticQueryEmbeddingVector`, looking up the words in a static hash table and summing their
+embeddings with a single ragged gather, against `GloveQueryEmbeddingVector` looking up each word in a
+Python dictionary, on a synthetic GloVe file.
+
+Usage: python -m benchmarks.benchmark_glove_embedding --vocab_size 50000 --batch_size 128
+"""
+import argparse
+import os
+import tempfile
+
+import numpy as np
+import tensorflow as tf
+from unittest.mock import MagicMock
+
+from ml4ir.applications.ranking.features.feature_fns.string import GloveQueryEmbeddingVector, \
+    GloveStaticQueryEmbeddingVector
+from benchmarks.utils import time_fn, report
+
+
+def main(args):
+    rng = np.random.default_rng(123)
+    words = np.array(["word{}".format(i) for i in range(args.vocab_size)])
+    queries = tf.constant([[" ".join(rng.choice(words, rng.integers(1, args.max_query_length + 1)))]
+                           for _ in range(args.batch_size)])
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        glove_path = os.path.join(tmp_dir, "glove.txt")
+        embeddings = rng.random((args.vocab_size, args.embedding_dim), dtype=np.float32)
+        with open(glove_path, "w") as f:
+            for word, embedding in zip(words, embeddings):
+                f.write("{} {}\n".format(word, " ".join(map(str, embedding))))
+
+        feature_info = {
+            "name": "query_text",
+            "feature_layer_info": {"args": {"embedding_size": args.embedding_dim, "glove_path": glove_path,
+                                            "max_entries": None}}
+        }
+        reference_vector = GloveQueryEmbeddingVector(feature_info, MagicMock())
+        new_vector = GloveStaticQueryEmbeddingVector(feature_info, MagicMock())
+        assert np.allclose(reference_vector(queries).numpy(), new_vector(queries).numpy(), rtol=1e-5)
+
+        def run(layer):
+            for _ in range(args.num_steps):
+                layer(queries)
+
+        reference_time = time_fn(lambda: run(reference_vector), num_runs=args.num_runs)
+        new_time = time_fn(lambda: run(new_vector), num_runs=args.num_runs)
+        report("glove query embeddings", reference_time, new_time)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vocab_size", type=int, default=50000)
+    parser.add_argument("--embedding_dim", type=int, default=50)
+    parser.add_argument("--batch_size", type=int, default=128)
+    parser.add_argument("--max_query_length", type=int, default=5)
+    parser.add_argument("--num_steps", type=int, default=10)
+    parser.add_argument("--num_runs", type=int, default=3)
+    main(parser.parse_args())
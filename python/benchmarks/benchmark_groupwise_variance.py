@@ -0,0 +1,103 @@
+"""
+Micro-benchmark for the vectorized groupwise running variance used by the power analysis
+
+Compares `t_test.compute_batched_stats` accumulating into a `GroupMetricStreamVariance` against the
+previous implementation computing the stats of each metric with a groupby apply and updating one
+`StreamVariance` per group and metric in Python.
+
+Usage: python -m benchmarks.benchmark_groupwise_variance --num_groups 100000 --num_batches 10
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+# metrics_helper is imported first to resolve its circular import with t_test
+from ml4ir.applications.ranking.model.metrics.helpers import metrics_helper  # noqa: F401
+from ml4ir.base.stats.t_test import StreamVariance, GroupMetricStreamVariance, compute_batched_stats
+from benchmarks.utils import time_fn, report
+
+VARIANCE_LIST = ["old_MRR", "new_MRR", "old_ACR", "new_ACR"]
+GROUP_KEY = ["group_id"]
+
+
+def generate_batch(batch_size: int, num_groups: int, seed: int):
+    """Generate a batch of clicked queries with the power analysis metrics"""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({"group_id": rng.integers(0, num_groups, batch_size)})
+    for metric in VARIANCE_LIST:
+        df[metric] = rng.random(batch_size)
+    return df
+
+
+def compute_batched_stats_reference(df, group_metric_running_variance_params, group_key, variance_list):
+    """Reference implementation updating a dictionary of StreamVariance row by row"""
+    metric_stat_df_list = []
+    grouped = df.groupby(group_key)
+    for metric in variance_list:
+        grouped_agg = grouped.apply(lambda x: x[metric].mean())
+        mean_df = pd.DataFrame(
+            {str(group_key): grouped_agg.keys().values, str([metric, "mean"]): grouped_agg.values})
+        grouped_agg = grouped.apply(lambda x: x[metric].var())
+        var_df = pd.DataFrame({str(group_key): grouped_agg.keys().values, str([metric, "var"]): grouped_agg.values})
+        grouped_agg = grouped.apply(lambda x: x[metric].count())
+        count_df = pd.DataFrame(
+            {str(group_key): grouped_agg.keys().values, str([metric, "count"]): grouped_agg.values})
+        metric_stat_df_list.append(pd.concat([mean_df, var_df, count_df], axis=1))
+
+    running_stats_df = pd.concat(metric_stat_df_list, axis=1)
+    running_stats_df = running_stats_df.loc[:, ~running_stats_df.columns.duplicated()].fillna(0)
+    for row in running_stats_df.iterrows():
+        group_params = group_metric_running_variance_params.setdefault(row[1][str(group_key)], {})
+        for metric in variance_list:
+            new_mean = row[1][str([metric, "mean"])]
+            new_var = row[1][str([metric, "var"])]
+            new_count = row[1][str([metric, "count"])]
+            sv = group_params.get(metric, StreamVariance())
+            if new_count == 0:
+                continue
+            if sv.count == 0:
+                sv.mean, sv.var = new_mean, new_var if new_count > 1 else 0
+            else:
+                combined_mean = (sv.count * sv.mean + new_count * new_mean) / (sv.count + new_count)
+                sv.var = (((sv.count - 1) * sv.var + (new_count - 1) * new_var) / (sv.count + new_count - 1)) + \
+                         ((sv.count * new_count * (sv.mean - new_mean) ** 2) / (
+                                 (sv.count + new_count) * (sv.count + new_count - 1)))
+                sv.mean = combined_mean
+            sv.count += new_count
+            group_params[metric] = sv
+    return group_metric_running_variance_params
+
+
+def main(args):
+    batches = [generate_batch(args.batch_size, args.num_groups, seed) for seed in range(args.num_batches)]
+
+    def reference():
+        params = {}
+        for df in batches:
+            params = compute_batched_stats_reference(df, params, GROUP_KEY, VARIANCE_LIST)
+        return params
+
+    def vectorized():
+        params = GroupMetricStreamVariance()
+        for df in batches:
+            params = compute_batched_stats(df, params, GROUP_KEY, VARIANCE_LIST)
+        return params
+
+    reference_params, new_params = reference(), vectorized()
+    for group_name in list(reference_params)[:100]:
+        for metric in VARIANCE_LIST:
+            assert np.isclose(reference_params[group_name][metric].var, new_params[group_name][metric].var)
+
+    reference_time = time_fn(reference, num_runs=args.num_runs)
+    new_time = time_fn(vectorized, num_runs=args.num_runs)
+    report("compute_batched_stats", reference_time, new_time)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num_groups", type=int, default=100000)
+    parser.add_argument("--num_batches", type=int, default=10)
+    parser.add_argument("--batch_size", type=int, default=50000)
+    parser.add_argument("--num_runs", type=int, default=1)
+    main(parser.parse_args())
@@ -0,0 +1,89 @@
+"""
+Data throughput benchmark for materializing the k-fold cross validation folds
+
+Compares iterating over the training and validation sets of every fold when each fold shards the
+merged dataset, which reads and parses the data again for every fold, against writing the folds
+to TFRecord files once with `materialize_folds` and reading the folds from these files.
+The ranking test data is repeated into multiple files to get more queries.
+
+Usage: python -m benchmarks.benchmark_kfold_materialization --num_folds 5 --num_repeats 5
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from ml4ir.applications.ranking.config.parse_args import get_args
+from ml4ir.applications.ranking.pipeline import RankingPipeline
+from ml4ir.base.config.keys import DataSplitKey
+from benchmarks.utils import time_fn, report
+
+DATA_DIR = "ml4ir/applications/ranking/tests/data/tfrecord"
+FEATURE_CONFIG_PATH = "ml4ir/applications/ranking/tests/data/configs/feature_config.yaml"
+
+
+def copy_data(args, data_dir):
+    """Repeat the files of each data split to get a larger dataset"""
+    for split in [DataSplitKey.TRAIN, DataSplitKey.VALIDATION, DataSplitKey.TEST]:
+        os.makedirs(os.path.join(data_dir, split))
+        for file_name in os.listdir(os.path.join(DATA_DIR, split)):
+            for i in range(args.num_repeats):
+                shutil.copy(os.path.join(DATA_DIR, split, file_name),
+                            os.path.join(data_dir, split, "{}_{}".format(i, file_name)))
+
+
+def iterate_folds(pipeline, relevance_dataset, merged_data, num_folds, folds_dir=None):
+    """Create the datasets of every fold and iterate over the training and validation sets"""
+    for fold_id in range(num_folds):
+        fold_relevance_dataset = pipeline.get_kfold_relevance_dataset(num_folds, False, read_data_sets=False)
+        fold_relevance_dataset.create_folds(fold_id, merged_data, relevance_dataset, folds_dir)
+        for _ in fold_relevance_dataset.train:
+            pass
+        for _ in fold_relevance_dataset.validation:
+            pass
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_dir = os.path.join(tmp_dir, "data")
+        copy_data(args, data_dir)
+        pipeline = RankingPipeline(args=get_args([
+            "--data_dir", data_dir,
+            "--data_format", "tfrecord",
+            "--feature_config", FEATURE_CONFIG_PATH,
+            "--batch_size", str(args.batch_size),
+            "--max_sequence_size", str(args.max_sequence_size),
+            "--kfold", str(args.num_folds),
+            "--models_dir", tmp_dir,
+            "--logs_dir", tmp_dir,
+            "--run_id", "benchmark",
+        ]))
+        relevance_dataset = pipeline.get_kfold_relevance_dataset(args.num_folds, False, read_data_sets=True)
+        merged_data = relevance_dataset.merge_datasets()
+        folds_dir = os.path.join(tmp_dir, "folds")
+
+        reference_time = time_fn(
+            lambda: iterate_folds(pipeline, relevance_dataset, merged_data, args.num_folds),
+            num_runs=args.num_runs)
+
+        start_time = time.perf_counter()
+        relevance_dataset.materialize_folds(merged_data, folds_dir)
+        print("folds materialized in {:.4f}s".format(time.perf_counter() - start_time))
+
+        def run_materialized():
+            relevance_dataset.materialize_folds(merged_data, folds_dir)
+            iterate_folds(pipeline, relevance_dataset, merged_data, args.num_folds, folds_dir)
+
+        new_time = time_fn(run_materialized, num_runs=args.num_runs)
+        report("{} folds train and validation".format(args.num_folds), reference_time, new_time)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch_size", type=int, default=128)
+    parser.add_argument("--max_sequence_size", type=int, default=25)
+    parser.add_argument("--num_folds", type=int, default=5)
+    parser.add_argument("--num_repeats", type=int, default=5)
+    parser.add_argument("--num_runs", type=int, default=1)
+    main(parser.parse_args())
@@ -0,0 +1,68 @@
+"""
+Throughput benchmark for batching the SequenceExample queries by sequence length
+
+Compares training a ranking model for an epoch on batches padded to `max_sequence_size` against
+batches bucketed by query length (`num_length_buckets`) and padded to their longest query,
+on the ranking test data repeated to get more batches. A `max_sequence_size` above the longest
+query emulates a long-tail query length distribution.
+
+Usage: python -m benchmarks.benchmark_length_buckets --max_sequence_size 100 --num_length_buckets 4
+"""
+import argparse
+import tempfile
+import time
+
+from ml4ir.applications.ranking.config.parse_args import get_args
+from ml4ir.applications.ranking.pipeline import RankingPipeline
+from benchmarks.utils import time_fn, report
+
+DATA_DIR = "ml4ir/applications/ranking/tests/data/tfrecord"
+FEATURE_CONFIG_PATH = "ml4ir/applications/ranking/tests/data/configs/feature_config.yaml"
+
+
+def get_train_fn(args, tmp_dir, num_length_buckets, scale_bucket_batch_sizes=False):
+    """Build the model and dataset, returning a function that trains an epoch"""
+    pipeline = RankingPipeline(args=get_args([
+        "--data_dir", DATA_DIR,
+        "--data_format", "tfrecord",
+        "--feature_config", FEATURE_CONFIG_PATH,
+        "--execution_mode", "train_only",
+        "--batch_size", str(args.batch_size),
+        "--max_sequence_size", str(args.max_sequence_size),
+        "--num_length_buckets", str(num_length_buckets),
+        "--scale_bucket_batch_sizes", str(scale_bucket_batch_sizes),
+        "--models_dir", tmp_dir,
+        "--logs_dir", tmp_dir,
+        "--run_id", "benchmark",
+    ]))
+    start_time = time.perf_counter()
+    relevance_dataset = pipeline.get_relevance_dataset()
+    print("num_length_buckets={} dataset created in {:.4f}s".format(
+        num_length_buckets, time.perf_counter() - start_time))
+    relevance_model = pipeline.get_relevance_model()
+    relevance_model.build(relevance_dataset)
+
+    train_dataset = relevance_dataset.train.repeat(args.num_repeats)
+    relevance_model.model.fit(train_dataset.take(1), verbose=0)
+
+    return lambda: relevance_model.model.fit(train_dataset, verbose=0)
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        reference_time = time_fn(get_train_fn(args, tmp_dir, 0), num_runs=args.num_runs)
+        new_time = time_fn(get_train_fn(args, tmp_dir, args.num_length_buckets), num_runs=args.num_runs)
+        report("train epoch num_length_buckets={}".format(args.num_length_buckets), reference_time, new_time)
+        new_time = time_fn(get_train_fn(args, tmp_dir, args.num_length_buckets, scale_bucket_batch_sizes=True),
+                           num_runs=args.num_runs)
+        report("train epoch scaled bucket batch sizes", reference_time, new_time)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch_size", type=int, default=128)
+    parser.add_argument("--max_sequence_size", type=int, default=100)
+    parser.add_argument("--num_length_buckets", type=int, default=4)
+    parser.add_argument("--num_repeats", type=int, default=20)
+    parser.add_argument("--num_runs", type=int, default=3)
+    main(parser.parse_args())
@@ -0,0 +1,67 @@
+"""
+Micro-benchmark for the segment based NDCG computation in metrics_helper
+
+Compares `metrics_helper.compute_ndcg` against the per query groupby loop it replaced.
+
+Usage: python -m benchmarks.benchmark_ndcg --num_rows 100000 --max_sequence_size 25
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from ml4ir.applications.ranking.model.metrics.helpers import metrics_helper
+from benchmarks.utils import time_fn, report
+
+
+def compute_ndcg_per_query(df, query_key_col, label_col, pred_col, new_col):
+    """Reference per query implementation of NDCG using a pandas groupby loop"""
+    for qid, group in df.groupby(query_key_col):
+        y_true = group[label_col].values
+        y_pred = group[pred_col].values
+
+        sorted_labels = y_true[np.argsort(-y_pred)]
+        discounts = np.log2(np.arange(1, y_true.shape[-1] + 1, dtype=float) + 1.)
+        dcg = np.sum(sorted_labels / discounts)
+        idcg = np.sum(np.sort(y_true)[::-1] / discounts)
+
+        with np.errstate(invalid="ignore"):
+            df.loc[np.array(df.loc[df[query_key_col] == qid].index), new_col] = dcg / idcg
+
+    return df
+
+
+def generate_batch(num_rows: int, max_sequence_size: int, seed: int = 123):
+    """Generate a random batch of ranking predictions with variable query lengths"""
+    rng = np.random.default_rng(seed)
+    query_lengths = rng.integers(1, max_sequence_size + 1, size=num_rows)
+    query_lengths = query_lengths[np.cumsum(query_lengths) <= num_rows]
+    query_ids = np.repeat(np.arange(query_lengths.size), query_lengths)
+
+    return pd.DataFrame({
+        "query_id": query_ids,
+        "label": rng.integers(0, 5, size=query_ids.size).astype(float),
+        "ranking_score": rng.random(query_ids.size),
+    })
+
+
+def main(args):
+    df = generate_batch(args.num_rows, args.max_sequence_size)
+    print("Batch with {} rows and {} queries".format(df.shape[0], df["query_id"].nunique()))
+
+    reference_time = time_fn(
+        lambda: compute_ndcg_per_query(df.copy(), "query_id", "label", "ranking_score", "ndcg"),
+        num_runs=1)
+    new_time = time_fn(
+        lambda: metrics_helper.compute_ndcg(df.copy(), "query_id", "label", "ranking_score", "ndcg"),
+        num_runs=args.num_runs)
+
+    report("compute_ndcg", reference_time, new_time)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num_rows", type=int, default=100000)
+    parser.add_argument("--max_sequence_size", type=int, default=25)
+    parser.add_argument("--num_runs", type=int, default=5)
+    main(parser.parse_args())
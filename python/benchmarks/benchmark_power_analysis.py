@@ -0,0 +1,70 @@
+"""
+Micro-benchmark for the vectorized power analysis across all the groups
+
+Compares `t_test.run_power_analysis` against solving the required sample size of each group and metric
+with `compute_required_sample_size`, one scalar root finding at a time.
+
+Usage: python -m benchmarks.benchmark_power_analysis --num_groups 10000
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+# metrics_helper is imported first to resolve its circular import with t_test
+from ml4ir.applications.ranking.model.metrics.helpers import metrics_helper  # noqa: F401
+from ml4ir.base.stats.t_test import compute_batched_stats, compute_required_sample_size, run_power_analysis
+from benchmarks.utils import time_fn, report
+
+METRIC_LIST = ["MRR", "ACR"]
+GROUP_KEY = ["group_id"]
+
+
+def run_power_analysis_reference(metric_list, group_key, group_metric_running_variance_params, statistical_power,
+                                 pvalue):
+    """Reference implementation solving the required sample size of each group and metric"""
+    group_metrics_stat_sig = []
+    for group in group_metric_running_variance_params:
+        group_entry = {str(group_key): group}
+        for metric in metric_list:
+            sv_old = group_metric_running_variance_params[group]["old_" + metric]
+            sv_new = group_metric_running_variance_params[group]["new_" + metric]
+            req_sample_size = compute_required_sample_size(sv_old.mean, sv_new.mean, sv_old.var, sv_new.var,
+                                                           statistical_power, pvalue)
+            group_entry["is_" + metric + "_lift_stat_sig"] = sv_new.count >= req_sample_size
+        group_metrics_stat_sig.append(group_entry)
+    return pd.DataFrame(group_metrics_stat_sig)
+
+
+def main(args):
+    rng = np.random.default_rng(123)
+    df = pd.DataFrame({"group_id": rng.integers(0, args.num_groups, args.num_groups * args.queries_per_group)})
+    for metric in METRIC_LIST:
+        df["old_" + metric] = rng.random(len(df))
+        df["new_" + metric] = df["old_" + metric] + rng.normal(0.05, 0.3, len(df))
+    group_metric_running_variance_params = compute_batched_stats(
+        df, {}, GROUP_KEY, ["old_" + m for m in METRIC_LIST] + ["new_" + m for m in METRIC_LIST])
+
+    def reference():
+        return run_power_analysis_reference(METRIC_LIST, GROUP_KEY, group_metric_running_variance_params,
+                                            args.power, args.pvalue)
+
+    def vectorized():
+        return run_power_analysis(METRIC_LIST, GROUP_KEY, group_metric_running_variance_params,
+                                  args.power, args.pvalue)
+
+    pd.testing.assert_frame_equal(vectorized(), reference())
+
+    reference_time = time_fn(reference, num_runs=args.num_runs)
+    new_time = time_fn(vectorized, num_runs=args.num_runs)
+    report("run_power_analysis", reference_time, new_time)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num_groups", type=int, default=10000)
+    parser.add_argument("--queries_per_group", type=int, default=20)
+    parser.add_argument("--power", type=float, default=0.8)
+    parser.add_argument("--pvalue", type=float, default=0.1)
+    parser.add_argument("--num_runs", type=int, default=1)
+    main(parser.parse_args())
@@ -0,0 +1,59 @@
+"""
+Wall clock benchmark for the fused single pass predict and evaluate
+
+Compares `RankingModel.predict_and_evaluate` against running `evaluate` and then `predict`,
+which traverses the test data twice, on the ranking test data repeated to get more batches.
+The predictions are written to a temporary logs directory as in the inference_evaluate execution mode.
+
+Usage: python -m benchmarks.benchmark_predict_and_evaluate --num_repeats 20
+"""
+import argparse
+import os
+import tempfile
+
+from ml4ir.applications.ranking.config.parse_args import get_args
+from ml4ir.applications.ranking.pipeline import RankingPipeline
+from benchmarks.utils import time_fn, report
+
+DATA_DIR = "ml4ir/applications/ranking/tests/data/tfrecord"
+FEATURE_CONFIG_PATH = "ml4ir/applications/ranking/tests/data/configs/feature_config.yaml"
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pipeline = RankingPipeline(args=get_args([
+            "--data_dir", DATA_DIR,
+            "--data_format", "tfrecord",
+            "--feature_config", FEATURE_CONFIG_PATH,
+            "--execution_mode", "inference_evaluate",
+            "--batch_size", str(args.batch_size),
+            "--models_dir", tmp_dir,
+            "--logs_dir", tmp_dir,
+            "--run_id", "benchmark",
+        ]))
+        relevance_dataset = pipeline.get_relevance_dataset()
+        relevance_model = pipeline.get_relevance_model()
+        relevance_model.build(relevance_dataset)
+
+        test_dataset = relevance_dataset.test.repeat(args.num_repeats)
+        logs_dir = os.path.join(tmp_dir, "predictions")
+        os.makedirs(logs_dir)
+
+        def evaluate_then_predict():
+            relevance_model.evaluate(test_dataset=test_dataset, additional_features={}, logs_dir=logs_dir)
+            relevance_model.predict(test_dataset=test_dataset, logs_dir=logs_dir)
+
+        reference_time = time_fn(evaluate_then_predict, num_runs=args.num_runs)
+        new_time = time_fn(
+            lambda: relevance_model.predict_and_evaluate(test_dataset=test_dataset, logs_dir=logs_dir),
+            num_runs=args.num_runs)
+
+    report("predict_and_evaluate", reference_time, new_time)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch_size", type=int, default=128)
+    parser.add_argument("--num_repeats", type=int, default=20)
+    parser.add_argument("--num_runs", type=int, default=3)
+    main(parser.parse_args())
@@ -0,0 +1,97 @@
+"""
+Wall clock benchmark for the prediction sinks used by RelevanceModel.predict
+
+Compares the synchronous per batch `to_csv(mode="a")` previously used in the predict loop against
+the prediction sinks writing from a background thread, while the inference of each batch is simulated
+with a sleep of `--inference_ms` (TensorFlow releases the GIL during the forward pass).
+
+Usage: python -m benchmarks.benchmark_prediction_sink --num_batches 200 --batch_size 4096
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from ml4ir.base.config.keys import PredictionsFormatKey
+from ml4ir.base.io import prediction_sink
+from benchmarks.utils import time_fn, report
+
+
+def generate_batch(batch_size: int, seed: int):
+    """Generate a batch of ranking predictions with the features to log"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "query_id": np.char.encode(rng.integers(0, 10 ** 6, batch_size).astype(str), "utf-8").astype(object),
+        "query_text": np.char.encode(np.repeat("a sample query", batch_size), "utf-8").astype(object),
+        "label": rng.integers(0, 2, batch_size),
+        "rank": rng.integers(1, 26, batch_size),
+        "score": rng.random(batch_size, dtype=np.float32),
+        "new_rank": rng.integers(1, 26, batch_size),
+    })
+
+
+def predict_to_csv_inline(batches, outfile: str, inference_s: float):
+    """Reference predict loop appending each batch to the CSV file"""
+    for predictions_df in batches:
+        time.sleep(inference_s)
+        predictions_df = predictions_df.copy()
+        np.set_printoptions(
+            formatter={"all": lambda x: str(x.decode("utf-8")) if isinstance(x, bytes) else str(x)},
+            linewidth=sys.maxsize, threshold=sys.maxsize)
+        for col in predictions_df.columns:
+            if isinstance(predictions_df[col].values[0], bytes):
+                predictions_df[col] = predictions_df[col].str.decode("utf8")
+        if os.path.isfile(outfile):
+            predictions_df.to_csv(outfile, mode="a", header=False, index=False)
+        else:
+            predictions_df.to_csv(outfile, mode="w", header=True, index=False)
+
+
+def predict_to_sink(batches, outfile: str, inference_s: float, predictions_format: str, max_queue_size: int):
+    """Predict loop streaming each batch to a prediction sink"""
+    with prediction_sink.get_prediction_sink(outfile, predictions_format, max_queue_size) as sink:
+        for predictions_df in batches:
+            time.sleep(inference_s)
+            sink.write(predictions_df.copy())
+
+
+def main(args):
+    batches = [generate_batch(args.batch_size, seed) for seed in range(args.num_batches)]
+    inference_s = args.inference_ms / 1000.
+    predictions_formats = [PredictionsFormatKey.CSV, PredictionsFormatKey.CSV_GZIP]
+    if prediction_sink.pq is not None:
+        predictions_formats.append(PredictionsFormatKey.PARQUET)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        outfile = os.path.join(tmp_dir, "model_predictions.csv")
+
+        def reference():
+            if os.path.isfile(outfile):
+                os.remove(outfile)
+            predict_to_csv_inline(batches, outfile, inference_s)
+
+        reference_time = time_fn(reference, num_runs=args.num_runs)
+        print("{} file size: {:.1f}MB".format(PredictionsFormatKey.CSV, os.path.getsize(outfile) / 2 ** 20))
+
+        for predictions_format in predictions_formats:
+            sink_outfile = os.path.join(tmp_dir, "model_predictions.{}".format(predictions_format))
+            for max_queue_size in [0, args.max_queue_size]:
+                new_time = time_fn(
+                    lambda: predict_to_sink(batches, sink_outfile, inference_s, predictions_format, max_queue_size),
+                    num_runs=args.num_runs)
+                report("{} queue_size={}".format(predictions_format, max_queue_size), reference_time, new_time)
+            print("{} file size: {:.1f}MB".format(predictions_format, os.path.getsize(sink_outfile) / 2 ** 20))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num_batches", type=int, default=200)
+    parser.add_argument("--batch_size", type=int, default=4096)
+    parser.add_argument("--inference_ms", type=float, default=20.)
+    parser.add_argument("--max_queue_size", type=int, default=8)
+    parser.add_argument("--num_runs", type=int, default=3)
+    main(parser.parse_args())
@@ -0,0 +1,97 @@
+"""
+Micro-benchmark for the columnar protobuf builders in tfrecord_helper
+
+Compares `get_sequence_example_protos` and `get_example_protos` against the groupby/apply
+based `get_sequence_example_proto` and `get_example_proto` helpers in protos per second.
+
+Usage: python -m benchmarks.benchmark_proto_builder --num_queries 5000 --max_sequence_size 25
+"""
+import argparse
+import logging
+
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+
+from ml4ir.base.config.keys import TFRecordTypeKey
+from ml4ir.base.data import tfrecord_helper
+from ml4ir.base.features.feature_config import FeatureConfig
+from ml4ir.base.io.local_io import LocalIO
+from benchmarks.utils import time_fn
+
+FEATURE_CONFIG_PATH = "ml4ir/applications/ranking/tests/data/configs/feature_config.yaml"
+
+
+def generate_records(feature_config: FeatureConfig, num_queries: int, max_sequence_size: int, seed: int = 123):
+    """Generate random records for all the features in the FeatureConfig with variable query lengths"""
+    rng = np.random.default_rng(seed)
+    query_lengths = rng.integers(1, max_sequence_size + 1, size=num_queries)
+    query_ids = np.repeat(np.arange(num_queries), query_lengths)
+    num_records = query_ids.size
+
+    df = pd.DataFrame()
+    for feature_info in feature_config.get_all_features():
+        feature_name = feature_info["name"]
+        is_context = feature_name in feature_config.get_context_features("name")
+        dtype = tf.as_dtype(feature_info["dtype"])
+        if dtype == tf.string:
+            values = np.array(["{}_{}".format(feature_name, i) for i in range(num_queries)])
+            df[feature_name] = values[query_ids] if is_context else values[rng.integers(0, num_queries, num_records)]
+        elif dtype.is_integer:
+            values = rng.integers(0, 10, size=num_queries)
+            df[feature_name] = values[query_ids] if is_context else rng.integers(0, 10, size=num_records)
+        else:
+            df[feature_name] = rng.random(num_records)
+
+    # Shuffle the records so that the queries are not contiguous
+    return df.sample(frac=1., random_state=seed).reset_index(drop=True)
+
+
+def report_throughput(name: str, num_protos: int, reference_time: float, new_time: float):
+    """Print the protos per second of the reference and new implementations"""
+    print("{:<40} reference: {:>10.0f} protos/s  new: {:>10.0f} protos/s  speedup: {:>6.1f}x".format(
+        name, num_protos / reference_time, num_protos / new_time, reference_time / new_time))
+
+
+def main(args):
+    file_io = LocalIO()
+    feature_config: FeatureConfig = FeatureConfig.get_instance(
+        tfrecord_type=TFRecordTypeKey.SEQUENCE_EXAMPLE,
+        feature_config_dict=file_io.read_yaml(FEATURE_CONFIG_PATH),
+        logger=logging.getLogger(),
+    )
+    df = generate_records(feature_config, args.num_queries, args.max_sequence_size)
+    print("Batch with {} records and {} queries".format(df.shape[0], args.num_queries))
+
+    context_features = feature_config.get_context_features()
+    sequence_features = feature_config.get_sequence_features()
+    reference_time = time_fn(
+        lambda: [proto.SerializeToString() for proto in df.groupby(
+            feature_config.get_context_features("name")).apply(
+            lambda g: tfrecord_helper.get_sequence_example_proto(g, context_features, sequence_features))],
+        num_runs=1)
+    new_time = time_fn(
+        lambda: tfrecord_helper.get_sequence_example_protos(df, context_features, sequence_features),
+        num_runs=args.num_runs)
+    report_throughput("get_sequence_example_protos", args.num_queries, reference_time, new_time)
+
+    features = [dict(f, default_value=feature_config.get_default_value(f))
+                for f in feature_config.get_all_features()]
+    df_example = df.head(args.num_examples)
+    reference_time = time_fn(
+        lambda: [proto.SerializeToString() for proto in df_example.apply(
+            lambda row: tfrecord_helper.get_example_proto(row, features), axis=1)],
+        num_runs=1)
+    new_time = time_fn(
+        lambda: tfrecord_helper.get_example_protos(df_example, features),
+        num_runs=args.num_runs)
+    report_throughput("get_example_protos", df_example.shape[0], reference_time, new_time)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num_queries", type=int, default=5000)
+    parser.add_argument("--max_sequence_size", type=int, default=25)
+    parser.add_argument("--num_examples", type=int, default=20000)
+    parser.add_argument("--num_runs", type=int, default=3)
+    main(parser.parse_args())
@@ -0,0 +1,81 @@
+"""
+Micro-benchmark for the ranks shared by the ranking metrics through a RankingMetricContext
+
+Compares a compiled metrics update step where MRR, ACR, NDCG, SegmentMRR, MacroMRR and RankMatchFailure
+each sort the predicted scores on their own against the same step sharing a single `RankingMetricContext`,
+as done by `RelevanceScorer` on every train and test step. NDCG keeps its own unstable sort of the
+predicted scores and only shares the ideal sort order.
+
+In graph mode grappler already merges identical sorts, so the gains show with `--run_eagerly`
+(e.g. when debugging with `run_eagerly=True`).
+
+Usage: python -m benchmarks.benchmark_rank_context --batch_size 1024 --max_sequence_size 100 [--run_eagerly]
+"""
+import argparse
+
+import numpy as np
+import tensorflow as tf
+
+from ml4ir.applications.ranking.model.metrics.metrics_impl import MRR, ACR, NDCG, SegmentMRR, MacroMRR, \
+    RankingMetricContext
+from ml4ir.applications.ranking.model.metrics.aux_metrics_impl import RankMatchFailure
+from benchmarks.utils import time_fn, report
+
+SEGMENTS = ["a", "b", "c"]
+
+
+def get_metrics_update_step(share_context: bool):
+    """Get a compiled step updating all the ranking metrics on a batch"""
+    metrics = [MRR(), ACR(), NDCG(), SegmentMRR(segments=SEGMENTS), MacroMRR(segments=SEGMENTS),
+               RankMatchFailure()]
+
+    @tf.function
+    def update_metrics(y_true, y_pred, mask, y_aux, y_true_ranks, segments):
+        context = RankingMetricContext(y_true, y_pred, mask) if share_context else None
+        metrics[0].update_state(y_true, y_pred, mask=mask, context=context)
+        metrics[1].update_state(y_true, y_pred, mask=mask, context=context)
+        metrics[2].update_state(y_true, y_pred, context=context)
+        metrics[3].update_state(y_true, y_pred, segments=segments, mask=mask, context=context)
+        metrics[4].update_state(y_true, y_pred, segments=segments, mask=mask, context=context)
+        metrics[5].update_state(y_true, y_pred, y_aux, y_true_ranks, mask, context=context)
+        return [metric.result() for metric in metrics]
+
+    return update_metrics
+
+
+def main(args):
+    tf.config.run_functions_eagerly(args.run_eagerly)
+    rng = np.random.default_rng(123)
+    shape = (args.batch_size, args.max_sequence_size)
+    inputs = (
+        tf.constant(rng.integers(0, 2, shape), dtype=tf.float32),
+        tf.constant(rng.random(shape), dtype=tf.float32),
+        tf.constant(np.arange(shape[1])[np.newaxis, :] < rng.integers(2, shape[1] + 1, (shape[0], 1)),
+                    dtype=tf.float32),
+        tf.constant(rng.integers(0, 2, shape), dtype=tf.float32),
+        tf.constant(np.tile(np.arange(1, shape[1] + 1), (shape[0], 1)), dtype=tf.float32),
+        tf.constant(rng.choice(SEGMENTS, (shape[0], 1))),
+    )
+
+    reference_step = get_metrics_update_step(share_context=False)
+    new_step = get_metrics_update_step(share_context=True)
+    for reference_value, new_value in zip(reference_step(*inputs), new_step(*inputs)):
+        assert np.allclose(reference_value.numpy(), new_value.numpy())
+
+    def run(step):
+        for _ in range(args.num_steps):
+            step(*inputs)
+
+    reference_time = time_fn(lambda: run(reference_step), num_runs=args.num_runs)
+    new_time = time_fn(lambda: run(new_step), num_runs=args.num_runs)
+    report("ranking metrics update step", reference_time, new_time)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch_size", type=int, default=1024)
+    parser.add_argument("--max_sequence_size", type=int, default=100)
+    parser.add_argument("--num_steps", type=int, default=50)
+    parser.add_argument("--num_runs", type=int, default=3)
+    parser.add_argument("--run_eagerly", action="store_true")
+    main(parser.parse_args())
@@ -0,0 +1,69 @@
+"""
+Throughput benchmark for the vectorized ranklib parser in ranklib_helper
+
+Compares `ranklib_helper.convert` against the line-by-line `process_line` conversion
+on a generated LETOR-like file, in lines per second.
+
+Usage: python -m benchmarks.benchmark_ranklib_parser --num_queries 2000 --num_features 136
+"""
+import argparse
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from ml4ir.base.data import ranklib_helper
+from benchmarks.utils import time_fn
+
+
+def generate_ranklib_file(file_path: str, num_queries: int, max_sequence_size: int, num_features: int,
+                          sparsity: float, seed: int = 123):
+    """Write a ranklib file with random relevance grades and sparse features"""
+    rng = np.random.default_rng(seed)
+    num_lines = 0
+    with open(file_path, "w") as f:
+        for qid in range(num_queries):
+            for doc in range(rng.integers(1, max_sequence_size + 1)):
+                feature_ids = np.flatnonzero(rng.random(num_features) >= sparsity) + 1
+                features = " ".join("{}:{:.6f}".format(i, v) for i, v in zip(feature_ids, rng.random(len(feature_ids))))
+                f.write("{} qid:{} {} #docid = D{}-{}\n".format(rng.integers(0, 5), qid, features, qid, doc))
+                num_lines += 1
+
+    return num_lines
+
+
+def convert_line_by_line(input_file: str):
+    """Reference conversion parsing each line with process_line"""
+    with open(input_file, "r") as f:
+        rows = [ranklib_helper.process_line(line, False, "qid", "relevance") for line in f]
+    return pd.DataFrame(rows)
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        input_file = os.path.join(tmp_dir, "sample.txt")
+        num_lines = generate_ranklib_file(
+            input_file, args.num_queries, args.max_sequence_size, args.num_features, args.sparsity)
+        print("Ranklib file with {} lines, {} queries and {} features".format(
+            num_lines, args.num_queries, args.num_features))
+
+        reference_time = time_fn(lambda: convert_line_by_line(input_file), num_runs=1)
+        new_time = time_fn(
+            lambda: ranklib_helper.convert(input_file, False, 0, False, "qid", "relevance",
+                                           add_dummy_rank_column=False, chunk_size=args.chunk_size),
+            num_runs=args.num_runs)
+
+    print("{:<40} reference: {:>10.0f} lines/s  new: {:>10.0f} lines/s  speedup: {:>6.1f}x".format(
+        "ranklib_helper.convert", num_lines / reference_time, num_lines / new_time, reference_time / new_time))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num_queries", type=int, default=2000)
+    parser.add_argument("--max_sequence_size", type=int, default=50)
+    parser.add_argument("--num_features", type=int, default=136)
+    parser.add_argument("--sparsity", type=float, default=0.2)
+    parser.add_argument("--chunk_size", type=int, default=1000000)
+    parser.add_argument("--num_runs", type=int, default=3)
+    main(parser.parse_args())
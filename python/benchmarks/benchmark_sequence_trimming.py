@@ -0,0 +1,88 @@
+"""
+Training step benchmark for trimming the padded records before the SetRankEncoder attention
+
+Compares a compiled training step of the SetRank DNN architecture on batches padded to `max_sequence_size`
+against the same step with `trim_sequence` enabled, which runs the architecture on the records up to the
+longest query of each batch. Query lengths are drawn from a long-tail geometric distribution.
+
+Usage: python -m benchmarks.benchmark_sequence_trimming --max_sequence_size 100 --mean_length 8
+"""
+import argparse
+import copy
+from unittest.mock import MagicMock
+
+import numpy as np
+import tensorflow as tf
+
+from ml4ir.base.config.keys import FeatureTypeKey
+from ml4ir.base.io.local_io import LocalIO
+from ml4ir.base.model.architectures.dnn import DNN, DNNLayerKey
+from benchmarks.utils import time_fn, report
+
+MODEL_CONFIG_PATH = "ml4ir/applications/ranking/tests/data/configs/model_config_set_rank.yaml"
+
+
+def get_batches(args):
+    """Generate batches of queries with long-tail lengths padded to max_sequence_size"""
+    rng = np.random.default_rng(123)
+    batches = []
+    for _ in range(args.num_batches):
+        num_records = np.minimum(rng.geometric(1. / args.mean_length, args.batch_size), args.max_sequence_size)
+        mask = np.arange(args.max_sequence_size)[np.newaxis, :] < num_records[:, np.newaxis]
+        batches.append(({
+            FeatureTypeKey.TRAIN: {
+                "features": tf.constant(rng.random((args.batch_size, args.max_sequence_size, args.num_features)),
+                                        dtype=tf.float32)
+            },
+            FeatureTypeKey.METADATA: {FeatureTypeKey.MASK: tf.constant(mask, dtype=tf.float32)}
+        }, tf.constant(rng.integers(0, 2, mask.shape) * mask, dtype=tf.float32)))
+    return batches
+
+
+def get_train_step(model_config):
+    """Get a compiled training step of the DNN architecture with a masked softmax cross entropy loss"""
+    model = DNN(model_config=model_config, feature_config=MagicMock(), file_io=MagicMock())
+    optimizer = tf.keras.optimizers.Adam()
+
+    @tf.function(reduce_retracing=True)
+    def train_step(inputs, labels):
+        with tf.GradientTape() as tape:
+            scores = model(inputs, training=True)
+            mask = inputs[FeatureTypeKey.METADATA][FeatureTypeKey.MASK]
+            scores = tf.where(tf.equal(mask, 1.), scores, tf.float32.min)
+            loss = tf.reduce_mean(tf.nn.softmax_cross_entropy_with_logits(labels, scores))
+        gradients = tape.gradient(loss, model.trainable_variables)
+        optimizer.apply_gradients(zip(gradients, model.trainable_variables))
+        return loss
+
+    return train_step
+
+
+def main(args):
+    model_config = LocalIO().read_yaml(MODEL_CONFIG_PATH)
+    trimmed_model_config = copy.deepcopy(model_config)
+    trimmed_model_config[DNNLayerKey.TRIM_SEQUENCE] = True
+    batches = get_batches(args)
+
+    def run(train_step):
+        for inputs, labels in batches:
+            train_step(inputs, labels)
+
+    reference_step, new_step = get_train_step(model_config), get_train_step(trimmed_model_config)
+    run(reference_step)
+    run(new_step)
+
+    reference_time = time_fn(lambda: run(reference_step), num_runs=args.num_runs)
+    new_time = time_fn(lambda: run(new_step), num_runs=args.num_runs)
+    report("set rank training steps", reference_time, new_time)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch_size", type=int, default=128)
+    parser.add_argument("--max_sequence_size", type=int, default=100)
+    parser.add_argument("--mean_length", type=float, default=8)
+    parser.add_argument("--num_features", type=int, default=16)
+    parser.add_argument("--num_batches", type=int, default=20)
+    parser.add_argument("--num_runs", type=int, default=3)
+    main(parser.parse_args())
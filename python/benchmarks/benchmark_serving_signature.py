@@ -0,0 +1,86 @@
+"""
+Latency benchmark for the tfrecord serving signatures
+
+Compares the batched `define_tfrecord_batch_signature` against the `define_tfrecord_signature`
+that parses one proto at a time in a while loop, for increasing batch sizes.
+A dummy model that consumes every feature is used so that the timings reflect the parsing and preprocessing.
+
+Usage: python -m benchmarks.benchmark_serving_signature --tfrecord_type example
+"""
+import argparse
+import logging
+
+import tensorflow as tf
+
+from ml4ir.base.config.keys import TFRecordTypeKey
+from ml4ir.base.features.feature_config import FeatureConfig
+from ml4ir.base.io.local_io import LocalIO
+from ml4ir.base.model import serving
+from benchmarks.utils import time_fn
+
+DATA = {
+    TFRecordTypeKey.EXAMPLE: (
+        "ml4ir/applications/classification/tests/data/configs/feature_config.yaml",
+        "ml4ir/applications/classification/tests/data/tfrecord/test/file_0.tfrecord",
+    ),
+    TFRecordTypeKey.SEQUENCE_EXAMPLE: (
+        "ml4ir/applications/ranking/tests/data/configs/feature_config.yaml",
+        "ml4ir/applications/ranking/tests/data/tfrecord/test/file_0.tfrecord",
+    ),
+}
+
+
+def dummy_model(inputs):
+    """Score each proto with the sum of its numeric feature values and string lengths"""
+    scores = list()
+    for feature_tensor in inputs.values():
+        if feature_tensor.dtype == tf.string:
+            feature_tensor = tf.strings.length(feature_tensor)
+        feature_tensor = tf.cast(feature_tensor, tf.float32)
+        scores.append(tf.reshape(feature_tensor, [tf.shape(feature_tensor)[0], -1]))
+
+    return tf.reduce_sum(tf.concat(scores, axis=1), axis=1)
+
+
+def main(args):
+    feature_config_path, tfrecord_path = DATA[args.tfrecord_type]
+    feature_config = FeatureConfig.get_instance(
+        tfrecord_type=args.tfrecord_type,
+        feature_config_dict=LocalIO().read_yaml(feature_config_path),
+        logger=logging.getLogger(),
+    )
+    protos = [proto.numpy() for proto in tf.data.TFRecordDataset(tfrecord_path)]
+
+    # Pad the sequences as the per proto signature can only stack sequences of the same size
+    signature_args = dict(
+        model=dummy_model,
+        tfrecord_type=args.tfrecord_type,
+        feature_config=feature_config,
+        preprocessing_keys_to_fns={},
+        required_fields_only=True,
+        pad_sequence=True,
+        max_sequence_size=args.max_sequence_size,
+    )
+    tfrecord_signature = serving.define_tfrecord_signature(**signature_args)
+    tfrecord_batch_signature = serving.define_tfrecord_batch_signature(**signature_args)
+
+    for batch_size in args.batch_sizes:
+        batch = tf.constant([protos[i % len(protos)] for i in range(batch_size)])
+
+        # Warm up the traced functions
+        tf.debugging.assert_near(tfrecord_signature(batch), tfrecord_batch_signature(batch))
+
+        reference_time = time_fn(lambda: tfrecord_signature(batch).numpy(), num_runs=args.num_runs)
+        new_time = time_fn(lambda: tfrecord_batch_signature(batch).numpy(), num_runs=args.num_runs)
+
+        print("{:<40} reference: {:>10.2f}ms  new: {:>10.2f}ms  speedup: {:>8.1f}x".format(
+            "batch_size={}".format(batch_size), reference_time * 1000, new_time * 1000, reference_time / new_time))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tfrecord_type", choices=list(DATA.keys()), default=TFRecordTypeKey.EXAMPLE)
+    parser.add_argument("--max_sequence_size", type=int, default=25)
+    parser.add_argument("--batch_sizes", type=int, nargs="+", default=[1, 4, 16, 64, 256, 1024])
+    parser.add_argument("--num_runs", type=int, default=10)
+    main(parser.parse_args())
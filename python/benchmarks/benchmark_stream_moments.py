@@ -0,0 +1,52 @@
+"""
+Micro-benchmark for the batched streaming moments used by the click rank distribution t-test
+
+Compares `t_test.compute_stats_from_stream` merging the NumPy moments of each batch against
+the per value Welford update previously used.
+
+Usage: python -m benchmarks.benchmark_stream_moments --num_batches 500 --batch_size 2000
+"""
+import argparse
+
+import numpy as np
+
+# metrics_helper is imported first to resolve its circular import with t_test
+from ml4ir.applications.ranking.model.metrics.helpers import metrics_helper  # noqa: F401
+from ml4ir.base.stats.t_test import compute_stats_from_stream
+from benchmarks.utils import time_fn, report
+
+
+def compute_stats_from_stream_reference(diff, count, mean, m2):
+    """Reference implementation with Welford's online algorithm"""
+    for i in range(len(diff)):
+        count += 1
+        delta = diff[i] - mean
+        mean += delta / count
+        delta2 = diff[i] - mean
+        m2 += delta * delta2
+    return count, mean, m2
+
+
+def main(args):
+    rng = np.random.default_rng(123)
+    batches = [rng.normal(0.05, 0.3, args.batch_size) for _ in range(args.num_batches)]
+
+    def run(fn):
+        count, mean, m2 = 0, 0, 0
+        for diff in batches:
+            count, mean, m2 = fn(diff, count, mean, m2)
+        return count, mean, m2
+
+    assert np.allclose(run(compute_stats_from_stream_reference), run(compute_stats_from_stream))
+
+    reference_time = time_fn(lambda: run(compute_stats_from_stream_reference), num_runs=args.num_runs)
+    new_time = time_fn(lambda: run(compute_stats_from_stream), num_runs=args.num_runs)
+    report("compute_stats_from_stream", reference_time, new_time)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num_batches", type=int, default=500)
+    parser.add_argument("--batch_size", type=int, default=2000)
+    parser.add_argument("--num_runs", type=int, default=3)
+    main(parser.parse_args())
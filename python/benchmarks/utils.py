@@ -0,0 +1,33 @@
+import time
+from typing import Callable
+
+
+def time_fn(fn: Callable, num_runs: int = 5):
+    """
+    Time a function call, returning the best wall clock time in seconds over the runs
+
+    Parameters
+    ----------
+    fn : Callable
+        Function to time; called with no arguments
+    num_runs : int
+        Number of times to call the function
+
+    Returns
+    -------
+    float
+        Minimum wall clock time across the runs in seconds
+    """
+    timings = []
+    for _ in range(num_runs):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+
+    return min(timings)
+
+
+def report(name: str, reference_time: float, new_time: float):
+    """Print the timings of a benchmark along with the speedup"""
+    print("{:<40} reference: {:>10.4f}s  new: {:>10.4f}s  speedup: {:>8.1f}x".format(
+        name, reference_time, new_time, reference_time / max(new_time, 1e-12)))
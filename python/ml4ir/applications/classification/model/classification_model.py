@@ -1,5 +1,4 @@
 import os
-import sys
 from typing import Optional
 
 import numpy as np
@@ -70,7 +69,6 @@ class ClassificationModel(RelevanceModel):
 
         if not self.is_compiled:
             return NotImplementedError
-        group_metrics_keys = self.feature_config.get_group_metrics_keys()
 
         # Compute the tensorflow native metrics
         metrics_dict = self.model.evaluate(test_dataset, return_dict=True)
@@ -92,55 +90,8 @@ class ClassificationModel(RelevanceModel):
                                        additional_features=additional_features,
                                        logs_dir=logs_dir,
                                        logging_frequency=logging_frequency)
-            global_metrics = []  # group_name, metric, value
-            grouped_metrics = []
-            # instead of calculating measure with a single update_state (can result in a call with
-            # thousands of examples at once, we use the same batch size used during training.
-            # Helps prevent OOM issues.
-
-            '''
-            type(test_dataset._input_dataset)
-            Out[4]: tensorflow.python.data.ops.dataset_ops.ShardDataset
-            type(test_dataset)
-            Out[10]: tensorflow.python.data.ops.dataset_ops.BatchDataset
-            
-            type(test_dataset)
-            Out[3]: tensorflow.python.data.ops.dataset_ops.PrefetchDataset
-            type(test_dataset._input_dataset)
-            Out[4]: tensorflow.python.data.ops.dataset_ops.BatchDataset
-            '''
-            batch_size = test_dataset._input_dataset._batch_size.numpy()  # Hacky way to get batch_size
-            # Letting metrics in the outer loop to avoid tracing
-            for metric in self.model.metrics:
-                global_metrics.append(
-                    self.calculate_metric_on_batch(metric, predictions, batch_size))
-                self.logger.info(f"Global metric {metric.name} completed."
-                                 f" Score: {global_metrics[-1]['value']}")
-
-                for group_ in group_metrics_keys:  # Calculate metrics for group metrics
-                    for name, group in predictions.groupby(group_['name']):
-                        self.logger.info(f"Per feature metric {metric.name}."
-                                         f" Feature: {group_['name']}, value: {name}")
-                        if group.shape[0] >= group_metrics_min_queries:
-                            grouped_metrics.append(self.calculate_metric_on_batch(metric,
-                                                                                  group,
-                                                                                  batch_size,
-                                                                                  group_['name'],
-                                                                                  name))
-            global_metrics = pd.DataFrame(global_metrics)
-            grouped_metrics = pd.DataFrame(grouped_metrics).sort_values(by='size')
-            if logs_dir:
-                self.file_io.write_df(
-                    grouped_metrics,
-                    outfile=os.path.join(logs_dir, RelevanceModelConstants.GROUP_METRICS_CSV_FILE),
-                    index=False
-                )
-                self.file_io.write_df(
-                    global_metrics,
-                    outfile=os.path.join(logs_dir, RelevanceModelConstants.METRICS_CSV_FILE),
-                    index=False
-                )
-                self.logger.info(f"Evaluation Results written at: {logs_dir}")
+            global_metrics, grouped_metrics = self.compute_metrics_on_predictions(
+                predictions, test_dataset, group_metrics_min_queries, logs_dir)
             return global_metrics, grouped_metrics, metrics_dict
         if logs_dir:
             global_metrics = pd.DataFrame.from_dict(metrics_dict, orient='index', columns=["value"])
@@ -153,6 +104,87 @@ class ClassificationModel(RelevanceModel):
             self.logger.info(f"Evaluation Results written at: {logs_dir}")
         return None, None, metrics_dict
 
+    def compute_metrics_on_predictions(
+            self,
+            predictions: pd.DataFrame,
+            test_dataset: data.TFRecordDataset,
+            group_metrics_min_queries: int = 50,
+            logs_dir: Optional[str] = None
+    ):
+        """
+        Compute the global and groupwise metrics from the predictions on the test dataset
+
+        Parameters
+        ----------
+        predictions : `pd.DataFrame`
+            pandas DataFrame containing the labels, features to log and predictions on the test dataset
+        test_dataset: an instance of tf.data.dataset
+            Batched test dataset used to get the batch size for updating the metrics
+        group_metrics_min_queries : int, optional
+            Minimum count threshold per group to be considered for computing
+            groupwise metrics
+        logs_dir : str, optional
+            Path to directory to save logs
+
+        Returns
+        -------
+        global_metrics : `pd.DataFrame` object
+            `pd.DataFrame` containing global metrics
+        grouped_metrics : `pd.DataFrame` object
+            `pd.DataFrame` containing groupwise metrics
+        """
+        group_metrics_keys = self.feature_config.get_group_metrics_keys()
+        global_metrics = []  # group_name, metric, value
+        grouped_metrics = []
+        # instead of calculating measure with a single update_state (can result in a call with
+        # thousands of examples at once, we use the same batch size used during training.
+        # Helps prevent OOM issues.
+
+        '''
+        type(test_dataset._input_dataset)
+        Out[4]: tensorflow.python.data.ops.dataset_ops.ShardDataset
+        type(test_dataset)
+        Out[10]: tensorflow.python.data.ops.dataset_ops.BatchDataset
+
+        type(test_dataset)
+        Out[3]: tensorflow.python.data.ops.dataset_ops.PrefetchDataset
+        type(test_dataset._input_dataset)
+        Out[4]: tensorflow.python.data.ops.dataset_ops.BatchDataset
+        '''
+        batch_size = test_dataset._input_dataset._batch_size.numpy()  # Hacky way to get batch_size
+        # Letting metrics in the outer loop to avoid tracing
+        for metric in self.model.metrics:
+            global_metrics.append(
+                self.calculate_metric_on_batch(metric, predictions, batch_size))
+            self.logger.info(f"Global metric {metric.name} completed."
+                             f" Score: {global_metrics[-1]['value']}")
+
+            for group_ in group_metrics_keys:  # Calculate metrics for group metrics
+                for name, group in predictions.groupby(group_['name']):
+                    self.logger.info(f"Per feature metric {metric.name}."
+                                     f" Feature: {group_['name']}, value: {name}")
+                    if group.shape[0] >= group_metrics_min_queries:
+                        grouped_metrics.append(self.calculate_metric_on_batch(metric,
+                                                                              group,
+                                                                              batch_size,
+                                                                              group_['name'],
+                                                                              name))
+        global_metrics = pd.DataFrame(global_metrics)
+        grouped_metrics = pd.DataFrame(grouped_metrics).sort_values(by='size')
+        if logs_dir:
+            self.file_io.write_df(
+                grouped_metrics,
+                outfile=os.path.join(logs_dir, RelevanceModelConstants.GROUP_METRICS_CSV_FILE),
+                index=False
+            )
+            self.file_io.write_df(
+                global_metrics,
+                outfile=os.path.join(logs_dir, RelevanceModelConstants.METRICS_CSV_FILE),
+                index=False
+            )
+            self.logger.info(f"Evaluation Results written at: {logs_dir}")
+        return global_metrics, grouped_metrics
+
     @staticmethod
     def get_chunks_from_df(dataframe, size):
         """
@@ -239,10 +271,6 @@ class ClassificationModel(RelevanceModel):
             pandas DataFrame containing the predictions on the test dataset
             made with the `RelevanceModel`
         """
-        if logs_dir:
-            outfile = os.path.join(logs_dir, RelevanceModelConstants.MODEL_PREDICTIONS_CSV_FILE)
-            # Delete file if it exists
-            self.file_io.rm_file(outfile)
         predictions_df = self._create_prediction_dataframe(logging_frequency,
                                                            test_dataset)
         predictions_ = np.squeeze(self.model.predict(test_dataset)[self.output_name])
@@ -251,24 +279,108 @@ class ClassificationModel(RelevanceModel):
         # than a list on numpy arrays
         predictions_df[self.output_name] = [x for x in predictions_]
         if logs_dir:
-            np.set_printoptions(formatter={'all':lambda x: str(x.decode('utf-8')) if isinstance(x, bytes) else str(x)},
-                                linewidth=sys.maxsize,
-                                threshold=sys.maxsize,  # write the full vector in the csv not a truncated version
-                                legacy="1.13")  # enables 1.13 legacy printing mode
-            for col in predictions_df.columns:
-                if isinstance(predictions_df[col].values[0], bytes):
-                    predictions_df[col] = predictions_df[col].str.decode('utf8')
-            predictions_df.to_csv(outfile, mode="w", header=True, index=False)
-            self.logger.info(f"Model predictions written to: {outfile}")
+            self._write_predictions(predictions_df, logs_dir)
         return predictions_df
 
-    def _create_prediction_dataframe(self, logging_frequency, test_dataset):
+    def predict_and_evaluate(
+            self,
+            test_dataset: data.TFRecordDataset,
+            inference_signature: str = "serving_default",
+            additional_features: dict = {},
+            group_metrics_min_queries: int = 50,
+            logs_dir: Optional[str] = None,
+            logging_frequency: int = 25
+    ):
+        """
+        Predict the scores on the test dataset and evaluate the Classification Model
+        with a single pass over the test dataset
+
+        Parameters
+        ----------
+        test_dataset: an instance of tf.data.dataset
+        inference_signature : str, optional
+            If using a SavedModel for prediction, specify the inference signature to be used for computing scores
+        additional_features : dict, optional
+            Dictionary containing new feature name and function definition to
+            compute them. Use this to compute additional features from the scores.
+            For example, converting ranking scores for each document into ranks for
+            the query
+        group_metrics_min_queries : int, optional
+            Minimum count threshold per group to be considered for computing
+            groupwise metrics
+        logs_dir : str, optional
+            Path to directory to save logs
+        logging_frequency : int
+            Value representing how often(in batches) to log status
+
+        Returns
+        -------
+        predictions_df : `pd.DataFrame`
+            pandas DataFrame containing the predictions on the test dataset
+        df_overall_metrics : `pd.DataFrame` object
+            `pd.DataFrame` containing overall metrics
+        df_groupwise_metrics : `pd.DataFrame` object
+            `pd.DataFrame` containing groupwise metrics if
+            group_metric_keys are defined in the FeatureConfig
+        metrics_dict : dict
+            metrics as a dictionary of metric names mapping to values
+
+        Notes
+        -----
+        The keras model metrics are updated with the same forward pass that computes the predictions,
+        which requires the keras model to be compiled. Otherwise, falls back to `evaluate()` and `predict()`
+        """
+        if not self.is_compiled:
+            return super().predict_and_evaluate(
+                test_dataset=test_dataset,
+                inference_signature=inference_signature,
+                additional_features=additional_features,
+                group_metrics_min_queries=group_metrics_min_queries,
+                logs_dir=logs_dir,
+                logging_frequency=logging_frequency,
+            )
+
+        # Compute the tensorflow native metrics along with the predictions
+        self.model.reset_metrics()
+        predictions_df = self._create_prediction_dataframe(logging_frequency,
+                                                           test_dataset,
+                                                           evaluate_step=tf.function(self.model.evaluate_step))
+        metrics_dict = {metric.name: metric.result().numpy() for metric in self.model.metrics}
+        if logs_dir:
+            self._write_predictions(predictions_df, logs_dir)
+
+        # If basic mode is specified, only compute the keras Model metrics
+        # By default, use the extended mode and compute metrics as defined in `evaluate()`
+        if self.eval_config.get(EvalConfigConstants.MODE, EvalConfigConstants.EXTENDED_MODE) == EvalConfigConstants.BASIC_MODE:
+            metrics_dict = {f"test_{key}": val for key, val in metrics_dict.items()}
+            self.logger.info("Overall Metrics: \n{}".format(pd.Series(metrics_dict)))
+            return predictions_df, None, None, metrics_dict
+
+        self.logger.info("Computing grouped metrics.")
+        global_metrics, grouped_metrics = self.compute_metrics_on_predictions(
+            predictions_df, test_dataset, group_metrics_min_queries, logs_dir)
+        return predictions_df, global_metrics, grouped_metrics, metrics_dict
+
+    def _write_predictions(self, predictions_df, logs_dir):
+        """
+        Writes the predictions DataFrame to the logs directory in the predictions format
+        """
+        # Write the full vectors with the 1.13 legacy printing mode
+        with self.get_prediction_sink(logs_dir, legacy_printing=True) as prediction_sink:
+            prediction_sink.write(predictions_df)
+        self.logger.info(f"Model predictions written to: {prediction_sink.outfile}")
+
+    def _create_prediction_dataframe(self, logging_frequency, test_dataset, evaluate_step=None):
         """
         Iterates through the test data and collects for each
         data point the information to be logged.
+        If `evaluate_step` is specified, it is called on each batch to update
+        the model metrics and the predictions are collected under `output_name`,
+        in the same way as `predict()` does with the predictions over the whole dataset.
         """
         predictions = {}  # keys are features we logs, values lists
         # containing the values of this feature for each batch
+        model_outputs = []  # unsqueezed outputs of `evaluate_step` for each batch
         label_name = self.feature_config.get_label()["name"]
         features_to_log = [f.get("node_name", f["name"]) for f in
                            self.feature_config.get_features_to_log()] + [label_name]
@@ -286,6 +398,8 @@ class ClassificationModel(RelevanceModel):
                     if key in features_to_log:
                         predictions[key] = [np.squeeze(x[key].numpy())]
                 predictions[label_name] = [np.squeeze(y.numpy())]
+            if evaluate_step:
+                model_outputs.append(evaluate_step((x, y))[self.output_name].numpy())
             if batch_count % logging_frequency == 0:
                 self.logger.info(f"Finished evaluating {batch_count} batches")
         # This is a memory bottleneck; we bring everything in memory
@@ -297,4 +411,8 @@ class ClassificationModel(RelevanceModel):
                 val)
         predictions_df = pd.DataFrame({key: val if len(val.shape) == 1 else [inner for inner in val]
                                        for key, val in predictions.items()})
+        if evaluate_step:
+            # Squeeze the outputs of all the batches at once so that batches
+            # of a single record or single class outputs are handled like in `predict()`
+            predictions_df[self.output_name] = [x for x in np.squeeze(np.concatenate(model_outputs))]
         return predictions_df
\ No newline at end of file
@@ -189,6 +189,17 @@ class ClassificationPipeline(RelevancePipeline):
             logger=self.logger,
             non_zero_features_only=self.non_zero_features_only,
             keep_additional_info=self.keep_additional_info,
+            csv_chunk_size=self.args.csv_chunk_size,
+            csv_from_generator=self.args.csv_from_generator,
+            tfrecord_cache_dir=self.args.tfrecord_cache_dir,
+            tfrecord_cache_max_size_mb=self.args.tfrecord_cache_max_size_mb,
+            tfrecord_cache_hash_contents=self.args.tfrecord_cache_hash_contents,
+            ranklib_num_workers=self.args.ranklib_num_workers,
+            num_parallel_reads=self.args.num_parallel_reads,
+            interleave_cycle_length=self.args.interleave_cycle_length,
+            deterministic_reads=self.args.deterministic_reads,
+            num_file_shards=self.args.num_file_shards,
+            file_shard_index=self.args.file_shard_index,
             num_folds=num_folds,
             include_testset_in_kfold=include_testset_in_kfold,
             read_data_sets=read_data_sets
@@ -196,11 +207,12 @@ class ClassificationPipeline(RelevancePipeline):
 
         return relevance_dataset
 
-    def create_pipeline_for_kfold(self, args):
+    @classmethod
+    def create_pipeline_for_kfold(cls, args):
         """
         Create a ClassificationPipeline object used in running kfold cross validation.
         """
-        return ClassificationPipeline(args=args)
+        return cls(args=args)
 
     def run_kfold_analysis(self, base_logs_dir, base_run_id, num_folds, metrics):
         # TODO: Implement the kfold CV analysis for classification
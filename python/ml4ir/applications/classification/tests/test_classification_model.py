@@ -1,5 +1,6 @@
 import pytest
 import numpy as np
+import pandas as pd
 from ml4ir.applications.classification.tests.test_base import ClassificationTestBase
 
 
@@ -57,3 +58,48 @@ class ClassificationModelTest(ClassificationTestBase):
             self.assertTrue(gk in unique_group_names)  # Assert they appear in the dataframe
             unique_metrics_gk = set(df.loc[df.group_name == gk].metric.unique())
             self.assertTrue(unique_metrics_gk == set(metrics))  # Assert each metric appears for them
+
+    def test_predict_and_evaluate(self):
+        """
+        Test that predicting and evaluating with a single pass over the test data
+        matches running predict and evaluate one after the other
+        """
+        predictions, global_metrics, grouped_metrics, metrics_dict = \
+            self.classification_model.predict_and_evaluate(test_dataset=self.relevance_dataset.test,
+                                                           group_metrics_min_queries=0)
+
+        self.assertEqual(set(metrics_dict.keys()), set(self.metrics_dict.keys()))
+        for key, value in self.metrics_dict.items():
+            self.assertTrue(np.isclose(metrics_dict[key], value, rtol=1e-5))
+
+        self.assertEqual(list(predictions.columns), list(self.predictions.columns))
+        output_name = self.classification_model.output_name
+        np.testing.assert_allclose(np.vstack(predictions[output_name]),
+                                   np.vstack(self.predictions[output_name]), rtol=1e-5)
+        pd.testing.assert_frame_equal(predictions.drop(columns=output_name),
+                                      self.predictions.drop(columns=output_name))
+
+        pd.testing.assert_frame_equal(global_metrics, self.global_metrics, rtol=1e-5)
+        # Group keys are decoded in place when the predictions are written to the logs directory
+        grouped_metrics["group_key"] = grouped_metrics["group_key"].apply(
+            lambda x: x.decode("utf-8") if isinstance(x, bytes) else x)
+        pd.testing.assert_frame_equal(grouped_metrics.reset_index(drop=True),
+                                      self.grouped_metrics.reset_index(drop=True), rtol=1e-5)
+
+    def test_predict_and_evaluate_partial_batch(self):
+        """
+        Test that the predictions collected with the evaluation steps match the predictions of
+        predict when the last batch is partial
+        """
+        test_dataset = self.relevance_dataset.test.unbatch().take(8).batch(3)
+        output_name = self.classification_model.output_name
+
+        predictions = self.classification_model.predict(test_dataset)
+        fused_predictions = self.classification_model._create_prediction_dataframe(
+            logging_frequency=25,
+            test_dataset=test_dataset,
+            evaluate_step=self.classification_model.model.evaluate_step)
+
+        self.assertEqual(len(fused_predictions), 8)
+        np.testing.assert_allclose(np.vstack(fused_predictions[output_name]),
+                                   np.vstack(predictions[output_name]), rtol=1e-5)
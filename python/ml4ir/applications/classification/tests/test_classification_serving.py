@@ -40,6 +40,7 @@ class ClassificationServingTest(ClassificationTestBase):
             models_dir=self.args.models_dir,
             preprocessing_keys_to_fns=preprocessing_keys_to_fns,
             required_fields_only=True,
+            batch_serving_signatures=True,
         )
 
         default_model = kmodels.load_model(
@@ -81,3 +82,15 @@ class ClassificationServingTest(ClassificationTestBase):
         assert np.isclose(
             model_predictions[0], tfrecord_signature_predictions[0], rtol=0.01,
         ).all()
+
+        # The batched tfrecord signature scores all the protos at once
+        assert ServingSignatureKey.TFRECORD_BATCH in tfrecord_model.signatures
+        tfrecord_batch_signature = tfrecord_model.signatures[ServingSignatureKey.TFRECORD_BATCH]
+        tfrecord_batch_signature_predictions = tfrecord_batch_signature(
+            protos=sequence_example_protos
+        )[self.args.output_name]
+        assert np.isclose(
+            tf.concat(tfrecord_signature_predictions, axis=0),
+            tfrecord_batch_signature_predictions,
+            rtol=0.01,
+        ).all()
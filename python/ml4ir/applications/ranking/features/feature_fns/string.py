@@ -1,11 +1,18 @@
+import os
+import json
 import string
 import re
+import tempfile
 import tensorflow as tf
 import numpy as np
 
 from ml4ir.base.features.feature_fns.base import BaseFeatureLayerOp
 from ml4ir.base.io.file_io import FileIO
 from ml4ir.applications.ranking.features.feature_fns.categorical import CategoricalVector
+from ml4ir.base.features.feature_fns.utils import VocabLookup
+
+# English stopwords filtered out of the queries before computing the GloVe query embeddings
+STOP_WORDS = {"you're", 'itself', 'but', 'against', 'until', 'where', 'as', 'from', 'own', 'again', 's', "wasn't", 'about', 'out', 'his', 'an', 'those', 've', 'should', 'doing', 'ourselves', 'or', 'down', 'such', "she's", 't', 're', 'me', 'what', 'to', 'didn', "wouldn't", 'hers', 'been', 'which', 'further', 'there', "shouldn't", 'them', "couldn't", 'is', 'wouldn', 'he', 'over', "hasn't", 'their', 'after', 'during', 'few', 'up', 'ma', 'yourselves', 'i', 'themselves', "won't", 'having', "you'll", 'these', 'were', 'most', "isn't", 'how', 'ours', 'y', 'and', 'if', 'not', 'between', 'its', "that'll", 'then', 'that', 'above', 'hadn', 'can', 'each', 'aren', 'whom', 'don', 'we', 'won', 'who', 'be', 'here', 'in', 'our', 'any', 'your', 'shan', 'all', 'd', 'same', 'you', 'nor', 'theirs', 'am', 'isn', 'below', 'o', 'couldn', 'into', "hadn't", 'shouldn', 'very', 'haven', 'it', 'wasn', 'other', 'they', 'are', 'both', 'no', 'through', 'at', 'now', 'himself', 'was', 'off', 'herself', 'doesn', 'mightn', "weren't", "you've", 'too', "mustn't", 'when', 'only', 'on', 'him', 'by', 'hasn', 'once', "haven't", 'yourself', 'have', "you'd", 'a', "doesn't", 'll', 'so', "should've", 'does', 'had', 'my', 'yours', 'she', 'than', 'some', 'why', 'with', 'the', 'will', 'needn', 'did', 'mustn', "needn't", 'more', 'her', 'before', 'for', 'has', 'because', 'of', 'do', "didn't", 'myself', "mightn't", 'just', 'weren', "aren't", 'this', 'ain', "don't", 'while', 'under', 'm', 'being', "it's", "shan't"}
 
 
 class QueryLength(BaseFeatureLayerOp):
@@ -229,7 +236,7 @@ class GloveQueryEmbeddingVector(BaseFeatureLayerOp):
         self.embedding_size = feature_info["feature_layer_info"]["args"]["embedding_size"]
         self.glove_path = feature_info["feature_layer_info"]["args"]["glove_path"]
         self.max_entries = feature_info["feature_layer_info"]["args"]["max_entries"]
-        self.stop_words = {"you're", 'itself', 'but', 'against', 'until', 'where', 'as', 'from', 'own', 'again', 's', "wasn't", 'about', 'out', 'his', 'an', 'those', 've', 'should', 'doing', 'ourselves', 'or', 'down', 'such', "she's", 't', 're', 'me', 'what', 'to', 'didn', "wouldn't", 'hers', 'been', 'which', 'further', 'there', "shouldn't", 'them', "couldn't", 'is', 'wouldn', 'he', 'over', "hasn't", 'their', 'after', 'during', 'few', 'up', 'ma', 'yourselves', 'i', 'themselves', "won't", 'having', "you'll", 'these', 'were', 'most', "isn't", 'how', 'ours', 'y', 'and', 'if', 'not', 'between', 'its', "that'll", 'then', 'that', 'above', 'hadn', 'can', 'each', 'aren', 'whom', 'don', 'we', 'won', 'who', 'be', 'here', 'in', 'our', 'any', 'your', 'shan', 'all', 'd', 'same', 'you', 'nor', 'theirs', 'am', 'isn', 'below', 'o', 'couldn', 'into', "hadn't", 'shouldn', 'very', 'haven', 'it', 'wasn', 'other', 'they', 'are', 'both', 'no', 'through', 'at', 'now', 'himself', 'was', 'off', 'herself', 'doesn', 'mightn', "weren't", "you've", 'too', "mustn't", 'when', 'only', 'on', 'him', 'by', 'hasn', 'once', "haven't", 'yourself', 'have', "you'd", 'a', "doesn't", 'll', 'so', "should've", 'does', 'had', 'my', 'yours', 'she', 'than', 'some', 'why', 'with', 'the', 'will', 'needn', 'did', 'mustn', "needn't", 'more', 'her', 'before', 'for', 'has', 'because', 'of', 'do', "didn't", 'myself', "mightn't", 'just', 'weren', "aren't", 'this', 'ain', "don't", 'while', 'under', 'm', 'being', "it's", "shan't"}
+        self.stop_words = STOP_WORDS
 
         self.word_vectors = {}
 
@@ -339,3 +346,231 @@ class GloveQueryEmbeddingVector(BaseFeatureLayerOp):
         query_embeddings = tf.expand_dims(query_embeddings, axis=1)
         return query_embeddings
 
+
+def _write_atomic(path: str, write_fn):
+    """Write a file to a temporary path in the same directory and move it into place, so that readers
+    never see a partially written file"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                                    prefix="{}.".format(os.path.basename(path)), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write_fn(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def get_glove_source_key(glove_path: str, max_entries: int = None):
+    """
+    Get the key identifying the GloVe embeddings text file a binary store is converted from
+
+    Parameters
+    ----------
+    glove_path : str
+        Path to the pre-trained GloVe embeddings text file
+    max_entries : int, optional
+        Maximum number of entries to load from the GloVe embeddings file
+
+    Returns
+    -------
+    dict
+        Size and modification time of the GloVe file along with max_entries
+    """
+    stat = os.stat(glove_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "max_entries": max_entries}
+
+
+def is_glove_store_stale(glove_path: str, store_path: str, max_entries: int = None):
+    """
+    Check if the binary store is missing or was converted from a different version of the GloVe file
+
+    Parameters
+    ----------
+    glove_path : str
+        Path to the pre-trained GloVe embeddings text file
+    store_path : str
+        Path prefix of the binary store files
+    max_entries : int, optional
+        Maximum number of entries to load from the GloVe embeddings file
+
+    Returns
+    -------
+    bool
+        Whether the binary store needs to be converted again
+    """
+    store_files = ["{}.{}".format(store_path, ext) for ext in ["npy", "vocab", "source"]]
+    if not all(os.path.exists(store_file) for store_file in store_files):
+        return True
+    with open("{}.source".format(store_path), "r", encoding="utf-8") as f:
+        return json.load(f) != get_glove_source_key(glove_path, max_entries)
+
+
+def convert_glove_to_npy(glove_path: str, store_path: str, max_entries: int = None):
+    """
+    Convert a GloVe embeddings text file into a binary store that can be memory-mapped:
+    a `<store_path>.npy` embedding matrix, a `<store_path>.vocab` file with the word of each row
+    and a `<store_path>.source` file with the key of the GloVe file used to detect a stale store
+
+    Parameters
+    ----------
+    glove_path : str
+        Path to the pre-trained GloVe embeddings text file
+    store_path : str
+        Path prefix of the binary store files
+    max_entries : int, optional
+        Maximum number of entries to load from the GloVe embeddings file
+
+    Notes
+    -----
+    Each file is written to a temporary file and moved into place, and the `.source` file is
+    written last, so that a concurrent or interrupted conversion never leaves a store that looks valid
+    """
+    source_key = get_glove_source_key(glove_path, max_entries)
+    words, vectors = list(), list()
+    with open(glove_path, "r", encoding="utf-8") as f:
+        for idx, line in enumerate(f):
+            if max_entries is not None and idx >= max_entries:
+                break
+            values = line.split()
+            words.append(values[0])
+            vectors.append(np.array(values[1:], dtype=np.float32))
+
+    _write_atomic("{}.npy".format(store_path), lambda f: np.save(f, np.stack(vectors)))
+    _write_atomic("{}.vocab".format(store_path), lambda f: f.write("\n".join(words).encode("utf-8")))
+    _write_atomic("{}.source".format(store_path), lambda f: f.write(json.dumps(source_key).encode("utf-8")))
+
+
+class GloveStaticQueryEmbeddingVector(BaseFeatureLayerOp):
+    """
+    A feature layer operation to define a query embedding vectorizer using pre-trained GloVe word embeddings
+    that runs in a compiled graph.
+
+    The words are mapped to the rows of an embedding matrix with a static hash table and the query embedding is
+    the sum of the embeddings of its words, computed with a single gather over the ragged tokens.
+    The embeddings are loaded from a binary store, converted from the GloVe text file when it is missing or stale.
+    The store only speeds up loading: the embedding matrix is copied into a non-trainable weight of the layer,
+    so that the SavedModel can be served without the GloVe files, and is saved with the checkpoints and SavedModels.
+    """
+
+    LAYER_NAME = "glove_static_query_embedding_vector"
+
+    GLOVE_PATH = "glove_path"
+    STORE_PATH = "store_path"
+    MAX_ENTRIES = "max_entries"
+    REMOVE_STOP_WORDS = "remove_stop_words"
+
+    def __init__(self, feature_info: dict, file_io: FileIO, **kwargs):
+        """
+        Initialize layer to define a query embedding vectorizer using pre-trained GloVe word embeddings.
+
+        Parameters
+        ----------
+        feature_info : dict
+            Dictionary representing the configuration parameters for the specific feature from the FeatureConfig.
+        file_io : FileIO
+            FileIO handler object for reading and writing.
+
+        Notes
+        -----
+        Args under feature_layer_info:
+            glove_path : str
+                Path to the pre-trained GloVe embeddings text file.
+            store_path : str
+                Path prefix of the binary embeddings store (`.npy` and `.vocab` files).
+                The store is converted from the GloVe text file if it does not exist or if the size or
+                modification time of the GloVe file changed since the conversion.
+                Defaults to the GloVe file path without extension, suffixed with max_entries if specified.
+                Must be specified if the store needs to be converted and the GloVe file directory is not writable.
+            max_entries : int
+                Maximum number of entries to load from the GloVe embeddings file. Defaults to all the entries.
+            remove_stop_words : bool
+                Whether to filter out the English stopwords from the queries. Defaults to true.
+        """
+        super().__init__(feature_info=feature_info, file_io=file_io, **kwargs)
+
+        self.max_entries = self.feature_layer_args.get(self.MAX_ENTRIES)
+        self.remove_stop_words = self.feature_layer_args.get(self.REMOVE_STOP_WORDS, True)
+        self.store_path = self.feature_layer_args.get(self.STORE_PATH)
+        if not self.store_path:
+            self.store_path = os.path.splitext(self.feature_layer_args[self.GLOVE_PATH])[0]
+            if self.max_entries is not None:
+                self.store_path = "{}.{}".format(self.store_path, self.max_entries)
+
+        if is_glove_store_stale(self.feature_layer_args[self.GLOVE_PATH], self.store_path, self.max_entries):
+            store_dir = os.path.dirname(os.path.abspath(self.store_path))
+            if not os.access(store_dir, os.W_OK):
+                raise ValueError(
+                    "Can not write the GloVe embeddings store to {}. Set {} in the feature_layer_info args "
+                    "of {} to a writable path prefix".format(store_dir, self.STORE_PATH, self.feature_name))
+            convert_glove_to_npy(self.feature_layer_args[self.GLOVE_PATH], self.store_path, self.max_entries)
+
+        # Memory-mapped to load the matrix into the weight without an intermediate copy
+        embeddings = np.load("{}.npy".format(self.store_path), mmap_mode="r")
+        self.embedding_dim = embeddings.shape[1]
+        self.embeddings = self.add_weight(
+            name="{}_glove_embeddings".format(self.feature_name),
+            shape=embeddings.shape,
+            dtype=tf.float32,
+            initializer=lambda shape, dtype: tf.convert_to_tensor(embeddings, dtype=dtype),
+            trainable=False,
+        )
+
+        # Map each word to its row, keeping the last one for duplicate words as with the GloVe text file.
+        # Stop words and out of vocabulary words are mapped to -1 and ignored
+        with open("{}.vocab".format(self.store_path), "r", encoding="utf-8") as f:
+            word_index = {word: idx for idx, word in enumerate(f.read().split("\n"))}
+        if self.remove_stop_words:
+            word_index = {word: idx for word, idx in word_index.items() if word not in STOP_WORDS}
+        self.vocab_lookup = VocabLookup(
+            vocabulary_keys=list(word_index.keys()),
+            vocabulary_ids=list(word_index.values()),
+            default_value=-1,
+            feature_name=self.feature_name,
+        )
+
+    def preprocess_text(self, text):
+        """
+        Preprocess the input text by converting to lowercase, removing punctuation and tokenizing.
+
+        Parameters
+        ----------
+        text : tf.Tensor
+            Input text tensor.
+
+        Returns
+        -------
+        tf.RaggedTensor
+            Tokenized text.
+        """
+        text = tf.strings.lower(text)
+        text = tf.strings.regex_replace(text, f"[{string.punctuation}]", " ")
+        return tf.strings.split(text)
+
+    def call(self, queries, training=None):
+        """
+        Defines the forward pass for the layer on the input queries tensor.
+
+        Parameters
+        ----------
+        queries : tf.Tensor
+            Input tensor containing the queries.
+        training : bool, optional
+            Boolean flag indicating if the layer is being used in training mode or not.
+
+        Returns
+        -------
+        tf.Tensor
+            Resulting tensor after the forward pass through the feature transform layer.
+        """
+        tokens = self.preprocess_text(queries)
+
+        # Gather the embeddings of all the words at once, zeroing the ignored words, and sum them for each query
+        word_ids = self.vocab_lookup(tokens.flat_values)
+        word_embeddings = tf.gather(self.embeddings, tf.maximum(word_ids, 0)) * \
+            tf.cast(word_ids >= 0, tf.float32)[:, tf.newaxis]
+        query_embeddings = tf.reduce_sum(tokens.with_flat_values(word_embeddings), axis=-2)
+
+        if len(queries.shape) == 1:
+            query_embeddings = tf.expand_dims(query_embeddings, axis=1)
+        return query_embeddings
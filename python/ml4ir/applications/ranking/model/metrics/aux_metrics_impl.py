@@ -2,11 +2,13 @@ import numpy as np
 import tensorflow as tf
 from tensorflow.keras import metrics
 
+from ml4ir.applications.ranking.model.metrics.metrics_impl import RankingMetricContext
+
 
 class RankMatchFailure(metrics.Mean):
     """Custom metric implementation to compute the ranking performance on an auxiliary label"""
 
-    def update_state(self, y_true, y_pred, y_aux, y_true_ranks, mask, sample_weight=None):
+    def update_state(self, y_true, y_pred, y_aux, y_true_ranks, mask, sample_weight=None, context=None):
         """
         Accumulates metric statistics by computing the mean of the
         metric function
@@ -24,6 +26,8 @@ class RankMatchFailure(metrics.Mean):
         mask : Tensor object
             Tensor object that contains 0/1 flag to identify which
             records were padded and thus should be excluded from metric computation
+        context : `RankingMetricContext` object, optional
+            Ranks shared with the other metrics updated on the same predictions
 
         Returns
         -------
@@ -33,12 +37,12 @@ class RankMatchFailure(metrics.Mean):
         -----
         `y_aux` is a mandatory argument as this is a metric designed for the auxiliary label
         """
-        query_scores = self._compute_query_scores(y_true, y_pred, y_aux, y_true_ranks, mask)
+        query_scores = self._compute_query_scores(y_true, y_pred, y_aux, y_true_ranks, mask, context)
         inf_masked_query_scores = self._mask_inf_scores(query_scores)
         sample_weight = self._get_sample_weight(query_scores)
         return super().update_state(inf_masked_query_scores, sample_weight)
 
-    def _compute_query_scores(self, y_true, y_pred, y_aux, y_true_ranks, mask):
+    def _compute_query_scores(self, y_true, y_pred, y_aux, y_true_ranks, mask, context=None):
         """
         Compute the auxiliary RankMatchFailure score for each query that will be aggregated via a mean upstream
 
@@ -55,27 +59,24 @@ class RankMatchFailure(metrics.Mean):
         mask : Tensor object
             Tensor object that contains 0/1 flag to identify which
             records were padded and thus should be excluded from metric computation
+        context : `RankingMetricContext` object, optional
+            Ranks shared with the other metrics updated on the same predictions
 
         Returns
         -------
         Tensor
             Score for each query
         """
-        # Convert y_pred for the masked records to -inf
-        y_pred = tf.where(tf.equal(mask, 0), tf.constant(-np.inf), y_pred)
+        if context is None:
+            context = RankingMetricContext(y_true, y_pred, mask)
 
-        # Convert predicted ranking scores into ranks for each record per query
+        # Convert predicted ranking scores into ranks for each record per query, with the masked records last
         # TODO: Currently these ranks are defined below the clicked document too.
         #       Scores below the clicked document shouldn't affect the final rank for NDCG
-        y_pred_ranks = tf.add(
-            tf.argsort(
-                tf.argsort(y_pred, axis=-1, direction="DESCENDING", stable=True), stable=True
-            ),
-            tf.constant(1),
-        )
+        y_pred_ranks = context.masked_y_pred_ranks
 
         # Fetch highest relevance grade from the y_true labels
-        y_true_clicks = tf.cast(tf.equal(y_true, tf.math.reduce_max(y_true, axis=-1)[:, tf.newaxis]), tf.float32)
+        y_true_clicks = context.y_true_clicks
 
         # Compute rank of clicked record from predictions and y_true_ranks
         # Break ties in case of multiple target click labels using the min rank from y_pred_ranks
@@ -1,4 +1,4 @@
-from typing import List
+from typing import Dict, List
 
 import numpy as np
 import pandas as pd
@@ -288,3 +288,342 @@ def compute_aux_metrics_on_query_group(query_group: pd.DataFrame,
         pass
 
     return pd.Series(aux_metrics_dict)
+
+
+def pad_query_groups(df: pd.DataFrame,
+                     query_key_col: str,
+                     columns: List[str],
+                     pad_values: Dict[str, float] = {}):
+    """
+    Convert the records of a DataFrame into padded [num_queries, max_sequence_size] matrices
+
+    Parameters
+    ----------
+    df : `pd.DataFrame` object
+        DataFrame with one row per record
+    query_key_col : str
+        Name of the query key column used to group the records
+    columns : list of str
+        Names of the columns to convert into padded matrices
+    pad_values : dict, optional
+        Value used to pad each column. Defaults to 0.
+
+    Returns
+    -------
+    query_keys : `pd.Index` object
+        Sorted unique query keys corresponding to the rows of the matrices
+    first_record_indices : np.ndarray
+        Positional index into `df` of the first record of each query
+    padded_columns : dict of np.ndarray
+        Padded matrix of shape [num_queries, max_sequence_size] for each column
+    mask : np.ndarray
+        Boolean matrix of shape [num_queries, max_sequence_size] identifying the valid records
+    """
+    query_codes, query_keys = pd.factorize(df[query_key_col], sort=True)
+    valid_rows = np.flatnonzero(query_codes >= 0)
+    sorted_rows = valid_rows[np.argsort(query_codes[valid_rows], kind="stable")]
+    sorted_codes = query_codes[sorted_rows]
+
+    # Position of each record within its query, preserving the original record order
+    query_starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])[:query_keys.size]
+    query_lengths = np.diff(np.r_[query_starts, sorted_codes.size])
+    positions = np.arange(sorted_codes.size) - np.repeat(query_starts, query_lengths)
+
+    num_queries = query_keys.size
+    max_sequence_size = int(query_lengths.max()) if query_lengths.size else 0
+
+    mask = np.zeros((num_queries, max_sequence_size), dtype=bool)
+    mask[sorted_codes, positions] = True
+
+    padded_columns = dict()
+    for column in columns:
+        values = df[column].values[sorted_rows].astype(float)
+        padded_column = np.full((num_queries, max_sequence_size), pad_values.get(column, 0.), dtype=float)
+        padded_column[sorted_codes, positions] = values
+        padded_columns[column] = padded_column
+
+    return query_keys, sorted_rows[query_starts], padded_columns, mask
+
+
+def compute_ndcg_batch(relevance_grades: np.ndarray, mask: np.ndarray):
+    """
+    Compute the normalized discounted cumulative gains for a batch of queries
+
+    Parameters
+    ----------
+    relevance_grades: np.ndarray
+        Relevance grades of shape [num_queries, max_sequence_size], ordered by rank within each query
+    mask: np.ndarray
+        Boolean matrix of shape [num_queries, max_sequence_size] identifying the valid records.
+        Valid records are expected to precede the padded records in each query
+
+    Returns
+    -------
+    np.ndarray
+        Computed NDCG for each query
+
+    Notes
+    -----
+    Vectorized equivalent of `compute_ndcg` with the same gain and discount definitions
+    """
+    discounts = np.log2(np.arange(relevance_grades.shape[1]) + 2.)
+    gains = np.where(mask, np.power(2., relevance_grades) - 1., 0.)
+    ideal_gains = -np.sort(np.where(mask, -gains, np.inf), axis=1)
+    ideal_gains = np.where(np.isinf(ideal_gains), 0., ideal_gains)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.sum(gains / discounts, axis=1) / np.sum(ideal_gains / discounts, axis=1)
+
+
+def sort_by_rank(values: np.ndarray, ranks: np.ndarray, mask: np.ndarray):
+    """
+    Sort the values of each query in a batch by the corresponding ranks, moving masked records to the end
+
+    Parameters
+    ----------
+    values: np.ndarray
+        Values of shape [num_queries, max_sequence_size] to be sorted
+    ranks: np.ndarray
+        Ranks of shape [num_queries, max_sequence_size] corresponding to the values
+    mask: np.ndarray
+        Boolean matrix of shape [num_queries, max_sequence_size] identifying the records to keep
+
+    Returns
+    -------
+    sorted_values : np.ndarray
+        Values sorted by rank within each query
+    sorted_mask : np.ndarray
+        Mask sorted by rank within each query
+    """
+    sorted_indices = np.argsort(np.where(mask, ranks, np.inf), axis=1, kind="stable")
+    return np.take_along_axis(values, sorted_indices, axis=1), np.take_along_axis(mask, sorted_indices, axis=1)
+
+
+def compute_all_failure_batch(aux_label_values: np.ndarray,
+                              ranks: np.ndarray,
+                              click_ranks: np.ndarray,
+                              mask: np.ndarray):
+    """
+    Computes the all failure on the aux label for a batch of queries
+
+    Parameters
+    ----------
+    aux_label_values: np.ndarray
+        Aux label values of shape [num_queries, max_sequence_size]
+    ranks: np.ndarray
+        Ranks of shape [num_queries, max_sequence_size] corresponding to the aux label values
+    click_ranks: np.ndarray
+        Rank of the clicked record for each query
+    mask: np.ndarray
+        Boolean matrix of shape [num_queries, max_sequence_size] identifying the valid records
+
+    Returns
+    -------
+    np.ndarray
+        All Failure value computed for each query
+    """
+    is_click = mask & (ranks == click_ranks[:, None])
+    click_aux_label_values = np.take_along_axis(
+        aux_label_values, np.argmax(is_click, axis=1)[:, None], axis=1)
+
+    is_pre_click = mask & (ranks < click_ranks[:, None])
+
+    # Query failure only if failure on all records above the click
+    all_failure = (is_click.any(axis=1)
+                   & is_pre_click.any(axis=1)
+                   & np.all(~is_pre_click | (aux_label_values < click_aux_label_values), axis=1))
+
+    return all_failure.astype(float)
+
+
+def compute_intrinsic_failure_batch(aux_label_values: np.ndarray,
+                                    ranks: np.ndarray,
+                                    click_ranks: np.ndarray,
+                                    mask: np.ndarray):
+    """
+    Computes the intrinsic failure on the aux label for a batch of queries
+
+    Parameters
+    ----------
+    aux_label_values: np.ndarray
+        Aux label values of shape [num_queries, max_sequence_size]
+    ranks: np.ndarray
+        Ranks of shape [num_queries, max_sequence_size] corresponding to the aux label values
+    click_ranks: np.ndarray
+        Rank of the clicked record for each query
+    mask: np.ndarray
+        Boolean matrix of shape [num_queries, max_sequence_size] identifying the valid records
+
+    Returns
+    -------
+    np.ndarray
+        Intrinsic Failure value computed for each query
+    """
+    # We need to have at least one relevant document.
+    # If not, any ordering is considered ideal
+    has_relevant = np.where(mask, aux_label_values, 0.).sum(axis=1) > 0
+
+    sorted_aux_label_values, sorted_mask = sort_by_rank(aux_label_values, ranks, mask)
+    intrinsic_failure = 1. - compute_ndcg_batch(sorted_aux_label_values, sorted_mask)
+
+    return np.where(has_relevant, intrinsic_failure, 0.)
+
+
+def compute_rank_match_failure_batch(aux_label_values: np.ndarray,
+                                     ranks: np.ndarray,
+                                     click_ranks: np.ndarray,
+                                     mask: np.ndarray):
+    """
+    Computes the rank match failure for a batch of queries
+
+    Parameters
+    ----------
+    aux_label_values: np.ndarray
+        Aux label values of shape [num_queries, max_sequence_size]
+    ranks: np.ndarray
+        Ranks of shape [num_queries, max_sequence_size] corresponding to the aux label values
+    click_ranks: np.ndarray
+        Rank of the clicked record for each query
+    mask: np.ndarray
+        Boolean matrix of shape [num_queries, max_sequence_size] identifying the valid records
+
+    Returns
+    -------
+    np.ndarray
+        RankMatchFailure value computed for each query.
+        NaN for queries where none of the records up to the click have an aux label value
+
+    Notes
+    -----
+    Currently, only defined for queries with exactly 1 clicked record
+    """
+    # Filter to only the records above clicked record
+    is_above_click = mask & (ranks <= click_ranks[:, None])
+    has_aux_label = aux_label_values > 0.
+
+    # Dense rank of the aux label values among the records above the click
+    sorted_indices = np.argsort(np.where(is_above_click, aux_label_values, np.inf), axis=1, kind="stable")
+    sorted_values = np.take_along_axis(aux_label_values, sorted_indices, axis=1)
+    sorted_dense_ranks = np.cumsum(
+        np.concatenate([np.ones_like(sorted_values[:, :1], dtype=bool),
+                        sorted_values[:, 1:] != sorted_values[:, :-1]], axis=1), axis=1)
+    aux_label_ranks = np.empty_like(sorted_dense_ranks)
+    np.put_along_axis(aux_label_ranks, sorted_indices, sorted_dense_ranks, axis=1)
+
+    # Convert aux ranks to relevance grades (higher is better) for use with NDCG metric
+    # If the aux label value is 0, then assign a relevance grade of 0 to account for variable sequence length
+    aux_label_relevance_grades = np.where(is_above_click & has_aux_label, 1. / np.maximum(aux_label_ranks, 1), 0.)
+
+    # Compute RankMF as 1 - NDCG on grades sorted by ranks
+    sorted_grades, sorted_mask = sort_by_rank(aux_label_relevance_grades, ranks, is_above_click)
+    rank_match_failure = 1. - compute_ndcg_batch(sorted_grades, sorted_mask)
+
+    # If no records have a match on the title
+    rank_match_failure = np.where(aux_label_relevance_grades.sum(axis=1) == 0, np.nan, rank_match_failure)
+
+    # If all records above the clicked record have some aux label value greater than 0, then there is no RankMF
+    rank_match_failure = np.where(np.all(~is_above_click | has_aux_label, axis=1), 0., rank_match_failure)
+
+    # If click is on the first record, there is no RankMF
+    return np.where(click_ranks == 1, 0., rank_match_failure)
+
+
+def compute_aux_metrics_batch(aux_label_values: np.ndarray,
+                              ranks: np.ndarray,
+                              click_ranks: np.ndarray,
+                              mask: np.ndarray,
+                              prefix: str = ""):
+    """
+    Computes the secondary ranking metrics using a aux label for a batch of queries
+
+    Parameters
+    ----------
+    aux_label_values: np.ndarray
+        Aux label values of shape [num_queries, max_sequence_size]
+    ranks: np.ndarray
+        Ranks of shape [num_queries, max_sequence_size] corresponding to the aux label values
+    click_ranks: np.ndarray
+        Rank of the clicked record for each query
+    mask: np.ndarray
+        Boolean matrix of shape [num_queries, max_sequence_size] identifying the valid records
+    prefix: str
+        Prefix attached to the metric name
+
+    Returns
+    -------
+    dict
+        Key value pairs of the metric names and the associated computed values for each query
+
+    Notes
+    -----
+    Vectorized equivalent of `compute_aux_metrics` over padded query matrices
+    """
+    return {
+        f"{prefix}{Metric.AUX_ALL_FAILURE}": compute_all_failure_batch(
+            aux_label_values, ranks, click_ranks, mask),
+        f"{prefix}{Metric.AUX_INTRINSIC_FAILURE}": compute_intrinsic_failure_batch(
+            aux_label_values, ranks, click_ranks, mask),
+        f"{prefix}{Metric.AUX_RANKMF}": compute_rank_match_failure_batch(
+            aux_label_values, ranks, click_ranks, mask)
+    }
+
+
+def compute_aux_metrics_on_queries(df: pd.DataFrame,
+                                   query_key_col: str,
+                                   label_col: str,
+                                   old_rank_col: str,
+                                   new_rank_col: str,
+                                   aux_label: str,
+                                   group_keys: List[str] = []):
+    """
+    Compute the old and new auxiliary ranking metrics for all queries in a DataFrame at once
+
+    Parameters
+    ----------
+    df : `pd.DataFrame` object
+        DataFrame with one row per record for all the queries
+    query_key_col : str
+        Name of the query key column
+    label_col : str
+        Name of the label column in the query_group
+    old_rank_col : str
+        Name of the column that represents the original rank of the records
+    new_rank_col : str
+        Name of the column that represents the newly computed rank of the records
+        after reordering based on new model scores
+    aux_label : str
+        Features used to compute auxiliary failure metrics
+    group_keys : list, optional
+        List of features used to compute groupwise metrics
+
+    Returns
+    -------
+    `pd.DataFrame` object
+        DataFrame indexed by the query key containing the group keys and
+        the ranking metrics computed using the aux label on the old and
+        new ranks generated by the model
+
+    Notes
+    -----
+    Produces the same values as applying `compute_aux_metrics_on_query_group` to each
+    query group, but computes them with array operations over padded query matrices
+    """
+    query_keys, first_record_indices, padded_columns, mask = pad_query_groups(
+        df, query_key_col, [label_col, old_rank_col, new_rank_col, aux_label])
+    is_click = mask & (padded_columns[label_col] == 1)
+
+    aux_metrics_dict = {k: df[k].values[first_record_indices] for k in group_keys}
+    for prefix, rank_col in [("old_", old_rank_col), ("new_", new_rank_col)]:
+        ranks = padded_columns[rank_col]
+        click_ranks = np.where(is_click, ranks, np.inf).min(axis=1)
+        aux_metrics_dict.update(
+            compute_aux_metrics_batch(
+                aux_label_values=padded_columns[aux_label],
+                ranks=ranks,
+                click_ranks=click_ranks,
+                mask=mask,
+                prefix=prefix,
+            )
+        )
+
+    return pd.DataFrame(aux_metrics_dict, index=pd.Index(query_keys, name=query_key_col))
@@ -0,0 +1,368 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+
+from ml4ir.applications.ranking.model.metrics.helpers.metric_key import Metric
+from ml4ir.applications.ranking.model.metrics.helpers.metrics_helper import RankingConstants
+from ml4ir.base.stats.t_test import GroupMetricStreamVariance, StreamMoments
+
+
+# Query level stats that are summed per group to compute ranking metrics
+SUM_STATS = [
+    "query_count",
+    "sum_old_rank",
+    "sum_new_rank",
+    "sum_old_reciprocal_rank",
+    "sum_new_reciprocal_rank",
+]
+GROUP_KEY_SEPARATOR = "\x1f"
+
+
+def _to_query_matrix(x, mask):
+    """Reshape a record level tensor to [batch_size, max_sequence_size] and broadcast context tensors"""
+    x = tf.reshape(x, [tf.shape(x)[0], -1])
+    return tf.broadcast_to(x, tf.shape(mask))
+
+
+def compute_dcg(y_true, y_score, mask):
+    """
+    Compute the Discounted Cumulative Gain for each query in a padded batch
+
+    Parameters
+    ----------
+    y_true : Tensor
+        Relevance grades of shape [batch_size, max_sequence_size]
+    y_score : Tensor
+        Scores used to order the records of shape [batch_size, max_sequence_size]
+    mask : Tensor
+        Boolean tensor of shape [batch_size, max_sequence_size] identifying the valid records
+
+    Returns
+    -------
+    Tensor
+        DCG of each query of shape [batch_size]
+    """
+    y_score = tf.where(mask, y_score, tf.constant(-np.inf, dtype=y_score.dtype))
+    sorted_indices = tf.argsort(y_score, axis=-1, direction="DESCENDING", stable=True)
+    sorted_labels = tf.gather(tf.where(mask, y_true, tf.zeros_like(y_true)), sorted_indices, batch_dims=1)
+
+    positions = tf.cast(tf.range(1, tf.shape(y_true)[1] + 1), y_true.dtype)
+    discounts = tf.math.log(positions + 1.) / tf.math.log(tf.constant(2., dtype=y_true.dtype))
+
+    return tf.reduce_sum(sorted_labels / discounts, axis=-1)
+
+
+def compute_query_stats(
+        predictions_dict: Dict[str, tf.Tensor],
+        label_col: str,
+        old_rank_col: str,
+        new_rank_col: str,
+        new_ranking_score: str,
+        old_ranking_score: Optional[str] = None,
+        compute_ndcg: bool = False,
+):
+    """
+    Compute the query level stats used for ranking metrics on padded prediction tensors
+
+    Parameters
+    ----------
+    predictions_dict : dict of Tensors
+        Dictionary of padded prediction tensors of shape [batch_size, max_sequence_size]
+        along with the `mask` tensor
+    label_col : str
+        Name of the label tensor
+    old_rank_col : str
+        Name of the tensor that represents the original rank of the records
+    new_rank_col : str
+        Name of the tensor that represents the newly computed rank of the records
+    new_ranking_score : str
+        Name of the tensor that represents the ranking score of the new model
+    old_ranking_score : str, optional
+        Name of the tensor that represents the ranking score of the old model
+    compute_ndcg : bool, optional
+        Whether the new and old NDCG should be computed
+
+    Returns
+    -------
+    dict of Tensors
+        Query level stats of shape [batch_size]. `is_clicked` identifies the
+        queries with a proxy click which are used for the metrics and `click_index`
+        is the position of the first proxy clicked record in each query
+
+    Notes
+    -----
+    Mirrors `metrics_helper.get_grouped_stats`: the proxy clicks are the records with the
+    highest relevance grade in queries with non zero labels, and ties are resolved with the
+    minimum old and new ranks of the clicked records
+    """
+    mask = tf.cast(predictions_dict["mask"], tf.bool)
+    labels = tf.cast(_to_query_matrix(predictions_dict[label_col], mask), tf.float64)
+    old_ranks = tf.cast(_to_query_matrix(predictions_dict[old_rank_col], mask), tf.float64)
+    new_ranks = tf.cast(_to_query_matrix(predictions_dict[new_rank_col], mask), tf.float64)
+
+    # Generate proxy clicks from the records with the highest relevance grade
+    inf = tf.constant(np.inf, dtype=tf.float64)
+    is_clicked = tf.reduce_sum(tf.where(mask, labels, tf.zeros_like(labels)), axis=-1) > 0.
+    max_labels = tf.reduce_max(tf.where(mask, labels, -inf), axis=-1, keepdims=True)
+    proxy_clicks = mask & is_clicked[:, tf.newaxis] & tf.equal(labels, max_labels)
+
+    old_click_rank = tf.reduce_min(tf.where(proxy_clicks, old_ranks, inf), axis=-1)
+    new_click_rank = tf.reduce_min(tf.where(proxy_clicks, new_ranks, inf), axis=-1)
+
+    query_stats = {
+        "is_clicked": is_clicked,
+        "click_index": tf.argmax(tf.cast(proxy_clicks, tf.int32), axis=-1, output_type=tf.int32),
+        RankingConstants.OLD_ACR: old_click_rank,
+        RankingConstants.NEW_ACR: new_click_rank,
+        RankingConstants.OLD_MRR: 1. / old_click_rank,
+        RankingConstants.NEW_MRR: 1. / new_click_rank,
+    }
+    query_stats[RankingConstants.DIFF_MRR] = query_stats[RankingConstants.NEW_MRR] - query_stats[
+        RankingConstants.OLD_MRR]
+
+    if compute_ndcg:
+        idcg = compute_dcg(labels, labels, mask)
+        query_stats[RankingConstants.NEW_NDCG] = tf.math.divide_no_nan(
+            compute_dcg(labels, tf.cast(_to_query_matrix(predictions_dict[new_ranking_score], mask), tf.float64),
+                        mask), idcg)
+        if old_ranking_score:
+            query_stats[RankingConstants.OLD_NDCG] = tf.math.divide_no_nan(
+                compute_dcg(labels,
+                            tf.cast(_to_query_matrix(predictions_dict[old_ranking_score], mask), tf.float64),
+                            mask), idcg)
+        else:
+            # we cannot compute old NDCG
+            query_stats[RankingConstants.OLD_NDCG] = tf.zeros_like(idcg)
+
+    return query_stats
+
+
+def compute_grouped_batch_stats(
+        predictions_dict: Dict[str, tf.Tensor],
+        query_stats: Dict[str, tf.Tensor],
+        group_keys: List[str] = [],
+        power_analysis_metrics: List[str] = [],
+):
+    """
+    Sum the query level stats of the clicked queries in a batch for each group
+
+    Parameters
+    ----------
+    predictions_dict : dict of Tensors
+        Dictionary of padded prediction tensors containing the group key features
+    query_stats : dict of Tensors
+        Query level stats computed with `compute_query_stats`
+    group_keys : list, optional
+        List of features used to compute groupwise metrics
+    power_analysis_metrics : list, optional
+        List of old and new metrics for which the groupwise variance is needed for power analysis
+
+    Returns
+    -------
+    group_values : list of Tensors
+        Values of each group key for the groups in the batch, each of shape [num_groups]
+    group_stats : dict of Tensors
+        Summed stats for each group in the batch, along with the M2 (sum of squared distance
+        from the group mean) of the power analysis metrics, each of shape [num_groups]
+    ttest_stats : dict of Tensors
+        Count, mean and M2 of the MRR difference over all the clicked queries,
+        used for the click rank distribution t-test
+    """
+    is_clicked = query_stats["is_clicked"]
+    query_stats = {k: tf.boolean_mask(v, is_clicked) for k, v in query_stats.items() if k != "is_clicked"}
+    click_index = query_stats.pop("click_index")
+    num_queries = tf.shape(query_stats[RankingConstants.OLD_ACR])[0]
+
+    # Group the clicked queries using the value of the group keys on the first proxy clicked record
+    mask = tf.cast(predictions_dict["mask"], tf.bool)
+    group_values = [tf.gather(tf.boolean_mask(_to_query_matrix(predictions_dict[k], mask), is_clicked),
+                              click_index[:, tf.newaxis], batch_dims=1)[:, 0]
+                    for k in group_keys]
+    if group_values:
+        group_ids = tf.strings.join(
+            [v if v.dtype == tf.string else tf.strings.as_string(v) for v in group_values],
+            separator=GROUP_KEY_SEPARATOR)
+    else:
+        group_ids = tf.fill([num_queries], "")
+    unique_group_ids, group_index = tf.unique(group_ids)
+    num_groups = tf.shape(unique_group_ids)[0]
+    first_query_index = tf.math.unsorted_segment_min(tf.range(num_queries), group_index, num_groups)
+    group_values = [tf.gather(v, first_query_index) for v in group_values]
+
+    def group_sum(x):
+        return tf.math.unsorted_segment_sum(x, group_index, num_groups)
+
+    group_stats = {
+        "query_count": group_sum(tf.ones_like(query_stats[RankingConstants.OLD_ACR])),
+        "sum_old_rank": group_sum(query_stats[RankingConstants.OLD_ACR]),
+        "sum_new_rank": group_sum(query_stats[RankingConstants.NEW_ACR]),
+        "sum_old_reciprocal_rank": group_sum(query_stats[RankingConstants.OLD_MRR]),
+        "sum_new_reciprocal_rank": group_sum(query_stats[RankingConstants.NEW_MRR]),
+    }
+    if RankingConstants.NEW_NDCG in query_stats:
+        group_stats[RankingConstants.NEW_NDCG] = group_sum(query_stats[RankingConstants.NEW_NDCG])
+        group_stats[RankingConstants.OLD_NDCG] = group_sum(query_stats[RankingConstants.OLD_NDCG])
+
+    # M2 of the metrics around the group mean of the batch for the groupwise variance needed for power analysis
+    for metric in power_analysis_metrics:
+        if metric not in group_stats:
+            group_stats[metric] = group_sum(query_stats[metric])
+        group_mean = group_stats[metric] / group_stats["query_count"]
+        group_stats["m2_{}".format(metric)] = group_sum(
+            tf.square(query_stats[metric] - tf.gather(group_mean, group_index)))
+
+    diff_mrr = query_stats[RankingConstants.DIFF_MRR]
+    count = tf.cast(num_queries, tf.float64)
+    mean = tf.math.divide_no_nan(tf.reduce_sum(diff_mrr), count)
+    ttest_stats = {
+        "count": count,
+        "mean": mean,
+        "m2": tf.reduce_sum(tf.square(diff_mrr - mean)),
+    }
+
+    return group_values, group_stats, ttest_stats
+
+
+class GroupedStatsAccumulator:
+    """
+    Accumulates the per batch grouped stats from `compute_grouped_batch_stats` into
+    numpy arrays keyed by the group, so only the final grouped table is materialized
+    as a pandas DataFrame
+
+    The count, mean and M2 of each batch used for the variances are merged with Chan's
+    parallel algorithm, as in `t_test.GroupMetricStreamVariance` and `t_test.StreamMoments`
+    """
+
+    def __init__(self, group_keys: List[str] = [], power_analysis_metrics: List[str] = []):
+        """
+        Parameters
+        ----------
+        group_keys : list, optional
+            List of features used to compute groupwise metrics
+        power_analysis_metrics : list, optional
+            List of old and new metrics for which groupwise variance is tracked
+        """
+        self.group_keys = group_keys
+        self.power_analysis_metrics = power_analysis_metrics
+        self.stat_names = None
+        self.group_index = dict()
+        self.group_stats = np.zeros((0, 0))
+        self.group_metric_running_variance_params = GroupMetricStreamVariance()
+        self.ttest_moments = StreamMoments()
+
+    def update(self, group_values, group_stats, ttest_stats):
+        """
+        Add the grouped stats of a batch to the accumulated stats
+
+        Parameters
+        ----------
+        group_values : list of Tensors
+            Values of each group key for the groups in the batch
+        group_stats : dict of Tensors
+            Summed stats for each group in the batch
+        ttest_stats : dict of Tensors
+            Count, mean and M2 of the MRR difference in the batch
+        """
+        if self.stat_names is None:
+            self.stat_names = [k for k in group_stats.keys() if not k.startswith("m2_")]
+            self.group_stats = np.zeros((0, len(self.stat_names)))
+
+        batch_stats = np.stack([group_stats[k].numpy() for k in self.stat_names], axis=-1)
+        if self.group_keys:
+            batch_groups = list(zip(*[values.numpy().tolist() for values in group_values]))
+        else:
+            # All the clicked queries in the batch fall into a single group, if any
+            batch_groups = [()] * batch_stats.shape[0]
+
+        # Register new groups and add the batch stats
+        for group in batch_groups:
+            if group not in self.group_index:
+                self.group_index[group] = len(self.group_index)
+        if len(self.group_index) > self.group_stats.shape[0]:
+            self.group_stats = np.vstack(
+                [self.group_stats, np.zeros((len(self.group_index) - self.group_stats.shape[0],
+                                             len(self.stat_names)))])
+        np.add.at(self.group_stats,
+                  np.array([self.group_index[g] for g in batch_groups], dtype=np.int64),
+                  batch_stats)
+
+        if self.group_keys and self.power_analysis_metrics:
+            count = group_stats["query_count"].numpy()[:, np.newaxis]
+            mean = np.stack([group_stats[metric].numpy() for metric in self.power_analysis_metrics], axis=-1) / count
+            m2 = np.stack([group_stats["m2_{}".format(metric)].numpy()
+                           for metric in self.power_analysis_metrics], axis=-1)
+            group_names = [group[0] if len(self.group_keys) == 1 else group for group in batch_groups]
+            self.group_metric_running_variance_params.merge_arrays(
+                group_names, self.power_analysis_metrics, mean, m2, np.repeat(count, mean.shape[1], axis=1))
+
+        self.ttest_moments.merge_moments(float(ttest_stats["count"].numpy()),
+                                         float(ttest_stats["mean"].numpy()),
+                                         float(ttest_stats["m2"].numpy()))
+
+    def get_grouped_stats(self):
+        """
+        Get the accumulated grouped stats in the format of `metrics_helper.get_grouped_stats`
+
+        Returns
+        -------
+        `pd.DataFrame` object
+            DataFrame object indexed by the group keys containing the summed ranking stats
+        """
+        stat_names = [k for k in (self.stat_names or SUM_STATS)
+                      if k in SUM_STATS or k in (RankingConstants.NEW_NDCG, RankingConstants.OLD_NDCG)]
+        stat_indices = [(self.stat_names or SUM_STATS).index(k) for k in stat_names]
+        df_grouped_stats = pd.DataFrame(self.group_stats[:, stat_indices], columns=stat_names)
+
+        if self.group_keys:
+            index = pd.MultiIndex.from_tuples(list(self.group_index.keys()), names=self.group_keys)
+            if len(self.group_keys) == 1:
+                index = index.get_level_values(0)
+            df_grouped_stats.index = index
+            df_grouped_stats = df_grouped_stats.sort_index()
+
+        return df_grouped_stats
+
+    def get_group_metric_running_variance_params(self):
+        """
+        Get the mean, variance and count of the power analysis metrics for each group
+
+        Returns
+        -------
+        `GroupMetricStreamVariance`
+            Mean, variance and count of each power analysis metric for each group
+            in the format used by `t_test.run_power_analysis`
+        """
+        return self.group_metric_running_variance_params
+
+    def get_ttest_stats(self):
+        """
+        Get the count, mean and M2 (sum of squared distance from the mean) of the MRR
+        difference across all the clicked queries for the click rank distribution t-test
+
+        Returns
+        -------
+        tuple of float
+            count, mean and M2 of the MRR difference
+        """
+        return self.ttest_moments.count, self.ttest_moments.mean, self.ttest_moments.m2
+
+
+def get_power_analysis_metrics(variance_list: List[str]):
+    """
+    Filter the power analysis metrics to the primary ranking metrics that can be computed in-graph
+
+    Parameters
+    ----------
+    variance_list : list
+        List of old and new metrics requiring power analysis
+
+    Returns
+    -------
+    list
+        List of old and new primary metrics requiring power analysis
+    """
+    primary_metrics = set(Metric.get_metrics_with_new_old_prefix(
+        [Metric.MRR, Metric.ACR, Metric.NDCG]))
+    return [m for m in variance_list if m in primary_metrics]
@@ -1,10 +1,10 @@
-from typing import List
+from typing import Dict, List
 
 import pandas as pd
 import numpy as np
 
 from ml4ir.applications.ranking.model.metrics.helpers.metric_key import Metric
-from ml4ir.applications.ranking.model.metrics.helpers.aux_metrics_helper import compute_aux_metrics_on_query_group
+from ml4ir.applications.ranking.model.metrics.helpers.aux_metrics_helper import compute_aux_metrics_on_queries
 from ml4ir.base.stats.t_test import compute_batched_stats
 
 DELTA = 1e-20
@@ -47,48 +47,134 @@ def generate_proxy_click(labels):
         return labels.astype(float)
 
 
-def compute_ndcg(df, query_key_col, label_col, pred_col="ranking_score", new_col="new_NDCG"):
+def get_segment_starts(sorted_segment_ids: np.ndarray):
     """
-    Computes the Normalized Discounted Cumulative Gain (NDCG) for each query in the DataFrame.
+    Find the start offsets of the contiguous segments in a sorted array of segment ids
+
+    Parameters
+    ----------
+    sorted_segment_ids : np.ndarray
+        1D array of segment ids sorted such that all rows of a segment are contiguous
+
+    Returns
+    -------
+    np.ndarray
+        Start offset of each segment. Can be used with `np.ufunc.reduceat`
+    """
+    if sorted_segment_ids.size == 0:
+        return np.zeros(0, dtype=np.int64)
+    return np.flatnonzero(np.r_[True, sorted_segment_ids[1:] != sorted_segment_ids[:-1]])
+
+
+def compute_segment_dcg(segment_ids: np.ndarray, y_true: np.ndarray, y_score: np.ndarray):
+    """
+    Compute the Discounted Cumulative Gain (DCG) of every segment (query) in a single pass
+
+    The records are sorted once by segment id and by descending score within each segment,
+    so that the rank discounts and the per segment sums can be computed with array operations.
+
+    Parameters
+    ----------
+    segment_ids : np.ndarray
+        1D integer array identifying the segment (query) of each record
+    y_true : np.ndarray
+        1D array of relevance grades of each record
+    y_score : np.ndarray
+        1D array of scores used to order the records within each segment
+
+    Returns
+    -------
+    np.ndarray
+        DCG of each segment, ordered by ascending segment id
+    """
+    # Stable sort by segment and then by descending score
+    sorted_indices = np.lexsort((-y_score, segment_ids))
+    sorted_segment_ids = segment_ids[sorted_indices]
+    segment_starts = get_segment_starts(sorted_segment_ids)
+    if segment_starts.size == 0:
+        return np.zeros(0, dtype=float)
+
+    # 1-based position of each record within its segment
+    segment_lengths = np.diff(np.r_[segment_starts, sorted_segment_ids.size])
+    positions = np.arange(1, sorted_segment_ids.size + 1) - np.repeat(segment_starts, segment_lengths)
+    discounts = np.log2(positions + 1.)
+
+    return np.add.reduceat(y_true[sorted_indices].astype(float) / discounts, segment_starts)
+
+
+def compute_segment_ndcg(segment_ids: np.ndarray, y_true: np.ndarray, y_scores: List[np.ndarray]):
+    """
+    Compute the Normalized Discounted Cumulative Gain (NDCG) of every segment (query)
+    for one or more score arrays, sharing the ideal DCG computation across them
+
+    Parameters
+    ----------
+    segment_ids : np.ndarray
+        1D integer array identifying the segment (query) of each record
+    y_true : np.ndarray
+        1D array of relevance grades of each record
+    y_scores : list of np.ndarray
+        List of 1D score arrays to compute NDCG for
+
+    Returns
+    -------
+    list of np.ndarray
+        NDCG of each segment per score array, ordered by ascending segment id.
+        Segments with no relevant records have a NDCG of NaN
+    """
+    idcg = compute_segment_dcg(segment_ids, y_true, y_true)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return [compute_segment_dcg(segment_ids, y_true, y_score) / idcg for y_score in y_scores]
+
+
+def compute_ndcg_columns(df, query_key_col, label_col, pred_cols: Dict[str, str]):
+    """
+    Computes the Normalized Discounted Cumulative Gain (NDCG) for each query in the DataFrame
+    for multiple prediction columns at once.
 
     Args:
         df (pandas.DataFrame): The input DataFrame.
         query_key_col (str): The name of the column containing the query id.
         label_col (str): The column name containing the true relevance scores.
-        pred_col (str, optional): The column name containing the predicted scores. Default is "ranking_score".
-        new_col (str, optional): The name for the new column containing the computed NDCG values. Default is "new_NDCG".
+        pred_cols (dict): Mapping of the new NDCG column name to the predicted scores column name.
 
     Returns:
-        pandas.DataFrame: The input DataFrame with the new column containing the computed NDCG values.
+        pandas.DataFrame: The input DataFrame with the new columns containing the computed NDCG values.
     """
-    grouped = df.groupby(query_key_col)
-    for qid, group in grouped:
-
-        y_true = group[label_col].values
-        y_pred = group[pred_col].values
-
-        # Sort the predicted scores in descending order
-        sorted_indices = np.argsort(-y_pred, axis=-1)
-        sorted_labels = np.take_along_axis(y_true, sorted_indices, axis=-1)
-
-        # Compute the Discounted Cumulative Gain (DCG)
-        positions = np.arange(1, y_true.shape[-1] + 1, dtype=float)
-        discounts = np.log1p(positions) / np.log1p(2.0)  # log base 2
-        dcg = np.sum(sorted_labels / discounts, axis=-1)
+    query_codes, _ = pd.factorize(df[query_key_col], sort=True)
+    query_ndcgs = compute_segment_ndcg(
+        query_codes,
+        df[label_col].values.astype(float),
+        [df[pred_col].values.astype(float) for pred_col in pred_cols.values()])
+
+    # Broadcast the query level NDCG back to the records. Records with missing query keys get NaN
+    # and form a leading segment (code -1) that has to be skipped
+    valid_rows = query_codes >= 0
+    offset = int((~valid_rows).any())
+    for new_col, query_ndcg in zip(pred_cols.keys(), query_ndcgs):
+        record_ndcg = np.full(len(df), np.nan)
+        record_ndcg[valid_rows] = query_ndcg[query_codes[valid_rows] + offset]
+        df[new_col] = record_ndcg
 
-        # Sort the true relevance scores in descending order
-        true_sorted_indices = np.argsort(-y_true, axis=-1)
-        true_sorted_labels = np.take_along_axis(y_true, true_sorted_indices, axis=-1)
+    return df
 
-        # Compute the Ideal Discounted Cumulative Gain (IDCG)
-        idcg = np.sum(true_sorted_labels / discounts, axis=-1)
 
-        # Compute the Normalized Discounted Cumulative Gain (NDCG)
-        ndcg = dcg / idcg
+def compute_ndcg(df, query_key_col, label_col, pred_col="ranking_score", new_col="new_NDCG"):
+    """
+    Computes the Normalized Discounted Cumulative Gain (NDCG) for each query in the DataFrame.
 
-        df.loc[np.array(df.loc[df[query_key_col] == qid].index), new_col] = ndcg.item()
+    Args:
+        df (pandas.DataFrame): The input DataFrame.
+        query_key_col (str): The name of the column containing the query id.
+        label_col (str): The column name containing the true relevance scores.
+        pred_col (str, optional): The column name containing the predicted scores. Default is "ranking_score".
+        new_col (str, optional): The name for the new column containing the computed NDCG values. Default is "new_NDCG".
 
-    return df
+    Returns:
+        pandas.DataFrame: The input DataFrame with the new column containing the computed NDCG values.
+    """
+    return compute_ndcg_columns(df, query_key_col, label_col, {new_col: pred_col})
 
 
 def get_grouped_stats(
@@ -129,8 +215,8 @@ def get_grouped_stats(
         Feature used to compute auxiliary failure metrics
     power_analysis_metrics: list
         List of metrics require power analysis computation
-    group_metric_running_variance_params: dict
-        A dictionary containing intermediate mean, variance and sample size for each group for each metric
+    group_metric_running_variance_params: `GroupMetricStreamVariance` or dict
+        The intermediate mean, variance and sample size for each group for each metric
 
     Returns
     -------
@@ -140,11 +226,12 @@ def get_grouped_stats(
         by the model
     """
     if np.array([Metric.NDCG in metric for metric in power_analysis_metrics]).any():
-        df = compute_ndcg(df, query_key_col, label_col, pred_col=new_ranking_score, new_col=RankingConstants.NEW_NDCG)
-
+        ndcg_cols = {RankingConstants.NEW_NDCG: new_ranking_score}
         if old_ranking_score in df.columns:  # if the old model ranking score is available
-            df = compute_ndcg(df, query_key_col, label_col, pred_col=old_ranking_score, new_col=RankingConstants.OLD_NDCG)
-        else:
+            ndcg_cols[RankingConstants.OLD_NDCG] = old_ranking_score
+        df = compute_ndcg_columns(df, query_key_col, label_col, ndcg_cols)
+
+        if old_ranking_score not in df.columns:
             # we cannot compute old NDCG
             df[RankingConstants.OLD_NDCG] = 0.0
 
@@ -164,15 +251,15 @@ def get_grouped_stats(
         # Filter to only queries with at least 1 click label
         df = df[df[query_key_col].isin(df_clicked[query_key_col])]
 
-        df_aux_metrics = df.groupby(query_key_col).apply(
-            lambda grp: compute_aux_metrics_on_query_group(
-                query_group=grp,
-                label_col=RankingConstants.PROXY_CLICK,
-                old_rank_col=old_rank_col,
-                new_rank_col=new_rank_col,
-                aux_label=aux_label,
-                group_keys=group_keys,
-            ))
+        df_aux_metrics = compute_aux_metrics_on_queries(
+            df=df,
+            query_key_col=query_key_col,
+            label_col=RankingConstants.PROXY_CLICK,
+            old_rank_col=old_rank_col,
+            new_rank_col=new_rank_col,
+            aux_label=aux_label,
+            group_keys=group_keys,
+        )
 
     # Adding ranking metrics: MRR, ACR
     df_clicked[RankingConstants.NEW_MRR] = 1.0 / df_clicked[new_rank_col]
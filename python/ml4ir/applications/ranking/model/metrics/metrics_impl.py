@@ -1,3 +1,4 @@
+import numpy as np
 import tensorflow as tf
 from tensorflow.keras import metrics
 from tensorflow.python.ops import math_ops
@@ -5,13 +6,88 @@ from tensorflow.python.ops import math_ops
 from ml4ir.base.model.metrics.metrics_impl import SegmentMean
 
 
+class RankingMetricContext:
+    """
+    Rank computations on a batch of predictions shared by the ranking metrics
+
+    The tensors are computed on first access and cached, so that all the metrics updated on the same
+    step sort the predicted scores once instead of once per metric
+    """
+
+    def __init__(self, y_true, y_pred, mask=None):
+        """
+        Parameters
+        ----------
+        y_true : Tensor object
+            The ground truth values. Shape : [batch_size, max_sequence_size]
+        y_pred : Tensor object
+            The predicted values. Shape : [batch_size, max_sequence_size]
+        mask : Tensor object
+            Tensor object that contains 0/1 flag to identify which
+            results were padded and thus should be excluded from metric computation
+        """
+        self.y_true = y_true
+        self.y_pred = y_pred
+        self.mask = mask
+        self._cache = dict()
+
+    def _get(self, key, compute_fn):
+        if key not in self._cache:
+            self._cache[key] = compute_fn()
+        return self._cache[key]
+
+    @staticmethod
+    def compute_ranks(sorted_indices):
+        """Convert the indices sorting the records of each query into 1-based ranks for each record"""
+        return tf.add(tf.argsort(sorted_indices, stable=True), tf.constant(1))
+
+    @property
+    def y_pred_sorted_indices(self):
+        """Indices of the records sorted by descending predicted score for each query"""
+        return self._get("y_pred_sorted_indices",
+                         lambda: tf.argsort(self.y_pred, axis=-1, direction="DESCENDING", stable=True))
+
+    @property
+    def y_pred_ranks(self):
+        """Ranks of the records from the predicted scores for each query"""
+        return self._get("y_pred_ranks", lambda: self.compute_ranks(self.y_pred_sorted_indices))
+
+    @property
+    def masked_y_pred_ranks(self):
+        """Ranks of the records from the predicted scores for each query, with the padded records ranked last"""
+        return self._get("masked_y_pred_ranks", lambda: self.compute_ranks(
+            tf.argsort(tf.where(tf.equal(self.mask, 0), tf.constant(-np.inf), self.y_pred),
+                       axis=-1, direction="DESCENDING", stable=True)))
+
+    @property
+    def y_true_sorted_indices(self):
+        """Indices of the records sorted by descending ground truth value for each query"""
+        return self._get("y_true_sorted_indices",
+                         lambda: tf.argsort(self.y_true, axis=-1, direction="DESCENDING", stable=True))
+
+    @property
+    def y_true_clicks(self):
+        """Proxy clicks on the records with the highest relevance grade from the y_true labels"""
+        return self._get("y_true_clicks", lambda: tf.cast(
+            tf.equal(self.y_true, tf.math.reduce_max(self.y_true, axis=-1)[:, tf.newaxis]), tf.float32))
+
+    @property
+    def click_ranks(self):
+        """
+        Ranks of the clicked result for each query from the predicted scores
+        Ties in case of multiple target click labels are broken with the minimum rank
+        """
+        return self._get("click_ranks", lambda: tf.reduce_min(
+            tf.divide(tf.cast(self.y_pred_ranks, tf.float32), self.y_true_clicks), axis=-1))
+
+
 class ClickRankProcessor:
     """
     Class with click rank processing utilities
     """
 
     @staticmethod
-    def get_click_ranks(y_true, y_pred, mask):
+    def get_click_ranks(y_true, y_pred, mask, context=None):
         """
         Gets the ranks of the clicked result for each query
 
@@ -24,32 +100,18 @@ class ClickRankProcessor:
         mask : Tensor object
             Tensor object that contains 0/1 flag to identify which
             results were padded and thus should be excluded from metric computation
+        context : `RankingMetricContext` object, optional
+            Ranks shared with the other metrics updated on the same predictions
 
         Returns
         -------
             Ranks of the clicked results for each query
             Ties are broken with minimum ranks
         """
-        # Convert predicted ranking scores into ranks for each record per query
-        y_pred_ranks = tf.cast(
-            tf.add(
-                tf.argsort(
-                    tf.argsort(y_pred, axis=-1, direction="DESCENDING", stable=True), stable=True
-                ),
-                tf.constant(1),
-            ),
-            tf.float32
-        )
-
-        # Fetch highest relevance grade from the y_true labels
-        y_true_clicks = tf.cast(
-            tf.equal(y_true, tf.math.reduce_max(y_true, axis=-1)[:, tf.newaxis]), tf.float32)
-
-        # Compute rank of clicked record from predictions
-        # Break ties in case of multiple target click labels using the min rank from y_pred_ranks
-        click_ranks = tf.reduce_min(tf.divide(y_pred_ranks, y_true_clicks), axis=-1)
+        if context is None:
+            context = RankingMetricContext(y_true, y_pred, mask)
 
-        return tf.cast(click_ranks, tf.float32)
+        return context.click_ranks
 
     @staticmethod
     def process_click_ranks(click_ranks):
@@ -61,7 +123,7 @@ class MeanRankMetric(metrics.Mean, ClickRankProcessor):
     Mean metric for the ranks of a query
     """
 
-    def update_state(self, y_true, y_pred, mask=None, sample_weight=None):
+    def update_state(self, y_true, y_pred, mask=None, sample_weight=None, context=None):
         """
         Accumulates metric statistics by computing the mean of the
         metric function
@@ -79,6 +141,8 @@ class MeanRankMetric(metrics.Mean, ClickRankProcessor):
             Optional weighting of each example. Defaults to 1. Can be
             a `Tensor` whose rank is either 0, or the same rank as `y_true`,
             and must be broadcastable to `y_true`.
+        context : `RankingMetricContext` object, optional
+            Ranks shared with the other metrics updated on the same predictions
 
         Returns
         -------
@@ -88,7 +152,7 @@ class MeanRankMetric(metrics.Mean, ClickRankProcessor):
         -----
         `y_true` and `y_pred` should have the same shape.
         """
-        click_ranks = self.get_click_ranks(y_true, y_pred, mask)
+        click_ranks = self.get_click_ranks(y_true, y_pred, mask, context)
 
         # Post processing on click ranks before mean
         query_scores = self.process_click_ranks(click_ranks)
@@ -143,7 +207,7 @@ class SegmentMRR(SegmentMean, ClickRankProcessor):
     >>> then the SegmentMRR is [0.75, 1.]
     """
 
-    def update_state(self, y_true, y_pred, segments, mask=None, sample_weight=None):
+    def update_state(self, y_true, y_pred, segments, mask=None, sample_weight=None, context=None):
         """
         Accumulates metric statistics by computing the mean of the
         metric function
@@ -163,6 +227,8 @@ class SegmentMRR(SegmentMean, ClickRankProcessor):
             Optional weighting of each example. Defaults to 1. Can be
             a `Tensor` whose rank is either 0, or the same rank as `y_true`,
             and must be broadcastable to `y_true`.
+        context : `RankingMetricContext` object, optional
+            Ranks shared with the other metrics updated on the same predictions
 
         Returns
         -------
@@ -172,7 +238,7 @@ class SegmentMRR(SegmentMean, ClickRankProcessor):
         -----
         `y_true` and `y_pred` should have the same shape.
         """
-        click_ranks = self.get_click_ranks(y_true, y_pred, mask)
+        click_ranks = self.get_click_ranks(y_true, y_pred, mask, context)
         segments = tf.squeeze(segments, axis=-1)
 
         # Post processing on click ranks before mean
@@ -267,7 +333,7 @@ class NDCG(metrics.Mean):
     Inherits from tf.keras.metrics.Mean.
     """
 
-    def update_state(self, y_true, y_pred, mask=None, sample_weight=None):
+    def update_state(self, y_true, y_pred, mask=None, sample_weight=None, context=None):
         """
         Update the metric state with new inputs.
 
@@ -276,6 +342,9 @@ class NDCG(metrics.Mean):
             y_pred (tf.Tensor): The tensor containing the predicted scores.
             mask (tf.Tensor, optional): The tensor containing the mask values. Default is None.
             sample_weight (tf.Tensor, optional): The tensor containing the sample weights. Default is None.
+            context (RankingMetricContext, optional): The ranks shared with the other metrics updated on the
+                same predictions. Only the ideal sort order is shared, as the records with tied predicted
+                scores keep the order of the unstable sort. Only used when no mask is applied. Default is None.
         """
         y_true_masked = y_true
         y_pred_masked = y_pred
@@ -285,6 +354,9 @@ class NDCG(metrics.Mean):
             # Apply mask to the true relevance scores and predicted scores
             y_true_masked = y_true * mask_float
             y_pred_masked = y_pred * mask_float
+            context = None
+        if context is None:
+            context = RankingMetricContext(y_true_masked, y_pred_masked)
 
         # Sort the predicted scores in descending order
         sorted_indices = tf.argsort(y_pred_masked, axis=-1, direction="DESCENDING")
@@ -297,7 +369,7 @@ class NDCG(metrics.Mean):
         dcg = tf.reduce_sum(sorted_labels / discounts, axis=-1)
 
         # Sort the true relevance scores in descending order
-        true_sorted_indices = tf.argsort(y_true_masked, axis=-1, direction="DESCENDING")
+        true_sorted_indices = context.y_true_sorted_indices
         true_sorted_labels = tf.gather(y_true_masked, true_sorted_indices, axis=-1,
                                        batch_dims=len(y_true_masked.shape) - 1)
 
@@ -1,11 +1,15 @@
 import os
 import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import tensorflow as tf
 from tensorflow import data
 import pandas as pd
 import numpy as np
-from typing import Optional
+from typing import Callable, Optional
 
+from ml4ir.base.config.keys import TFRecordTypeKey
 from ml4ir.base.model.relevance_model import RelevanceModel
 from ml4ir.base.data.relevance_dataset import RelevanceDataset
 from ml4ir.base.model.scoring.prediction_helper import get_predict_fn
@@ -13,10 +17,13 @@ from ml4ir.base.model.relevance_model import RelevanceModelConstants
 from ml4ir.base.model.architectures.dnn import DNNLayerKey
 from ml4ir.applications.ranking.model.scoring import prediction_helper
 from ml4ir.applications.ranking.model.metrics.helpers import metrics_helper
+from ml4ir.applications.ranking.model.metrics.helpers import in_graph_metrics_helper
+from ml4ir.applications.ranking.model.metrics.helpers.metric_key import Metric
 from ml4ir.applications.ranking.config.keys import PositionalBiasHandler
 from ml4ir.base.stats.t_test import perform_click_rank_dist_paired_t_test, compute_stats_from_stream, \
     t_test_log_results, run_ttest, power_ttest, compute_groupwise_running_variance_for_metrics, run_power_analysis, \
-    StreamVariance, compute_batched_stats, update_running_stats_for_t_test
+    GroupMetricStreamVariance, compute_batched_stats, update_running_stats_for_t_test, \
+    merge_group_metric_running_variance_params, StreamMoments
 from ml4ir.base.config.eval_config import EvalConfigConstants, get_power_analysis_config
 
 pd.set_option("display.max_rows", 500)
@@ -116,7 +123,6 @@ class RankingModel(RelevanceModel):
         """
         group_keys = list(set(self.feature_config.get_group_metrics_keys("node_name")))
         eval_dict = get_power_analysis_config(self.eval_config, group_keys)
-        group_keys = eval_dict[EvalConfigConstants.GROUP_BY]
 
         # If basic mode is specified, only compute the keras Model metrics
         # By default, use the extended mode and compute metrics as defined in this function
@@ -126,175 +132,603 @@ class RankingModel(RelevanceModel):
             self.logger.info("Overall Metrics: \n{}".format(pd.Series(metrics_dict)))
             return None, None, metrics_dict
         else:
-            metrics_dict = dict()
-            group_metrics_keys = self.feature_config.get_group_metrics_keys()
-            evaluation_features = (
-                group_metrics_keys
-                + [
-                    self.feature_config.get_query_key(),
-                    self.feature_config.get_label(),
-                    self.feature_config.get_rank(),
-                ]
+            evaluation_features, old_ranking_score = self.get_evaluation_features(eval_dict)
+
+            additional_features[metrics_helper.RankingConstants.NEW_RANK] = prediction_helper.convert_score_to_rank
+
+            if self.eval_config.get(EvalConfigConstants.MODE) == EvalConfigConstants.IN_GRAPH_MODE:
+                # Auxiliary label metrics are not computed in-graph, so power analysis is limited to primary metrics
+                eval_dict[EvalConfigConstants.VARIANCE_LIST] = in_graph_metrics_helper.get_power_analysis_metrics(
+                    eval_dict[EvalConfigConstants.VARIANCE_LIST])
+                eval_dict[EvalConfigConstants.METRICS] = [
+                    m for m in eval_dict[EvalConfigConstants.METRICS]
+                    if "new_{}".format(m) in eval_dict[EvalConfigConstants.VARIANCE_LIST]]
+                df_grouped_stats, group_metric_running_variance_params, (agg_count, agg_mean, agg_M2) = \
+                    self.compute_grouped_stats_in_graph(
+                        test_dataset=test_dataset,
+                        inference_signature=inference_signature,
+                        additional_features=additional_features,
+                        evaluation_features=evaluation_features,
+                        old_ranking_score=old_ranking_score,
+                        power_analysis_metrics=eval_dict[EvalConfigConstants.VARIANCE_LIST],
+                        logging_frequency=logging_frequency,
+                    )
+            else:
+                df_grouped_stats, group_metric_running_variance_params, (agg_count, agg_mean, agg_M2) = \
+                    self.compute_grouped_stats(
+                        test_dataset=test_dataset,
+                        inference_signature=inference_signature,
+                        additional_features=additional_features,
+                        evaluation_features=evaluation_features,
+                        old_ranking_score=old_ranking_score,
+                        power_analysis_metrics=eval_dict[EvalConfigConstants.VARIANCE_LIST],
+                        logging_frequency=logging_frequency,
+                    )
+
+            return self.summarize_evaluation(
+                df_grouped_stats=df_grouped_stats,
+                group_metric_running_variance_params=group_metric_running_variance_params,
+                ttest_stats=(agg_count, agg_mean, agg_M2),
+                eval_dict=eval_dict,
+                group_metrics_min_queries=group_metrics_min_queries,
+                logs_dir=logs_dir,
             )
 
-            try:
-                old_ranking_score = self.feature_config.get_feature(metrics_helper.RankingConstants.OLD_RANKING_SCORE)
-                # Adding the old model ranking score. This is needed for computing old_NDCG
-                evaluation_features.append(old_ranking_score)
-            except KeyError:
-                old_ranking_score = None
+    def get_evaluation_features(self, eval_dict: dict):
+        """
+        Get the features to be fetched along with the scores to compute the ranking metrics
 
-            # Add aux_label if present
-            aux_label = self.feature_config.get_aux_label()
-            if aux_label and (
-                    aux_label.get("node_name") or (
-                    aux_label["name"] not in eval_dict[EvalConfigConstants.GROUP_BY])):
-                evaluation_features += [aux_label]
+        Parameters
+        ----------
+        eval_dict : dict
+            Evaluation configuration with the power analysis parameters
 
-            additional_features[metrics_helper.RankingConstants.NEW_RANK] = prediction_helper.convert_score_to_rank
+        Returns
+        -------
+        evaluation_features : list
+            List of feature configs needed to compute the ranking metrics
+        old_ranking_score : dict
+            Feature config of the ranking score of the old model, if available
+        """
+        evaluation_features = (
+            self.feature_config.get_group_metrics_keys()
+            + [
+                self.feature_config.get_query_key(),
+                self.feature_config.get_label(),
+                self.feature_config.get_rank(),
+            ]
+        )
 
-            _predict_fn = get_predict_fn(
-                model=self.model,
-                tfrecord_type=self.tfrecord_type,
-                feature_config=self.feature_config,
-                label_processor=self.model.interaction_model.label_transform_op,
-                inference_signature=inference_signature,
-                is_compiled=self.is_compiled,
-                output_name=self.output_name,
-                features_to_return=evaluation_features,
-                additional_features=additional_features,
-                max_sequence_size=self.max_sequence_size
-            )
+        try:
+            old_ranking_score = self.feature_config.get_feature(metrics_helper.RankingConstants.OLD_RANKING_SCORE)
+            # Adding the old model ranking score. This is needed for computing old_NDCG
+            evaluation_features.append(old_ranking_score)
+        except KeyError:
+            old_ranking_score = None
+
+        # Add aux_label if present
+        aux_label = self.feature_config.get_aux_label()
+        if aux_label and (
+                aux_label.get("node_name") or (
+                aux_label["name"] not in eval_dict[EvalConfigConstants.GROUP_BY])):
+            evaluation_features += [aux_label]
+
+        return evaluation_features, old_ranking_score
+
+    def compute_grouped_stats(
+        self,
+        test_dataset: data.TFRecordDataset,
+        inference_signature: str = None,
+        additional_features: dict = {},
+        evaluation_features: list = [],
+        old_ranking_score: Optional[dict] = None,
+        power_analysis_metrics: list = [],
+        logging_frequency: int = 25,
+        features_to_log: Optional[list] = None,
+        predictions_callback: Optional[Callable] = None,
+    ):
+        """
+        Compute the grouped ranking stats on the test dataset with pandas on each batch of predictions
+
+        Parameters
+        ----------
+        test_dataset: an instance of tf.data.dataset
+        inference_signature : str, optional
+            If using a SavedModel for prediction, specify the inference signature to be used for computing scores
+        additional_features : dict, optional
+            Dictionary containing new feature name and function definition to
+            compute them.
+        evaluation_features : list, optional
+            List of feature configs to be fetched along with the scores
+        old_ranking_score : dict, optional
+            Feature config of the ranking score of the old model, if available
+        power_analysis_metrics : list, optional
+            List of old and new metrics requiring power analysis
+        logging_frequency : int
+            Value representing how often(in batches) to log status
+        features_to_log : list, optional
+            List of feature configs to be logged with the predictions passed to `predictions_callback`
+        predictions_callback : callable, optional
+            Function called with the DataFrame of predictions of each batch, with the same columns as
+            `predict()`. Used to log the predictions in the same traversal of the test dataset
+
+        Returns
+        -------
+        df_grouped_stats : `pd.DataFrame` object
+            DataFrame object containing the ranking stats summed for each group
+        group_metric_running_variance_params : `GroupMetricStreamVariance`
+            Mean, variance and count for each group for each power analysis metric
+        tuple of float
+            Count, mean and M2 of the MRR difference used for the click rank distribution t-test
+
+        Notes
+        -----
+        The grouped stats of each batch are computed on `num_workers` threads from the eval config (defaults to 1)
+        while the model predicts the next batches, and are accumulated in the order of the batches.
+        Set `num_workers` to 0 to compute them synchronously.
+        """
+        # Fetch the features to log along with the evaluation features and split the columns for each batch
+        features_to_return = list(evaluation_features)
+        if predictions_callback:
+            features_to_return += list(features_to_log)
+        evaluation_columns = list(dict.fromkeys(
+            [f.get("node_name", f["name"]) for f in evaluation_features]
+            + [self.output_name] + list(additional_features.keys())))
+        prediction_columns = list(dict.fromkeys(
+            [f.get("node_name", f["name"]) for f in features_to_log or []]
+            + [self.output_name] + list(additional_features.keys())))
+
+        _predict_fn = get_predict_fn(
+            model=self.model,
+            tfrecord_type=self.tfrecord_type,
+            feature_config=self.feature_config,
+            label_processor=self.model.interaction_model.label_transform_op,
+            inference_signature=inference_signature,
+            is_compiled=self.is_compiled,
+            output_name=self.output_name,
+            features_to_return=features_to_return,
+            additional_features=additional_features,
+            max_sequence_size=self.max_sequence_size
+        )
 
-            batch_count = 0
-            df_grouped_stats = pd.DataFrame()
-            # defining variables to compute running mean and variance for t-test computations
-            agg_count, agg_mean, agg_M2 = 0, 0, 0
-            group_metric_running_variance_params = {}
+        def get_batch_grouped_stats(predictions_df):
+            start_time = time.perf_counter()
+            # Compute the running variance params of the batch on its own, to be merged in order
+            df_batch_grouped_stats, batch_running_variance_params, df_clicked = metrics_helper.get_grouped_stats(
+                df=predictions_df,
+                query_key_col=self.feature_config.get_query_key("node_name"),
+                label_col=self.feature_config.get_label("node_name"),
+                old_rank_col=self.feature_config.get_rank("node_name"),
+                new_rank_col=metrics_helper.RankingConstants.NEW_RANK,
+                old_ranking_score=old_ranking_score,
+                new_ranking_score=metrics_helper.RankingConstants.NEW_RANKING_SCORE,
+                group_keys=list(set(self.feature_config.get_group_metrics_keys("node_name"))),
+                aux_label=self.feature_config.get_aux_label("node_name"),
+                power_analysis_metrics=power_analysis_metrics,
+                group_metric_running_variance_params=GroupMetricStreamVariance(),
+            )
+            # Moments of the MRR difference of the clicked records for the click rank distribution t-test
+            batch_ttest_moments = StreamMoments().update(df_clicked[metrics_helper.RankingConstants.DIFF_MRR])
+            return df_batch_grouped_stats, batch_running_variance_params, batch_ttest_moments, \
+                time.perf_counter() - start_time
+
+        batch_count = 0
+        df_grouped_stats = pd.DataFrame()
+        # running mean and variance for t-test computations
+        ttest_moments = StreamMoments()
+        group_metric_running_variance_params = GroupMetricStreamVariance()
+        model_time, metrics_time, wait_time = 0., 0., 0.
+
+        def accumulate(batch_grouped_stats):
+            nonlocal batch_count, df_grouped_stats, group_metric_running_variance_params, metrics_time
+            df_batch_grouped_stats, batch_running_variance_params, batch_ttest_moments, batch_metrics_time = \
+                batch_grouped_stats
+
+            group_metric_running_variance_params = merge_group_metric_running_variance_params(
+                group_metric_running_variance_params, batch_running_variance_params)
+            ttest_moments.merge(batch_ttest_moments)
+
+            if df_grouped_stats.empty:
+                df_grouped_stats = df_batch_grouped_stats
+            else:
+                df_grouped_stats = df_grouped_stats.add(
+                    df_batch_grouped_stats, fill_value=0.0)
+            metrics_time += batch_metrics_time
+            batch_count += 1
+            if batch_count % logging_frequency == 0:
+                self.logger.info(
+                    "Finished evaluating {} batches".format(batch_count))
+
+        # The pandas metrics are computed on a pool of worker threads while the model runs ahead on the next batches.
+        # The batches are accumulated in order, with a bounded number of batches in flight
+        num_workers = self.eval_config.get(EvalConfigConstants.NUM_WORKERS, 1)
+        executor = ThreadPoolExecutor(max_workers=num_workers) if num_workers > 0 else None
+        pending_batches = deque()
+        try:
+            batch_start_time = time.perf_counter()
             for predictions_dict in test_dataset.map(_predict_fn).take(-1):
                 predictions_df = pd.DataFrame(predictions_dict)
-
-                df_batch_grouped_stats, group_metric_running_variance_params, predictions_df = metrics_helper.get_grouped_stats(
-                                                    df=predictions_df,
-                                                    query_key_col=self.feature_config.get_query_key("node_name"),
-                                                    label_col=self.feature_config.get_label("node_name"),
-                                                    old_rank_col=self.feature_config.get_rank("node_name"),
-                                                    new_rank_col=metrics_helper.RankingConstants.NEW_RANK,
-                                                    old_ranking_score=old_ranking_score,
-                                                    new_ranking_score=metrics_helper.RankingConstants.NEW_RANKING_SCORE,
-                                                    group_keys=list(set(self.feature_config.get_group_metrics_keys(
-                                                        "node_name"))),
-                                                    aux_label=self.feature_config.get_aux_label("node_name"),
-                                                    power_analysis_metrics=eval_dict[EvalConfigConstants.VARIANCE_LIST],
-                                                    group_metric_running_variance_params=group_metric_running_variance_params,
-                                                )
-
-                agg_count, agg_mean, agg_M2 = update_running_stats_for_t_test(predictions_df, agg_count, agg_mean, agg_M2)
-
-                if df_grouped_stats.empty:
-                    df_grouped_stats = df_batch_grouped_stats
+                model_time += time.perf_counter() - batch_start_time
+
+                if predictions_callback:
+                    predictions_callback(predictions_df[prediction_columns])
+                    predictions_df = predictions_df[evaluation_columns]
+
+                if executor:
+                    pending_batches.append(executor.submit(get_batch_grouped_stats, predictions_df))
+                    if len(pending_batches) > 2 * num_workers:
+                        wait_start_time = time.perf_counter()
+                        batch_grouped_stats = pending_batches.popleft().result()
+                        wait_time += time.perf_counter() - wait_start_time
+                        accumulate(batch_grouped_stats)
                 else:
-                    df_grouped_stats = df_grouped_stats.add(
-                        df_batch_grouped_stats, fill_value=0.0)
-                batch_count += 1
-                if batch_count % logging_frequency == 0:
-                    self.logger.info(
-                        "Finished evaluating {} batches".format(batch_count))
-
-            # performing click rank distribution t-test
-            t_test_metrics_dict = run_ttest(agg_mean, (agg_M2 / (agg_count - 1)), agg_count,
-                                                 eval_dict[EvalConfigConstants.PVALUE], self.logger)
-            metrics_dict.update(t_test_metrics_dict)
-
-            # performing power analysis
-            group_metrics_stat_sig = run_power_analysis(eval_dict[EvalConfigConstants.METRICS],
-                                                        group_keys,
-                                                        group_metric_running_variance_params,
-                                                        eval_dict[EvalConfigConstants.POWER],
-                                                        eval_dict[EvalConfigConstants.PVALUE])
-
-            # Compute overall metrics
-            df_overall_metrics = metrics_helper.summarize_grouped_stats(
-                df_grouped_stats)
-            self.logger.info("Overall Metrics: \n{}".format(df_overall_metrics))
+                    accumulate(get_batch_grouped_stats(predictions_df))
+                batch_start_time = time.perf_counter()
 
-            # Log metrics to weights and biases
-            metrics_dict.update(
-                {"test_{}".format(k): v for k,
-                 v in df_overall_metrics.to_dict().items()}
-            )
+            wait_start_time = time.perf_counter()
+            while pending_batches:
+                accumulate(pending_batches.popleft().result())
+            wait_time += time.perf_counter() - wait_start_time
+        finally:
+            if executor:
+                executor.shutdown(wait=True, cancel_futures=True)
 
-            df_group_metrics = None
-            df_group_metrics_summary = None
-            if group_metrics_keys:
-                # Filter groups by min_query_count
-                df_grouped_stats = df_grouped_stats[
-                    df_grouped_stats["query_count"] >= group_metrics_min_queries
-                ]
-
-                # Compute group metrics
-                df_group_metrics = df_grouped_stats.apply(
-                    metrics_helper.summarize_grouped_stats, axis=1
-                )
+        self.logger.info("Evaluation time for {} batches: {:.2f}s in the model, {:.2f}s computing the metrics "
+                         "with {} workers, {:.2f}s waiting on the metrics".format(
+                             batch_count, model_time, metrics_time, num_workers, wait_time))
+
+        return df_grouped_stats, group_metric_running_variance_params, \
+            (ttest_moments.count, ttest_moments.mean, ttest_moments.m2)
+
+    def summarize_evaluation(
+        self,
+        df_grouped_stats: pd.DataFrame,
+        group_metric_running_variance_params: GroupMetricStreamVariance,
+        ttest_stats: tuple,
+        eval_dict: dict,
+        group_metrics_min_queries: int = 50,
+        logs_dir: Optional[str] = None,
+    ):
+        """
+        Compute the overall and groupwise metrics, the click rank distribution t-test and the
+        power analysis from the grouped ranking stats
+
+        Parameters
+        ----------
+        df_grouped_stats : `pd.DataFrame` object
+            DataFrame object containing the ranking stats summed for each group
+        group_metric_running_variance_params : `GroupMetricStreamVariance`
+            Mean, variance and count for each group for each power analysis metric
+        ttest_stats : tuple of float
+            Count, mean and M2 of the MRR difference used for the click rank distribution t-test
+        eval_dict : dict
+            Evaluation configuration with the power analysis parameters
+        group_metrics_min_queries : int, optional
+            Minimum count threshold per group to be considered for computing
+            groupwise metrics
+        logs_dir : str, optional
+            Path to directory to save logs
+
+        Returns
+        -------
+        df_overall_metrics : `pd.DataFrame` object
+            `pd.DataFrame` containing overall metrics
+        df_groupwise_metrics : `pd.DataFrame` object
+            `pd.DataFrame` containing groupwise metrics if
+            group_metric_keys are defined in the FeatureConfig
+        metrics_dict : dict
+            metrics as a dictionary of metric names mapping to values
+        """
+        metrics_dict = dict()
+        agg_count, agg_mean, agg_M2 = ttest_stats
+        group_keys = eval_dict[EvalConfigConstants.GROUP_BY]
+        group_metrics_keys = self.feature_config.get_group_metrics_keys()
+
+        # performing click rank distribution t-test
+        t_test_metrics_dict = run_ttest(agg_mean, (agg_M2 / (agg_count - 1)), agg_count,
+                                             eval_dict[EvalConfigConstants.PVALUE], self.logger)
+        metrics_dict.update(t_test_metrics_dict)
+
+        # performing power analysis
+        group_metrics_stat_sig = run_power_analysis(eval_dict[EvalConfigConstants.METRICS],
+                                                    group_keys,
+                                                    group_metric_running_variance_params,
+                                                    eval_dict[EvalConfigConstants.POWER],
+                                                    eval_dict[EvalConfigConstants.PVALUE])
+
+        # Compute overall metrics
+        df_overall_metrics = metrics_helper.summarize_grouped_stats(
+            df_grouped_stats)
+        self.logger.info("Overall Metrics: \n{}".format(df_overall_metrics))
+
+        # Log metrics to weights and biases
+        metrics_dict.update(
+            {"test_{}".format(k): v for k,
+             v in df_overall_metrics.to_dict().items()}
+        )
 
-                # Add power analysis to group metric dataframe
-                df_group_metrics = metrics_helper.join_stat_sig_signal(df_group_metrics, group_keys,
-                                                                       eval_dict[EvalConfigConstants.METRICS],
-                                                                       group_metrics_stat_sig)
-
-                # Writing stat sig. groupwise results per metric
-                for metric in eval_dict[EvalConfigConstants.METRICS]:
-                    stat_sig_df = metrics_helper.generate_stat_sig_based_metrics(df_group_metrics, metric, group_keys, metrics_dict)
-                    if logs_dir:
-                        self.file_io.write_df(
-                            stat_sig_df,
-                            outfile=os.path.join(
-                                logs_dir, "stat_sig_" + metric + '_' + RelevanceModelConstants.GROUP_METRICS_CSV_FILE),
-                        )
-                        self.logger.info("\nNumber of stat sig {} improved groups = {}".format(metric,
-                                         str(metrics_dict["stat_sig_" + metric + "_improved_groups"])))
-                        self.logger.info("\nNumber of stat_sig {} degraded groups = {}".format(metric,
-                                         str(metrics_dict["stat_sig_" + metric + "_degraded_groups"])))
-                        self.logger.info("\nStat. sig. {} group perc improvement = {}".format(metric,
-                                         str(metrics_dict["stat_sig_" + metric + "_group_improv_perc"])))
-                        self.logger.info("\nStat. sig. improved {} groups = {}".format(metric,
-                                         str(metrics_dict["stat_sig_improved_" + metric + "_groups"])))
-                        self.logger.info("\nStat. sig. degraded {} groups = {}".format(metric,
-                                         str(metrics_dict["stat_sig_degraded_" + metric + "_groups"])))
-
-                    # Compute group metrics summary
-                    stat_sig_df_summary = stat_sig_df.describe(include='all')
-                    self.logger.info(
-                        "\nComputing group metrics for {} stat. sig. lifts using keys: {}".format(metric,
-                                                                                                  group_keys))
-                    self.logger.info("\nGroupwise Metrics for {}: \n{}".format(metric, stat_sig_df_summary.T))
+        df_group_metrics = None
+        df_group_metrics_summary = None
+        if group_metrics_keys:
+            # Filter groups by min_query_count
+            df_grouped_stats = df_grouped_stats[
+                df_grouped_stats["query_count"] >= group_metrics_min_queries
+            ]
+
+            # Compute group metrics
+            df_group_metrics = df_grouped_stats.apply(
+                metrics_helper.summarize_grouped_stats, axis=1
+            )
+
+            # Add power analysis to group metric dataframe
+            df_group_metrics = metrics_helper.join_stat_sig_signal(df_group_metrics, group_keys,
+                                                                   eval_dict[EvalConfigConstants.METRICS],
+                                                                   group_metrics_stat_sig)
 
+            # Writing stat sig. groupwise results per metric
+            for metric in eval_dict[EvalConfigConstants.METRICS]:
+                stat_sig_df = metrics_helper.generate_stat_sig_based_metrics(df_group_metrics, metric, group_keys, metrics_dict)
                 if logs_dir:
                     self.file_io.write_df(
-                        df_group_metrics,
+                        stat_sig_df,
                         outfile=os.path.join(
-                            logs_dir, RelevanceModelConstants.GROUP_METRICS_CSV_FILE),
+                            logs_dir, "stat_sig_" + metric + '_' + RelevanceModelConstants.GROUP_METRICS_CSV_FILE),
                     )
+                    self.logger.info("\nNumber of stat sig {} improved groups = {}".format(metric,
+                                     str(metrics_dict["stat_sig_" + metric + "_improved_groups"])))
+                    self.logger.info("\nNumber of stat_sig {} degraded groups = {}".format(metric,
+                                     str(metrics_dict["stat_sig_" + metric + "_degraded_groups"])))
+                    self.logger.info("\nStat. sig. {} group perc improvement = {}".format(metric,
+                                     str(metrics_dict["stat_sig_" + metric + "_group_improv_perc"])))
+                    self.logger.info("\nStat. sig. improved {} groups = {}".format(metric,
+                                     str(metrics_dict["stat_sig_improved_" + metric + "_groups"])))
+                    self.logger.info("\nStat. sig. degraded {} groups = {}".format(metric,
+                                     str(metrics_dict["stat_sig_degraded_" + metric + "_groups"])))
 
                 # Compute group metrics summary
-                df_group_metrics_summary = df_group_metrics.describe()
+                stat_sig_df_summary = stat_sig_df.describe(include='all')
                 self.logger.info(
-                    "Computing group metrics using keys: {}".format(
-                        eval_dict[EvalConfigConstants.GROUP_BY]
-                    )
+                    "\nComputing group metrics for {} stat. sig. lifts using keys: {}".format(metric,
+                                                                                              group_keys))
+                self.logger.info("\nGroupwise Metrics for {}: \n{}".format(metric, stat_sig_df_summary.T))
+
+            if logs_dir:
+                self.file_io.write_df(
+                    df_group_metrics,
+                    outfile=os.path.join(
+                        logs_dir, RelevanceModelConstants.GROUP_METRICS_CSV_FILE),
                 )
-                self.logger.info("Groupwise Metrics: \n{}".format(
-                    df_group_metrics_summary.T))
-
-                # Log metrics to weights and biases
-                metrics_dict.update(
-                    {
-                        "test_group_mean_{}".format(k): v
-                        for k, v in df_group_metrics_summary.T["mean"].to_dict().items()
-                    }
+
+            # Compute group metrics summary
+            df_group_metrics_summary = df_group_metrics.describe()
+            self.logger.info(
+                "Computing group metrics using keys: {}".format(
+                    eval_dict[EvalConfigConstants.GROUP_BY]
                 )
+            )
+            self.logger.info("Groupwise Metrics: \n{}".format(
+                df_group_metrics_summary.T))
+
+            # Log metrics to weights and biases
+            metrics_dict.update(
+                {
+                    "test_group_mean_{}".format(k): v
+                    for k, v in df_group_metrics_summary.T["mean"].to_dict().items()
+                }
+            )
+
+        return df_overall_metrics, df_group_metrics, metrics_dict
+
+    def predict_and_evaluate(
+        self,
+        test_dataset: data.TFRecordDataset,
+        inference_signature: str = "serving_default",
+        additional_features: dict = {},
+        group_metrics_min_queries: int = 50,
+        logs_dir: Optional[str] = None,
+        logging_frequency: int = 25
+    ):
+        """
+        Predict the scores on the test dataset and evaluate the RankingModel
+
+        Parameters
+        ----------
+        test_dataset: an instance of tf.data.dataset
+        inference_signature : str, optional
+            If using a SavedModel for prediction, specify the inference signature to be used for computing scores
+        additional_features : dict, optional
+            Dictionary containing new feature name and function definition to
+            compute them. Use this to compute additional features from the scores.
+            For example, converting ranking scores for each document into ranks for
+            the query
+        group_metrics_min_queries : int, optional
+            Minimum count threshold per group to be considered for computing
+            groupwise metrics
+        logs_dir : str, optional
+            Path to directory to save logs
+        logging_frequency : int
+            Value representing how often(in batches) to log status
+
+        Returns
+        -------
+        predictions_df : `pd.DataFrame`
+            pandas DataFrame containing the predictions on the test dataset,
+            None if the predictions are written to `logs_dir`
+        df_overall_metrics : `pd.DataFrame` object
+            `pd.DataFrame` containing overall metrics
+        df_groupwise_metrics : `pd.DataFrame` object
+            `pd.DataFrame` containing groupwise metrics if
+            group_metric_keys are defined in the FeatureConfig
+        metrics_dict : dict
+            metrics as a dictionary of metric names mapping to values
+
+        Notes
+        -----
+        With the extended evaluation mode, each batch of predictions from a single traversal
+        of the test dataset is both logged and used to compute the grouped ranking stats.
+        Other evaluation modes run `evaluate()` and `predict()` one after the other.
+        """
+        if self.eval_config.get(EvalConfigConstants.MODE, EvalConfigConstants.EXTENDED_MODE) in {
+            EvalConfigConstants.BASIC_MODE, EvalConfigConstants.IN_GRAPH_MODE
+        }:
+            return super().predict_and_evaluate(
+                test_dataset=test_dataset,
+                inference_signature=inference_signature,
+                additional_features=additional_features,
+                group_metrics_min_queries=group_metrics_min_queries,
+                logs_dir=logs_dir,
+                logging_frequency=logging_frequency,
+            )
+
+        group_keys = list(set(self.feature_config.get_group_metrics_keys("node_name")))
+        eval_dict = get_power_analysis_config(self.eval_config, group_keys)
+        evaluation_features, old_ranking_score = self.get_evaluation_features(eval_dict)
+
+        additional_features = dict(additional_features)
+        additional_features[metrics_helper.RankingConstants.NEW_RANK] = prediction_helper.convert_score_to_rank
+
+        with self.get_prediction_sink(logs_dir) as prediction_sink:
+            df_grouped_stats, group_metric_running_variance_params, ttest_stats = self.compute_grouped_stats(
+                test_dataset=test_dataset,
+                inference_signature=inference_signature,
+                additional_features=additional_features,
+                evaluation_features=evaluation_features,
+                old_ranking_score=old_ranking_score,
+                power_analysis_metrics=eval_dict[EvalConfigConstants.VARIANCE_LIST],
+                logging_frequency=logging_frequency,
+                features_to_log=self.feature_config.get_features_to_log(),
+                predictions_callback=prediction_sink.write,
+            )
+
+        df_overall_metrics, df_group_metrics, metrics_dict = self.summarize_evaluation(
+            df_grouped_stats=df_grouped_stats,
+            group_metric_running_variance_params=group_metric_running_variance_params,
+            ttest_stats=ttest_stats,
+            eval_dict=eval_dict,
+            group_metrics_min_queries=group_metrics_min_queries,
+            logs_dir=logs_dir,
+        )
+
+        return self.collect_predictions(prediction_sink), df_overall_metrics, df_group_metrics, metrics_dict
+
+    def compute_grouped_stats_in_graph(
+        self,
+        test_dataset: data.TFRecordDataset,
+        inference_signature: str = None,
+        additional_features: dict = {},
+        evaluation_features: list = [],
+        old_ranking_score: Optional[dict] = None,
+        power_analysis_metrics: list = [],
+        logging_frequency: int = 25
+    ):
+        """
+        Compute the grouped ranking stats on the test dataset with tensorflow ops on the
+        padded [batch_size, max_sequence_size] prediction tensors.
+
+        The query level MRR, ACR, NDCG and proxy clicks are computed and summed per group
+        inside the graph for each batch, and accumulated in numpy arrays, so that only the
+        final grouped stats table is materialized as a pandas DataFrame.
+
+        Parameters
+        ----------
+        test_dataset: an instance of tf.data.dataset
+        inference_signature : str, optional
+            If using a SavedModel for prediction, specify the inference signature to be used for computing scores
+        additional_features : dict, optional
+            Dictionary containing new feature name and function definition to
+            compute them.
+        evaluation_features : list, optional
+            List of feature configs to be fetched along with the scores
+        old_ranking_score : dict, optional
+            Feature config of the ranking score of the old model, if available
+        power_analysis_metrics : list, optional
+            List of old and new metrics requiring power analysis
+        logging_frequency : int
+            Value representing how often(in batches) to log status
+
+        Returns
+        -------
+        df_grouped_stats : `pd.DataFrame` object
+            DataFrame object containing the ranking stats summed for each group
+        group_metric_running_variance_params : `GroupMetricStreamVariance`
+            Mean, variance and count for each group for each power analysis metric
+        tuple of float
+            Count, mean and M2 of the MRR difference used for the click rank distribution t-test
+
+        Raises
+        ------
+        ValueError
+            if the records are not grouped into queries, i.e. the tfrecord type is not SequenceExample
+
+        Notes
+        -----
+        Auxiliary label metrics and power analysis on auxiliary metrics are not computed in this mode.
+        The group key values of a query are read from its first proxy clicked record, like the
+        extended mode which groups the clicked records. Group keys are expected to be query level
+        (context) features for the groups to be well defined.
+        """
+        if self.tfrecord_type != TFRecordTypeKey.SEQUENCE_EXAMPLE:
+            raise ValueError("The {} evaluation mode requires the records to be grouped into queries with the {} "
+                             "tfrecord type, found {}. Use the {} evaluation mode instead".format(
+                                 EvalConfigConstants.IN_GRAPH_MODE, TFRecordTypeKey.SEQUENCE_EXAMPLE,
+                                 self.tfrecord_type, EvalConfigConstants.EXTENDED_MODE))
+
+        group_keys = list(set(self.feature_config.get_group_metrics_keys("node_name")))
+        if self.feature_config.get_aux_label():
+            self.logger.warning("Auxiliary label metrics are not computed with the {} evaluation mode".format(
+                EvalConfigConstants.IN_GRAPH_MODE))
+        # Groupwise variance for power analysis is only tracked when there are group keys
+        variance_metrics = in_graph_metrics_helper.get_power_analysis_metrics(power_analysis_metrics) \
+            if group_keys else []
+
+        _predict_fn = get_predict_fn(
+            model=self.model,
+            tfrecord_type=self.tfrecord_type,
+            feature_config=self.feature_config,
+            label_processor=self.model.interaction_model.label_transform_op,
+            inference_signature=inference_signature,
+            is_compiled=self.is_compiled,
+            output_name=self.output_name,
+            features_to_return=evaluation_features,
+            additional_features=additional_features,
+            max_sequence_size=self.max_sequence_size,
+            flatten_records=False
+        )
+
+        compute_ndcg = np.array([Metric.NDCG in metric for metric in power_analysis_metrics]).any()
+        old_ranking_score_name = old_ranking_score.get("node_name", old_ranking_score["name"]) \
+            if old_ranking_score else None
+
+        @tf.function
+        def _compute_grouped_batch_stats(features, labels):
+            predictions_dict = _predict_fn(features, labels)
+            query_stats = in_graph_metrics_helper.compute_query_stats(
+                predictions_dict=predictions_dict,
+                label_col=self.feature_config.get_label("node_name"),
+                old_rank_col=self.feature_config.get_rank("node_name"),
+                new_rank_col=metrics_helper.RankingConstants.NEW_RANK,
+                new_ranking_score=self.output_name,
+                old_ranking_score=old_ranking_score_name,
+                compute_ndcg=compute_ndcg,
+            )
+            return in_graph_metrics_helper.compute_grouped_batch_stats(
+                predictions_dict=predictions_dict,
+                query_stats=query_stats,
+                group_keys=group_keys,
+                power_analysis_metrics=variance_metrics,
+            )
+
+        accumulator = in_graph_metrics_helper.GroupedStatsAccumulator(group_keys, variance_metrics)
+        batch_count = 0
+        for group_values, group_stats, ttest_stats in test_dataset.map(_compute_grouped_batch_stats).take(-1):
+            accumulator.update(group_values, group_stats, ttest_stats)
+            batch_count += 1
+            if batch_count % logging_frequency == 0:
+                self.logger.info("Finished evaluating {} batches".format(batch_count))
 
-            return df_overall_metrics, df_group_metrics, metrics_dict
+        return (accumulator.get_grouped_stats(),
+                accumulator.get_group_metric_running_variance_params(),
+                accumulator.get_ttest_stats())
 
     def save(
         self,
@@ -304,7 +738,8 @@ class RankingModel(RelevanceModel):
         required_fields_only: bool = True,
         pad_sequence: bool = False,
         dataset: Optional[RelevanceDataset] = None,
-        experiment_details: Optional[dict] = None
+        experiment_details: Optional[dict] = None,
+        batch_serving_signatures: bool = False
     ):
         """
         Save the RelevanceModel as a tensorflow SavedModel to the `models_dir`
@@ -340,6 +775,8 @@ class RankingModel(RelevanceModel):
             and customize.
         experiment_details: dict
             Dictionary containing metadata and results about the current experiment
+        batch_serving_signatures: bool, optional
+            Additionally save the `tfrecord_batch` and `tfrecord_ragged` serving signatures
 
         Notes
         -----
@@ -362,6 +799,7 @@ class RankingModel(RelevanceModel):
             postprocessing_fn=mask_padded_records,
             required_fields_only=required_fields_only,
             pad_sequence=pad_sequence,
+            batch_serving_signatures=batch_serving_signatures,
         )
 
         # Logging positional biases
@@ -396,7 +834,8 @@ class LinearRankingModel(RankingModel):
         required_fields_only: bool = True,
         pad_sequence: bool = False,
         dataset: Optional[RelevanceDataset] = None,
-        experiment_details: Optional[dict] = None
+        experiment_details: Optional[dict] = None,
+        batch_serving_signatures: bool = False
     ):
         """
         Save the RelevanceModel as a tensorflow SavedModel to the `models_dir`
@@ -429,6 +868,8 @@ class LinearRankingModel(RankingModel):
             and customize.
         experiment_details: dict
             Dictionary containing metadata and results about the current experiment
+        batch_serving_signatures: bool, optional
+            Additionally save the `tfrecord_batch` and `tfrecord_ragged` serving signatures
 
         Notes
         -----
@@ -474,6 +915,7 @@ class LinearRankingModel(RankingModel):
             postprocessing_fn=postprocessing_fn,
             required_fields_only=required_fields_only,
             pad_sequence=pad_sequence,
+            batch_serving_signatures=batch_serving_signatures,
         )
 
     def calibrate(self, **kwargs):
@@ -130,11 +130,12 @@ class RankingPipeline(RelevancePipeline):
                 )
             )
 
-    def create_pipeline_for_kfold(self, args):
+    @classmethod
+    def create_pipeline_for_kfold(cls, args):
         """
         Create a RankingPipeline object used in running kfold cross validation.
         """
-        return RankingPipeline(args=args)
+        return cls(args=args)
 
     def kfold_analysis(self, base_logs_dir, run_id, num_folds, pvalue_threshold=0.1, metrics=None):
         """
@@ -365,3 +365,83 @@ class ComputeAuxMetricsTest(unittest.TestCase):
 
         with self.subTest("Equal grade values"):
             self.assertTrue(np.isclose(compute_ndcg([1., 1., 1.]), 1., atol=3))
+
+
+class ComputeAuxMetricsBatchTest(unittest.TestCase):
+    """Test suite for the vectorized auxiliary metrics in aux_metrics_helper"""
+
+    def generate_queries(self, num_queries=200, seed=123):
+        """Generate random queries with shuffled records, ties in aux labels and multiple clicks"""
+        rng = np.random.default_rng(seed)
+        records = []
+        for query_id in range(num_queries):
+            num_records = rng.integers(1, 12)
+            click = np.zeros(num_records)
+            click[rng.integers(0, num_records, size=rng.integers(1, 3))] = 1
+            records.append(pd.DataFrame({
+                "query_id": "q{}".format(query_id),
+                "old_rank": rng.permutation(num_records) + 1,
+                "new_rank": rng.permutation(num_records) + 1,
+                "click": click,
+                "aux_label": rng.choice([0., 0., 1., 2., 5., 10.], size=num_records),
+                "group": query_id % 7
+            }))
+
+        return pd.concat(records).sample(frac=1, random_state=seed)
+
+    def test_compute_aux_metrics_on_queries_matches_query_group(self):
+        """Test the vectorized computation against compute_aux_metrics_on_query_group on every query"""
+        df = self.generate_queries()
+        expected = df.groupby("query_id").apply(
+            lambda grp: compute_aux_metrics_on_query_group(
+                query_group=grp,
+                label_col="click",
+                old_rank_col="old_rank",
+                new_rank_col="new_rank",
+                aux_label="aux_label",
+                group_keys=["group"]))
+        computed = compute_aux_metrics_on_queries(
+            df=df,
+            query_key_col="query_id",
+            label_col="click",
+            old_rank_col="old_rank",
+            new_rank_col="new_rank",
+            aux_label="aux_label",
+            group_keys=["group"])
+
+        pd_testing.assert_frame_equal(computed, expected.astype(float), check_dtype=False)
+
+    def test_compute_aux_metrics_batch(self):
+        """Test the vectorized computation on padded queries against compute_aux_metrics"""
+        aux_label_values = np.array([[1, 1, 1, 10, 0, 0],
+                                     [5, 5, 5, 10, 0, 0],
+                                     [0, 0, 3.5, 0, 1.5, 0],
+                                     [0, 0, 0, 0, 0, 0]])
+        ranks = np.array([[1, 2, 3, 4, 0, 0],
+                          [4, 3, 2, 1, 0, 0],
+                          [1, 2, 3, 4, 5, 0],
+                          [1, 2, 3, 4, 5, 6]])
+        mask = np.array([[1, 1, 1, 1, 0, 0],
+                         [1, 1, 1, 1, 0, 0],
+                         [1, 1, 1, 1, 1, 0],
+                         [1, 1, 1, 1, 1, 1]], dtype=bool)
+        click_ranks = np.array([4, 1, 5, 5])
+
+        computed_metrics = compute_aux_metrics_batch(aux_label_values, ranks, click_ranks, mask)
+        for i in range(len(click_ranks)):
+            expected_metrics = compute_aux_metrics(
+                aux_label_values=pd.Series(aux_label_values[i][mask[i]]),
+                ranks=pd.Series(ranks[i][mask[i]]),
+                click_rank=click_ranks[i])
+            for metric_name, value in expected_metrics.items():
+                if value is None:
+                    self.assertTrue(np.isnan(computed_metrics[metric_name][i]))
+                else:
+                    self.assertTrue(np.isclose(computed_metrics[metric_name][i], value))
+
+    def test_compute_ndcg_batch(self):
+        """Test vectorized NDCG computation on padded relevance grades"""
+        computed_ndcg = compute_ndcg_batch(np.array([[1., 2., 3.], [3., 2., 1.], [1., 1., 0.]]),
+                                           np.array([[1, 1, 1], [1, 1, 1], [1, 1, 0]], dtype=bool))
+        self.assertTrue(np.allclose(computed_ndcg,
+                                    [compute_ndcg([1., 2., 3.]), compute_ndcg([3., 2., 1.]), compute_ndcg([1., 1.])]))
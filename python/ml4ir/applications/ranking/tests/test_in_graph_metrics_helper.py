@@ -0,0 +1,203 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+from pandas import testing as pd_testing
+
+from ml4ir.applications.ranking.model.metrics.helpers import metrics_helper
+from ml4ir.applications.ranking.model.metrics.helpers.in_graph_metrics_helper import *
+
+
+class InGraphMetricsHelperTest(unittest.TestCase):
+    """Test suite for ml4ir.applications.ranking.model.metrics.helpers.in_graph_metrics_helper"""
+
+    def generate_batch(self, batch_size=32, max_sequence_size=8, seed=123):
+        """Generate a padded batch of predictions and the equivalent flattened DataFrame"""
+        rng = np.random.default_rng(seed)
+        query_lengths = rng.integers(1, max_sequence_size + 1, size=batch_size)
+        mask = np.arange(max_sequence_size)[np.newaxis, :] < query_lengths[:, np.newaxis]
+
+        labels = rng.integers(0, 3, size=mask.shape).astype(float)
+        old_ranking_score = rng.random(mask.shape)
+        new_ranking_score = rng.random(mask.shape)
+        old_rank = np.argsort(np.argsort(-np.where(mask, old_ranking_score, -np.inf), axis=-1), axis=-1) + 1
+        new_rank = np.argsort(np.argsort(-np.where(mask, new_ranking_score, -np.inf), axis=-1), axis=-1) + 1
+        group = rng.choice(np.array([b"a", b"b", b"c"]), size=(batch_size, 1))
+        query_key = np.arange(batch_size)[:, np.newaxis]
+
+        predictions_dict = {
+            "mask": tf.constant(mask.astype(np.int64)),
+            "query_key": tf.constant(query_key),
+            "group": tf.constant(group),
+            "label": tf.constant(np.where(mask, labels, 0.)),
+            "old_rank": tf.constant(np.where(mask, old_rank, 0)),
+            "new_rank": tf.constant(np.where(mask, new_rank, 0)),
+            "old_ranking_score": tf.constant(np.where(mask, old_ranking_score, 0.)),
+            "ranking_score": tf.constant(np.where(mask, new_ranking_score, 0.)),
+        }
+        df = pd.DataFrame({
+            "query_key": np.broadcast_to(query_key, mask.shape)[mask],
+            "group": np.broadcast_to(group, mask.shape)[mask],
+            "label": labels[mask],
+            "old_rank": old_rank[mask],
+            "new_rank": new_rank[mask],
+            "old_ranking_score": old_ranking_score[mask],
+            "ranking_score": new_ranking_score[mask],
+        })
+
+        return predictions_dict, df
+
+    def compute_in_graph_stats(self, predictions_dict, group_keys, power_analysis_metrics, compute_ndcg):
+        query_stats = compute_query_stats(predictions_dict,
+                                          label_col="label",
+                                          old_rank_col="old_rank",
+                                          new_rank_col="new_rank",
+                                          new_ranking_score="ranking_score",
+                                          old_ranking_score="old_ranking_score",
+                                          compute_ndcg=compute_ndcg)
+        accumulator = GroupedStatsAccumulator(group_keys, power_analysis_metrics)
+        accumulator.update(*compute_grouped_batch_stats(predictions_dict, query_stats,
+                                                        group_keys, power_analysis_metrics))
+        return accumulator
+
+    def test_grouped_stats_match_metrics_helper(self):
+        """Test that the in-graph grouped stats match metrics_helper.get_grouped_stats"""
+        predictions_dict, df = self.generate_batch()
+        power_analysis_metrics = ["old_MRR", "new_MRR", "old_NDCG", "new_NDCG"]
+
+        expected_stats, expected_variance_params, df_clicked = metrics_helper.get_grouped_stats(
+            df=df,
+            query_key_col="query_key",
+            label_col="label",
+            old_rank_col="old_rank",
+            new_rank_col="new_rank",
+            old_ranking_score="old_ranking_score",
+            new_ranking_score="ranking_score",
+            group_keys=["group"],
+            power_analysis_metrics=power_analysis_metrics,
+            group_metric_running_variance_params={})
+
+        accumulator = self.compute_in_graph_stats(predictions_dict, ["group"], power_analysis_metrics, True)
+
+        pd_testing.assert_frame_equal(accumulator.get_grouped_stats(),
+                                      expected_stats.sort_index().astype(float),
+                                      check_names=False)
+
+        variance_params = accumulator.get_group_metric_running_variance_params()
+        self.assertEqual(set(variance_params.keys()), set(expected_variance_params.keys()))
+        for group, group_params in expected_variance_params.items():
+            for metric, sv in group_params.items():
+                self.assertEqual(variance_params[group][metric].count, sv.count)
+                self.assertAlmostEqual(variance_params[group][metric].mean, sv.mean)
+                self.assertAlmostEqual(variance_params[group][metric].var, sv.var)
+
+        count, mean, m2 = accumulator.get_ttest_stats()
+        diff_mrr = df_clicked[metrics_helper.RankingConstants.DIFF_MRR]
+        self.assertEqual(count, diff_mrr.shape[0])
+        self.assertAlmostEqual(mean, diff_mrr.mean())
+        self.assertAlmostEqual(m2, ((diff_mrr - diff_mrr.mean()) ** 2).sum())
+
+    def test_overall_stats_accumulated_across_batches(self):
+        """Test that the stats without group keys are accumulated across batches"""
+        batches = [self.generate_batch(seed=seed) for seed in range(3)]
+        accumulator = GroupedStatsAccumulator()
+        df_expected = pd.DataFrame()
+        for predictions_dict, df in batches:
+            query_stats = compute_query_stats(predictions_dict, "label", "old_rank", "new_rank", "ranking_score")
+            accumulator.update(*compute_grouped_batch_stats(predictions_dict, query_stats))
+
+            df_batch_stats, _, _ = metrics_helper.get_grouped_stats(
+                df=df,
+                query_key_col="query_key",
+                label_col="label",
+                old_rank_col="old_rank",
+                new_rank_col="new_rank")
+            df_expected = df_batch_stats if df_expected.empty else df_expected.add(df_batch_stats, fill_value=0.)
+
+        pd_testing.assert_frame_equal(accumulator.get_grouped_stats(), df_expected.astype(float))
+
+    def test_variance_accumulated_across_batches(self):
+        """Test that the groupwise variance and t-test stats merged across batches match metrics_helper"""
+        power_analysis_metrics = ["old_MRR", "new_MRR", "old_ACR", "new_ACR"]
+        accumulator = GroupedStatsAccumulator(["group"], power_analysis_metrics)
+        expected_variance_params = {}
+        diff_mrr = []
+        for seed in range(4):
+            predictions_dict, df = self.generate_batch(seed=seed)
+            query_stats = compute_query_stats(predictions_dict, "label", "old_rank", "new_rank", "ranking_score")
+            accumulator.update(*compute_grouped_batch_stats(predictions_dict, query_stats,
+                                                            ["group"], power_analysis_metrics))
+
+            _, expected_variance_params, df_clicked = metrics_helper.get_grouped_stats(
+                df=df,
+                query_key_col="query_key",
+                label_col="label",
+                old_rank_col="old_rank",
+                new_rank_col="new_rank",
+                group_keys=["group"],
+                power_analysis_metrics=power_analysis_metrics,
+                group_metric_running_variance_params=expected_variance_params)
+            diff_mrr.append(df_clicked[metrics_helper.RankingConstants.DIFF_MRR])
+
+        variance_params = accumulator.get_group_metric_running_variance_params()
+        self.assertEqual(set(variance_params.keys()), set(expected_variance_params.keys()))
+        for group, group_params in expected_variance_params.items():
+            for metric, sv in group_params.items():
+                self.assertEqual(variance_params[group][metric].count, sv.count)
+                self.assertAlmostEqual(variance_params[group][metric].mean, sv.mean)
+                self.assertAlmostEqual(variance_params[group][metric].var, sv.var)
+
+        count, mean, m2 = accumulator.get_ttest_stats()
+        diff_mrr = pd.concat(diff_mrr)
+        self.assertEqual(count, diff_mrr.shape[0])
+        self.assertAlmostEqual(mean, diff_mrr.mean())
+        self.assertAlmostEqual(m2, ((diff_mrr - diff_mrr.mean()) ** 2).sum())
+
+    def test_group_key_from_clicked_record(self):
+        """Test that the group key of a query is read from its proxy clicked record like metrics_helper"""
+        mask = np.array([[1, 1, 1], [1, 1, 0]])
+        predictions_dict = {
+            "mask": tf.constant(mask),
+            "group": tf.constant([[b"a", b"b", b"c"], [b"a", b"c", b""]]),
+            "label": tf.constant([[0., 0., 1.], [0., 1., 0.]]),
+            "old_rank": tf.constant([[1, 2, 3], [1, 2, 0]]),
+            "new_rank": tf.constant([[3, 2, 1], [2, 1, 0]]),
+        }
+        df = pd.DataFrame({
+            "query_key": [0, 0, 0, 1, 1],
+            "group": [b"a", b"b", b"c", b"a", b"c"],
+            "label": [0., 0., 1., 0., 1.],
+            "old_rank": [1, 2, 3, 1, 2],
+            "new_rank": [3, 2, 1, 2, 1],
+        })
+
+        expected_stats, _, _ = metrics_helper.get_grouped_stats(
+            df=df,
+            query_key_col="query_key",
+            label_col="label",
+            old_rank_col="old_rank",
+            new_rank_col="new_rank",
+            group_keys=["group"])
+        query_stats = compute_query_stats(predictions_dict, "label", "old_rank", "new_rank", "ranking_score")
+        accumulator = GroupedStatsAccumulator(["group"])
+        accumulator.update(*compute_grouped_batch_stats(predictions_dict, query_stats, ["group"]))
+
+        pd_testing.assert_frame_equal(accumulator.get_grouped_stats(),
+                                      expected_stats.sort_index().astype(float),
+                                      check_names=False)
+
+    def test_compute_dcg(self):
+        """Test the DCG computation on padded queries"""
+        y_true = tf.constant([[3., 2., 0., 1.], [0., 1., 5., 0.]], dtype=tf.float64)
+        y_score = tf.constant([[0.1, 0.4, 0.3, 0.9], [0.5, 0.2, 0.1, 0.9]], dtype=tf.float64)
+        mask = tf.constant([[True, True, True, True], [True, True, False, False]])
+
+        dcg = compute_dcg(y_true, y_score, mask).numpy()
+
+        self.assertAlmostEqual(dcg[0], 1. + 2. / np.log2(3) + 0. / np.log2(4) + 3. / np.log2(5))
+        self.assertAlmostEqual(dcg[1], 0. + 1. / np.log2(3))
+
+
+if __name__ == "__main__":
+    unittest.main()
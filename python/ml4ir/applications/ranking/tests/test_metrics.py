@@ -7,10 +7,12 @@ import pandas as pd
 import tensorflow as tf
 from ml4ir.base.data.relevance_dataset import RelevanceDataset
 from ml4ir.applications.ranking.model.ranking_model import RankingModel
+from ml4ir.base.config.keys import TFRecordTypeKey
 from ml4ir.base.features.feature_config import FeatureConfig
 from ml4ir.applications.ranking.tests.test_base import RankingTestBase
 from ml4ir.applications.ranking.model.metrics.metrics_impl import MRR, ACR, NDCG, SegmentMRR, \
-    MacroMRR
+    MacroMRR, RankingMetricContext
+from ml4ir.applications.ranking.model.metrics.aux_metrics_impl import RankMatchFailure
 from ml4ir.applications.ranking.model.metrics.helpers import metrics_helper
 from ml4ir.applications.ranking.config.parse_args import get_args
 from ml4ir.applications.ranking.pipeline import RankingPipeline
@@ -147,6 +149,117 @@ class RankingModelTest(RankingTestBase):
             assert gold_metric_name in metrics
             assert np.isclose(metrics[gold_metric_name], gold_metric_val, atol=0.05)
 
+    def test_in_graph_evaluation(self):
+        """
+        Test that the in_graph evaluation mode computes the same ranking metrics as the extended mode
+        """
+        feature_config: FeatureConfig = FeatureConfig.get_instance(
+            tfrecord_type=self.args.tfrecord_type,
+            feature_config_dict=self.file_io.read_yaml(
+                os.path.join(self.root_data_dir, "configs", self.feature_config_fname)),
+            logger=self.logger,
+        )
+        relevance_dataset = RelevanceDataset(
+            data_dir=os.path.join(self.root_data_dir, "tfrecord"),
+            data_format="tfrecord",
+            feature_config=feature_config,
+            tfrecord_type=self.args.tfrecord_type,
+            max_sequence_size=self.args.max_sequence_size,
+            batch_size=self.args.batch_size,
+            preprocessing_keys_to_fns={},
+            train_pcent_split=self.args.train_pcent_split,
+            val_pcent_split=self.args.val_pcent_split,
+            test_pcent_split=self.args.test_pcent_split,
+            use_part_files=self.args.use_part_files,
+            parse_tfrecord=True,
+            file_io=self.file_io,
+            logger=self.logger,
+        )
+        ranking_model: RankingModel = self.get_ranking_model(
+            loss_key=self.args.loss_key, feature_config=feature_config, metrics_keys=["MRR"]
+        )
+
+        power_analysis = {"metrics": "MRR, NDCG", "power": 0.8, "pvalue": 0.1}
+        ranking_model.eval_config = {"mode": "extended", "power_analysis": power_analysis}
+        extended_overall_metrics, extended_group_metrics, extended_metrics_dict = ranking_model.evaluate(
+            test_dataset=relevance_dataset.test)
+        ranking_model.eval_config = {"mode": "in_graph", "power_analysis": power_analysis}
+        in_graph_overall_metrics, in_graph_group_metrics, in_graph_metrics_dict = ranking_model.evaluate(
+            test_dataset=relevance_dataset.test)
+
+        for metric in ["query_count", "old_ACR", "new_ACR", "old_MRR", "new_MRR", "new_NDCG"]:
+            assert np.isclose(in_graph_overall_metrics[metric], extended_overall_metrics[metric])
+        for metric in ["new_MRR", "new_NDCG", "is_MRR_lift_stat_sig", "is_NDCG_lift_stat_sig"]:
+            assert np.allclose(in_graph_group_metrics[metric].values.astype(float),
+                               extended_group_metrics[metric].values.astype(float))
+        for metric in ["Rank distribution t-test statistic", "stat_sig_MRR_improved_groups",
+                       "stat_sig_MRR_degraded_groups"]:
+            assert np.isclose(in_graph_metrics_dict[metric], extended_metrics_dict[metric])
+
+    def test_in_graph_evaluation_example_records(self):
+        """
+        Test that the in_graph evaluation mode fails clearly when the records are not grouped into queries
+        """
+        feature_config: FeatureConfig = FeatureConfig.get_instance(
+            tfrecord_type=self.args.tfrecord_type,
+            feature_config_dict=self.file_io.read_yaml(
+                os.path.join(self.root_data_dir, "configs", self.feature_config_fname)),
+            logger=self.logger,
+        )
+        ranking_model: RankingModel = self.get_ranking_model(
+            loss_key=self.args.loss_key, feature_config=feature_config, metrics_keys=["MRR"]
+        )
+        ranking_model.tfrecord_type = TFRecordTypeKey.EXAMPLE
+        ranking_model.eval_config = {"mode": "in_graph"}
+
+        with self.assertRaisesRegex(ValueError, "in_graph evaluation mode requires"):
+            ranking_model.evaluate(test_dataset=tf.data.Dataset.from_tensors(({}, tf.constant([0.]))))
+
+    def test_parallel_evaluation(self):
+        """
+        Test that computing the extended metrics on worker threads matches the synchronous evaluation
+        """
+        feature_config: FeatureConfig = FeatureConfig.get_instance(
+            tfrecord_type=self.args.tfrecord_type,
+            feature_config_dict=self.file_io.read_yaml(
+                os.path.join(self.root_data_dir, "configs", self.feature_config_fname)),
+            logger=self.logger,
+        )
+        relevance_dataset = RelevanceDataset(
+            data_dir=os.path.join(self.root_data_dir, "tfrecord"),
+            data_format="tfrecord",
+            feature_config=feature_config,
+            tfrecord_type=self.args.tfrecord_type,
+            max_sequence_size=self.args.max_sequence_size,
+            batch_size=8,
+            preprocessing_keys_to_fns={},
+            train_pcent_split=self.args.train_pcent_split,
+            val_pcent_split=self.args.val_pcent_split,
+            test_pcent_split=self.args.test_pcent_split,
+            use_part_files=self.args.use_part_files,
+            parse_tfrecord=True,
+            file_io=self.file_io,
+            logger=self.logger,
+        )
+        ranking_model: RankingModel = self.get_ranking_model(
+            loss_key=self.args.loss_key, feature_config=feature_config, metrics_keys=["MRR"]
+        )
+
+        power_analysis = {"metrics": "MRR, NDCG", "power": 0.8, "pvalue": 0.1}
+        ranking_model.eval_config = {"mode": "extended", "power_analysis": power_analysis, "num_workers": 0}
+        overall_metrics, group_metrics, metrics_dict = ranking_model.evaluate(test_dataset=relevance_dataset.test)
+
+        for num_workers in [1, 3]:
+            ranking_model.eval_config["num_workers"] = num_workers
+            parallel_overall_metrics, parallel_group_metrics, parallel_metrics_dict = ranking_model.evaluate(
+                test_dataset=relevance_dataset.test)
+
+            pd.testing.assert_series_equal(parallel_overall_metrics, overall_metrics)
+            pd.testing.assert_frame_equal(parallel_group_metrics, group_metrics)
+            assert parallel_metrics_dict.keys() == metrics_dict.keys()
+            for key, value in metrics_dict.items():
+                assert parallel_metrics_dict[key] == value or np.isnan(value), key
+
     def test_stat_sig_evaluation(self):
         # FIXME: Avoid end to end test
         """testing ml4ir stat sig computation end-to-end"""
@@ -254,6 +367,44 @@ class RankingMetricsTest(unittest.TestCase):
             segments=[["a"], ["a"], ["b"], ["b"]]).numpy()
         self.assertTrue(np.isclose(actual_metric_val, 0.36111))
 
+    def test_shared_rank_context(self):
+        """Test that the metrics updated with ranks shared through a context match the metrics computed on their own"""
+        rng = np.random.default_rng(123)
+        # Ties in the scores and labels, and padded records at the end of the queries
+        y_true = tf.constant(rng.integers(0, 3, (16, 8)), dtype=tf.float32)
+        y_pred = tf.constant(rng.integers(0, 4, (16, 8)) / 4., dtype=tf.float32)
+        mask = tf.constant(np.arange(8)[np.newaxis, :] < rng.integers(2, 9, (16, 1)), dtype=tf.float32)
+        y_aux = tf.constant(rng.integers(0, 2, (16, 8)), dtype=tf.float32)
+        y_true_ranks = tf.constant(np.tile(np.arange(1, 9), (16, 1)), dtype=tf.float32)
+        segments = tf.constant(rng.choice(["a", "b", "c"], (16, 1)))
+
+        context = RankingMetricContext(y_true, y_pred, mask)
+        for metric_cls in [MRR, ACR]:
+            metric, shared_metric = metric_cls(), metric_cls()
+            metric.update_state(y_true, y_pred, mask=mask)
+            shared_metric.update_state(y_true, y_pred, mask=mask, context=context)
+            assert metric.result().numpy() == shared_metric.result().numpy()
+
+        metric, shared_metric = SegmentMRR(segments=["a", "b", "c"]), SegmentMRR(segments=["a", "b", "c"])
+        metric.update_state(y_true, y_pred, segments=segments, mask=mask)
+        shared_metric.update_state(y_true, y_pred, segments=segments, mask=mask, context=context)
+        assert np.array_equal(metric.result().numpy(), shared_metric.result().numpy())
+
+        metric, shared_metric = NDCG(), NDCG()
+        metric.update_state(y_true, y_pred)
+        shared_metric.update_state(y_true, y_pred, context=context)
+        assert metric.result().numpy() == shared_metric.result().numpy()
+
+        metric, shared_metric = RankMatchFailure(), RankMatchFailure()
+        metric.update_state(y_true, y_pred, y_aux, y_true_ranks, mask)
+        shared_metric.update_state(y_true, y_pred, y_aux, y_true_ranks, mask, context=context)
+        assert metric.result().numpy() == shared_metric.result().numpy()
+
+        # The ranks are computed once and reused by all the metrics
+        assert context.y_pred_ranks is context.y_pred_ranks
+        assert set(context._cache.keys()) == {"y_pred_sorted_indices", "y_pred_ranks", "y_true_clicks", "click_ranks",
+                                              "y_true_sorted_indices", "masked_y_pred_ranks"}
+
     def test_acr(self):
         self.assertEquals(ACR()([[1, 0, 0], [0, 0, 1]], [[0.3, 0.6, 0.1], [0.2, 0.2, 0.3]]).numpy(),
                           1.5)
@@ -396,6 +547,47 @@ class MetricHelperTest(unittest.TestCase):
         expected_values = np.array([1.0, 1.0, 1.0, 0.789998, 0.789998, 0.789998])
         self.compute_and_assert_NDCG(data, expected_values)
 
+    def test_compute_NDCG_unsorted_queries(self):
+        """Test NDCG computation when the records of a query are not contiguous"""
+        data = {
+            'query_id': [2, 1, 2, 1, 2, 1],
+            'y_true': [1.0, 3.0, 2.0, 2.0, 3.0, 1.0],
+            'y_pred': [30, 0.3, 20, 0.2, 10, 0.1]
+        }
+        expected_values = np.array([0.789998, 1.0, 0.789998, 1.0, 0.789998, 1.0])
+        self.compute_and_assert_NDCG(data, expected_values)
+
+    def test_compute_NDCG_no_relevant_records(self):
+        """Test NDCG is undefined for queries without relevant records"""
+        data = {
+            'query_id': ["a", "a", "b", "b"],
+            'y_true': [0.0, 0.0, 1.0, 0.0],
+            'y_pred': [0.1, 0.2, 0.1, 0.2]
+        }
+        result = metrics_helper.compute_ndcg(pd.DataFrame(data), "query_id", "y_true", pred_col="y_pred", new_col="ndcg")
+        assert np.isnan(result['ndcg'].values[:2]).all()
+        assert np.isclose(result['ndcg'].values[2:], 0.63093).all()
+
+    def test_compute_segment_ndcg_matches_per_query_ndcg(self):
+        """Test the segment based NDCG against a per query computation on random queries"""
+        rng = np.random.default_rng(42)
+        query_ids = rng.integers(0, 50, size=500)
+        y_true = rng.integers(0, 4, size=500).astype(float)
+        y_new = rng.random(500)
+        y_old = rng.random(500)
+
+        new_ndcg, old_ndcg = metrics_helper.compute_segment_ndcg(query_ids, y_true, [y_new, y_old])
+        for i, qid in enumerate(np.unique(query_ids)):
+            labels = y_true[query_ids == qid]
+            discounts = np.log2(np.arange(2, labels.size + 2))
+            idcg = np.sum(np.sort(labels)[::-1] / discounts)
+            for y_pred, ndcg in [(y_new, new_ndcg), (y_old, old_ndcg)]:
+                dcg = np.sum(labels[np.argsort(-y_pred[query_ids == qid])] / discounts)
+                if idcg == 0:
+                    assert np.isnan(ndcg[i])
+                else:
+                    assert np.isclose(ndcg[i], dcg / idcg)
+
     def compute_and_assert_NDCG(self, data, expected_values):
         df = pd.DataFrame(data)
         result = metrics_helper.compute_ndcg(df, "query_id", "y_true", pred_col="y_pred", new_col="ndcg")
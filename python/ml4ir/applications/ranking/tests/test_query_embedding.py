@@ -1,3 +1,5 @@
+import os
+import tempfile
 import tensorflow as tf
 import numpy as np
 import unittest
@@ -52,4 +54,101 @@ class TestQueryEmbeddingVectorUsingGlove(unittest.TestCase):
         query = tf.constant([["word1", "word2"]])
         query_embedding = self.query_embedding_vector.build_embeddings(query)
         expected_embedding = np.array([0.5, 0.7, 0.9], dtype=np.float32)
-        np.isclose(query_embedding.numpy(), expected_embedding).all()
\ No newline at end of file
+        np.isclose(query_embedding.numpy(), expected_embedding).all()
+
+
+class TestStaticQueryEmbeddingVectorUsingGlove(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.glove_path = os.path.join(self.tmp_dir.name, "glove.txt")
+        with open(self.glove_path, "w") as f:
+            f.write("word1 0.1 0.2 0.3\nword2 0.4 0.5 0.6\nthe 0.7 0.7 0.7\nword3 0.9 0.9 0.9")
+        self.feature_info = {
+            "name": "default_feature",
+            "feature_layer_info": {
+                "args": {
+                    "glove_path": self.glove_path,
+                    "max_entries": 3
+                }
+            }
+        }
+        self.query_embedding_vector = string_transforms.GloveStaticQueryEmbeddingVector(self.feature_info,
+                                                                                        MagicMock())
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_glove_store_conversion(self):
+        store_path = os.path.join(self.tmp_dir.name, "glove.3")
+        embeddings = np.load("{}.npy".format(store_path))
+        with open("{}.vocab".format(store_path)) as f:
+            vocab = f.read().split("\n")
+
+        self.assertEqual(vocab, ["word1", "word2", "the"])
+        np.testing.assert_array_equal(embeddings, np.array([[0.1, 0.2, 0.3], [0.4, 0.5, 0.6], [0.7, 0.7, 0.7]],
+                                                           dtype=np.float32))
+        self.assertEqual(self.query_embedding_vector.embedding_dim, 3)
+
+    def test_glove_store_reconverted_when_stale(self):
+        store_path = os.path.join(self.tmp_dir.name, "glove.3")
+        self.assertFalse(string_transforms.is_glove_store_stale(self.glove_path, store_path, 3))
+        self.assertTrue(string_transforms.is_glove_store_stale(self.glove_path, store_path, 2))
+        # Temporary files are moved into place
+        self.assertEqual(sorted(os.listdir(self.tmp_dir.name)),
+                         ["glove.3.npy", "glove.3.source", "glove.3.vocab", "glove.txt"])
+
+        with open(self.glove_path, "w") as f:
+            f.write("word1 1.0 2.0\nword2 3.0 4.0\nword4 5.0 6.0\nword3 0.9 0.9")
+        self.assertTrue(string_transforms.is_glove_store_stale(self.glove_path, store_path, 3))
+
+        query_embedding_vector = string_transforms.GloveStaticQueryEmbeddingVector(self.feature_info, MagicMock())
+        self.assertEqual(query_embedding_vector.embedding_dim, 2)
+        self.assertFalse(string_transforms.is_glove_store_stale(self.glove_path, store_path, 3))
+        np.testing.assert_allclose(query_embedding_vector(tf.constant([["word1 word4"]])).numpy(),
+                                   np.array([[[6., 8.]]], dtype=np.float32))
+
+    def test_glove_store_in_read_only_directory(self):
+        # A store that is up to date is read from a read-only directory
+        with unittest.mock.patch.object(string_transforms.os, "access", return_value=False):
+            query_embedding_vector = string_transforms.GloveStaticQueryEmbeddingVector(self.feature_info,
+                                                                                       MagicMock())
+        self.assertEqual(query_embedding_vector.embedding_dim, 3)
+
+        # A store that needs to be converted requires a writable store path
+        self.feature_info["feature_layer_info"]["args"]["max_entries"] = 2
+        with unittest.mock.patch.object(string_transforms.os, "access", return_value=False):
+            with self.assertRaisesRegex(ValueError, "store_path"):
+                string_transforms.GloveStaticQueryEmbeddingVector(self.feature_info, MagicMock())
+
+        store_dir = os.path.join(self.tmp_dir.name, "store")
+        os.makedirs(store_dir)
+        self.feature_info["feature_layer_info"]["args"]["store_path"] = os.path.join(store_dir, "glove")
+        query_embedding_vector = string_transforms.GloveStaticQueryEmbeddingVector(self.feature_info, MagicMock())
+        self.assertEqual(sorted(os.listdir(store_dir)), ["glove.npy", "glove.source", "glove.vocab"])
+        self.assertEqual(query_embedding_vector.embeddings.shape, (2, 3))
+
+    def test_query_embeddings(self):
+        queries = tf.constant([["Word1, word2!"], ["the word1"], ["word3 unknown"], [""]])
+        query_embeddings = self.query_embedding_vector(queries)
+
+        # Stop words, out of vocabulary words and words past max_entries are ignored
+        expected_embeddings = np.array([[[0.5, 0.7, 0.9]], [[0.1, 0.2, 0.3]], [[0., 0., 0.]], [[0., 0., 0.]]],
+                                       dtype=np.float32)
+        self.assertEqual(query_embeddings.shape, (4, 1, 3))
+        np.testing.assert_allclose(query_embeddings.numpy(), expected_embeddings, rtol=1e-6)
+
+    def test_query_embeddings_in_graph(self):
+        queries = tf.constant([["Word1, word2!"], ["the word1"]])
+        query_embeddings = tf.function(self.query_embedding_vector)(queries)
+        np.testing.assert_allclose(query_embeddings.numpy(),
+                                   self.query_embedding_vector(queries).numpy())
+
+    def test_matches_glove_query_embedding_vector(self):
+        feature_info = {
+            "name": "default_feature",
+            "feature_layer_info": {"args": {"embedding_size": 3, "glove_path": self.glove_path, "max_entries": 3}}
+        }
+        reference_vector = string_transforms.GloveQueryEmbeddingVector(feature_info, MagicMock())
+        queries = tf.constant([["word1 word2"], ["word2"]])
+        np.testing.assert_allclose(self.query_embedding_vector(queries).numpy(),
+                                   reference_vector(queries).numpy(), rtol=1e-6)
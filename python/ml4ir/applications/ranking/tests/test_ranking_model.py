@@ -145,3 +145,110 @@ class RankingModelTest(RankingTestBase):
         for train_feature in train_features:
             assert train_feature in coefficients_df.feature.values
 
+
+    def test_predict_and_evaluate(self):
+        """
+        Test that predicting and evaluating with a single pass over the test data
+        matches running predict and evaluate one after the other
+        """
+        feature_config: FeatureConfig = FeatureConfig.get_instance(
+            tfrecord_type=self.args.tfrecord_type,
+            feature_config_dict=self.file_io.read_yaml(
+                os.path.join(self.root_data_dir, "configs", self.feature_config_fname)),
+            logger=self.logger,
+        )
+        relevance_dataset = RelevanceDataset(
+            data_dir=os.path.join(self.root_data_dir, "tfrecord"),
+            data_format="tfrecord",
+            feature_config=feature_config,
+            tfrecord_type=self.args.tfrecord_type,
+            max_sequence_size=self.args.max_sequence_size,
+            batch_size=self.args.batch_size,
+            preprocessing_keys_to_fns={},
+            train_pcent_split=self.args.train_pcent_split,
+            val_pcent_split=self.args.val_pcent_split,
+            test_pcent_split=self.args.test_pcent_split,
+            use_part_files=self.args.use_part_files,
+            parse_tfrecord=True,
+            file_io=self.file_io,
+            logger=self.logger,
+        )
+        ranking_model: RankingModel = self.get_ranking_model(
+            loss_key=self.args.loss_key, feature_config=feature_config, metrics_keys=["MRR"]
+        )
+        ranking_model.build(relevance_dataset)
+
+        df_overall_metrics, df_group_metrics, metrics_dict = ranking_model.evaluate(
+            test_dataset=relevance_dataset.test, additional_features={}, group_metrics_min_queries=0)
+        predictions_df = ranking_model.predict(test_dataset=relevance_dataset.test)
+
+        fused_predictions_df, fused_df_overall_metrics, fused_df_group_metrics, fused_metrics_dict = \
+            ranking_model.predict_and_evaluate(test_dataset=relevance_dataset.test, group_metrics_min_queries=0)
+
+        pd.testing.assert_frame_equal(fused_predictions_df, predictions_df)
+        pd.testing.assert_series_equal(fused_df_overall_metrics, df_overall_metrics)
+        pd.testing.assert_frame_equal(fused_df_group_metrics, df_group_metrics)
+        assert fused_metrics_dict.keys() == metrics_dict.keys()
+        for key, value in metrics_dict.items():
+            if isinstance(value, float):
+                assert np.isclose(fused_metrics_dict[key], value, equal_nan=True)
+
+        # Check the predictions written to the logs directory
+        logs_dirs = [os.path.join(self.output_dir, name) for name in ["unfused", "fused"]]
+        for logs_dir in logs_dirs:
+            self.file_io.make_directory(logs_dir, clear_dir=True)
+        ranking_model.predict(test_dataset=relevance_dataset.test, logs_dir=logs_dirs[0])
+        assert ranking_model.predict_and_evaluate(
+            test_dataset=relevance_dataset.test, group_metrics_min_queries=0, logs_dir=logs_dirs[1])[0] is None
+        pd.testing.assert_frame_equal(
+            *[pd.read_csv(os.path.join(logs_dir, "model_predictions.csv")) for logs_dir in logs_dirs])
+
+    def test_factorize_context_features(self):
+        """
+        Test that the trainable context features are not tiled to the records when the DNN factorizes them,
+        and that the scores match the unfactorized model with the same weights
+        """
+        feature_config: FeatureConfig = FeatureConfig.get_instance(
+            tfrecord_type=self.args.tfrecord_type,
+            feature_config_dict=self.file_io.read_yaml(
+                os.path.join(self.root_data_dir, "configs", self.feature_config_fname)),
+            logger=self.logger,
+        )
+        relevance_dataset = RelevanceDataset(
+            data_dir=os.path.join(self.root_data_dir, "tfrecord"),
+            data_format="tfrecord",
+            feature_config=feature_config,
+            tfrecord_type=self.args.tfrecord_type,
+            max_sequence_size=self.args.max_sequence_size,
+            batch_size=self.args.batch_size,
+            preprocessing_keys_to_fns={},
+            train_pcent_split=self.args.train_pcent_split,
+            val_pcent_split=self.args.val_pcent_split,
+            test_pcent_split=self.args.test_pcent_split,
+            use_part_files=self.args.use_part_files,
+            parse_tfrecord=True,
+            file_io=self.file_io,
+            logger=self.logger,
+        )
+        features, _ = next(iter(relevance_dataset.test))
+
+        ranking_model: RankingModel = self.get_ranking_model(
+            loss_key=self.args.loss_key, feature_config=feature_config, metrics_keys=["MRR"]
+        )
+        factorized_ranking_model: RankingModel = self.get_ranking_model(
+            loss_key=self.args.loss_key, feature_config=feature_config, metrics_keys=["MRR"],
+            model_config={**self.model_config, "factorize_context_features": True}
+        )
+        scores = ranking_model.model(features)[self.args.output_name]
+        # Build the weights of the factorized model
+        factorized_ranking_model.model(features)
+
+        train_features = factorized_ranking_model.model.interaction_model(features)["train"]
+        context_features = set(feature_config.get_context_features("node_name"))
+        for name, feature in train_features.items():
+            assert feature.shape[1] == (1 if name in context_features else self.args.max_sequence_size)
+
+        factorized_ranking_model.model.set_weights(ranking_model.model.get_weights())
+        factorized_scores = factorized_ranking_model.model(features)[self.args.output_name]
+        assert factorized_scores.shape == scores.shape
+        assert np.allclose(factorized_scores, scores, atol=1e-5)
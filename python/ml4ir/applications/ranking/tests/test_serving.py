@@ -9,7 +9,9 @@ from ml4ir.applications.ranking.tests.test_base import RankingTestBase
 from ml4ir.base.config.keys import DataFormatKey
 from ml4ir.base.config.keys import ServingSignatureKey
 from ml4ir.base.data.relevance_dataset import RelevanceDataset
+from ml4ir.base.data.tfrecord_reader import get_batch_parse_fn
 from ml4ir.base.features.feature_config import FeatureConfig
+from ml4ir.base.model.serving import ROW_LENGTHS_NAME
 
 
 class RankingModelTest(RankingTestBase):
@@ -65,7 +67,8 @@ class RankingModelTest(RankingTestBase):
             preprocessing_keys_to_fns={},
             postprocessing_fn=None,
             required_fields_only=not self.args.use_all_fields_at_inference,
-            pad_sequence=self.args.pad_sequence_at_inference
+            pad_sequence=self.args.pad_sequence_at_inference,
+            batch_serving_signatures=True
         )
 
         # Load SavedModel and get the right serving signature
@@ -120,6 +123,7 @@ class RankingModelTest(RankingTestBase):
         default_signature_predictions = _filter_records(
             _flatten_records(default_signature_predictions), mask
         )
+        tfrecord_single_predictions = tfrecord_signature_predictions
         tfrecord_signature_predictions = tf.squeeze(
             tf.concat(tfrecord_signature_predictions, axis=1)
         )
@@ -133,6 +137,42 @@ class RankingModelTest(RankingTestBase):
             default_signature_predictions, tfrecord_signature_predictions, rtol=0.01
         ).all()
 
+        # The batched tfrecord signature scores all the queries at once,
+        # padded to the longest query in the batch
+        assert ServingSignatureKey.TFRECORD_BATCH in tfrecord_model.signatures
+        tfrecord_batch_signature = tfrecord_model.signatures[ServingSignatureKey.TFRECORD_BATCH]
+        tfrecord_batch_signature_predictions = tfrecord_batch_signature(
+            protos=sequence_example_protos
+        )[self.args.output_name]
+        tfrecord_batch_features, _ = get_batch_parse_fn(
+            tfrecord_type=self.args.tfrecord_type,
+            feature_config=feature_config,
+            preprocessing_keys_to_fns={},
+            required_fields_only=not self.args.use_all_fields_at_inference,
+            pad_sequence=self.args.pad_sequence_at_inference,
+            max_sequence_size=self.args.max_sequence_size,
+        )(sequence_example_protos)
+        tfrecord_batch_signature_predictions = _filter_records(
+            tfrecord_batch_signature_predictions, tfrecord_batch_features["mask"]
+        )
+        assert np.isclose(
+            tfrecord_signature_predictions, tfrecord_batch_signature_predictions, rtol=0.01
+        ).all()
+
+        # The ragged tfrecord signature returns the scores of each query without padding
+        assert ServingSignatureKey.TFRECORD_RAGGED in tfrecord_model.signatures
+        tfrecord_ragged_signature = tfrecord_model.signatures[ServingSignatureKey.TFRECORD_RAGGED]
+        tfrecord_ragged_outputs = tfrecord_ragged_signature(protos=sequence_example_protos)
+        tfrecord_ragged_predictions = tf.RaggedTensor.from_row_lengths(
+            tfrecord_ragged_outputs[self.args.output_name],
+            tfrecord_ragged_outputs[ROW_LENGTHS_NAME],
+        )
+        assert tfrecord_ragged_predictions.shape[0] == self.args.batch_size
+        for i in range(self.args.batch_size):
+            assert np.isclose(
+                tfrecord_ragged_predictions[i], tf.squeeze(tfrecord_single_predictions[i], axis=0), rtol=0.01
+            ).all()
+
     def get_feature_config(self):
         feature_config_path = os.path.join(
             self.root_data_dir, "configs", self.FEATURE_CONFIG_FNAME
@@ -169,6 +209,15 @@ class RankingModelTest(RankingTestBase):
 
         return tfrecord_model.signatures[ServingSignatureKey.TFRECORD]
 
+    def test_default_serving_signatures(self):
+        """Test that the batch serving signatures are only saved when requested"""
+        self.get_tfrecord_signature(self.get_feature_config())
+
+        tfrecord_model = kmodels.load_model(
+            os.path.join(self.output_dir, "final", "tfrecord"), compile=False
+        )
+        assert set(tfrecord_model.signatures.keys()) == {ServingSignatureKey.TFRECORD}
+
     def test_model_serving_default(self):
         """
         Train a simple dnn model and test serving flow by loading the SavedModel
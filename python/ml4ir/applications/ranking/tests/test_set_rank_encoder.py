@@ -3,8 +3,13 @@ import unittest
 import tensorflow as tf
 from tensorflow.experimental.numpy import isclose
 import numpy as np
+from unittest.mock import MagicMock
 
 from ml4ir.applications.ranking.model.layers.set_rank_encoder import SetRankEncoder
+from ml4ir.base.config.keys import FeatureTypeKey
+from ml4ir.base.model.architectures.dnn import DNN
+from ml4ir.base.model.architectures.auto_dag_network import AutoDagNetwork
+from ml4ir.base.model.architectures.utils import get_trimmed_sequence_size, trim_sequence
 
 
 class TestSetRankEncoder(unittest.TestCase):
@@ -140,3 +145,92 @@ class TestSetRankEncoder(unittest.TestCase):
         self.assertEqual(encoder_output.shape[2], self.encoding_size)
 
         self.validate_encoder_output(encoder_output, mask)
+
+
+class TestSequenceTrimming(unittest.TestCase):
+    """Unit tests for trimming the padded records before the SetRankEncoder in the ranking architectures"""
+
+    def setUp(self):
+        tf.random.set_seed(123)
+        self.set_rank_encoder_args = {
+            "requires_mask": True,
+            "encoding_size": 16,
+            "num_layers": 2,
+            "num_attention_heads": 2,
+            "intermediate_size": 16,
+            "dropout_rate": 0.0
+        }
+
+        # Queries of at most 6 records padded to 10 records
+        num_records = np.array([6, 1, 4, 3])
+        self.mask = tf.constant(np.arange(10)[np.newaxis, :] < num_records[:, np.newaxis], dtype=tf.float32)
+        self.inputs = {
+            FeatureTypeKey.TRAIN: {
+                "feature_a": tf.random.uniform([4, 10, 3]),
+                "feature_b": tf.random.uniform([4, 10, 1])
+            },
+            FeatureTypeKey.METADATA: {
+                FeatureTypeKey.MASK: self.mask,
+                "query_key": tf.constant([["q{}".format(i)] * 10 for i in range(4)]),
+                # Query level vector with more entries than the longest query
+                "query_vector": tf.random.uniform([4, 8])
+            }
+        }
+
+    def test_trim_sequence(self):
+        """Test that only the features along the sequence axis of the mask are trimmed"""
+        metadata_features = self.inputs[FeatureTypeKey.METADATA]
+
+        def trim(features):
+            return trim_sequence(features,
+                                 tf.shape(features[FeatureTypeKey.MASK])[1],
+                                 get_trimmed_sequence_size(features[FeatureTypeKey.MASK]))
+
+        for trimmed_features in [trim(metadata_features), tf.function(trim)(metadata_features)]:
+            self.assertEqual(trimmed_features[FeatureTypeKey.MASK].shape, [4, 6])
+            self.assertEqual(trimmed_features["query_key"].shape, [4, 6])
+            self.assertTrue(np.all(trimmed_features["query_vector"].numpy() ==
+                                   metadata_features["query_vector"].numpy()))
+
+    def validate_trimmed_scores(self, model):
+        """Check that the trimmed forward pass matches the padded one on the records of the queries"""
+        padded_scores = model(self.inputs, training=False)
+        model.trim_padded_records = True
+        trimmed_scores = model(self.inputs, training=False)
+
+        self.assertEqual(trimmed_scores.shape, padded_scores.shape)
+        self.assertTrue(np.allclose(tf.boolean_mask(trimmed_scores, self.mask),
+                                    tf.boolean_mask(padded_scores, self.mask), atol=1e-5))
+        self.assertTrue(np.all(trimmed_scores.numpy()[:, 6:] == 0.))
+
+        # Also check the compiled forward pass, where the trimmed sequence size is dynamic
+        compiled_scores = tf.function(lambda inputs: model(inputs, training=False))(self.inputs)
+        self.assertTrue(np.allclose(compiled_scores, trimmed_scores, atol=1e-5))
+
+    def test_dnn(self):
+        """Test trimming the padded records in the DNN architecture"""
+        model = DNN(model_config={
+            "layers": [
+                {"type": "set_rank_encoder", **self.set_rank_encoder_args},
+                {"type": "dense", "units": 8, "activation": "relu"},
+                {"type": "dense", "units": 1}
+            ]
+        }, feature_config=MagicMock(), file_io=MagicMock())
+
+        self.validate_trimmed_scores(model)
+
+    def test_auto_dag_network(self):
+        """Test trimming the padded records in the AutoDagNetwork architecture"""
+        model = AutoDagNetwork(model_config={
+            "layers": [
+                {"type": "keras.layers.merging.concatenate.Concatenate", "name": "features_concat",
+                 "inputs": ["feature_a", "feature_b"], "aslist": True, "args": {"axis": -1}},
+                {"type": "ml4ir.applications.ranking.model.layers.set_rank_encoder.SetRankEncoder",
+                 "name": "set_rank_encoder", "inputs": ["features_concat", FeatureTypeKey.MASK],
+                 "args": self.set_rank_encoder_args},
+                {"type": "keras.layers.core.dense.Dense", "name": "final_dense",
+                 "inputs": ["set_rank_encoder"], "args": {"units": 1}}
+            ]
+        }, feature_config=MagicMock(), file_io=MagicMock())
+
+        self.validate_trimmed_scores(model)
@@ -5,6 +5,7 @@ class EvalConfigConstants:
     MODE = "mode"
     BASIC_MODE = "basic"  # Just runs keras.Model.evaluate()
     EXTENDED_MODE = "extended"  # Runs the full evaluation function configured in the RelevanceModel
+    IN_GRAPH_MODE = "in_graph"  # Computes the extended ranking metrics with tensorflow ops on the padded batches
     GROUP_BY = "group_by"
     POWER_ANALYSIS = "power_analysis"
     VARIANCE_LIST = "variance_list"
@@ -13,6 +14,7 @@ class EvalConfigConstants:
     TTEST_PVALUE_THRESHOLD = 0.1
     METRICS = "metrics"
     SEGMENTS = "segments"
+    NUM_WORKERS = "num_workers"  # Number of threads computing the extended metrics on the batches of predictions
 
 
 def get_power_analysis_config(eval_config, group_key):
@@ -100,6 +100,8 @@ class ServingSignatureKey(Key):
 
     DEFAULT = saved_model.DEFAULT_SERVING_SIGNATURE_DEF_KEY
     TFRECORD = "serving_tfrecord"
+    TFRECORD_BATCH = "serving_tfrecord_batch"
+    TFRECORD_RAGGED = "serving_tfrecord_ragged"
 
 
 class EncodingTypeKey(Key):
@@ -126,6 +128,14 @@ class FileHandlerKey(Key):
     SPARK = "spark"
 
 
+class PredictionsFormatKey(Key):
+    """File formats to write the model predictions to"""
+
+    CSV = "csv"
+    CSV_GZIP = "csv.gz"
+    PARQUET = "parquet"
+
+
 class CalibrationKey(Key):
     CALIBRATION = "calibration"
     TEMPERATURE_SCALING = "temperature_scaling"
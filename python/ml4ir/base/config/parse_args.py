@@ -1,7 +1,8 @@
 import ast
 from argparse import ArgumentParser, Namespace, Action
 from typing import List
-from ml4ir.base.config.keys import OptimizerKey, DataFormatKey, TFRecordTypeKey, ExecutionModeKey, ServingSignatureKey, FileHandlerKey
+from ml4ir.base.config.keys import OptimizerKey, DataFormatKey, TFRecordTypeKey, ExecutionModeKey, ServingSignatureKey, FileHandlerKey, \
+    PredictionsFormatKey
 from ml4ir.applications.ranking.config.keys import LossKey as RankingLoss, MetricKey as RankingMetricKey
 from ml4ir.applications.classification.config.keys import LossKey as ClassificationLoss, MetricKey as ClassificationMetricKey
 
@@ -308,6 +309,31 @@ class RelevanceArgParser(ArgumentParser):
             help="Minimum number of queries per group to be used to computed groupwise metrics.",
         )
 
+        self.add_argument(
+            "--fuse_inference_evaluate",
+            type=ast.literal_eval,
+            default=False,
+            help="Whether to compute the predictions and the evaluation metrics with a single pass over "
+                 "the test data in execution modes that run both inference and evaluation.",
+        )
+
+        self.add_argument(
+            "--predictions_format",
+            type=str,
+            choices=PredictionsFormatKey.get_all_keys(),
+            default=PredictionsFormatKey.CSV,
+            help="File format to write the model predictions to the logs directory in. "
+                 "Writing to parquet requires pyarrow, installed with `pip install ml4ir[parquet]`.",
+        )
+
+        self.add_argument(
+            "--predictions_writer_queue_size",
+            type=int,
+            default=0,
+            help="Maximum number of batches of predictions waiting to be written to the logs directory "
+                 "by a background thread. The predictions are written synchronously if 0.",
+        )
+
         self.add_argument(
             "--compile_keras_model",
             type=ast.literal_eval,
@@ -333,6 +359,14 @@ class RelevanceArgParser(ArgumentParser):
                  "Used to define the TFRecord serving signature in the SavedModel",
         )
 
+        self.add_argument(
+            "--batch_serving_signatures",
+            type=ast.literal_eval,
+            default=False,
+            help="Whether to additionally save the serving signatures parsing a batch of TFRecord protos at once "
+                 "and scoring many SequenceExample queries with ragged outputs in the SavedModel.",
+        )
+
         self.add_argument(
             "--output_name",
             type=str,
@@ -387,6 +421,110 @@ class RelevanceArgParser(ArgumentParser):
                  "(All info after the '#' in the format [key = val]).",
         )
 
+        self.add_argument(
+            "--csv_chunk_size",
+            type=int,
+            default=0,
+            help="[CSV format only] Number of CSV rows to be converted to protobufs at a time. "
+                 "Bounds the memory used for loading the CSV data. Each CSV file is loaded entirely when 0. "
+                 "All records of a query must be contiguous within a CSV file when set.",
+        )
+
+        self.add_argument(
+            "--csv_from_generator",
+            type=ast.literal_eval,
+            default=False,
+            help="[CSV format only] Stream the protobufs converted from the CSV files into the dataset "
+                 "instead of writing intermediate TFRecord files.",
+        )
+
+        self.add_argument(
+            "--ranklib_num_workers",
+            type=int,
+            default=1,
+            help="[Ranklib format only] Number of processes used to convert the ranklib files in parallel. "
+                 "Each file is converted into its own TFRecord file.",
+        )
+
+        self.add_argument(
+            "--tfrecord_cache_dir",
+            type=str,
+            default=None,
+            help="[CSV and Ranklib formats only] Directory to cache the TFRecord files converted from the input data. "
+                 "Data splits with unchanged input files and feature config reuse the cached TFRecord files.",
+        )
+
+        self.add_argument(
+            "--tfrecord_cache_max_size_mb",
+            type=int,
+            default=0,
+            help="Maximum size of the TFRecord cache in MB. "
+                 "Least recently used conversions are evicted when exceeded. Unbounded if 0.",
+        )
+
+        self.add_argument(
+            "--tfrecord_cache_hash_contents",
+            type=ast.literal_eval,
+            default=False,
+            help="Identify cached input files by a hash of their contents instead of their size and modification time. "
+                 "Use when the input files are copied to a new location on every run.",
+        )
+
+        self.add_argument(
+            "--num_parallel_reads",
+            type=int,
+            default=0,
+            help="[TFRecord format only] Number of files to read in parallel by interleaving the records "
+                 "of multiple files. Use -1 to autotune. Files are read sequentially if 0.",
+        )
+
+        self.add_argument(
+            "--interleave_cycle_length",
+            type=int,
+            default=0,
+            help="[TFRecord format only] Number of files interleaved at a time. Autotuned if 0.",
+        )
+
+        self.add_argument(
+            "--deterministic_reads",
+            type=ast.literal_eval,
+            default=True,
+            help="[TFRecord format only] Whether the interleaved records are read in a deterministic order. "
+                 "Set to False to read from the files as soon as the data is available.",
+        )
+
+        self.add_argument(
+            "--num_file_shards",
+            type=int,
+            default=1,
+            help="[TFRecord format only] Number of shards to split the files of each data split into, "
+                 "typically the number of workers reading the data.",
+        )
+
+        self.add_argument(
+            "--file_shard_index",
+            type=int,
+            default=0,
+            help="[TFRecord format only] Index of the shard of files read by this worker.",
+        )
+
+        self.add_argument(
+            "--num_length_buckets",
+            type=int,
+            default=0,
+            help="[TFRecord format only] Number of sequence length buckets to batch the SequenceExample queries by. "
+                 "Bucket boundaries are derived from the query length histogram and each batch is padded to its "
+                 "longest query instead of max_sequence_size. Disabled if 0 or 1.",
+        )
+
+        self.add_argument(
+            "--scale_bucket_batch_sizes",
+            type=ast.literal_eval,
+            default=False,
+            help="[TFRecord format only] Scale the batch size of each sequence length bucket so that every batch "
+                 "holds batch_size * max_sequence_size padded records.",
+        )
+
         self.add_argument(
             "--kfold",
             type=int,
@@ -409,6 +547,30 @@ class RelevanceArgParser(ArgumentParser):
             help="Metric to use for post Kfold CV analysis.",
         )
 
+        self.add_argument(
+            "--kfold_num_workers",
+            type=int,
+            default=1,
+            help="Number of processes to train and evaluate the folds of the K-fold Cross Validation in parallel. "
+                 "Folds are run sequentially if 1. Requires the local file handler.",
+        )
+
+        self.add_argument(
+            "--kfold_intra_op_threads",
+            type=int,
+            default=0,
+            help="Number of intra-op threads of each K-fold Cross Validation worker process. "
+                 "Defaults to the number of CPUs divided by kfold_num_workers if 0.",
+        )
+
+        self.add_argument(
+            "--kfold_inter_op_threads",
+            type=int,
+            default=0,
+            help="Number of inter-op threads of each K-fold Cross Validation worker process. "
+                 "Defaults to the number of intra-op threads if 0.",
+        )
+
     def set_default_args(self):
         pass
 
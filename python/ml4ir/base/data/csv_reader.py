@@ -3,12 +3,14 @@ import tensorflow as tf
 
 from ml4ir.base.features.feature_config import FeatureConfig
 from ml4ir.base.data import tfrecord_reader, tfrecord_writer
+from ml4ir.base.data.tfrecord_cache import TFRecordCache
 from ml4ir.base.io.file_io import FileIO
 
 from typing import List
 
 # Constants
 TFRECORD_FILE = "file_0.tfrecord"
+DEFAULT_CHUNK_SIZE = 100000
 
 
 def read(
@@ -23,6 +25,9 @@ def read(
     use_part_files: bool = False,
     max_sequence_size: int = 25,
     parse_tfrecord: bool = True,
+    chunk_size: int = 0,
+    from_generator: bool = False,
+    tfrecord_cache: TFRecordCache = None,
     logger=None,
     **kwargs
 ) -> tf.data.TFRecordDataset:
@@ -35,6 +40,10 @@ def read(
         3. Write the protobufs into a .tfrecord file
         4. Load .tfrecord file into a TFRecordDataset and parse the protobufs
 
+    With `chunk_size`, the CSV files are streamed in chunks of rows so that only a chunk
+    is held in memory at a time. With `from_generator`, the protobufs are fed directly
+    into the input pipeline through `tf.data.Dataset.from_generator` and no .tfrecord file is written.
+
     Parameters
     ----------
     data_dir : str
@@ -43,7 +52,8 @@ def read(
         FeatureConfig object that defines the features to be loaded in the dataset
         and the preprocessing functions to be applied to each of them
     tfrecord_dir : str
-        Path to directory where the serialized .tfrecord files will be stored
+        Path to directory where the serialized .tfrecord files will be stored.
+        Not used if the .tfrecord files are read from `tfrecord_cache`
     data_compression: str
         Type of data compression used for the input data files.
         NOTE - Not implemented for CSV reader.
@@ -53,6 +63,16 @@ def read(
         load dataset from part files checked using "part-" prefix
     max_sequence_size : int
         value specifying max number of records per query
+    chunk_size : int, optional
+        If greater than 0, number of CSV rows to read and convert to protobufs at a time.
+        All the records of a query must be contiguous within a CSV file
+    from_generator : bool, optional
+        Stream the protobufs from the CSV files on each iteration of the dataset
+        instead of writing them to a .tfrecord file.
+        Uses `DEFAULT_CHUNK_SIZE` if `chunk_size` is not specified
+    tfrecord_cache : `TFRecordCache`, optional
+        cache of previously converted TFRecord files to be reused when the
+        CSV files and the FeatureConfig are unchanged
     logger : Logger object
         logging handler to print and save status messages
 
@@ -67,18 +87,53 @@ def read(
         prefix="part-" if use_part_files else "",
     )
 
-    # Create a directory for storing tfrecord files
-    file_io.make_directory(tfrecord_dir, clear_dir=True)
+    if from_generator:
+        chunk_size = chunk_size if chunk_size > 0 else DEFAULT_CHUNK_SIZE
+        return tfrecord_reader.read_from_protos(
+            proto_generator_fn=lambda: tfrecord_writer.get_protos_from_files(
+                csv_files=csv_files,
+                feature_config=feature_config,
+                tfrecord_type=tfrecord_type,
+                file_io=file_io,
+                chunk_size=chunk_size,
+            ),
+            feature_config=feature_config,
+            tfrecord_type=tfrecord_type,
+            max_sequence_size=max_sequence_size,
+            batch_size=batch_size,
+            preprocessing_keys_to_fns=preprocessing_keys_to_fns,
+            parse_tfrecord=parse_tfrecord,
+            output_name=kwargs.get("output_name"),
+            logger=logger,
+        )
 
-    # Write tfrecord files
-    tfrecord_writer.write_from_files(
-        csv_files=csv_files,
-        tfrecord_file=os.path.join(tfrecord_dir, TFRECORD_FILE),
-        feature_config=feature_config,
-        tfrecord_type=tfrecord_type,
-        file_io=file_io,
-        logger=logger,
-    )
+    def write_tfrecords(output_dir):
+        # Create a directory for storing tfrecord files
+        file_io.make_directory(output_dir, clear_dir=True)
+
+        # Write tfrecord files
+        tfrecord_writer.write_from_files(
+            csv_files=csv_files,
+            tfrecord_file=os.path.join(output_dir, TFRECORD_FILE),
+            feature_config=feature_config,
+            tfrecord_type=tfrecord_type,
+            file_io=file_io,
+            chunk_size=chunk_size,
+            logger=logger,
+        )
+
+    if tfrecord_cache:
+        # The cached TFRecord files are read in place.
+        # Chunked conversion orders the queries differently, so it is part of the cache key
+        tfrecord_dir = tfrecord_cache.convert(
+            input_files=csv_files,
+            feature_config=feature_config,
+            tfrecord_type=tfrecord_type,
+            convert_fn=write_tfrecords,
+            chunked=chunk_size > 0,
+        )
+    else:
+        write_tfrecords(tfrecord_dir)
 
     dataset = tfrecord_reader.read(
         data_dir=tfrecord_dir,
@@ -89,6 +144,7 @@ def read(
         preprocessing_keys_to_fns=preprocessing_keys_to_fns,
         parse_tfrecord=parse_tfrecord,
         file_io=file_io,
+        output_name=kwargs.get("output_name"),
         logger=logger,
     )
 
@@ -1,10 +1,29 @@
-from typing import Optional
+import os
+from typing import List, Optional
+from urllib.parse import urlparse
 from logging import Logger
 import tensorflow as tf
+from tensorflow.core.protobuf import struct_pb2
+from tensorflow.python.saved_model import nested_structure_coder
 
 from ml4ir.base.data.relevance_dataset import RelevanceDataset
+from ml4ir.base.data.tfrecord_cache import TFRecordCache
 from ml4ir.base.features.feature_config import FeatureConfig
 from ml4ir.base.io.file_io import FileIO
+from ml4ir.base.io.local_io import LocalIO
+
+ELEMENT_SPEC_FILE = "element_spec.pb"
+TEST_FILE = "test.tfrecord"
+
+
+def check_local_folds_dir(folds_dir: str):
+    """
+    Check that the folds are materialized to the local file system.
+    The element spec is written with the python file API and the folds directory is
+    managed with LocalIO, independent of the file handler of the dataset
+    """
+    if urlparse(folds_dir).scheme not in ("", "file"):
+        raise ValueError("Folds can only be materialized to a local directory, got: {}".format(folds_dir))
 
 
 class KfoldRelevanceDataset(RelevanceDataset):
@@ -27,6 +46,17 @@ class KfoldRelevanceDataset(RelevanceDataset):
             logger: Optional[Logger] = None,
             keep_additional_info: int = 0,
             non_zero_features_only: int = 0,
+            csv_chunk_size: int = 0,
+            csv_from_generator: bool = False,
+            tfrecord_cache_dir: str = None,
+            tfrecord_cache_max_size_mb: int = 0,
+            tfrecord_cache_hash_contents: bool = False,
+            ranklib_num_workers: int = 1,
+            num_parallel_reads: int = 0,
+            interleave_cycle_length: int = 0,
+            deterministic_reads: bool = True,
+            num_file_shards: int = 1,
+            file_shard_index: int = 0,
             num_folds: int = 3,
             include_testset_in_kfold: bool = False,
             read_data_sets: bool = False,
@@ -56,6 +86,26 @@ class KfoldRelevanceDataset(RelevanceDataset):
 
         self.keep_additional_info = keep_additional_info
         self.non_zero_features_only = non_zero_features_only
+        self.csv_chunk_size = csv_chunk_size
+        self.csv_from_generator = csv_from_generator
+        self.ranklib_num_workers = ranklib_num_workers
+        self.num_parallel_reads = num_parallel_reads
+        self.interleave_cycle_length = interleave_cycle_length
+        self.deterministic_reads = deterministic_reads
+        self.num_file_shards = num_file_shards
+        self.file_shard_index = file_shard_index
+        # Folds are batched to a fixed size after unbatching the queries of all the splits
+        self.num_length_buckets = 0
+        self.scale_bucket_batch_sizes = False
+        self.tfrecord_cache: Optional[TFRecordCache] = None
+        if tfrecord_cache_dir:
+            self.tfrecord_cache = TFRecordCache(
+                cache_dir=tfrecord_cache_dir,
+                file_io=file_io,
+                max_size=tfrecord_cache_max_size_mb * 1024 * 1024,
+                hash_contents=tfrecord_cache_hash_contents,
+                logger=logger,
+            )
 
         self.train: Optional[tf.data.TFRecordDataset] = None
         self.validation: Optional[tf.data.TFRecordDataset] = None
@@ -85,7 +135,190 @@ class KfoldRelevanceDataset(RelevanceDataset):
         # all_data = all_data.shuffle(batch_size * 2)
         return all_data
 
-    def create_folds(self, fold_id, merged_data, relevance_dataset):
+    def get_fold_id(self, index, query):
+        """
+        Assign a query of the merged dataset to a fold in a round robin fashion,
+        like sharding the merged dataset with `num_folds` shards.
+
+        Parameters
+        ----------
+        index: tf.Tensor
+            position of the query in the merged dataset
+        query: tuple of (dict of tensors, tf.Tensor)
+            features and labels of the query
+
+        Returns
+        -------
+        tf.Tensor
+            fold id of the query
+        """
+        return index % self.num_folds
+
+    def materialize_folds(self, merged_data, folds_dir: str, write_batch_size: int = 1024):
+        """
+        Write the queries of each fold to its own TFRecord file in a single pass over the merged dataset,
+        so that creating the datasets of every fold does not read and parse the data again.
+        Each record holds the serialized tensors of a query as returned by the merged dataset.
+        The test set is written to its own file if it is not included in the folds, so that the
+        folds can be created from `folds_dir` alone, e.g. in other processes.
+
+        Parameters
+        ----------
+        merged_data: Tensorflow Dataset
+            the unbatched dataset used to create folds
+        folds_dir: str
+            local path to the directory to write the TFRecord file of each fold to.
+            The folds are always written to the local file system, whatever the file handler
+            of the dataset, e.g. to the local models directory of the run
+        write_batch_size: int, optional
+            number of serialized queries fetched from the dataset at a time
+
+        Raises
+        ------
+        ValueError
+            if any fold is empty, i.e. when there are fewer queries than folds
+        """
+        check_local_folds_dir(folds_dir)
+        LocalIO(self.logger).make_directory(folds_dir, clear_dir=True)
+        with open(os.path.join(folds_dir, ELEMENT_SPEC_FILE), "wb") as f:
+            f.write(nested_structure_coder.encode_structure(merged_data.element_spec).SerializeToString())
+
+        fold_sizes = self.write_queries(merged_data,
+                                        [self.get_fold_file(folds_dir, f_id) for f_id in range(self.num_folds)],
+                                        self.get_fold_id,
+                                        write_batch_size)
+        self.check_fold_sizes(fold_sizes)
+        if not self.include_testset_in_kfold:
+            self.write_queries(self.test.unbatch(),
+                               [os.path.join(folds_dir, TEST_FILE)],
+                               lambda index, query: tf.constant(0, tf.int64),
+                               write_batch_size)
+
+        if self.logger:
+            self.logger.info("Materialized {} folds to {}".format(self.num_folds, folds_dir))
+
+    @staticmethod
+    def write_queries(dataset, tfrecord_files: List[str], get_file_id, write_batch_size: int = 1024):
+        """
+        Serialize the tensors of each query of the dataset and write them to TFRecord files
+
+        Parameters
+        ----------
+        dataset: Tensorflow Dataset
+            unbatched dataset of queries
+        tfrecord_files: list of str
+            paths of the TFRecord files to write to
+        get_file_id: function
+            function mapping the position of a query in the dataset and the query to the index
+            of the TFRecord file to write it to
+        write_batch_size: int, optional
+            number of serialized queries fetched from the dataset at a time
+
+        Returns
+        -------
+        list of int
+            number of queries written to each TFRecord file
+        """
+        def serialize_query(index, query):
+            return get_file_id(index, query), tf.io.serialize_tensor(tf.stack(
+                [tf.io.serialize_tensor(tensor) for tensor in tf.nest.flatten(query)]))
+
+        serialized_data = dataset.enumerate().map(
+            serialize_query, num_parallel_calls=tf.data.experimental.AUTOTUNE
+        ).batch(write_batch_size).prefetch(tf.data.experimental.AUTOTUNE)
+
+        num_queries = [0] * len(tfrecord_files)
+        writers = [tf.io.TFRecordWriter(tfrecord_file) for tfrecord_file in tfrecord_files]
+        try:
+            for file_ids, queries in serialized_data.as_numpy_iterator():
+                for file_id, query in zip(file_ids, queries):
+                    writers[file_id].write(query)
+                    num_queries[file_id] += 1
+        finally:
+            for writer in writers:
+                writer.close()
+
+        return num_queries
+
+    def check_fold_sizes(self, fold_sizes: List[int]):
+        """
+        Check that every fold holds at least one query
+
+        Parameters
+        ----------
+        fold_sizes: list of int
+            number of queries in each fold
+
+        Raises
+        ------
+        ValueError
+            if any fold is empty
+        """
+        if min(fold_sizes) == 0:
+            raise ValueError("Found empty folds when splitting the queries into {} folds : {}. "
+                             "Use fewer folds than queries".format(self.num_folds, fold_sizes))
+
+        if self.logger:
+            self.logger.info("Number of queries in each fold : {}".format(fold_sizes))
+
+    @staticmethod
+    def get_fold_file(folds_dir: str, fold_id: int):
+        """Path to the TFRecord file of a materialized fold"""
+        return os.path.join(folds_dir, "fold_{}.tfrecord".format(fold_id))
+
+    @staticmethod
+    def read_queries(folds_dir: str, tfrecord_files: List[str]):
+        """
+        Read the queries written by `materialize_folds`
+
+        Parameters
+        ----------
+        folds_dir: str
+            local path to the directory the folds were materialized to
+        tfrecord_files: list of str
+            paths of the TFRecord files to read, in order
+
+        Returns
+        -------
+        Tensorflow Dataset
+            unbatched dataset of the queries, with the element spec of the merged dataset
+        """
+        check_local_folds_dir(folds_dir)
+        with open(os.path.join(folds_dir, ELEMENT_SPEC_FILE), "rb") as f:
+            element_spec = nested_structure_coder.decode_proto(struct_pb2.StructuredValue.FromString(f.read()))
+        flat_specs = tf.nest.flatten(element_spec)
+
+        def parse_query(serialized_query):
+            serialized_tensors = tf.io.parse_tensor(serialized_query, tf.string)
+            tensors = []
+            for i, spec in enumerate(flat_specs):
+                tensor = tf.io.parse_tensor(serialized_tensors[i], spec.dtype)
+                tensor.set_shape(spec.shape)
+                tensors.append(tensor)
+            return tf.nest.pack_sequence_as(element_spec, tensors)
+
+        return tf.data.TFRecordDataset(tfrecord_files).map(
+            parse_query, num_parallel_calls=tf.data.experimental.AUTOTUNE)
+
+    def read_folds(self, folds_dir: str, fold_ids: List[int]):
+        """
+        Read the queries of the folds written by `materialize_folds`
+
+        Parameters
+        ----------
+        folds_dir: str
+            path to the directory with the TFRecord file of each fold
+        fold_ids: list of int
+            folds to read, in order
+
+        Returns
+        -------
+        Tensorflow Dataset
+            unbatched dataset of the queries of the folds
+        """
+        return self.read_queries(folds_dir, [self.get_fold_file(folds_dir, f_id) for f_id in fold_ids])
+
+    def create_folds(self, fold_id, merged_data, relevance_dataset, folds_dir: str = None):
         """
         Create training, validation and test set according to the passed fold id.
 
@@ -97,25 +330,36 @@ class KfoldRelevanceDataset(RelevanceDataset):
             the dataset used to create folds
         relevance_dataset: RelevanceDataset object
             Used to access the test set to setup folds
+        folds_dir: str, optional
+            path to the folds written by `materialize_folds`. The folds and the test set are read
+            from these files, in which case `merged_data` and `relevance_dataset` are not used
         """
+        if folds_dir:
+            def get_fold(f_ids):
+                return self.read_folds(folds_dir, f_ids)
+        else:
+            def get_fold(f_ids):
+                fold = None
+                for f_id in f_ids:
+                    if not fold:
+                        fold = merged_data.shard(self.num_folds, f_id)
+                    else:
+                        fold = fold.concatenate(merged_data.shard(self.num_folds, f_id))
+                return fold
+
         test = None
         training_idx = list(range(self.num_folds))
         if self.include_testset_in_kfold:
-            validation = merged_data.shard(self.num_folds, fold_id)
+            validation = get_fold([fold_id])
             test_idx = fold_id + 1
             if fold_id + 1 >= self.num_folds:
                 test_idx = 0
-            test = merged_data.shard(self.num_folds, test_idx)
+            test = get_fold([test_idx])
             training_idx.remove(test_idx)
         else:
-            validation = merged_data.shard(self.num_folds, fold_id)
+            validation = get_fold([fold_id])
         training_idx.remove(fold_id)
-        train = None
-        for f_id in training_idx:
-            if not train:
-                train = merged_data.shard(self.num_folds, f_id)
-            else:
-                train = train.concatenate(merged_data.shard(self.num_folds, f_id))
+        train = get_fold(training_idx)
 
         # batchify training, validation and test sets.
         validation = validation.batch(self.batch_size, drop_remainder=False)
@@ -126,5 +370,8 @@ class KfoldRelevanceDataset(RelevanceDataset):
         if self.include_testset_in_kfold:
             test = test.batch(self.batch_size, drop_remainder=False)
             self.test = test.prefetch(tf.data.experimental.AUTOTUNE)
+        elif folds_dir:
+            test = self.read_queries(folds_dir, [os.path.join(folds_dir, TEST_FILE)])
+            self.test = test.batch(self.batch_size, drop_remainder=False).prefetch(tf.data.experimental.AUTOTUNE)
         else:
             self.test = relevance_dataset.test
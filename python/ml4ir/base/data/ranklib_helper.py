@@ -1,9 +1,16 @@
 import ast
 import argparse
+import warnings
+import multiprocessing
 import pandas as pd
 import numpy as np
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
 
 max_f_id = 0
+# Largest feature ID mapped with a lookup table when parsing
+MAX_LOOKUP_FEATURE_ID = 1 << 20
+
 def process_line(line, keep_additional_info, query_id_name, relevance_name):
     """Takes an input line in ranklib format and returns a row in ml4ir format.
 
@@ -51,9 +58,245 @@ def process_line(line, keep_additional_info, query_id_name, relevance_name):
     return r
 
 
+def _parse_additional_info(comments):
+    """
+    Parse the additional info (All info after the "#") of each line in the format [key = val]
+
+    Parameters
+    ----------
+    comments : list of str
+        additional info of each ranklib line
+
+    Returns
+    -------
+    dict of (str, list)
+        additional info values for each key. Values are NaN for lines missing the key
+    """
+    additional_info = dict()
+    for row, comment in enumerate(comments):
+        for key_value in comment.replace(" = ", ":").split():
+            key, _, value = key_value.partition(":")
+            if key not in additional_info:
+                additional_info[key] = [np.nan] * len(comments)
+            additional_info[key][row] = value
+
+    return additional_info
+
+
+def _to_numeric(values):
+    """Convert a numpy array of strings to floats, keeping the strings if any value is not numeric"""
+    try:
+        return values.astype(np.float64)
+    except (ValueError, TypeError):
+        return values.astype(object)
+
+
+def _split_numeric_bodies(bodies, query_id_name):
+    """
+    Split the ranklib lines into flat arrays with a single numpy pass over the text.
+    Fast path for the common case where all the feature IDs and values are numeric
+
+    Parameters
+    ----------
+    bodies : list of str
+        ranklib lines without the additional info
+    query_id_name : str
+        The name of the query id column.
+
+    Returns
+    -------
+    tuple or None
+        query ids, relevance, row id, feature key, feature code and feature value arrays
+        as returned by `_split_bodies`. None if any feature ID or value is not numeric
+    """
+    # Relevance is the first value of each line and is given the feature ID -1.
+    # The query id is the second value of each line
+    query_id_prefix = query_id_name + ":"
+    query_ids = list()
+    feature_texts = list()
+    for body in bodies:
+        tokens = body.split(None, 2)
+        if len(tokens) < 2 or not tokens[1].startswith(query_id_prefix):
+            return None
+        query_ids.append(tokens[1][len(query_id_prefix):])
+        feature_texts.append("-1:" + tokens[0])
+        if len(tokens) == 3:
+            feature_texts.append(tokens[2])
+    text = " ".join(feature_texts)
+
+    num_tokens = 2 * text.count(":")
+    with warnings.catch_warnings():
+        # numpy warns when the text could not be parsed to its end
+        warnings.simplefilter("ignore", DeprecationWarning)
+        tokens = np.fromstring(text.replace(":", " "), sep=" ")
+    if tokens.size != num_tokens:
+        return None
+
+    ids, values = tokens[0::2], tokens[1::2]
+    if not (ids == np.round(ids)).all():
+        return None
+    ids = ids.astype(np.int64)
+
+    is_relevance = ids == -1
+    row_ids = np.cumsum(is_relevance) - 1
+    is_feature = ~is_relevance
+    ids = ids[is_feature]
+    if ids.size and ids.min() < 0:
+        return None
+
+    if ids.size and ids.max() < MAX_LOOKUP_FEATURE_ID:
+        # Feature IDs are usually small integers, so map them to codes with a lookup table instead of sorting
+        feature_ids = np.flatnonzero(np.bincount(ids))
+        id_to_code = np.zeros(feature_ids[-1] + 1, dtype=np.int64)
+        id_to_code[feature_ids] = np.arange(feature_ids.size)
+        feature_codes = id_to_code[ids]
+    else:
+        feature_ids, feature_codes = np.unique(ids, return_inverse=True)
+
+    return (query_ids, values[is_relevance], row_ids[is_feature],
+            [str(feature_id) for feature_id in feature_ids], feature_codes, values[is_feature])
+
+
+def _split_bodies(bodies, query_id_name, relevance_name):
+    """
+    Split the ranklib lines into flat arrays of keys and values for all the lines at once
+
+    Parameters
+    ----------
+    bodies : list of str
+        ranklib lines without the additional info
+    query_id_name : str
+        The name of the query id column.
+    relevance_name : str
+        The name of the relevance column (the target label).
+
+    Returns
+    -------
+    query_ids : list of str
+        query id of each line
+    relevance : numpy array
+        relevance of each line
+    row_ids : numpy array
+        line index of each feature value
+    feature_keys : list of str
+        unique feature IDs
+    feature_codes : numpy array
+        index into `feature_keys` of each feature value
+    feature_values : numpy array
+        feature values
+
+    Raises
+    ------
+    ValueError
+        if any relevance or feature value is not numeric
+    """
+    # Prefix the relevance key so that every token is a key:value pair
+    prefix = relevance_name + ":"
+    tokens = (prefix + (" " + prefix).join(bodies)).replace(":", " ").split()
+    codes, keys = pd.factorize(tokens[0::2])
+    values = tokens[1::2]
+    keys = keys.tolist()
+
+    # Each line starts with the relevance
+    relevance_code = keys.index(relevance_name)
+    row_ids = np.cumsum(codes == relevance_code) - 1
+    query_id_code = keys.index(query_id_name) if query_id_name in keys else -1
+    query_ids = [values[i] for i in np.flatnonzero(codes == query_id_code)]
+    numeric_values = pd.to_numeric(pd.Series(values), errors="coerce").values.astype(np.float64)
+
+    is_feature = (codes != relevance_code) & (codes != query_id_code)
+    is_coerced = np.isnan(numeric_values) & (codes != query_id_code) & \
+        (pd.Series(values).str.lower() != "nan").values
+    if is_coerced.any():
+        first_coerced = np.flatnonzero(is_coerced)[0]
+        raise ValueError("Found {} non numeric relevance or feature values, e.g. {}:{}".format(
+            is_coerced.sum(), keys[codes[first_coerced]], values[first_coerced]))
+    feature_keys = [key for code, key in enumerate(keys) if code not in (relevance_code, query_id_code)]
+    code_to_feature = np.full(len(keys), -1)
+    code_to_feature[[keys.index(key) for key in feature_keys]] = np.arange(len(feature_keys))
+
+    return (query_ids, numeric_values[codes == relevance_code], row_ids[is_feature],
+            feature_keys, code_to_feature[codes[is_feature]], numeric_values[is_feature])
+
+
+def parse_lines(lines, keep_additional_info, query_id_name, relevance_name, feature_names=None):
+    """
+    Parse a block of ranklib lines into a dataframe in ml4ir format.
+    Vectorized equivalent of `process_line` over all the lines, that splits the whole block
+    into key and value arrays at once and scatters the feature values into a dense matrix.
+    Like `process_line`, updates the module level `max_f_id` with the largest feature ID.
+    Unlike `process_line`, feature values that are not numeric raise a ValueError
+
+    Parameters
+    ----------
+    lines : list of str
+        lines from ranklib format data
+    keep_additional_info : bool
+        Option to keep additional info (All info after the "#") True to keep, False to ignore.
+    query_id_name : str
+        The name of the query id column.
+    relevance_name : str
+        The name of the relevance column (the target label).
+    feature_names : list of str, optional
+        Names of the feature columns to be kept. All features are kept if None
+
+    Returns
+    -------
+    Dataframe
+        dataframe with the query id, relevance and feature columns.
+        Features missing from a line are set to NaN
+
+    Raises
+    ------
+    ValueError
+        if any relevance or feature value is not numeric
+    """
+    records = [record for record in map(lambda line: line.partition("#"), lines) if record[0].strip()]
+    if not records:
+        return pd.DataFrame(columns=[query_id_name, relevance_name])
+    bodies = [body for body, _, _ in records]
+
+    split_bodies = _split_numeric_bodies(bodies, query_id_name)
+    if split_bodies is None:
+        split_bodies = _split_bodies(bodies, query_id_name, relevance_name)
+    query_ids, relevance, row_ids, feature_keys, feature_codes, feature_values = split_bodies
+    additional_info = _parse_additional_info([comment for _, _, comment in records]) if keep_additional_info else {}
+
+    global max_f_id
+    max_f_id = max([max_f_id] + [int(key) for key in feature_keys + list(additional_info) if key.isdigit()])
+
+    columns = dict()
+    if query_ids:
+        columns[query_id_name] = np.array(["Q" + query_id for query_id in query_ids], dtype=object)
+    columns[relevance_name] = relevance
+
+    # Sort the features by their ID and scatter the values into a dense matrix
+    feature_order = sorted(range(len(feature_keys)), key=lambda i: (
+        not feature_keys[i].isdigit(), int(feature_keys[i]) if feature_keys[i].isdigit() else 0, feature_keys[i]))
+    if feature_names is not None:
+        feature_names = set(feature_names)
+        feature_order = [i for i in feature_order if "f_" + feature_keys[i] in feature_names]
+
+    if feature_order:
+        feature_columns = np.full(len(feature_keys), -1)
+        feature_columns[feature_order] = np.arange(len(feature_order))
+        feature_columns = feature_columns[feature_codes]
+        is_kept = feature_columns >= 0
+        dense = np.full((len(records), len(feature_order)), np.nan)
+        dense[row_ids[is_kept], feature_columns[is_kept]] = feature_values[is_kept]
+        for column, i in enumerate(feature_order):
+            columns["f_" + feature_keys[i]] = dense[:, column]
+
+    for key, info_values in additional_info.items():
+        if feature_names is None or "f_" + key in feature_names:
+            columns["f_" + key] = _to_numeric(np.array(info_values, dtype=object))
+
+    return pd.DataFrame(columns)
+
+
 def convert(input_file, keep_additional_info, gl_2_clicks,
             non_zero_features_only, query_id_name, relevance_name,
-            add_dummy_rank_column = True):
+            add_dummy_rank_column = True, feature_names = None, chunk_size = 1000000):
     """Convert the input file with the specified parameters into ml4ir format. returns a dataframe
 
             Parameters
@@ -70,6 +313,11 @@ def convert(input_file, keep_additional_info, gl_2_clicks,
                 The name of the relevance column (the target label).
             add_dummy_rank_column : bool
                 ml4ir expects pre-rankings. This would add a dummy pre-rankings.
+            feature_names : list of str
+                Names of the feature columns to be kept, like the features in the FeatureConfig.
+                All features are kept if None
+            chunk_size : int
+                Number of lines parsed at a time
 
 
             Returns
@@ -78,22 +326,23 @@ def convert(input_file, keep_additional_info, gl_2_clicks,
                 converted ml4ir dataframe
         """
 
-    f = open(input_file, 'r')
-    rows = []
-    for line in f:
-        rows.append(process_line(line, keep_additional_info, query_id_name, relevance_name))
-    f.close()
+    dfs = []
+    with open(input_file, 'r') as f:
+        for lines in iter(lambda: list(islice(f, chunk_size)), []):
+            dfs.append(parse_lines(lines, keep_additional_info, query_id_name, relevance_name, feature_names))
+    df = pd.concat(dfs, ignore_index=True)
+
     if non_zero_features_only:
-        columns = [query_id_name, relevance_name] + ['f_' + str(i) for i in range(max_f_id)]
-        df = pd.DataFrame(rows, columns=columns)
+        # Features missing from a line have a value of 0
+        feature_columns = ['f_' + str(i) for i in range(max_f_id)]
+        if feature_names is not None:
+            feature_names = set(feature_names)
+            feature_columns = [c for c in feature_columns if c in feature_names]
+        df = df.reindex(columns=[query_id_name, relevance_name] + feature_columns)
         df.replace(np.nan, 0, inplace=True)
-    else:
-        df = pd.DataFrame(rows)
     if int(gl_2_clicks) == 1:
-        groups = df.groupby(query_id_name)
-        for gname, group in groups:
-            df.loc[df[query_id_name] == gname, relevance_name] = (
-                    df.loc[df[query_id_name] == gname].relevance == max(group.relevance)).astype(int)
+        df[relevance_name] = (
+                df[relevance_name] == df.groupby(query_id_name)[relevance_name].transform('max')).astype(int)
 
     # NOTE: ml4ir expects a pre-ranking. Adding a dummy pre-ranking to match format.
     if add_dummy_rank_column:
@@ -124,7 +373,7 @@ def ranklib_to_csv(input_file, output_file, keep_additional_info, gl_2_clicks, n
     df = convert(input_file, keep_additional_info, gl_2_clicks, non_zero_features_only, query_id_name, relevance_name, add_dummy_rank_column)
     df.to_csv(output_file)
 
-def ranklib_directory_to_csvs(input_dir, keep_additional_info, gl_2_clicks, non_zero_features_only, query_id_name, relevance_name, add_dummy_rank_column = False):
+def ranklib_directory_to_csvs(input_dir, keep_additional_info, gl_2_clicks, non_zero_features_only, query_id_name, relevance_name, add_dummy_rank_column = False, num_workers = 1):
     """Convert all files in the given directory with the specified parameters into ml4ir format writes the converted file to a csv
             Parameters
             ----------
@@ -140,12 +389,22 @@ def ranklib_directory_to_csvs(input_dir, keep_additional_info, gl_2_clicks, non_
                 The name of the relevance column (the target label).
             add_dummy_rank_column : bool
                 ml4ir expects pre-rankings. This would add a dummy pre-rankings.
+            num_workers : int
+                Number of processes used to convert the files in parallel.
     """
     from os import listdir
     from os.path import isfile, join
     onlyfiles = [f for f in listdir(input_dir) if isfile(join(input_dir, f))]
-    for f in onlyfiles[1:]:
-        ranklib_to_csv(join(input_dir, f), join(input_dir, f)+'_ml4ir.csv', keep_additional_info, gl_2_clicks, non_zero_features_only, query_id_name, relevance_name, add_dummy_rank_column)
+    convert_args = [(join(input_dir, f), join(input_dir, f)+'_ml4ir.csv', keep_additional_info, gl_2_clicks, non_zero_features_only, query_id_name, relevance_name, add_dummy_rank_column)
+                    for f in onlyfiles[1:]]
+    if num_workers > 1:
+        # Using spawn as tensorflow is not fork safe
+        with ProcessPoolExecutor(max_workers=num_workers,
+                                 mp_context=multiprocessing.get_context("spawn")) as executor:
+            list(executor.map(ranklib_to_csv, *zip(*convert_args)))
+    else:
+        for args in convert_args:
+            ranklib_to_csv(*args)
 
 
 
@@ -1,14 +1,103 @@
 import os
-import pandas as pd
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from logging import Logger
 import tensorflow as tf
 
 from ml4ir.base.io.file_io import FileIO
 from ml4ir.base.features.feature_config import FeatureConfig
 from ml4ir.base.data import tfrecord_reader, tfrecord_writer, ranklib_helper
+from ml4ir.base.data.tfrecord_cache import TFRecordCache
 
 from typing import List
 
-TFRECORD_FILE = "file_0.tfrecord"
+TFRECORD_FILE = "file_{}.tfrecord"
+
+
+def _convert_file(
+    ranklib_file: str,
+    tfrecord_file: str,
+    feature_config: FeatureConfig,
+    tfrecord_type: str,
+    keep_additional_info: bool,
+    gl_2_clicks: bool,
+    non_zero_features_only: bool,
+):
+    """Convert a single ranklib file into a tfrecord file. Executed in the worker processes"""
+    df = ranklib_helper.convert(ranklib_file, keep_additional_info, gl_2_clicks, non_zero_features_only,
+                                feature_config.get_query_key()['name'], feature_config.get_label()['name'],
+                                feature_names=feature_config.get_all_features(key='name'))
+
+    return tfrecord_writer.write_from_df(df=df,
+                                         tfrecord_file=tfrecord_file,
+                                         feature_config=feature_config,
+                                         tfrecord_type=tfrecord_type)
+
+
+def convert_files(
+    ranklib_files: List[str],
+    tfrecord_dir: str,
+    feature_config: FeatureConfig,
+    tfrecord_type: str,
+    keep_additional_info: bool = False,
+    gl_2_clicks: bool = False,
+    non_zero_features_only: bool = True,
+    num_workers: int = 1,
+    logger: Logger = None,
+):
+    """
+    Convert each ranklib file independently into its own tfrecord file.
+    Memory is bounded by the largest ranklib file and the files are converted in parallel with a process pool
+
+    Parameters
+    ----------
+    ranklib_files: list of str
+        Paths of the ranklib files to convert
+    tfrecord_dir: str
+        Path to directory where the serialized .tfrecord files will be stored
+    feature_config: ml4ir.config.features.FeatureConfig object
+        FeatureConfig object extracted from the feature config
+    tfrecord_type: {"example", "sequence_example"}
+        Type of the TFRecord protobuf message to be created
+    keep_additional_info: int
+        Option to keep additional info (All info after the "#") 1 to keep, 0 to ignore
+    gl_2_clicks: bool
+        Convert graded relevance to clicks
+    non_zero_features_only: int
+        Only non zero features are stored. 1 for yes, 0 otherwise
+    num_workers: int
+        Number of processes used to convert the files.
+        If 1, the files are converted sequentially in the current process
+    logger: logging object
+        logging object
+
+    Returns
+    -------
+    list of str
+        Paths of the tfrecord files written
+    """
+    tfrecord_files = [os.path.join(tfrecord_dir, TFRECORD_FILE.format(i)) for i in range(len(ranklib_files))]
+    convert_args = [(ranklib_file, tfrecord_file, feature_config, tfrecord_type,
+                     keep_additional_info, gl_2_clicks, non_zero_features_only)
+                    for ranklib_file, tfrecord_file in zip(ranklib_files, tfrecord_files)]
+
+    if logger:
+        logger.info("Converting {} ranklib files to {} protobufs with {} workers".format(
+            len(ranklib_files), tfrecord_type, num_workers))
+
+    if num_workers > 1 and len(ranklib_files) > 1:
+        # Using spawn as tensorflow is not fork safe
+        with ProcessPoolExecutor(max_workers=min(num_workers, len(ranklib_files)),
+                                 mp_context=multiprocessing.get_context("spawn")) as executor:
+            proto_counts = list(executor.map(_convert_file, *zip(*convert_args)))
+    else:
+        proto_counts = [_convert_file(*args) for args in convert_args]
+
+    if logger:
+        logger.info("Finished writing {} protobufs".format(sum(proto_counts)))
+
+    return tfrecord_files
+
 
 def read(
     data_dir: str,
@@ -25,6 +114,8 @@ def read(
     logger=None,
     keep_additional_info: bool = False,
     non_zero_features_only: bool = True,
+    tfrecord_cache: TFRecordCache = None,
+    num_workers: int = 1,
     **kwargs
 ) -> tf.data.TFRecordDataset:
     """
@@ -33,10 +124,12 @@ def read(
     - creates Dataset X and y
 
     Current execution plan:
-        1. Convert ranklib to a dataframe
+        1. Convert each ranklib file to a dataframe
         2. Convert each query into tf.train.SequenceExample protobufs
-        3. Write the protobufs into a .tfrecord file
-        4. Load .tfrecord file into a TFRecordDataset and parse the protobufs
+        3. Write the protobufs of each ranklib file into its own .tfrecord file
+        4. Load .tfrecord files into a TFRecordDataset and parse the protobufs
+
+    The records of a query should not be split across ranklib files
 
     Parameters
     ----------
@@ -45,7 +138,8 @@ def read(
     feature_config: ml4ir.config.features.FeatureConfig object
         FeatureConfig object extracted from the feature config
     tfrecord_dir: str
-        Path to directory where the serialized .tfrecord files will be stored
+        Path to directory where the serialized .tfrecord files will be stored.
+        Not used if the .tfrecord files are read from `tfrecord_cache`
     data_compression: str
         Type of data compression used for the input data files.
         Note - Not implemented for ranklib_reader.
@@ -61,6 +155,11 @@ def read(
         Option to keep additional info (All info after the "#") 1 to keep, 0 to ignore
     non_zero_features_only: int
         Only non zero features are stored. 1 for yes, 0 otherwise
+    tfrecord_cache: `TFRecordCache`, optional
+        cache of previously converted TFRecord files to be reused when the
+        ranklib files and the FeatureConfig are unchanged
+    num_workers: int
+        Number of processes used to convert the ranklib files in parallel
 
     Returns
     -------
@@ -75,24 +174,35 @@ def read(
 
     gl_2_clicks = False
 
-    # Create a directory for storing tfrecord files
-    file_io.make_directory(tfrecord_dir, clear_dir=True)
-
-    #Convert input ranklib file to dataframe
-    df = pd.concat(
-        [
-            ranklib_helper.convert(f, keep_additional_info, gl_2_clicks, non_zero_features_only,
-                                   feature_config.get_query_key()['name'], feature_config.get_label()['name'])
-            for f in ranklib_files
-        ])
+    def write_tfrecords(output_dir):
+        # Create a directory for storing tfrecord files
+        file_io.make_directory(output_dir, clear_dir=True)
 
-    #Write tfrecord files
-    tfrecord_writer.write_from_df(df=df,
-                                  tfrecord_file=os.path.join(tfrecord_dir, TFRECORD_FILE),
-                                  feature_config=feature_config,
-                                  tfrecord_type=tfrecord_type,
-                                  logger=logger)
+        convert_files(
+            ranklib_files=ranklib_files,
+            tfrecord_dir=output_dir,
+            feature_config=feature_config,
+            tfrecord_type=tfrecord_type,
+            keep_additional_info=keep_additional_info,
+            gl_2_clicks=gl_2_clicks,
+            non_zero_features_only=non_zero_features_only,
+            num_workers=num_workers,
+            logger=logger,
+        )
 
+    if tfrecord_cache:
+        # The cached TFRecord files are read in place
+        tfrecord_dir = tfrecord_cache.convert(
+            input_files=ranklib_files,
+            feature_config=feature_config,
+            tfrecord_type=tfrecord_type,
+            convert_fn=write_tfrecords,
+            keep_additional_info=keep_additional_info,
+            gl_2_clicks=gl_2_clicks,
+            non_zero_features_only=non_zero_features_only,
+        )
+    else:
+        write_tfrecords(tfrecord_dir)
 
     dataset = tfrecord_reader.read(
         data_dir=tfrecord_dir,
@@ -8,6 +8,7 @@ from ml4ir.base.config.keys import DataFormatKey, DataSplitKey
 from ml4ir.base.data import csv_reader
 from ml4ir.base.data import tfrecord_reader
 from ml4ir.base.data import ranklib_reader
+from ml4ir.base.data.tfrecord_cache import TFRecordCache
 from ml4ir.base.features.feature_config import FeatureConfig
 from ml4ir.base.io.file_io import FileIO
 
@@ -34,7 +35,20 @@ class RelevanceDataset:
             logger: Optional[Logger] = None,
             keep_additional_info: int = 0,
             non_zero_features_only: int = 0,
-            output_name: str = None
+            output_name: str = None,
+            csv_chunk_size: int = 0,
+            csv_from_generator: bool = False,
+            tfrecord_cache_dir: str = None,
+            tfrecord_cache_max_size_mb: int = 0,
+            tfrecord_cache_hash_contents: bool = False,
+            ranklib_num_workers: int = 1,
+            num_parallel_reads: int = 0,
+            interleave_cycle_length: int = 0,
+            deterministic_reads: bool = True,
+            num_file_shards: int = 1,
+            file_shard_index: int = 0,
+            num_length_buckets: int = 0,
+            scale_bucket_batch_sizes: bool = False
     ):
         """
         Constructor method to instantiate a RelevanceDataset object
@@ -80,6 +94,39 @@ class RelevanceDataset:
             logging handler for status messages
         output_name: str
             The name of tensorflow's output node which carry the prediction score.
+        csv_chunk_size : int, optional
+            number of CSV rows to be converted to protobufs at a time, bounding the memory used
+            for CSV data. Reads each CSV file entirely when 0
+        csv_from_generator : bool, optional
+            stream the protobufs converted from the CSV files into the dataset
+            without writing intermediate TFRecord files
+        tfrecord_cache_dir : str, optional
+            path to the directory to cache the TFRecord files converted from CSV and ranklib data.
+            Unchanged data splits reuse the cached TFRecord files across runs. Disabled if None
+        tfrecord_cache_max_size_mb : int, optional
+            maximum size of the TFRecord cache in MB; least recently used conversions are evicted.
+            Unbounded if 0
+        tfrecord_cache_hash_contents : bool, optional
+            identify the input files by a hash of their contents instead of the size and modification time
+        ranklib_num_workers : int, optional
+            number of processes used to convert the ranklib files in parallel
+        num_parallel_reads : int, optional
+            [TFRecord format only] number of files to read in parallel by interleaving the records.
+            Use -1 to autotune. Files are read sequentially if 0
+        interleave_cycle_length : int, optional
+            [TFRecord format only] number of files interleaved at a time. Autotuned if 0
+        deterministic_reads : bool, optional
+            [TFRecord format only] whether the interleaved records are read in a deterministic order
+        num_file_shards : int, optional
+            [TFRecord format only] number of shards to split the files of each split into, one per worker
+        file_shard_index : int, optional
+            [TFRecord format only] index of the shard of files read by this worker
+        num_length_buckets : int, optional
+            [TFRecord format only] number of sequence length buckets to batch the SequenceExample queries by,
+            padding each batch to its longest query. Queries are padded to `max_sequence_size` if 0 or 1
+        scale_bucket_batch_sizes : bool, optional
+            [TFRecord format only] scale the batch size of each length bucket so that every batch
+            holds `batch_size * max_sequence_size` padded records
 
         Notes
         -----
@@ -105,6 +152,25 @@ class RelevanceDataset:
 
         self.keep_additional_info = keep_additional_info
         self.non_zero_features_only = non_zero_features_only
+        self.csv_chunk_size = csv_chunk_size
+        self.csv_from_generator = csv_from_generator
+        self.ranklib_num_workers = ranklib_num_workers
+        self.num_parallel_reads = num_parallel_reads
+        self.interleave_cycle_length = interleave_cycle_length
+        self.deterministic_reads = deterministic_reads
+        self.num_file_shards = num_file_shards
+        self.file_shard_index = file_shard_index
+        self.num_length_buckets = num_length_buckets
+        self.scale_bucket_batch_sizes = scale_bucket_batch_sizes
+        self.tfrecord_cache: Optional[TFRecordCache] = None
+        if tfrecord_cache_dir:
+            self.tfrecord_cache = TFRecordCache(
+                cache_dir=tfrecord_cache_dir,
+                file_io=file_io,
+                max_size=tfrecord_cache_max_size_mb * 1024 * 1024,
+                hash_contents=tfrecord_cache_hash_contents,
+                logger=logger,
+            )
         self.output_name = output_name
 
         self.train: Optional[tf.data.TFRecordDataset] = None
@@ -189,7 +255,18 @@ class RelevanceDataset:
                 logger=self.logger,
                 keep_additional_info=self.keep_additional_info,
                 non_zero_features_only=self.non_zero_features_only,
-                output_name=self.output_name
+                output_name=self.output_name,
+                chunk_size=self.csv_chunk_size,
+                from_generator=self.csv_from_generator,
+                tfrecord_cache=self.tfrecord_cache,
+                num_workers=self.ranklib_num_workers,
+                num_parallel_reads=self.num_parallel_reads,
+                cycle_length=self.interleave_cycle_length,
+                deterministic=self.deterministic_reads,
+                num_file_shards=self.num_file_shards,
+                file_shard_index=self.file_shard_index,
+                num_length_buckets=self.num_length_buckets,
+                scale_bucket_batch_sizes=self.scale_bucket_batch_sizes
             )
             self.validation = data_reader.read(
                 data_dir=os.path.join(self.data_dir, DataSplitKey.VALIDATION),
@@ -206,7 +283,18 @@ class RelevanceDataset:
                 logger=self.logger,
                 keep_additional_info=self.keep_additional_info,
                 non_zero_features_only=self.non_zero_features_only,
-                output_name=self.output_name
+                output_name=self.output_name,
+                chunk_size=self.csv_chunk_size,
+                from_generator=self.csv_from_generator,
+                tfrecord_cache=self.tfrecord_cache,
+                num_workers=self.ranklib_num_workers,
+                num_parallel_reads=self.num_parallel_reads,
+                cycle_length=self.interleave_cycle_length,
+                deterministic=self.deterministic_reads,
+                num_file_shards=self.num_file_shards,
+                file_shard_index=self.file_shard_index,
+                num_length_buckets=self.num_length_buckets,
+                scale_bucket_batch_sizes=self.scale_bucket_batch_sizes
             )
             self.test = data_reader.read(
                 data_dir=os.path.join(self.data_dir, DataSplitKey.TEST),
@@ -223,7 +311,18 @@ class RelevanceDataset:
                 logger=self.logger,
                 keep_additional_info=self.keep_additional_info,
                 non_zero_features_only=self.non_zero_features_only,
-                output_name=self.output_name
+                output_name=self.output_name,
+                chunk_size=self.csv_chunk_size,
+                from_generator=self.csv_from_generator,
+                tfrecord_cache=self.tfrecord_cache,
+                num_workers=self.ranklib_num_workers,
+                num_parallel_reads=self.num_parallel_reads,
+                cycle_length=self.interleave_cycle_length,
+                deterministic=self.deterministic_reads,
+                num_file_shards=self.num_file_shards,
+                file_shard_index=self.file_shard_index,
+                num_length_buckets=self.num_length_buckets,
+                scale_bucket_batch_sizes=self.scale_bucket_batch_sizes
             )
 
     def balance_classes(self):
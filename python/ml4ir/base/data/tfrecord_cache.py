@@ -0,0 +1,283 @@
+import os
+import json
+import hashlib
+from logging import Logger
+
+from ml4ir.base.features.feature_config import FeatureConfig
+from ml4ir.base.io.file_io import FileIO
+
+from typing import Callable, List, Optional, Set
+
+# Version of the TFRecord conversion; bump to invalidate previously cached TFRecords
+CACHE_VERSION = 1
+TMP_PREFIX = ".tmp-"
+HASH_BLOCK_SIZE = 1 << 20
+
+
+def get_file_fingerprint(file_path: str, file_io: FileIO, hash_contents: bool = False) -> dict:
+    """
+    Get a fingerprint of an input file to detect changes between runs
+
+    Parameters
+    ----------
+    file_path : str
+        path to the input file
+    file_io : `FileIO`
+        file I/O handler to read the size and modification time of the file
+    hash_contents : bool, optional
+        use a sha256 hash of the file contents instead of the modification time.
+        Slower, but survives copying the input files to a new location
+
+    Returns
+    -------
+    dict
+        fingerprint of the file with the file name, size and modification time or content hash
+    """
+    fingerprint = {"name": os.path.basename(file_path), "size": file_io.get_file_size(file_path)}
+    if hash_contents:
+        content_hash = hashlib.sha256()
+        with open(file_path, "rb") as fp:
+            for block in iter(lambda: fp.read(HASH_BLOCK_SIZE), b""):
+                content_hash.update(block)
+        fingerprint["sha256"] = content_hash.hexdigest()
+    else:
+        fingerprint["mtime"] = file_io.get_modified_time(file_path)
+
+    return fingerprint
+
+
+def get_feature_config_fingerprint(feature_config: FeatureConfig) -> List[dict]:
+    """
+    Get the subset of the FeatureConfig that determines the serialized TFRecords
+
+    Parameters
+    ----------
+    feature_config : `FeatureConfig`
+        FeatureConfig object that defines the features to be converted
+
+    Returns
+    -------
+    list of dict
+        name, dtype, tfrecord type and default value of each feature
+    """
+    return [{"name": feature_info["name"],
+             "dtype": str(feature_info["dtype"]),
+             "tfrecord_type": feature_info.get("tfrecord_type"),
+             "default_value": str(feature_config.get_default_value(feature_info))}
+            for feature_info in feature_config.get_all_features()]
+
+
+class TFRecordCache:
+    """
+    Persistent cache of TFRecord files converted from CSV and ranklib inputs
+
+    Each cache entry is a directory named with the content address of the conversion,
+    computed from the fingerprints of the input files, the relevant FeatureConfig subset,
+    the tfrecord type and any other conversion arguments.
+    The TFRecord files are read in place from the cache entries.
+    The least recently used entries are evicted when the cache grows over `max_size` bytes,
+    except for the entries used by this cache object, which datasets may still be reading.
+    """
+
+    def __init__(
+            self,
+            cache_dir: str,
+            file_io: FileIO,
+            max_size: int = 0,
+            hash_contents: bool = False,
+            logger: Optional[Logger] = None,
+    ):
+        """
+        Constructor method to instantiate a TFRecordCache
+
+        Parameters
+        ----------
+        cache_dir : str
+            path to the directory to store the cached TFRecord files
+        file_io : `FileIO`
+            file I/O handler used to manage the cache entries
+        max_size : int, optional
+            maximum size of the cache in bytes; unbounded if 0
+        hash_contents : bool, optional
+            fingerprint the input files with a hash of the contents instead of the modification time
+        logger : `Logger`, optional
+            logging handler for cache hit, miss and eviction messages
+        """
+        self.cache_dir = cache_dir
+        self.file_io = file_io
+        self.max_size = max_size
+        self.hash_contents = hash_contents
+        self.logger = logger
+        # Keys of the entries returned by this cache object, never evicted by it
+        self.keys_in_use: Set[str] = set()
+
+        self.file_io.make_directory(self.cache_dir, clear_dir=False)
+
+    def log(self, message: str):
+        if self.logger:
+            self.logger.info(message)
+
+    def get_key(
+            self, input_files: List[str], feature_config: FeatureConfig, tfrecord_type: str, **conversion_args
+    ) -> str:
+        """
+        Compute the content address of a TFRecord conversion
+
+        Parameters
+        ----------
+        input_files : list of str
+            list of input files to be converted
+        feature_config : `FeatureConfig`
+            FeatureConfig object that defines the features to be converted
+        tfrecord_type : {"example", "sequence_example"}
+            Type of the TFRecord protobuf message to be created
+        conversion_args : dict
+            any additional arguments that change the converted TFRecords
+
+        Returns
+        -------
+        str
+            sha256 hex digest identifying the converted TFRecords
+        """
+        key = {
+            "version": CACHE_VERSION,
+            "input_files": [get_file_fingerprint(f, self.file_io, self.hash_contents) for f in sorted(input_files)],
+            "features": get_feature_config_fingerprint(feature_config),
+            "tfrecord_type": tfrecord_type,
+            "conversion_args": conversion_args,
+        }
+        return hashlib.sha256(json.dumps(key, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up the cached TFRecord files for a key
+
+        Parameters
+        ----------
+        key : str
+            content address of the conversion
+
+        Returns
+        -------
+        str or None
+            path to the directory of the cached TFRecord files if the key was found in the cache, None otherwise
+        """
+        entry_dir = os.path.join(self.cache_dir, key)
+        if not self.file_io.path_exists(entry_dir):
+            self.log("TFRecord cache miss : {}".format(key))
+            return None
+
+        # Mark the entry as recently used
+        self.file_io.touch(entry_dir)
+        self.keys_in_use.add(key)
+        self.log("TFRecord cache hit : {}".format(entry_dir))
+        return entry_dir
+
+    def put(self, key: str, convert_fn: Callable) -> str:
+        """
+        Convert the TFRecord files of a key into the cache and evict old entries if needed
+
+        Parameters
+        ----------
+        key : str
+            content address of the conversion
+        convert_fn : callable
+            function that converts the input files into TFRecord files in the directory passed as argument
+
+        Returns
+        -------
+        str
+            path to the directory of the cached TFRecord files
+        """
+        entry_dir = os.path.join(self.cache_dir, key)
+        tmp_dir = os.path.join(self.cache_dir, "{}{}-{}".format(TMP_PREFIX, key, os.getpid()))
+
+        # Convert into a temporary directory and move it in place so that partially written entries are never read
+        self.file_io.make_directory(tmp_dir, clear_dir=True)
+        try:
+            convert_fn(tmp_dir)
+        except Exception:
+            self.file_io.rm_dir(tmp_dir)
+            raise
+        try:
+            self.file_io.move(tmp_dir, entry_dir)
+            self.log("Added TFRecords to cache : {}".format(key))
+        except OSError:
+            # Entry was added concurrently by another process
+            self.file_io.rm_dir(tmp_dir)
+        self.file_io.touch(entry_dir)
+        self.keys_in_use.add(key)
+
+        self.evict()
+        return entry_dir
+
+    def get_entries(self) -> List[tuple]:
+        """
+        Get the entries in the cache
+
+        Returns
+        -------
+        list of tuple
+            list of (key, size in bytes, last used time) for each entry in the cache
+        """
+        entries = list()
+        for entry_dir in self.file_io.get_files_in_directory(self.cache_dir, extension=""):
+            key = os.path.basename(entry_dir)
+            if key.startswith(TMP_PREFIX):
+                continue
+            size = sum(self.file_io.get_file_size(f)
+                       for f in self.file_io.get_files_in_directory(entry_dir, extension=""))
+            entries.append((key, size, self.file_io.get_modified_time(entry_dir)))
+
+        return entries
+
+    def evict(self):
+        """
+        Evict the least recently used entries until the cache fits in `max_size` bytes.
+        Entries used by this cache object are kept
+        """
+        if not self.max_size:
+            return
+
+        entries = sorted(self.get_entries(), key=lambda entry: entry[2])
+        cache_size = sum(size for _, size, _ in entries)
+        for key, size, _ in entries:
+            if cache_size <= self.max_size:
+                break
+            if key in self.keys_in_use:
+                continue
+            self.file_io.rm_dir(os.path.join(self.cache_dir, key))
+            cache_size -= size
+            self.log("Evicted TFRecords from cache : {} ({} bytes)".format(key, size))
+
+    def convert(
+            self,
+            input_files: List[str],
+            feature_config: FeatureConfig,
+            tfrecord_type: str,
+            convert_fn: Callable,
+            **conversion_args
+    ) -> str:
+        """
+        Look up the converted TFRecord files in the cache or convert them into the cache
+
+        Parameters
+        ----------
+        input_files : list of str
+            list of input files to be converted
+        feature_config : `FeatureConfig`
+            FeatureConfig object that defines the features to be converted
+        tfrecord_type : {"example", "sequence_example"}
+            Type of the TFRecord protobuf message to be created
+        convert_fn : callable
+            function that converts the input files into TFRecord files in the directory passed as argument
+        conversion_args : dict
+            any additional arguments that change the converted TFRecords
+
+        Returns
+        -------
+        str
+            path to the directory of the cached TFRecord files, to be read in place
+        """
+        key = self.get_key(input_files, feature_config, tfrecord_type, **conversion_args)
+        return self.get(key) or self.put(key, convert_fn)
@@ -1,6 +1,7 @@
 from tensorflow import train
 import tensorflow as tf
 import pandas as pd
+import numpy as np
 
 from ml4ir.base.config.keys import SequenceExampleTypeKey
 
@@ -109,3 +110,227 @@ def get_sequence_example_proto(group, context_features, sequence_features):
         context=train.Features(feature=context_features_dict),
         feature_lists=train.FeatureLists(feature_list=sequence_features_dict),
     )
+
+
+# Single byte varints for values below 128
+_SMALL_VARINTS = [bytes((value,)) for value in range(0x80)]
+
+
+def _encode_varint(value):
+    """Encode an integer as a protobuf varint. Negative values use the 64 bit two's complement"""
+    if 0 <= value < 0x80:
+        return _SMALL_VARINTS[value]
+    value &= 0xFFFFFFFFFFFFFFFF
+    encoded = bytearray()
+    while value > 0x7F:
+        encoded.append((value & 0x7F) | 0x80)
+        value >>= 7
+    encoded.append(value)
+    return bytes(encoded)
+
+
+def _encode_length_delimited(field_number, payload):
+    """Encode a length delimited protobuf field (bytes, string, packed values or a nested message)"""
+    return _encode_varint((field_number << 3) | 2) + _encode_varint(len(payload)) + payload
+
+
+def _encode_bytes_column(values):
+    """Returns a function to serialize a bytes_list Feature from a slice of string values"""
+    # BytesList.value is a repeated bytes field
+    encoded_values = dict()
+    encoded = list()
+    for value in values:
+        if value not in encoded_values:
+            encoded_values[value] = _encode_length_delimited(1, value.encode("utf-8"))
+        encoded.append(encoded_values[value])
+    return lambda start, end: _encode_length_delimited(1, b"".join(encoded[start:end]))
+
+
+def _encode_float_column(values):
+    """Returns a function to serialize a float_list Feature from a slice of float values"""
+    # FloatList.value is a packed repeated float field
+    values = values.astype("<f4")
+    return lambda start, end: _encode_length_delimited(
+        2, _encode_length_delimited(1, values[start:end].tobytes()))
+
+
+def _encode_int64_column(values):
+    """Returns a function to serialize an int64_list Feature from a slice of integer values"""
+    # Int64List.value is a packed repeated varint field
+    varints = dict()
+    encoded = list()
+    for value in values.astype(np.int64).tolist():
+        if value not in varints:
+            varints[value] = _encode_varint(value)
+        encoded.append(varints[value])
+    return lambda start, end: _encode_length_delimited(
+        3, _encode_length_delimited(1, b"".join(encoded[start:end])))
+
+
+def _get_column_encoder(dtype):
+    """Returns appropriate column encoder based on datatype"""
+    if dtype == tf.string:
+        return _encode_bytes_column
+    elif dtype == tf.float32:
+        return _encode_float_column
+    elif dtype == tf.int64:
+        return _encode_int64_column
+    else:
+        raise Exception("Feature dtype {} not supported".format(dtype))
+
+
+def get_feature_encoders(features):
+    """
+    Precompute the encoders for each feature to convert DataFrame columns into serialized protobuf features
+
+    Parameters
+    ----------
+    features : list of dict
+        list of feature configurations from the FeatureConfig
+
+    Returns
+    -------
+    list of tuple
+        list of (feature name, column encoder, default value) for each feature.
+        The column encoder converts a numpy array of feature values into a function that
+        returns the serialized `Feature` protobuf for a slice of the values
+    """
+    return [(feature_info["name"],
+             _get_column_encoder(feature_info["dtype"]),
+             feature_info.get("default_value"))
+            for feature_info in features]
+
+
+def _encode_columns(df, feature_encoders, row_order=None):
+    """Encode each feature column of the DataFrame, filling missing values with the default value"""
+    columns = list()
+    for feature_name, column_encoder, default_value in feature_encoders:
+        if feature_name not in df.columns:
+            raise Exception("Could not find column {} in dataframe with columns: {}".format(
+                feature_name, list(df.columns)))
+        values = df[feature_name].values
+        if row_order is not None:
+            values = values[row_order]
+        missing = pd.isna(values)
+        if missing.any():
+            values = np.where(missing, default_value, values)
+        # Map entries are serialized with the key as field 1 and the value as field 2
+        columns.append((_encode_length_delimited(1, feature_name.encode("utf-8")), column_encoder(values)))
+
+    return columns
+
+
+def get_query_boundaries(df, query_keys):
+    """
+    Sort the records of a DataFrame by the query keys and find the boundaries of each query.
+    The queries are ordered by the sorted query key values and the records within a query
+    retain their original order, same as `pd.DataFrame.groupby`
+
+    Parameters
+    ----------
+    df : pandas DataFrame
+        DataFrame containing the records of all the queries
+    query_keys : list of str
+        list of columns identifying a query
+
+    Returns
+    -------
+    row_order : numpy array
+        Indices that sort the records by query. Records with missing query keys are dropped
+    query_starts : numpy array
+        Start index of each query in the sorted records
+    query_ends : numpy array
+        End index(exclusive) of each query in the sorted records
+    """
+    codes = np.stack([pd.factorize(df[key], sort=True)[0] for key in query_keys])
+
+    # Drop records with missing query keys, similar to groupby
+    valid_rows = np.flatnonzero((codes >= 0).all(axis=0))
+    codes = codes[:, valid_rows]
+
+    # lexsort uses the last key as the primary sort key
+    sort_index = np.lexsort(codes[::-1])
+    row_order = valid_rows[sort_index]
+    sorted_codes = codes[:, sort_index]
+
+    is_query_start = np.r_[True, (sorted_codes[:, 1:] != sorted_codes[:, :-1]).any(axis=0)][:row_order.size]
+    query_starts = np.flatnonzero(is_query_start)
+    query_ends = np.r_[query_starts[1:], row_order.size].astype(int)
+
+    return row_order, query_starts, query_ends
+
+
+def get_example_protos(df, features):
+    """
+    Get serialized Example protobufs for each row of a pandas DataFrame.
+    Columnar equivalent of `get_example_proto` that encodes each feature column once
+    and writes the protobuf wire format directly
+
+    Parameters
+    ----------
+    df : pandas DataFrame
+        pandas dataframe to be converted to example protos
+    features : list of dict
+        list of configurations for all features
+
+    Returns
+    -------
+    list of bytes
+        Serialized Example protobufs for each row
+    """
+    columns = _encode_columns(df, get_feature_encoders(features))
+
+    protos = list()
+    for i in range(df.shape[0]):
+        features_proto = b"".join(
+            _encode_length_delimited(1, feature_key + _encode_length_delimited(2, encode_feature(i, i + 1)))
+            for feature_key, encode_feature in columns)
+        protos.append(_encode_length_delimited(1, features_proto))
+
+    return protos
+
+
+def get_sequence_example_protos(df, context_features, sequence_features):
+    """
+    Get serialized SequenceExample protobufs for each query in a pandas DataFrame.
+    Columnar equivalent of `get_sequence_example_proto` applied on a groupby
+    over the context features. The records are sorted once by query and each feature
+    column is encoded once, then sliced at the query boundaries to write the protobuf
+    wire format directly
+
+    Parameters
+    ----------
+    df : pandas DataFrame
+        pandas dataframe containing the records of all the queries
+    context_features : list of dict
+        list of configurations for all the context features
+    sequence_features : list of dict
+        list of configurations for all the sequence features
+
+    Returns
+    -------
+    list of bytes
+        Serialized SequenceExample protobufs for each query in the order of the sorted context feature values
+    """
+    sequence_features = [feature_info for feature_info in sequence_features
+                         if feature_info["tfrecord_type"] == SequenceExampleTypeKey.SEQUENCE]
+
+    row_order, query_starts, query_ends = get_query_boundaries(
+        df, [feature_info["name"] for feature_info in context_features])
+    context_columns = _encode_columns(df, get_feature_encoders(context_features), row_order)
+    sequence_columns = _encode_columns(df, get_feature_encoders(sequence_features), row_order)
+
+    protos = list()
+    for start, end in zip(query_starts.tolist(), query_ends.tolist()):
+        # Features.feature is a map of feature name to Feature
+        context_proto = b"".join(
+            _encode_length_delimited(1, feature_key + _encode_length_delimited(2, encode_feature(start, start + 1)))
+            for feature_key, encode_feature in context_columns)
+        # FeatureLists.feature_list is a map of feature name to FeatureList with a single Feature
+        feature_lists_proto = b"".join(
+            _encode_length_delimited(1, feature_key + _encode_length_delimited(
+                2, _encode_length_delimited(1, encode_feature(start, end))))
+            for feature_key, encode_feature in sequence_columns)
+        protos.append(_encode_length_delimited(1, context_proto) + _encode_length_delimited(2, feature_lists_proto))
+
+    return protos
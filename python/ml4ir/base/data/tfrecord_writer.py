@@ -40,24 +40,41 @@ Usage example:
 ... --out-dir /tmp \\
 ... --feature-config /tmp/fconfig.yaml \\
 ... --keep-single-files
+
+Large datasets can be split into shards partitioned by the query key hash,
+with the protobufs built and written by a pool of worker processes
+
+>>> python ml4ir/base/data/tfrecord_writer.py \\
+... sequence_example \\
+... --csv-dir <DIR_WITH_CSVs> \\
+... --out-dir <PATH_TO_OUTPUT_DIR> \\
+... --feature-config <PATH_TO_YAML_FEATURE_CONFIG> \\
+... --num-shards 16 \\
+... --num-workers 8 \\
+... --compression-type GZIP
 """
 
 import os
+import multiprocessing
 from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
 from logging import Logger
-from typing import List
+from typing import List, Optional
 
+import numpy as np
+import pandas as pd
 from pandas import DataFrame
 from tensorflow import io
 
 from ml4ir.base.config.keys import TFRecordTypeKey
-from ml4ir.base.data.tfrecord_helper import get_sequence_example_proto, get_example_proto
+from ml4ir.base.data.tfrecord_helper import get_sequence_example_protos, get_example_protos
 from ml4ir.base.features.feature_config import FeatureConfig
 from ml4ir.base.io.file_io import FileIO
 from ml4ir.base.io.local_io import LocalIO
 from ml4ir.base.io.logging_utils import setup_logging
 
 MODES = {"example": TFRecordTypeKey.EXAMPLE, "sequence_example": TFRecordTypeKey.SEQUENCE_EXAMPLE}
+COMPRESSION_TYPES = ["GZIP"]
 
 
 def write_from_files(
@@ -67,6 +84,10 @@ def write_from_files(
         tfrecord_type: str,
         file_io: FileIO,
         logger: Logger = None,
+        num_shards: int = 1,
+        num_workers: int = 1,
+        compression_type: Optional[str] = None,
+        chunk_size: int = 0,
 ):
     """
     Converts data from CSV files into tfrecord files
@@ -86,11 +107,168 @@ def write_from_files(
         FileIO handler object for reading and writing files
     logger : `Logger`, optional
         logging handler for status messages
+    num_shards : int, optional
+        Number of tfrecord shards to partition the data into by the query key hash.
+        If greater than 1, the shards are written next to `tfrecord_file` using
+        `get_shard_file` instead of writing to `tfrecord_file`
+    num_workers : int, optional
+        Number of processes used to build and write the shards
+    compression_type : {"GZIP"}, optional
+        Compression type of the output tfrecord files
+    chunk_size : int, optional
+        If greater than 0, the CSV files are streamed in chunks of `chunk_size` rows and
+        the protobufs are written incrementally to a single `tfrecord_file`, keeping memory
+        bounded by the chunk size. Sharding is not supported in this mode and a ValueError is raised
+        if `num_shards` is greater than 1.
+        Refer to `get_protos_from_files` for the ordering requirements on the CSV records
     """
+    if chunk_size > 0 and num_shards > 1:
+        raise ValueError("Writing in chunks (chunk_size={}) does not support sharding (num_shards={}). "
+                         "Set only one of them".format(chunk_size, num_shards))
+
+    if chunk_size > 0:
+        if logger:
+            logger.info("Writing {} protobufs in chunks of {} rows to : {}".format(
+                tfrecord_type, chunk_size, tfrecord_file))
+        num_protos = 0
+        with io.TFRecordWriter(tfrecord_file, options=compression_type) as tf_writer:
+            for proto in get_protos_from_files(csv_files, feature_config, tfrecord_type, file_io, chunk_size):
+                tf_writer.write(proto)
+                num_protos += 1
+        if logger:
+            logger.info("Finished writing {} protobufs".format(num_protos))
+        return
 
     # Read CSV data into a pandas dataframe
     df = file_io.read_df_list(csv_files, use_escape_char=True)
-    write_from_df(df, tfrecord_file, feature_config, tfrecord_type, logger)
+    if num_shards > 1:
+        write_sharded_from_df(df=df,
+                              tfrecord_file=tfrecord_file,
+                              feature_config=feature_config,
+                              tfrecord_type=tfrecord_type,
+                              num_shards=num_shards,
+                              num_workers=num_workers,
+                              compression_type=compression_type,
+                              logger=logger)
+    else:
+        write_from_df(df, tfrecord_file, feature_config, tfrecord_type, logger, compression_type)
+
+
+def fill_missing_values(df: DataFrame, feature_config: FeatureConfig):
+    """
+    Fill the missing values of each feature with the default value from the FeatureConfig
+
+    Parameters
+    ----------
+    df : `pd.DataFrame`
+        pandas DataFrame with missing feature values
+    feature_config : `FeatureConfig`
+        FeatureConfig object that defines the default value of the features
+
+    Returns
+    -------
+    `pd.DataFrame`
+        pandas DataFrame with the missing values filled
+    """
+    # Note: Samples with NaN (context) features will be dropped
+    fill_na_mapper = {feat["name"]: feature_config.get_default_value(feat)
+                      for feat in feature_config.get_all_features()}
+    return df.fillna(fill_na_mapper)
+
+
+def get_protos(df: DataFrame, feature_config: FeatureConfig, tfrecord_type: str):
+    """
+    Convert the records of a pandas DataFrame into serialized Example or SequenceExample protobufs
+
+    Parameters
+    ----------
+    df : `pd.DataFrame`
+        pandas DataFrame to be converted to protobufs
+    feature_config : `FeatureConfig`
+        FeatureConfig object that defines the features to be loaded in the dataset
+    tfrecord_type : {"example", "sequence_example"}
+        Type of the TFRecord protobuf message to be created
+
+    Returns
+    -------
+    list of bytes
+        Serialized Example protobufs for each record or SequenceExample protobufs for each query
+    """
+    if tfrecord_type == TFRecordTypeKey.EXAMPLE:
+        return get_example_protos(df=df, features=feature_config.get_all_features())
+    elif tfrecord_type == TFRecordTypeKey.SEQUENCE_EXAMPLE:
+        # Group the records on query_id/query key and
+        # convert each query to a single sequence example proto
+        return get_sequence_example_protos(
+            df=df,
+            context_features=feature_config.get_context_features(),
+            sequence_features=feature_config.get_sequence_features(),
+        )
+    else:
+        raise Exception(
+            "You have entered {} as tfrecords write mode. "
+            "We only support {} and {}.".format(
+                tfrecord_type, TFRecordTypeKey.EXAMPLE, TFRecordTypeKey.SEQUENCE_EXAMPLE
+            )
+        )
+
+
+def get_protos_from_files(
+        csv_files: List[str],
+        feature_config: FeatureConfig,
+        tfrecord_type: str,
+        file_io: FileIO,
+        chunk_size: int,
+):
+    """
+    Stream serialized protobufs from CSV files read in chunks of rows
+
+    The records of the last query in each chunk are carried over to the next chunk
+    so that a query spanning a chunk boundary is converted into a single SequenceExample.
+
+    Parameters
+    ----------
+    csv_files : list of str
+        list of csv file paths to read data from
+    feature_config : `FeatureConfig`
+        FeatureConfig object that defines the features to be loaded in the dataset
+    tfrecord_type : {"example", "sequence_example"}
+        Type of the TFRecord protobuf message to be created
+    file_io : FileIO object
+        FileIO handler object for reading files in chunks
+    chunk_size : int
+        Number of CSV rows to read and convert at a time
+
+    Yields
+    ------
+    bytes
+        Serialized Example or SequenceExample protobufs
+
+    Notes
+    -----
+    For SequenceExample protobufs, all the records of a query must be contiguous within a CSV file.
+    Unlike `write_from_df`, the queries are not sorted by the query key across chunks
+    """
+    query_keys = feature_config.get_context_features(key="name")
+    for csv_file in csv_files:
+        carry_over = None
+        for df in file_io.read_df_chunks(csv_file, chunk_size=chunk_size, use_escape_char=True):
+            df = fill_missing_values(df, feature_config)
+            if carry_over is not None:
+                df = pd.concat([carry_over, df], ignore_index=True)
+
+            if tfrecord_type == TFRecordTypeKey.SEQUENCE_EXAMPLE:
+                # Hold back the last query as it may continue in the next chunk
+                is_last_query = (df[query_keys] == df[query_keys].iloc[-1]).all(axis=1).values
+                carry_over = df[is_last_query]
+                df = df[~is_last_query]
+
+            for proto in get_protos(df, feature_config, tfrecord_type):
+                yield proto
+
+        if carry_over is not None and not carry_over.empty:
+            for proto in get_protos(carry_over, feature_config, tfrecord_type):
+                yield proto
 
 
 def write_from_df(
@@ -99,6 +277,7 @@ def write_from_df(
         feature_config: FeatureConfig,
         tfrecord_type: str,
         logger: Logger = None,
+        compression_type: Optional[str] = None,
 ):
     """
     Converts data from CSV files into tfrecord files
@@ -115,42 +294,165 @@ def write_from_df(
         Type of the TFRecord protobuf message to be used for TFRecordDataset
     logger : `Logger`, optional
         logging handler for status messages
-    """
+    compression_type : {"GZIP"}, optional
+        Compression type of the output tfrecord file
 
-    # Note: Samples with NaN (context) features will be dropped
-    fill_na_mapper = {feat["name"]: feature_config.get_default_value(feat)
-                      for feat in feature_config.get_all_features()}
-    df = df.fillna(fill_na_mapper)
+    Returns
+    -------
+    int
+        Number of protobufs written to the tfrecord file
+    """
+    df = fill_missing_values(df, feature_config)
 
     if logger:
         logger.info("Writing SequenceExample protobufs to : {}".format(tfrecord_file))
-    with io.TFRecordWriter(tfrecord_file) as tf_writer:
-        if tfrecord_type == TFRecordTypeKey.EXAMPLE:
-            protos = df.apply(
-                lambda row: get_example_proto(row=row, features=feature_config.get_all_features()),
-                axis=1,
-            )
-        elif tfrecord_type == TFRecordTypeKey.SEQUENCE_EXAMPLE:
-            # Group pandas dataframe on query_id/query key and
-            # convert each group to a single sequence example proto
-            context_feature_names = feature_config.get_context_features(key="name")
-            protos = df.groupby(context_feature_names).apply(
-                lambda g: get_sequence_example_proto(
-                    group=g,
-                    context_features=feature_config.get_context_features(),
-                    sequence_features=feature_config.get_sequence_features(),
-                )
-            )
-        else:
-            raise Exception(
-                "You have entered {} as tfrecords write mode. "
-                "We only support {} and {}.".format(
-                    tfrecord_type, TFRecordTypeKey.EXAMPLE, TFRecordTypeKey.SEQUENCE_EXAMPLE
-                )
-            )
-        # Write to disk
+    protos = get_protos(df, feature_config, tfrecord_type)
+
+    # Write to disk
+    with io.TFRecordWriter(tfrecord_file, options=compression_type) as tf_writer:
+        for proto in protos:
+            tf_writer.write(proto)
+
+    return len(protos)
+
+
+def get_shard_file(tfrecord_file: str, shard: int, num_shards: int):
+    """
+    Get the path of a tfrecord shard from the base tfrecord file path
+
+    Parameters
+    ----------
+    tfrecord_file : str
+        Base tfrecord file path, for example `out/combined.tfrecord`
+    shard : int
+        Index of the shard
+    num_shards : int
+        Total number of shards
+
+    Returns
+    -------
+    str
+        Path of the shard, for example `out/combined-00001-of-00004.tfrecord`
+    """
+    tfrecord_dir, file_name = os.path.split(tfrecord_file)
+    file_name, _, extension = file_name.partition(".")
+    return os.path.join(tfrecord_dir, "{}-{:05d}-of-{:05d}.{}".format(
+        file_name, shard, num_shards, extension or "tfrecord"))
+
+
+def get_shard_ids(df: DataFrame, feature_config: FeatureConfig, tfrecord_type: str, num_shards: int):
+    """
+    Assign each record to a shard using the hash of the query key so that all
+    the records of a query are written to the same shard
+
+    Parameters
+    ----------
+    df : `pd.DataFrame`
+        pandas DataFrame to be partitioned
+    feature_config : `FeatureConfig`
+        FeatureConfig object that defines the query key and context features
+    tfrecord_type : {"example", "sequence_example"}
+        Type of the TFRecord protobuf message to be written
+    num_shards : int
+        Number of shards to partition the records into
+
+    Returns
+    -------
+    numpy array
+        Shard index of each record in the DataFrame
+    """
+    if tfrecord_type == TFRecordTypeKey.SEQUENCE_EXAMPLE:
+        # SequenceExample protobufs are grouped on all the context features
+        partition_keys = feature_config.get_context_features(key="name")
+    elif feature_config.get_query_key() and feature_config.get_query_key("name") in df.columns:
+        partition_keys = [feature_config.get_query_key("name")]
+    else:
+        # Example protobufs without a query key are partitioned by row
+        return np.arange(df.shape[0]) % num_shards
+
+    key_hash = pd.util.hash_pandas_object(df[partition_keys], index=False).values
+    return (key_hash % np.uint64(num_shards)).astype(int)
+
+
+def _write_shard(
+        df: DataFrame,
+        tfrecord_file: str,
+        feature_config: FeatureConfig,
+        tfrecord_type: str,
+        compression_type: Optional[str] = None,
+):
+    """Build and write the protobufs for a single shard. Executed in the worker processes"""
+    with io.TFRecordWriter(tfrecord_file, options=compression_type) as tf_writer:
+        protos = get_protos(df, feature_config, tfrecord_type)
         for proto in protos:
-            tf_writer.write(proto.SerializeToString())
+            tf_writer.write(proto)
+
+    return len(protos)
+
+
+def write_sharded_from_df(
+        df: DataFrame,
+        tfrecord_file: str,
+        feature_config: FeatureConfig,
+        tfrecord_type: str,
+        num_shards: int,
+        num_workers: int = 1,
+        compression_type: Optional[str] = None,
+        logger: Logger = None,
+):
+    """
+    Converts data from a pandas DataFrame into tfrecord shards partitioned by the query key hash.
+    The protobufs for each shard are built, serialized and written in parallel with a process pool
+
+    Parameters
+    ----------
+    df : `pd.DataFrame`
+        pandas DataFrame to be converted to TFRecordDataset
+    tfrecord_file : str
+        Base tfrecord file path used to name the shards with `get_shard_file`
+    feature_config : `FeatureConfig`
+        FeatureConfig object that defines the features to be loaded in the dataset
+        and the preprocessing functions to be applied to each of them
+    tfrecord_type : {"example", "sequence_example"}
+        Type of the TFRecord protobuf message to be used for TFRecordDataset
+    num_shards : int
+        Number of tfrecord shards to write
+    num_workers : int, optional
+        Number of processes used to build and write the shards.
+        If 1, the shards are written sequentially in the current process
+    compression_type : {"GZIP"}, optional
+        Compression type of the output tfrecord files
+    logger : `Logger`, optional
+        logging handler for status messages
+
+    Returns
+    -------
+    list of str
+        Paths of the tfrecord shards written
+    """
+    df = fill_missing_values(df, feature_config)
+
+    shard_ids = get_shard_ids(df, feature_config, tfrecord_type, num_shards)
+    shard_files = [get_shard_file(tfrecord_file, shard, num_shards) for shard in range(num_shards)]
+    shard_args = [(df[shard_ids == shard], shard_files[shard], feature_config, tfrecord_type, compression_type)
+                  for shard in range(num_shards)]
+
+    if logger:
+        logger.info("Writing {} protobufs to {} shards with {} workers : {}".format(
+            tfrecord_type, num_shards, num_workers, ", ".join(shard_files)))
+
+    if num_workers > 1:
+        # Using spawn as tensorflow is not fork safe
+        with ProcessPoolExecutor(max_workers=num_workers,
+                                 mp_context=multiprocessing.get_context("spawn")) as executor:
+            proto_counts = list(executor.map(_write_shard, *zip(*shard_args)))
+    else:
+        proto_counts = [_write_shard(*args) for args in shard_args]
+
+    if logger:
+        logger.info("Finished writing {} protobufs".format(sum(proto_counts)))
+
+    return shard_files
 
 
 def main(args):
@@ -175,12 +477,15 @@ def main(args):
         logger=logger,
     )
 
+    # Compressed files use the .tfrecord.gz extension expected by tfrecord_reader
+    extension = "tfrecord.gz" if args.compression_type else "tfrecord"
+
     # Convert to TFRecord SequenceExample protobufs and save
     if args.keep_single_files:
         # Convert each CSV file individually - better performance
         for csv_file in csv_files:
             tfrecord_file: str = os.path.basename(csv_file).replace(".csv", "")
-            tfrecord_file: str = os.path.join(args.out_dir, "{}.tfrecord".format(tfrecord_file))
+            tfrecord_file: str = os.path.join(args.out_dir, "{}.{}".format(tfrecord_file, extension))
             write_from_files(
                 csv_files=[csv_file],
                 tfrecord_file=tfrecord_file,
@@ -188,11 +493,15 @@ def main(args):
                 logger=logger,
                 tfrecord_type=MODES[args.tfmode],
                 file_io=file_io,
+                num_shards=args.num_shards,
+                num_workers=args.num_workers,
+                compression_type=args.compression_type,
+                chunk_size=args.chunk_size,
             )
 
     else:
         # Convert all CSV files at once - expensive groupby operation
-        tfrecord_file: str = os.path.join(args.out_dir, "combined.tfrecord")
+        tfrecord_file: str = os.path.join(args.out_dir, "combined.{}".format(extension))
         write_from_files(
             csv_files=csv_files,
             tfrecord_file=tfrecord_file,
@@ -200,6 +509,10 @@ def main(args):
             logger=logger,
             tfrecord_type=MODES[args.tfmode],
             file_io=file_io,
+            num_shards=args.num_shards,
+            num_workers=args.num_workers,
+            compression_type=args.compression_type,
+            chunk_size=args.chunk_size,
         )
 
 
@@ -241,6 +554,34 @@ def define_arguments():
              "If not set, a single combined.tfrecord is created."
              "All occurrences of a query key should be within a single file",
     )
+    parser.add_argument(
+        "--num-shards",
+        type=int,
+        default=1,
+        help="Number of tfrecord shards to write for each output file. "
+             "Records are partitioned by the hash of the query key so that a query is within a single shard. "
+             "Shards are named as <name>-<shard>-of-<num_shards>.tfrecord",
+    )
+    parser.add_argument(
+        "--num-workers",
+        type=int,
+        default=1,
+        help="Number of processes used to build and write the tfrecord shards in parallel",
+    )
+    parser.add_argument(
+        "--compression-type",
+        choices=COMPRESSION_TYPES,
+        default=None,
+        help="Compression type of the output tfrecord files. Compressed files use the .tfrecord.gz extension",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=0,
+        help="When greater than 0, streams each CSV file in chunks of rows and writes the protobufs "
+             "incrementally to bound memory usage. Records of a query should be contiguous within a file. "
+             "Can not be used with --num-shards greater than 1",
+    )
     return parser
 
 
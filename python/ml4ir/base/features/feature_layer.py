@@ -14,7 +14,8 @@ from ml4ir.base.features.feature_fns.sentence_transformers import SentenceTransf
 from ml4ir.applications.ranking.features.feature_fns.categorical import CategoricalVector
 from ml4ir.applications.ranking.features.feature_fns.normalization import TheoreticalMinMaxNormalization
 from ml4ir.applications.ranking.features.feature_fns.rank_transform import ReciprocalRank
-from ml4ir.applications.ranking.features.feature_fns.string import QueryLength, QueryTypeVector, GloveQueryEmbeddingVector
+from ml4ir.applications.ranking.features.feature_fns.string import QueryLength, QueryTypeVector, GloveQueryEmbeddingVector, \
+    GloveStaticQueryEmbeddingVector
 
 
 class FeatureLayerMap:
@@ -43,7 +44,8 @@ class FeatureLayerMap:
             ReciprocalRank.LAYER_NAME: ReciprocalRank,
             QueryLength.LAYER_NAME: QueryLength,
             QueryTypeVector.LAYER_NAME: QueryTypeVector,
-            GloveQueryEmbeddingVector.LAYER_NAME: GloveQueryEmbeddingVector
+            GloveQueryEmbeddingVector.LAYER_NAME: GloveQueryEmbeddingVector,
+            GloveStaticQueryEmbeddingVector.LAYER_NAME: GloveStaticQueryEmbeddingVector
         }
 
     def add_fn(self, key, fn):
@@ -22,8 +22,14 @@ class PreprocessingMap:
             convert_label_to_clicks.__name__: convert_label_to_clicks
             # Add more here
         }
+        # Functions that can be applied to a batch of records at once
+        self.elementwise_keys = {
+            preprocess_text.__name__,
+            split_and_pad_string.__name__,
+            natural_log.__name__,
+        }
 
-    def add_fn(self, key, fn):
+    def add_fn(self, key, fn, elementwise=False):
         """
         Add custom preprocessing function to the PreprocessingMap
 
@@ -33,8 +39,15 @@ class PreprocessingMap:
             Name of the feature preprocessing function
         fn : function
             Function definition for the preprocessing function
+        elementwise : bool, optional
+            Whether the function processes each record of a batched
+            feature tensor independently and can be applied to the whole batch
         """
         self.key_to_fn[key] = fn
+        if elementwise:
+            self.elementwise_keys.add(key)
+        else:
+            self.elementwise_keys.discard(key)
 
     def add_fns(self, keys_to_fns_dict):
         """
@@ -44,7 +57,15 @@ class PreprocessingMap:
         ----------
         keys_to_fns_dict : dict
             Dictionary of preprocessing functions to add to PreprocessingMap
+
+        Notes
+        -----
+        Custom functions are assumed to process a single record at a time.
+        Use `add_fn` with `elementwise=True` to apply them to a batch of records at once
         """
+        for key, fn in keys_to_fns_dict.items():
+            if self.key_to_fn.get(key) is not fn:
+                self.elementwise_keys.discard(key)
         self.key_to_fn.update(keys_to_fns_dict)
 
     def get_fns(self):
@@ -74,6 +95,22 @@ class PreprocessingMap:
         """
         return self.key_to_fn.get(key)
 
+    def is_elementwise(self, key):
+        """
+        Check if a preprocessing function can be applied to a batch of records at once
+
+        Parameters
+        ----------
+        key : str
+            Name of preprocessing function
+
+        Returns
+        -------
+        bool
+            True if the function processes each record of a batched feature tensor independently
+        """
+        return key in self.elementwise_keys
+
     def pop_fn(self, key):
         """
         Get preprocessing function from name and remove from PreprocessingMap
@@ -88,6 +125,7 @@ class PreprocessingMap:
         function
             Function to preprocess feature corresponding to the key passed
         """
+        self.elementwise_keys.discard(key)
         self.key_to_fn.pop(key)
 
 
@@ -231,15 +269,11 @@ def split_and_pad_string(feature_tensor, split_char=",", max_length=20):
     Output:
         >>> ['AAA', 'BBB', 'CCC', '', '']
     """
-    tokens = tf.strings.split(feature_tensor, sep=split_char).to_tensor()
-    padded_tokens = tf.image.pad_to_bounding_box(
-        tf.expand_dims(tokens[:, :max_length], axis=-1),
-        offset_height=0,
-        offset_width=0,
-        target_height=1,
-        target_width=max_length,
+    # Pad or clip the innermost dimension so that batched inputs are split per record
+    tokens = tf.strings.split(feature_tensor, sep=split_char)
+    padded_tokens = tokens.to_tensor(
+        default_value="", shape=tf.concat([tf.shape(feature_tensor), [max_length]], axis=0)
     )
-    padded_tokens = tf.squeeze(padded_tokens, axis=-1)
     return padded_tokens
 
 
@@ -112,6 +112,28 @@ class FileIO(object):
         """
         raise NotImplementedError
 
+    def read_df_chunks(self, infile: str, chunk_size: int, sep: str = ",", index_col: int = None, **kwargs):
+        """
+        Load a pandas dataframe from a file in chunks of rows
+
+        Parameters
+        ----------
+        infile : str
+            path to the csv input file
+        chunk_size : int
+            number of rows in each chunk
+        sep : str, optional
+            separator to use for loading file
+        index_col : int, optional
+            column to be used as index
+
+        Returns
+        -------
+        iterator of `pandas.DataFrame`
+            pandas dataframes with `chunk_size` rows each loaded from specified path
+        """
+        raise NotImplementedError
+
     def write_df(self, df, outfile: str = None, sep: str = ",", index: bool = True):
         """
         Write a pandas dataframe to a file
@@ -257,4 +279,78 @@ class FileIO(object):
         file_path : str
             path to file to be removed
         """
-        raise NotImplementedError
\ No newline at end of file
+        raise NotImplementedError
+
+    def open_file(self, file_path: str, mode: str = "r"):
+        """
+        Open a file to stream its contents
+
+        Parameters
+        ----------
+        file_path : str
+            path to the file
+        mode : str, optional
+            mode to open the file in, as for the builtin `open`
+
+        Returns
+        -------
+        file object
+            file object to read from or write to
+        """
+        raise NotImplementedError
+
+    def get_file_size(self, file_path: str) -> int:
+        """
+        Get the size of a file
+
+        Parameters
+        ----------
+        file_path : str
+            path to the file
+
+        Returns
+        -------
+        int
+            size of the file in bytes
+        """
+        raise NotImplementedError
+
+    def get_modified_time(self, path: str) -> float:
+        """
+        Get the last modification time of a file or directory
+
+        Parameters
+        ----------
+        path : str
+            path to the file or directory
+
+        Returns
+        -------
+        float
+            modification time in seconds since the epoch
+        """
+        raise NotImplementedError
+
+    def touch(self, path: str):
+        """
+        Set the modification time of an existing file or directory to the current time
+
+        Parameters
+        ----------
+        path : str
+            path to the file or directory
+        """
+        raise NotImplementedError
+
+    def move(self, src_path: str, dest_path: str):
+        """
+        Move a file or directory. Fails if the destination exists
+
+        Parameters
+        ----------
+        src_path : str
+            path to the file or directory to be moved
+        dest_path : str
+            new path of the file or directory
+        """
+        raise NotImplementedError
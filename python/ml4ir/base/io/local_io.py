@@ -141,6 +141,63 @@ class LocalIO(FileIO):
              for infile in infiles]
         )
 
+    def read_df_chunks(
+            self, infile: str, chunk_size: int, sep: str = ",", index_col: int = None, na_filter: bool = False,
+            **kwargs
+    ):
+        """
+        Load a pandas dataframe from a file in chunks of rows
+
+        Parameters
+        ----------
+        infile : str
+            path to the csv input file; can be hdfs path
+        chunk_size : int
+            number of rows in each chunk
+        sep : str, optional
+            separator to use for loading file
+        index_col : int, optional
+            column to be used as index
+        na_filter: bool
+            whether to convert empty string or the string with na_values (null, nan, ...) to NaN.
+
+        Yields
+        ------
+        `pandas.DataFrame`
+            pandas dataframes with `chunk_size` rows each loaded from file
+
+        Notes
+        -----
+        Unlike `read_df`, bad lines are not collected and are only reported as warnings by pandas
+        """
+        self.log("Loading dataframe in chunks of {} rows from path : {}".format(chunk_size, infile))
+
+        escape_char = None
+        if "use_escape_char" in kwargs and kwargs["use_escape_char"]:
+            escape_char = "\\"
+        if infile.endswith(".gz"):
+            fp = gzip.open(os.path.expanduser(infile), "rb")
+        else:
+            fp = open(os.path.expanduser(infile), "r")
+
+        try:
+            for df in pd.read_csv(
+                fp,
+                sep=sep,
+                index_col=index_col,
+                skipinitialspace=True,
+                quotechar='"',
+                escapechar=escape_char,
+                error_bad_lines=False,
+                warn_bad_lines=True,
+                engine="c",
+                na_filter=na_filter,
+                chunksize=chunk_size
+            ):
+                yield df
+        finally:
+            fp.close()
+
     def write_df(self, df, outfile: str = None, sep: str = ",", index: bool = True) -> str:
         """
         Write a pandas dataframe to a file
@@ -313,6 +370,88 @@ class LocalIO(FileIO):
             os.remove(file_path)
             self.log("File deleted : {}".format(file_path))
 
+    def open_file(self, file_path: str, mode: str = "r"):
+        """
+        Open a file to stream its contents
+
+        Parameters
+        ----------
+        file_path : str
+            path to the file
+        mode : str, optional
+            mode to open the file in, as for the builtin `open`
+
+        Returns
+        -------
+        file object
+            file object to read from or write to
+        """
+        return open(file_path, mode)
+
+    def get_file_size(self, file_path: str) -> int:
+        """
+        Get the size of a file
+
+        Parameters
+        ----------
+        file_path : str
+            path to the file
+
+        Returns
+        -------
+        int
+            size of the file in bytes
+        """
+        return os.path.getsize(file_path)
+
+    def get_modified_time(self, path: str) -> float:
+        """
+        Get the last modification time of a file or directory
+
+        Parameters
+        ----------
+        path : str
+            path to the file or directory
+
+        Returns
+        -------
+        float
+            modification time in seconds since the epoch
+        """
+        return os.path.getmtime(path)
+
+    def touch(self, path: str):
+        """
+        Set the modification time of an existing file or directory to the current time
+
+        Parameters
+        ----------
+        path : str
+            path to the file or directory
+        """
+        os.utime(path)
+
+    def move(self, src_path: str, dest_path: str):
+        """
+        Move a file or directory. Fails if the destination exists
+
+        Parameters
+        ----------
+        src_path : str
+            path to the file or directory to be moved
+        dest_path : str
+            new path of the file or directory
+
+        Raises
+        ------
+        FileExistsError
+            if `dest_path` already exists
+        """
+        if os.path.exists(dest_path):
+            raise FileExistsError("Path already exists : {}".format(dest_path))
+        os.rename(src_path, dest_path)
+        self.log("Moved {} to {}".format(src_path, dest_path))
+
     def save_numpy_array(self, np_array, file_path: str, allow_pickle=True, zip=True, **kwargs):
         """
         Save a numpy array to disk
@@ -0,0 +1,294 @@
+import gzip
+import io
+import queue
+import sys
+import threading
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+from ml4ir.base.config.keys import PredictionsFormatKey
+from ml4ir.base.io.file_io import FileIO
+
+
+class PredictionSink(object):
+    """
+    Abstract class defining the destination of the batches of predictions made with a RelevanceModel
+
+    Use as a context manager to make sure that all the batches are flushed once the predictions are done
+    """
+
+    outfile: Optional[str] = None
+
+    def write(self, predictions_df: pd.DataFrame):
+        """
+        Write a batch of predictions
+
+        Parameters
+        ----------
+        predictions_df : `pd.DataFrame`
+            pandas DataFrame containing the predictions for a batch
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Flush the batches of predictions written so far and release the sink"""
+        pass
+
+    def get_predictions(self) -> Optional[pd.DataFrame]:
+        """
+        Get the predictions collected by the sink
+
+        Returns
+        -------
+        `pd.DataFrame`
+            pandas DataFrame containing all the predictions, None if they were written to `outfile`
+        """
+        return None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class InMemoryPredictionSink(PredictionSink):
+    """Collects the batches of predictions in memory"""
+
+    def __init__(self):
+        self.predictions_df_list = list()
+
+    def write(self, predictions_df: pd.DataFrame):
+        self.predictions_df_list.append(predictions_df)
+
+    def get_predictions(self) -> Optional[pd.DataFrame]:
+        return pd.concat(self.predictions_df_list)
+
+
+class CSVPredictionSink(PredictionSink):
+    """Streams the batches of predictions to a CSV file, optionally gzip compressed"""
+
+    def __init__(self, outfile: str, file_io: FileIO, compression: Optional[str] = None,
+                 legacy_printing: bool = False):
+        """
+        Parameters
+        ----------
+        outfile : str
+            Path to the CSV file to write the predictions to
+        file_io : `FileIO`
+            file I/O handler to open the CSV file with
+        compression : {None, "gzip"}
+            Compression to apply to the CSV file
+        legacy_printing : bool
+            Write the array valued predictions with the numpy 1.13 legacy printing mode
+        """
+        if compression not in (None, "gzip"):
+            raise ValueError("Unsupported compression for the predictions CSV file: {}".format(compression))
+
+        self.outfile = outfile
+        self.raw_file = file_io.open_file(outfile, "wb")
+        if compression == "gzip":
+            # Favor the compression speed so that writing keeps up with the inference
+            binary_file = gzip.GzipFile(fileobj=self.raw_file, mode="wb", compresslevel=1)
+        else:
+            binary_file = self.raw_file
+        self.file = io.TextIOWrapper(binary_file, encoding="utf-8", newline="")
+        self.write_header = True
+
+        # write the full line in the csv not the truncated version.
+        self.print_options = dict(
+            formatter={"all": lambda x: str(x.decode("utf-8"))
+            if isinstance(x, bytes) else str(x)},
+            linewidth=sys.maxsize, threshold=sys.maxsize)
+        if legacy_printing:
+            self.print_options["legacy"] = "1.13"
+
+    def write(self, predictions_df: pd.DataFrame):
+        predictions_df = decode_bytes_columns(predictions_df)
+
+        # Write the headers only with the first batch
+        with np.printoptions(**self.print_options):
+            predictions_df.to_csv(self.file, header=self.write_header, index=False)
+        self.write_header = False
+
+    def close(self):
+        self.file.close()
+        # GzipFile does not close the file object it wraps
+        self.raw_file.close()
+
+
+class ParquetPredictionSink(PredictionSink):
+    """Streams the batches of predictions to a Parquet file, one row group per batch"""
+
+    def __init__(self, outfile: str, file_io: FileIO):
+        """
+        Parameters
+        ----------
+        outfile : str
+            Path to the Parquet file to write the predictions to
+        file_io : `FileIO`
+            file I/O handler to open the Parquet file with
+        """
+        if pq is None:
+            raise ImportError("pyarrow is required to write the predictions to a Parquet file. "
+                              "Install it with `pip install ml4ir[parquet]`")
+
+        self.outfile = outfile
+        self.file_io = file_io
+        self.file = None
+        self.writer = None
+
+    def write(self, predictions_df: pd.DataFrame):
+        predictions_df = decode_bytes_columns(predictions_df)
+
+        if self.writer:
+            table = pa.Table.from_pandas(predictions_df, schema=self.writer.schema, preserve_index=False)
+        else:
+            # The schema of the Parquet file is inferred from the first batch
+            table = pa.Table.from_pandas(predictions_df, preserve_index=False)
+            self.file = self.file_io.open_file(self.outfile, "wb")
+            self.writer = pq.ParquetWriter(self.file, table.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer:
+            self.writer.close()
+            self.file.close()
+
+
+class BackgroundPredictionSink(PredictionSink):
+    """
+    Writes the batches of predictions to a wrapped sink from a background thread
+
+    The batches are passed through a bounded queue, so that the predictions on the next batches
+    can be computed while the previous batches are written, while holding a bounded number of
+    batches in memory. The batches are written in the order they are received.
+    """
+
+    _STOP = object()
+
+    def __init__(self, sink: PredictionSink, max_queue_size: int = 8):
+        """
+        Parameters
+        ----------
+        sink : `PredictionSink`
+            Sink to write the batches of predictions to
+        max_queue_size : int
+            Maximum number of batches waiting to be written. `write` blocks when the queue is full
+        """
+        self.sink = sink
+        self.outfile = sink.outfile
+        self.queue = queue.Queue(maxsize=max_queue_size)
+        self.error = None
+        self.closed = False
+
+        self.thread = threading.Thread(target=self._run, name="PredictionSinkWriter", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            predictions_df = self.queue.get()
+            if predictions_df is self._STOP:
+                break
+
+            # Keep consuming the queue after an error so that the producer never blocks
+            if self.error is None:
+                try:
+                    self.sink.write(predictions_df)
+                except Exception as e:
+                    self.error = e
+
+    def write(self, predictions_df: pd.DataFrame):
+        if self.error is not None:
+            raise self.error
+
+        self.queue.put(predictions_df)
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.queue.put(self._STOP)
+            self.thread.join()
+            self.sink.close()
+
+        if self.error is not None:
+            raise self.error
+
+    def get_predictions(self) -> Optional[pd.DataFrame]:
+        return self.sink.get_predictions()
+
+
+def decode_bytes_columns(predictions_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Decode the bytes features in the predictions to strings
+
+    Parameters
+    ----------
+    predictions_df : `pd.DataFrame`
+        pandas DataFrame containing the predictions for a batch
+
+    Returns
+    -------
+    `pd.DataFrame`
+        pandas DataFrame with the bytes columns decoded in place
+    """
+    for col in predictions_df.columns:
+        if isinstance(predictions_df[col].values[0], bytes):
+            predictions_df[col] = predictions_df[col].str.decode("utf8")
+
+    return predictions_df
+
+
+def get_prediction_sink(
+    outfile: Optional[str] = None,
+    file_io: Optional[FileIO] = None,
+    predictions_format: str = PredictionsFormatKey.CSV,
+    max_queue_size: int = 0,
+    legacy_printing: bool = False,
+) -> PredictionSink:
+    """
+    Create the sink to write the predictions of a RelevanceModel to
+
+    Parameters
+    ----------
+    outfile : str, optional
+        Path to the file to write the predictions to. The predictions are collected in memory if not specified
+    file_io : `FileIO`, optional
+        file I/O handler to open `outfile` with. Required if `outfile` is specified
+    predictions_format : {"csv", "csv.gz", "parquet"}
+        File format to write the predictions in
+    max_queue_size : int
+        Maximum number of batches waiting to be written by a background thread.
+        The batches are written synchronously if 0
+    legacy_printing : bool
+        Write the array valued predictions to CSV files with the numpy 1.13 legacy printing mode
+
+    Returns
+    -------
+    `PredictionSink`
+        Sink to write the batches of predictions to
+    """
+    if not outfile:
+        return InMemoryPredictionSink()
+
+    if predictions_format == PredictionsFormatKey.CSV:
+        sink = CSVPredictionSink(outfile, file_io, legacy_printing=legacy_printing)
+    elif predictions_format == PredictionsFormatKey.CSV_GZIP:
+        sink = CSVPredictionSink(outfile, file_io, compression="gzip", legacy_printing=legacy_printing)
+    elif predictions_format == PredictionsFormatKey.PARQUET:
+        sink = ParquetPredictionSink(outfile, file_io)
+    else:
+        raise ValueError("Unsupported predictions format: {}".format(predictions_format))
+
+    if max_queue_size > 0:
+        sink = BackgroundPredictionSink(sink, max_queue_size=max_queue_size)
+
+    return sink
@@ -15,7 +15,8 @@ from tensorflow.keras import layers
 from ml4ir.base.config.keys import FeatureTypeKey
 from ml4ir.base.features.feature_config import FeatureConfig
 from ml4ir.base.io.file_io import FileIO
-from ml4ir.base.model.architectures.utils import instantiate_keras_layer
+from ml4ir.base.model.architectures.utils import instantiate_keras_layer, get_trimmed_sequence_size, \
+    trim_sequence, pad_sequence
 
 
 class CycleFoundException(Exception):
@@ -220,6 +221,7 @@ class AutoDagNetwork(keras.Model):
     OP_IDENTIFIER = "op"
     LAYER_KWARGS = "args"
     TIED_WEIGHTS = "tie_weights"
+    TRIM_SEQUENCE = "trim_sequence"
     DEFAULT_VIZ_SAVE_PATH = "./"
     GRAPH_VIZ_FILE_NAME = "auto_dag_network.png"
 
@@ -250,6 +252,9 @@ class AutoDagNetwork(keras.Model):
 
         self.model_graph = self.define_architecture(model_config)
 
+        # Trim the padded records beyond the longest query of each batch before the forward pass
+        self.trim_padded_records = model_config.get(self.TRIM_SEQUENCE, False)
+
         self.execution_order: List[LayerNode] = self.model_graph.topological_sort()
         # The line below is important for tensorflow to register the available params for the model
         # An alternative is to do this in build()
@@ -361,6 +366,12 @@ class AutoDagNetwork(keras.Model):
         """
         all_features = {**inputs[FeatureTypeKey.TRAIN], **inputs[FeatureTypeKey.METADATA]}
 
+        trim_sequence_enabled = self.trim_padded_records and FeatureTypeKey.MASK in all_features
+        if trim_sequence_enabled:
+            sequence_size = tf.shape(all_features[FeatureTypeKey.MASK])[1]
+            trimmed_sequence_size = get_trimmed_sequence_size(all_features[FeatureTypeKey.MASK])
+            all_features = trim_sequence(all_features, sequence_size, trimmed_sequence_size)
+
         # Do not modify the input
         outputs = {k: v for k, v in all_features.items()}
 
@@ -394,4 +405,8 @@ class AutoDagNetwork(keras.Model):
         else:
             scores = model_output
 
+        # Pad the scores of the trimmed records back to the sequence size of the inputs
+        if trim_sequence_enabled:
+            scores = pad_sequence(scores, sequence_size)
+
         return scores
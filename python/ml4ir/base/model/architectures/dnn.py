@@ -4,12 +4,13 @@ from tensorflow.keras import layers
 from typing import List
 
 from ml4ir.base.config.keys import FeatureTypeKey
-from ml4ir.base.features.feature_config import FeatureConfig
+from ml4ir.base.features.feature_config import FeatureConfig, SequenceExampleFeatureConfig
 from ml4ir.base.features.feature_fns.categorical import get_vocabulary_info
 from ml4ir.applications.ranking.config.keys import PositionalBiasHandler
 from ml4ir.base.io.file_io import FileIO
 from ml4ir.base.model.layers.fixed_additive_positional_bias import FixedAdditivePositionalBias
-from ml4ir.base.model.architectures.utils import get_keras_layer_subclasses, instantiate_keras_layer
+from ml4ir.base.model.architectures.utils import get_keras_layer_subclasses, instantiate_keras_layer, \
+    get_trimmed_sequence_size, trim_sequence, pad_sequence
 from ml4ir.applications.ranking.model.layers.set_rank_encoder import SetRankEncoder
 from ml4ir.applications.ranking.model.layers.normalization import QueryNormalization
 
@@ -30,6 +31,8 @@ class DNNLayerKey:
     SET_RANK_ENCODER = "set_rank_encoder"
     CONCATENATED_INPUT = "concatenated_input"
     REQUIRES_MASK = "requires_mask"
+    TRIM_SEQUENCE = "trim_sequence"
+    FACTORIZE_CONTEXT_FEATURES = "factorize_context_features"
 
 
 class DNN(keras.Model):
@@ -63,10 +66,26 @@ class DNN(keras.Model):
         # Concat all train features to get a dense feature vector
         self.concat_input_op = layers.Concatenate(axis=-1, name=DNNLayerKey.CONCATENATED_INPUT)
 
+        # Trim the padded records beyond the longest query of each batch before the forward pass
+        self.trim_padded_records = model_config.get(DNNLayerKey.TRIM_SEQUENCE, False)
+
         # Store if a layer requires mask to be passed during forward pass
         self.layer_ops_requires_mask = [layer_args.get(DNNLayerKey.REQUIRES_MASK, False) for layer_args in model_config[DNNLayerKey.LAYERS]]
         self.layer_ops: List = self.define_architecture(model_config, feature_config)
 
+        # Run the first dense layer on the context features once per query and broadcast-add
+        # the result to the records instead of processing a copy of the context features for each record
+        self.factorize_context_features = model_config.get(DNNLayerKey.FACTORIZE_CONTEXT_FEATURES, False)
+        if self.factorize_context_features and not isinstance(self.layer_ops[0], layers.Dense):
+            raise ValueError("{} requires the first layer of the DNN to be of type {}".format(
+                DNNLayerKey.FACTORIZE_CONTEXT_FEATURES, DNNLayerKey.DENSE))
+        if self.factorize_context_features and not isinstance(feature_config, SequenceExampleFeatureConfig):
+            raise ValueError("{} requires a SequenceExample feature config defining context features".format(
+                DNNLayerKey.FACTORIZE_CONTEXT_FEATURES))
+        # The interaction model does not tile these features to the records when they are factorized
+        self.untiled_context_features = set(feature_config.get_context_features("node_name")) \
+            if self.factorize_context_features else set()
+
         if DNNLayerKey.POSITIONAL_BIAS_HANDLER in self.model_config and self.model_config[DNNLayerKey.POSITIONAL_BIAS_HANDLER][
             "key"] == PositionalBiasHandler.FIXED_ADDITIVE_POSITIONAL_BIAS:
             self.positional_bias_layer = FixedAdditivePositionalBias(max_ranks=self.model_config[DNNLayerKey.POSITIONAL_BIAS_HANDLER]["max_ranks"],
@@ -132,6 +151,62 @@ class DNN(keras.Model):
         """Build the DNN model"""
         self.train_features = sorted(input_shape[FeatureTypeKey.TRAIN])
 
+        if self.factorize_context_features:
+            context_features = set(self.feature_config.get_context_features("node_name"))
+            self.context_train_features = [f for f in self.train_features if f in context_features]
+            self.record_train_features = [f for f in self.train_features if f not in context_features]
+            if not self.record_train_features:
+                raise ValueError("{} requires at least one trainable sequence feature".format(
+                    DNNLayerKey.FACTORIZE_CONTEXT_FEATURES))
+
+    def factorized_dense(self, dense_op: layers.Dense, train_features: dict):
+        """
+        Apply the first dense layer to the concatenated train features by splitting its kernel
+        between the record and context features. The context features are projected once per query
+        and the projection is broadcast-added to the projection of the features of each record
+
+        Parameters
+        ----------
+        dense_op: layers.Dense
+            First dense layer of the DNN
+        train_features: dict of tensors
+            Train feature tensors of shape [batch_size, sequence_size, feature_size]. The context
+            features are of shape [batch_size, 1, feature_size] as they are not tiled by the interaction
+            model. If they are tiled to the records, only the first record is used
+
+        Returns
+        -------
+        tf.Tensor
+            Output of the dense layer, identical to applying it to the concatenated train features
+        """
+        # Kernel rows of each feature in the concatenated input, sorted by feature name
+        feature_rows, offset = dict(), 0
+        for feature in self.train_features:
+            feature_size = train_features[feature].shape[-1]
+            feature_rows[feature] = list(range(offset, offset + feature_size))
+            offset += feature_size
+        if not dense_op.built:
+            dense_op.build(tf.TensorShape([None, None, offset]))
+
+        record_input = tf.concat([train_features[f] for f in self.record_train_features], axis=-1)
+        outputs = tf.tensordot(
+            record_input,
+            tf.gather(dense_op.kernel, [row for f in self.record_train_features for row in feature_rows[f]]),
+            axes=1)
+        if self.context_train_features:
+            context_input = tf.concat([train_features[f][:, :1] for f in self.context_train_features], axis=-1)
+            outputs += tf.tensordot(
+                context_input,
+                tf.gather(dense_op.kernel, [row for f in self.context_train_features for row in feature_rows[f]]),
+                axes=1)
+
+        if dense_op.use_bias:
+            outputs = tf.nn.bias_add(outputs, dense_op.bias)
+        if dense_op.activation is not None:
+            outputs = dense_op.activation(outputs)
+
+        return outputs
+
     def call(self, inputs, training=None):
         """
         Perform the forward pass for the architecture layer
@@ -151,13 +226,25 @@ class DNN(keras.Model):
         train_features = inputs[FeatureTypeKey.TRAIN]
         metadata_features = inputs[FeatureTypeKey.METADATA]
 
+        trim_sequence_enabled = self.trim_padded_records and FeatureTypeKey.MASK in metadata_features
+        if trim_sequence_enabled:
+            sequence_size = tf.shape(metadata_features[FeatureTypeKey.MASK])[1]
+            trimmed_sequence_size = get_trimmed_sequence_size(metadata_features[FeatureTypeKey.MASK])
+            train_features = trim_sequence(train_features, sequence_size, trimmed_sequence_size)
+            metadata_features = trim_sequence(metadata_features, sequence_size, trimmed_sequence_size)
+
         # Concat input features to get a single vector representation
-        layer_input = self.concat_input_op([train_features[k] for k in sorted(train_features)])
+        if self.factorize_context_features:
+            layer_input = self.factorized_dense(self.layer_ops[0], train_features)
+        else:
+            layer_input = self.concat_input_op([train_features[k] for k in sorted(train_features)])
 
         # Pass ranking features through all the layers of the DNN
-        for layer_op, requires_mask in zip(self.layer_ops, self.layer_ops_requires_mask):
-            if requires_mask:
-                mask = inputs[FeatureTypeKey.METADATA][FeatureTypeKey.MASK]
+        for i, (layer_op, requires_mask) in enumerate(zip(self.layer_ops, self.layer_ops_requires_mask)):
+            if i == 0 and self.factorize_context_features:
+                continue
+            elif requires_mask:
+                mask = metadata_features[FeatureTypeKey.MASK]
                 layer_input = layer_op(layer_input, mask=mask, training=training)
             else:
                 layer_input = layer_op(layer_input, training=training)
@@ -178,4 +265,8 @@ class DNN(keras.Model):
         else:
             scores = layer_input
 
+        # Pad the scores of the trimmed records back to the sequence size of the inputs
+        if trim_sequence_enabled:
+            scores = pad_sequence(scores, sequence_size)
+
         return scores
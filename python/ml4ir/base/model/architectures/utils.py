@@ -64,3 +64,73 @@ def instantiate_keras_layer(layer_type: str, layer_args: Dict) -> tf.keras.layer
         raise KeyError(f"Layer type: '{layer_type}' "
                        f"is not supported or not found in subclasses of "
                        f"keras.layers.Layer: '{json.dumps(get_keras_layer_subclasses(), indent=4)}'")
+
+
+def get_trimmed_sequence_size(mask: tf.Tensor) -> tf.Tensor:
+    """
+    Get the number of records of the batch up to the last unmasked record of any query
+
+    Parameters
+    ----------
+    mask: tf.Tensor
+        Mask of the padded records of each query
+        Shape: [batch_size, sequence_size]
+
+    Returns
+    -------
+    tf.Tensor
+        Scalar int32 tensor with the trimmed sequence size, at least 1
+    """
+    positions = tf.range(1, tf.shape(mask)[1] + 1)
+    return tf.maximum(tf.reduce_max(positions * tf.cast(tf.not_equal(mask, 0), tf.int32)), 1)
+
+
+def trim_sequence(features: Dict[str, tf.Tensor],
+                  sequence_size: tf.Tensor,
+                  trimmed_sequence_size: tf.Tensor) -> Dict[str, tf.Tensor]:
+    """
+    Trim the sequence axis of the feature tensors to `trimmed_sequence_size` records
+
+    Parameters
+    ----------
+    features: dict of tf.Tensor
+        Feature tensors with the records of the queries along the second axis
+    sequence_size: tf.Tensor
+        Number of records of the padded queries, as given by the mask.
+        Only tensors with this many entries along the second axis are trimmed
+    trimmed_sequence_size: tf.Tensor
+        Number of records to keep
+
+    Returns
+    -------
+    dict of tf.Tensor
+        Trimmed feature tensors. Tensors with less than 2 dimensions or whose
+        second axis is not the sequence axis, like query level vectors, are left as is
+    """
+    def trim(feature):
+        if len(feature.shape) < 2:
+            return feature
+        feature_size = tf.shape(feature)[1]
+        return feature[:, :tf.where(tf.equal(feature_size, sequence_size), trimmed_sequence_size, feature_size)]
+
+    return {name: trim(feature) for name, feature in features.items()}
+
+
+def pad_sequence(tensor: tf.Tensor, sequence_size: tf.Tensor) -> tf.Tensor:
+    """
+    Pad the sequence axis of a trimmed tensor with zeros back to `sequence_size` records
+
+    Parameters
+    ----------
+    tensor: tf.Tensor
+        Tensor with the records of the queries along the second axis
+    sequence_size: tf.Tensor
+        Number of records of the padded tensor
+
+    Returns
+    -------
+    tf.Tensor
+        Tensor padded to `sequence_size` records
+    """
+    paddings = [[0, 0], [0, sequence_size - tf.shape(tensor)[1]]] + [[0, 0]] * (len(tensor.shape) - 2)
+    return tf.pad(tensor, paddings)
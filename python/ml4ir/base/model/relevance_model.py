@@ -1,15 +1,15 @@
 import os
-import sys
 from logging import Logger
 from typing import Optional, List, Union, Tuple
 
 import numpy as np
 import pandas as pd
 import tensorflow as tf
-from ml4ir.base.config.keys import LearningRateScheduleKey
+from ml4ir.base.config.keys import LearningRateScheduleKey, PredictionsFormatKey
 from ml4ir.base.data.relevance_dataset import RelevanceDataset
 from ml4ir.base.features.feature_config import FeatureConfig
 from ml4ir.base.io.file_io import FileIO
+from ml4ir.base.io.prediction_sink import PredictionSink, get_prediction_sink
 from ml4ir.base.model.calibration.temperature_scaling import temperature_scale, \
     TemperatureScalingLayer
 from ml4ir.base.model.callbacks.debugging import DebuggingCallback
@@ -26,6 +26,7 @@ from tensorflow.keras.optimizers import Optimizer
 
 class RelevanceModelConstants:
 
+    MODEL_PREDICTIONS_FILE = "model_predictions"
     MODEL_PREDICTIONS_CSV_FILE = "model_predictions.csv"
     METRICS_CSV_FILE = "metrics.csv"
     GROUP_METRICS_CSV_FILE = "group_metrics.csv"
@@ -48,7 +49,9 @@ class RelevanceModel:
             compile_keras_model: bool = False,
             output_name: str = "score",
             logger=None,
-            eval_config: dict = {}
+            eval_config: dict = {},
+            predictions_format: str = PredictionsFormatKey.CSV,
+            predictions_writer_queue_size: int = 0
     ):
         """
         Constructor to instantiate a RelevanceModel that can be used for
@@ -87,6 +90,11 @@ class RelevanceModel:
             logging handler for status messages
         eval_config : dict
             A dictionary of Evaluation config parameters
+        predictions_format : {"csv", "csv.gz", "parquet"}
+            File format to write the model predictions to the logs directory in
+        predictions_writer_queue_size : int
+            Maximum number of batches of predictions waiting to be written by a background thread.
+            The predictions are written synchronously if 0
         """
         self.feature_config: FeatureConfig = feature_config
         self.logger: Logger = logger
@@ -94,6 +102,8 @@ class RelevanceModel:
         self.scorer = scorer
         self.tfrecord_type = tfrecord_type
         self.file_io = file_io
+        self.predictions_format = predictions_format
+        self.predictions_writer_queue_size = predictions_writer_queue_size
 
         if len(eval_config) == 0:
             self.eval_config = self.file_io.read_yaml(RelevanceModelConstants.DEFAULT_EVAL_CONFIG_YAML)
@@ -518,11 +528,6 @@ class RelevanceModel:
             pandas DataFrame containing the predictions on the test dataset
             made with the `RelevanceModel`
         """
-        if logs_dir:
-            outfile = os.path.join(logs_dir, RelevanceModelConstants.MODEL_PREDICTIONS_CSV_FILE)
-            # Delete file if it exists
-            self.file_io.rm_file(outfile)
-
         _predict_fn = get_predict_fn(
             model=self.model,
             tfrecord_type=self.tfrecord_type,
@@ -536,42 +541,67 @@ class RelevanceModel:
             max_sequence_size=self.max_sequence_size,
         )
 
-        predictions_df_list = list()
         batch_count = 0
-        for predictions_dict in test_dataset.map(_predict_fn).take(-1):
-            predictions_df = pd.DataFrame(predictions_dict)
-
-            if logs_dir:
-                np.set_printoptions(
-                    formatter={"all": lambda x: str(x.decode("utf-8"))
-                    if isinstance(x, bytes) else str(x)},
-                    linewidth=sys.maxsize, threshold=sys.maxsize)  # write the full line in the csv not the truncated version.
-
-                # Decode bytes features to strings
-                for col in predictions_df.columns:
-                    if isinstance(predictions_df[col].values[0], bytes):
-                        predictions_df[col] = predictions_df[col].str.decode("utf8")
-
-                if os.path.isfile(outfile):
-                    predictions_df.to_csv(outfile, mode="a", header=False, index=False)
-                else:
-                    # If writing first time, write headers to CSV file
-                    predictions_df.to_csv(outfile, mode="w", header=True, index=False)
+        with self.get_prediction_sink(logs_dir) as prediction_sink:
+            for predictions_dict in test_dataset.map(_predict_fn).take(-1):
+                prediction_sink.write(pd.DataFrame(predictions_dict))
 
-            else:
-                predictions_df_list.append(predictions_df)
+                batch_count += 1
+                if batch_count % logging_frequency == 0:
+                    self.logger.info("Finished predicting scores for {} batches".format(batch_count))
 
-            batch_count += 1
-            if batch_count % logging_frequency == 0:
-                self.logger.info("Finished predicting scores for {} batches".format(batch_count))
+        return self.collect_predictions(prediction_sink)
 
-        predictions_df = None
-        if logs_dir:
-            self.logger.info("Model predictions written to -> {}".format(outfile))
-        else:
-            predictions_df = pd.concat(predictions_df_list)
+    def get_prediction_sink(self, logs_dir: Optional[str] = None, legacy_printing: bool = False) -> PredictionSink:
+        """
+        Get the sink to write the model predictions to and delete the existing predictions file
+
+        Parameters
+        ----------
+        logs_dir : str, optional
+            Path to directory to save logs
+        legacy_printing : bool, optional
+            Write the array valued predictions to CSV files with the numpy 1.13 legacy printing mode
+
+        Returns
+        -------
+        `PredictionSink`
+            Sink streaming the predictions to a file in `logs_dir` in the `predictions_format`,
+            or collecting them in memory if no `logs_dir` is specified
+        """
+        if not logs_dir:
+            return get_prediction_sink()
+
+        outfile = os.path.join(
+            logs_dir, "{}.{}".format(RelevanceModelConstants.MODEL_PREDICTIONS_FILE, self.predictions_format))
+        # Delete file if it exists
+        self.file_io.rm_file(outfile)
+
+        return get_prediction_sink(
+            outfile=outfile,
+            file_io=self.file_io,
+            predictions_format=self.predictions_format,
+            max_queue_size=self.predictions_writer_queue_size,
+            legacy_printing=legacy_printing)
+
+    def collect_predictions(self, prediction_sink: PredictionSink) -> Optional[pd.DataFrame]:
+        """
+        Finish logging the predictions
+
+        Parameters
+        ----------
+        prediction_sink : `PredictionSink`
+            Closed sink the predictions for each batch were written to
+
+        Returns
+        -------
+        `pd.DataFrame`
+            pandas DataFrame containing all the predictions if they were collected in memory, None otherwise
+        """
+        if prediction_sink.outfile:
+            self.logger.info("Model predictions written to -> {}".format(prediction_sink.outfile))
 
-        return predictions_df
+        return prediction_sink.get_predictions()
 
     def evaluate(
             self,
@@ -625,6 +655,72 @@ class RelevanceModel:
         else:
             raise NotImplementedError
 
+    def predict_and_evaluate(
+            self,
+            test_dataset: data.TFRecordDataset,
+            inference_signature: str = "serving_default",
+            additional_features: dict = {},
+            group_metrics_min_queries: int = 50,
+            logs_dir: Optional[str] = None,
+            logging_frequency: int = 25
+    ):
+        """
+        Predict the scores on the test dataset and evaluate the RelevanceModel
+
+        Parameters
+        ----------
+        test_dataset: an instance of tf.data.dataset
+        inference_signature : str, optional
+            If using a SavedModel for prediction, specify the inference signature to be used for computing scores
+        additional_features : dict, optional
+            Dictionary containing new feature name and function definition to
+            compute them. Use this to compute additional features from the scores.
+            For example, converting ranking scores for each document into ranks for
+            the query
+        group_metrics_min_queries : int, optional
+            Minimum count threshold per group to be considered for computing
+            groupwise metrics
+        logs_dir : str, optional
+            Path to directory to save logs
+        logging_frequency : int
+            Value representing how often(in batches) to log status
+
+        Returns
+        -------
+        predictions_df : `pd.DataFrame`
+            pandas DataFrame containing the predictions on the test dataset,
+            None if the predictions are written to `logs_dir`
+        df_overall_metrics : `pd.DataFrame` object
+            `pd.DataFrame` containing overall metrics
+        df_groupwise_metrics : `pd.DataFrame` object
+            `pd.DataFrame` containing groupwise metrics if
+            group_metric_keys are defined in the FeatureConfig
+        metrics_dict : dict
+            metrics as a dictionary of metric names mapping to values
+
+        Notes
+        -----
+        Runs `evaluate()` and `predict()` one after the other, traversing the test dataset twice.
+        Override this method to compute the predictions and metrics with a single traversal.
+        """
+        df_overall_metrics, df_groupwise_metrics, metrics_dict = self.evaluate(
+            test_dataset=test_dataset,
+            inference_signature=inference_signature,
+            additional_features=dict(additional_features),
+            group_metrics_min_queries=group_metrics_min_queries,
+            logs_dir=logs_dir,
+            logging_frequency=logging_frequency,
+        )
+        predictions_df = self.predict(
+            test_dataset=test_dataset,
+            inference_signature=inference_signature,
+            additional_features=dict(additional_features),
+            logs_dir=logs_dir,
+            logging_frequency=logging_frequency,
+        )
+
+        return predictions_df, df_overall_metrics, df_groupwise_metrics, metrics_dict
+
     def run_ttest(self, mean, variance, n, ttest_pvalue_threshold):
         """
         Compute the paired t-test statistic and its p-value given mean, standard deviation and sample count
@@ -657,7 +753,8 @@ class RelevanceModel:
             pad_sequence: bool = False,
             sub_dir: str = "final",
             dataset: Optional[RelevanceDataset] = None,
-            experiment_details: Optional[dict] = None
+            experiment_details: Optional[dict] = None,
+            batch_serving_signatures: bool = False
     ):
         """
         Save the RelevanceModel as a tensorflow SavedModel to the `models_dir`
@@ -669,6 +766,12 @@ class RelevanceModel:
         * `tfrecord`: serving signature that allows keras model to be served using TFRecord proto messages.
                   Allows definition of custom pre/post processing logic
 
+        * `tfrecord_batch`: [if `batch_serving_signatures`] same as `tfrecord`, but parses the whole batch
+                  of TFRecord proto messages with a single batched parse
+
+        * `tfrecord_ragged`: [if `batch_serving_signatures`] scores many SequenceExample queries in one call
+                  and returns the scores of each query as the flat values and row lengths of a ragged tensor
+
         Additionally, each model layer is also saved as a separate numpy zipped
         array to enable transfer learning with other ml4ir models.
 
@@ -697,6 +800,8 @@ class RelevanceModel:
             and customize.
         experiment_details: dict
             Dictionary containing metadata and results about the current experiment
+        batch_serving_signatures: bool, optional
+            Additionally save the `tfrecord_batch` and `tfrecord_ragged` serving signatures
 
         Notes
         -----
@@ -713,6 +818,8 @@ class RelevanceModel:
 
         Currently supported
         - signature to read TFRecord SequenceExample inputs
+        - [optional] signature to read a batch of TFRecord inputs with a single batched parse
+        - [optional] signature to score many SequenceExample queries with ragged outputs
         """
         self.model.save(
             filepath=os.path.join(model_file, "tfrecord"),
@@ -725,6 +832,7 @@ class RelevanceModel:
                 required_fields_only=required_fields_only,
                 pad_sequence=pad_sequence,
                 max_sequence_size=self.max_sequence_size,
+                batch_serving_signatures=batch_serving_signatures,
             ),
         )
 
@@ -67,6 +67,9 @@ class InteractionModel(keras.Model):
         self.feature_transform_ops = dict()
         self.label_transform_op = None
 
+        # Trainable context features consumed once per query by the architecture, which are not tiled to the records
+        self.untiled_context_features = set()
+
 
 class UnivariateInteractionModel(InteractionModel):
     """Keras layer that applies in-graph transformations to input feature tensors"""
@@ -204,14 +207,16 @@ class UnivariateInteractionModel(InteractionModel):
 
             """
             NOTE: If the trainable feature is of type context, then we tile/duplicate
-            the values for all examples of the sequence
+            the values for all examples of the sequence, unless the architecture
+            consumes it once per query
             """
             if (
                 self.tfrecord_type == TFRecordTypeKey.SEQUENCE_EXAMPLE
                 and feature_info[TFRECORD_TYPE] == SequenceExampleTypeKey.CONTEXT
             ):
                 if feature_info[TRAINABLE]:
-                    feature_tensor = tf.tile(feature_tensor, train_tile_shape)
+                    if feature_node_name not in self.untiled_context_features:
+                        feature_tensor = tf.tile(feature_tensor, train_tile_shape)
                 else:
                     feature_tensor = tf.tile(feature_tensor, metadata_tile_shape)
 
@@ -2,7 +2,6 @@ import tensorflow as tf
 from tensorflow import keras
 from typing import List, Dict
 import numpy as np
-from tensorflow.keras import backend as K
 
 from ml4ir.base.config.keys import TFRecordTypeKey
 from ml4ir.base.features.feature_config import FeatureConfig
@@ -19,6 +18,7 @@ def get_predict_fn(
     features_to_return: List = [],
     additional_features: Dict = {},
     max_sequence_size: int = 0,
+    flatten_records: bool = True,
 ):
     """
     Define a prediction function to convert input features into scores.
@@ -51,6 +51,10 @@ def get_predict_fn(
     max_sequence_size : int, optional
         Maximum size of the sequence in a TFRecord SequenceExample protobuf
         object
+    flatten_records : bool, optional
+        Whether to collapse the query and record dimensions of SequenceExample
+        outputs and remove the padded records. If False, the outputs are kept
+        as padded [batch_size, max_sequence_size] tensors and the mask is returned
 
     Returns
     -------
@@ -119,6 +123,15 @@ def get_predict_fn(
         for feature_name, feature_fn in additional_features.items():
             predictions_dict[feature_name] = feature_fn(features, label, scores)
 
+        if not flatten_records:
+            for feature_name in predictions_dict.keys():
+                if isinstance(predictions_dict[feature_name], dict):
+                    predictions_dict[feature_name] = predictions_dict[feature_name][output_name]
+            if tfrecord_type == TFRecordTypeKey.SEQUENCE_EXAMPLE:
+                predictions_dict["mask"] = features["mask"]
+
+            return predictions_dict
+
         # Explode context features to each record for logging
         # NOTE: This assumes that the record dimension is on axis 1, like previously
         for feature_name in predictions_dict.keys():
@@ -128,7 +141,7 @@ def get_predict_fn(
             if tfrecord_type == TFRecordTypeKey.SEQUENCE_EXAMPLE:
                 feat_ = tf.cond(
                     tf.equal(tf.shape(feat_)[1], tf.constant(1)),
-                    true_fn=lambda: K.repeat_elements(feat_, rep=max_sequence_size, axis=1),
+                    true_fn=lambda: tf.repeat(feat_, repeats=tf.shape(features["mask"])[1], axis=1),
                     false_fn=lambda: feat_,
                 )
 
@@ -7,7 +7,9 @@ import tensorflow as tf
 from tensorflow import keras
 from tensorflow.keras.metrics import Metric
 
-from ml4ir.applications.ranking.model.metrics.metrics_impl import MeanRankMetric
+from ml4ir.applications.ranking.model.metrics.metrics_impl import MeanRankMetric, SegmentMRR, NDCG, \
+    RankingMetricContext
+from ml4ir.applications.ranking.model.metrics.aux_metrics_impl import RankMatchFailure
 from ml4ir.base.config.keys import FeatureTypeKey
 from ml4ir.base.features.feature_config import FeatureConfig
 from ml4ir.base.io.file_io import FileIO
@@ -110,6 +112,7 @@ class RelevanceScorer(keras.Model):
         self.output_name = output_name
         self.logs_dir = logs_dir
         self.architecture_op = self.get_architecture_op()
+        self.set_untiled_context_features()
         self.plot_abstract_model()
 
     @classmethod
@@ -174,6 +177,11 @@ class RelevanceScorer(keras.Model):
             **kwargs
         )
 
+    def set_untiled_context_features(self):
+        """Skip tiling the trainable context features that the architecture op consumes once per query"""
+        if hasattr(self.architecture_op, "untiled_context_features"):
+            self.interaction_model.untiled_context_features = set(self.architecture_op.untiled_context_features)
+
     def plot_abstract_model(self):
         """Visualize the model architecture if defined by the architecture op"""
         if hasattr(self.architecture_op, "plot_abstract_model"):
@@ -307,6 +315,8 @@ class RelevanceScorer(keras.Model):
         Notes
         -----
         - Currently only support pre-compiled Keras metrics
+        - The ranks of the predictions are computed once for all the ranking metrics
+          and shared through a `RankingMetricContext`
         """
         # Compute metrics on primary label
         try:
@@ -317,13 +327,20 @@ class RelevanceScorer(keras.Model):
             mask = None
         y_true = tf.cast(y_true, tf.float32)
 
+        # Ranks shared by the ranking metrics, computed on first use
+        context = RankingMetricContext(y_true, y_pred, mask)
+
         # Compute metrics on primary label
         segments = inputs.get(self.group_metric_feature)
         for compiled_metric in self.compiled_metrics._metrics:
-            if isinstance(compiled_metric, SegmentMean):
+            if isinstance(compiled_metric, SegmentMRR):
+                compiled_metric.update_state(y_true, y_pred, segments=segments, mask=mask, context=context)
+            elif isinstance(compiled_metric, SegmentMean):
                 compiled_metric.update_state(y_true, y_pred, segments=segments, mask=mask)
             elif isinstance(compiled_metric, MeanRankMetric):
-                compiled_metric.update_state(y_true, y_pred, mask=mask)
+                compiled_metric.update_state(y_true, y_pred, mask=mask, context=context)
+            elif isinstance(compiled_metric, NDCG):
+                compiled_metric.update_state(y_true, y_pred, context=context)
             else:
                 compiled_metric.update_state(y_true, y_pred)
 
@@ -335,7 +352,10 @@ class RelevanceScorer(keras.Model):
                 # TODO: The function definition could be made more generic
                 #       to accommodate more metrics in the future,
                 #       but this is sufficient for now
-                metric.update_state(y_true, y_pred, y_aux, y_true_ranks, mask)
+                if isinstance(metric, RankMatchFailure):
+                    metric.update_state(y_true, y_pred, y_aux, y_true_ranks, mask, context=context)
+                else:
+                    metric.update_state(y_true, y_pred, y_aux, y_true_ranks, mask)
 
     def train_step(self, data):
         """
@@ -375,10 +395,10 @@ class RelevanceScorer(keras.Model):
         # Return a dict mapping metric names to current value
         return {metric.name: metric.result() for metric in self.metrics}
 
-    def test_step(self, data):
+    def evaluate_step(self, data):
         """
-        Defines the operations performed within a single prediction or evaluation step.
-        Called implicitly by tensorflow-keras when using model.predict() or model.evaluate()
+        Defines the operations performed within a single evaluation step
+        and returns the model outputs so that the same forward pass can be used for prediction
 
         Parameters
         ----------
@@ -388,7 +408,7 @@ class RelevanceScorer(keras.Model):
         Returns
         -------
         dict
-            Dictionary of metrics and loss computed for this evaluation step
+            Dictionary of output tensors of the model for this evaluation step
         """
         X, y = data
 
@@ -396,7 +416,8 @@ class RelevanceScorer(keras.Model):
         if self.interaction_model.label_transform_op:
             y = self.interaction_model.label_transform_op(y, training=False)
 
-        y_pred = self(X, training=False)[self.output_name]
+        outputs = self(X, training=False)
+        y_pred = outputs[self.output_name]
 
         # Update loss metric
         self.__update_loss(inputs=X, y_true=y, y_pred=y_pred)
@@ -404,6 +425,25 @@ class RelevanceScorer(keras.Model):
         # Update metrics
         self.__update_metrics(inputs=X, y_true=y, y_pred=y_pred)
 
+        return outputs
+
+    def test_step(self, data):
+        """
+        Defines the operations performed within a single prediction or evaluation step.
+        Called implicitly by tensorflow-keras when using model.predict() or model.evaluate()
+
+        Parameters
+        ----------
+        data: tuple of tensor objects
+            Tuple of features and corresponding labels to be used to evaluate the model
+
+        Returns
+        -------
+        dict
+            Dictionary of metrics and loss computed for this evaluation step
+        """
+        self.evaluate_step(data)
+
         # Return a dict mapping metric names to current value
         return {metric.name: metric.result() for metric in self.metrics}
 
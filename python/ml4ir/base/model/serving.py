@@ -1,11 +1,15 @@
 import tensorflow as tf
 from tensorflow import TensorSpec, TensorArray
 
-from ml4ir.base.config.keys import ServingSignatureKey
-from ml4ir.base.data.tfrecord_reader import get_parse_fn
+from ml4ir.base.config.keys import ServingSignatureKey, TFRecordTypeKey
+from ml4ir.base.data.tfrecord_reader import get_parse_fn, get_batch_parse_fn
 from ml4ir.base.features.feature_config import FeatureConfig
 from ml4ir.base.io.file_io import FileIO
 
+# Output names of the ragged serving signature
+PREDICTIONS_NAME = "predictions"
+ROW_LENGTHS_NAME = "row_lengths"
+
 
 def define_default_signature(model, feature_config):
     """Default serving signature to take each model feature as input and outputs the scores"""
@@ -71,7 +75,9 @@ def define_tfrecord_signature(
     there is no real way to generate a dense tensor of ranking scores from different queries,
     as they might have varying number of records in each of them.
 
-    Workaround: To infer on multiple queries, run predict() on each of the queries separately.
+    Workaround: To infer on multiple queries, use the `define_tfrecord_ragged_signature`
+    serving signature which scores queries padded to the longest query in the batch
+    and returns the scores of each query as ragged tensor components.
     """
 
     tfrecord_parse_fn = get_parse_fn(
@@ -133,6 +139,173 @@ def define_tfrecord_signature(
     return _serve_tfrecord
 
 
+def define_tfrecord_batch_signature(
+    model,
+    tfrecord_type: str,
+    feature_config: FeatureConfig,
+    preprocessing_keys_to_fns: dict,
+    postprocessing_fn=None,
+    required_fields_only: bool = True,
+    pad_sequence: bool = False,
+    max_sequence_size: int = 0,
+):
+    """
+    Serving signature that parses the whole batch of TFRecord protos with a
+    single batched parse and applies the feature preprocessing on the batched tensors
+    before running the keras model trained as a RelevanceModel
+
+    Parameters
+    ----------
+    model : keras Model
+        Keras model object to be saved
+    tfrecord_type : {"example", "sequence_example"}
+        Type of the TFRecord protobuf that the saved model will be used on at serving time
+    feature_config : `FeatureConfig` object
+        FeatureConfig object that defines the input features into the model
+        and the corresponding feature preprocesing functions to be used
+        in the serving signature
+    preprocessing_keys_to_fns : dict
+        Dictionary mapping function names to tf.functions that should be saved in the preprocessing step of the tfrecord serving signature
+    postprocessing_fn: function
+        custom tensorflow compatible postprocessing function to be used at serving time.
+        Saved as part of the postprocessing layer of the tfrecord serving signature
+    required_fields_only: bool
+        boolean value defining if only required fields
+        need to be added to the tfrecord parsing function at serving time
+    pad_sequence: bool, optional
+        Value defining if sequences should be padded to `max_sequence_size` for SequenceExample
+        proto inputs at serving time. If False, the sequences are padded to the longest sequence
+        in the batch and the mask identifies the padded records.
+    max_sequence_size : int, optional
+        Maximum sequence size for SequenceExample protobuf
+        The protobuf object will be padded or clipped to this value
+
+    Returns
+    -------
+    `tf.function`
+        Serving signature function that accepts a TFRecord string tensor and returns predictions
+
+    Notes
+    -----
+    Produces the same predictions as the `define_tfrecord_signature` serving signature
+    without looping over the protos. Custom preprocessing functions that are not elementwise
+    are still mapped over the records of the batch.
+    """
+    tfrecord_batch_parse_fn = get_batch_parse_fn(
+        feature_config=feature_config,
+        tfrecord_type=tfrecord_type,
+        preprocessing_keys_to_fns=preprocessing_keys_to_fns,
+        max_sequence_size=max_sequence_size,
+        required_fields_only=required_fields_only,
+        pad_sequence=pad_sequence,
+    )
+
+    # Define a serving signature for a batch of tfrecords
+    @tf.function(input_signature=[TensorSpec(shape=[None], dtype=tf.string)])
+    def _serve_tfrecord_batch(protos):
+        features_dict, labels = tfrecord_batch_parse_fn(protos)
+
+        # Run the model to get predictions
+        predictions = model(inputs=features_dict)
+
+        # Define a post hook
+        if postprocessing_fn:
+            predictions = postprocessing_fn(predictions, features_dict)
+
+        return predictions
+
+    return _serve_tfrecord_batch
+
+
+def define_tfrecord_ragged_signature(
+    model,
+    tfrecord_type: str,
+    feature_config: FeatureConfig,
+    preprocessing_keys_to_fns: dict,
+    postprocessing_fn=None,
+    required_fields_only: bool = True,
+    pad_sequence: bool = False,
+    max_sequence_size: int = 0,
+):
+    """
+    Serving signature that scores many SequenceExample queries with a single forward pass
+    and returns the scores of each query without the padded records
+
+    The queries are padded to the longest query in the batch and masked before running the
+    keras model. As signatures can only return dense tensors, each prediction is returned as
+    the flat values of a ragged tensor with one row per query, along with the `row_lengths`.
+    The per query scores can be recovered with `tf.RaggedTensor.from_row_lengths`.
+
+    Parameters
+    ----------
+    model : keras Model
+        Keras model object to be saved
+    tfrecord_type : {"sequence_example"}
+        Type of the TFRecord protobuf that the saved model will be used on at serving time
+    feature_config : `FeatureConfig` object
+        FeatureConfig object that defines the input features into the model
+        and the corresponding feature preprocesing functions to be used
+        in the serving signature
+    preprocessing_keys_to_fns : dict
+        Dictionary mapping function names to tf.functions that should be saved in the preprocessing step of the tfrecord serving signature
+    postprocessing_fn: function
+        custom tensorflow compatible postprocessing function to be used at serving time.
+        Saved as part of the postprocessing layer of the tfrecord serving signature
+    required_fields_only: bool
+        boolean value defining if only required fields
+        need to be added to the tfrecord parsing function at serving time
+    pad_sequence: bool, optional
+        Value defining if sequences should be padded to `max_sequence_size` instead of
+        the longest query in the batch before scoring
+    max_sequence_size : int, optional
+        Maximum sequence size for SequenceExample protobuf
+        The protobuf object will be padded or clipped to this value
+
+    Returns
+    -------
+    `tf.function`
+        Serving signature function that accepts a TFRecord string tensor and returns
+        the flat predictions of all the queries and the number of records in each query
+    """
+    if tfrecord_type != TFRecordTypeKey.SEQUENCE_EXAMPLE:
+        raise ValueError("Ragged serving signature is only supported for SequenceExample protos")
+
+    tfrecord_batch_parse_fn = get_batch_parse_fn(
+        feature_config=feature_config,
+        tfrecord_type=tfrecord_type,
+        preprocessing_keys_to_fns=preprocessing_keys_to_fns,
+        max_sequence_size=max_sequence_size,
+        required_fields_only=required_fields_only,
+        pad_sequence=pad_sequence,
+    )
+
+    # Define a serving signature for a batch of queries with ragged outputs
+    @tf.function(input_signature=[TensorSpec(shape=[None], dtype=tf.string)])
+    def _serve_tfrecord_ragged(protos):
+        features_dict, labels = tfrecord_batch_parse_fn(protos)
+
+        # Run the model on all the queries padded to the same size
+        predictions = model(inputs=features_dict)
+
+        # Define a post hook
+        if postprocessing_fn:
+            predictions = postprocessing_fn(predictions, features_dict)
+
+        # Drop the scores of the padded records from each query
+        row_lengths = tf.reduce_sum(tf.cast(tf.not_equal(features_dict["mask"], 0), tf.int64), axis=1)
+        if not isinstance(predictions, dict):
+            predictions = {PREDICTIONS_NAME: predictions}
+        ragged_predictions = {
+            name: tf.RaggedTensor.from_tensor(prediction, lengths=row_lengths).flat_values
+            for name, prediction in predictions.items()
+        }
+        ragged_predictions[ROW_LENGTHS_NAME] = row_lengths
+
+        return ragged_predictions
+
+    return _serve_tfrecord_ragged
+
+
 def define_serving_signatures(
     model,
     tfrecord_type: str,
@@ -142,6 +315,7 @@ def define_serving_signatures(
     required_fields_only: bool = True,
     pad_sequence: bool = False,
     max_sequence_size: int = 0,
+    batch_serving_signatures: bool = False,
 ):
     """
     Defines all serving signatures for the SavedModel
@@ -170,6 +344,9 @@ def define_serving_signatures(
     max_sequence_size : int, optional
         Maximum sequence size for SequenceExample protobuf
         The protobuf object will be padded or clipped to this value
+    batch_serving_signatures : bool, optional
+        Additionally define the signature parsing a batch of protos at once and,
+        for SequenceExample models, the signature returning the ragged scores of many queries
 
     Returns
     -------
@@ -179,17 +356,27 @@ def define_serving_signatures(
 
     Notes
     -----
-    Currently only supports TFRecord serving signature
+    Currently only supports TFRecord serving signatures, parsing the protos
+    one at a time and, if `batch_serving_signatures` is set, as a batch
     """
-    return {
-        ServingSignatureKey.TFRECORD: define_tfrecord_signature(
-            model=model,
-            tfrecord_type=tfrecord_type,
-            feature_config=feature_config,
-            preprocessing_keys_to_fns=preprocessing_keys_to_fns,
-            postprocessing_fn=postprocessing_fn,
-            required_fields_only=required_fields_only,
-            pad_sequence=pad_sequence,
-            max_sequence_size=max_sequence_size,
-        )
+    signature_args = dict(
+        model=model,
+        tfrecord_type=tfrecord_type,
+        feature_config=feature_config,
+        preprocessing_keys_to_fns=preprocessing_keys_to_fns,
+        postprocessing_fn=postprocessing_fn,
+        required_fields_only=required_fields_only,
+        pad_sequence=pad_sequence,
+        max_sequence_size=max_sequence_size,
+    )
+    signatures = {
+        ServingSignatureKey.TFRECORD: define_tfrecord_signature(**signature_args),
     }
+    if batch_serving_signatures:
+        signatures[ServingSignatureKey.TFRECORD_BATCH] = define_tfrecord_batch_signature(**signature_args)
+        if tfrecord_type == TFRecordTypeKey.SEQUENCE_EXAMPLE:
+            signatures[ServingSignatureKey.TFRECORD_RAGGED] = define_tfrecord_ragged_signature(
+                **signature_args
+            )
+
+    return signatures
@@ -6,7 +6,9 @@ import traceback
 import sys
 import time
 import ast
+import multiprocessing
 from argparse import Namespace
+from concurrent.futures import ProcessPoolExecutor
 from logging import Logger
 import pathlib
 from typing import List, Union, Type, Optional
@@ -42,6 +44,20 @@ from ml4ir.base.model.scoring.scorer_factory import get_scorer
 pd.set_option('display.max_colwidth', None)
 
 
+def _run_fold(pipeline_cls, args: Namespace, fold_id: int, folds_dir: str,
+              intra_op_threads: int, inter_op_threads: int):
+    """Train and evaluate a fold of the k-fold cross validation. Executed in the worker processes"""
+    tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+    tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+
+    pipeline = pipeline_cls.create_pipeline_for_kfold(args)
+    fold_relevance_dataset = pipeline.get_kfold_relevance_dataset(args.kfold, args.include_testset_in_kfold,
+                                                                  read_data_sets=False)
+    fold_relevance_dataset.create_folds(fold_id, None, None, folds_dir)
+
+    return pipeline.run_pipeline(fold_relevance_dataset)
+
+
 class RelevancePipeline(object):
     """Base class that defines a pipeline to train, evaluate and save
     a RelevanceModel using ml4ir"""
@@ -256,6 +272,19 @@ class RelevancePipeline(object):
             logger=self.logger,
             non_zero_features_only=self.non_zero_features_only,
             keep_additional_info=self.keep_additional_info,
+            csv_chunk_size=self.args.csv_chunk_size,
+            csv_from_generator=self.args.csv_from_generator,
+            tfrecord_cache_dir=self.args.tfrecord_cache_dir,
+            tfrecord_cache_max_size_mb=self.args.tfrecord_cache_max_size_mb,
+            tfrecord_cache_hash_contents=self.args.tfrecord_cache_hash_contents,
+            ranklib_num_workers=self.args.ranklib_num_workers,
+            num_parallel_reads=self.args.num_parallel_reads,
+            interleave_cycle_length=self.args.interleave_cycle_length,
+            deterministic_reads=self.args.deterministic_reads,
+            num_file_shards=self.args.num_file_shards,
+            file_shard_index=self.args.file_shard_index,
+            num_length_buckets=self.args.num_length_buckets,
+            scale_bucket_batch_sizes=self.args.scale_bucket_batch_sizes,
             output_name=self.args.output_name
         )
 
@@ -308,6 +337,17 @@ class RelevancePipeline(object):
             logger=self.logger,
             non_zero_features_only=self.non_zero_features_only,
             keep_additional_info=self.keep_additional_info,
+            csv_chunk_size=self.args.csv_chunk_size,
+            csv_from_generator=self.args.csv_from_generator,
+            tfrecord_cache_dir=self.args.tfrecord_cache_dir,
+            tfrecord_cache_max_size_mb=self.args.tfrecord_cache_max_size_mb,
+            tfrecord_cache_hash_contents=self.args.tfrecord_cache_hash_contents,
+            ranklib_num_workers=self.args.ranklib_num_workers,
+            num_parallel_reads=self.args.num_parallel_reads,
+            interleave_cycle_length=self.args.interleave_cycle_length,
+            deterministic_reads=self.args.deterministic_reads,
+            num_file_shards=self.args.num_file_shards,
+            file_shard_index=self.args.file_shard_index,
             num_folds=num_folds,
             include_testset_in_kfold=include_testset_in_kfold,
             read_data_sets=read_data_sets,
@@ -433,11 +473,23 @@ class RelevancePipeline(object):
             file_io=self.local_io,
             logger=self.logger,
             eval_config=self.eval_config,
+            predictions_format=self.args.predictions_format,
+            predictions_writer_queue_size=self.args.predictions_writer_queue_size,
         )
 
         return relevance_model
 
-    def create_pipeline_for_kfold(self, args):
+    @classmethod
+    def create_pipeline_for_kfold(cls, args):
+        """
+        Create the pipeline used to run a fold of the kfold cross validation.
+        Defined as a class method as it is also called in the worker processes when running the folds in parallel
+
+        Parameters
+        ----------
+        args: argparse Namespace
+            arguments of the pipeline of the fold
+        """
         raise NotImplementedError
 
     def run(self):
@@ -479,6 +531,11 @@ class RelevancePipeline(object):
 
             merged_data = relevance_dataset.merge_datasets()
 
+            # write the queries of each fold once instead of re-reading the merged data for every fold.
+            # The folds are written to the models directory of the run to leave the data directory untouched
+            folds_dir = os.path.join(self.models_dir_local, "folds")
+            relevance_dataset.materialize_folds(merged_data, folds_dir)
+
             num_folds = self.args.kfold
             base_logs_dir = str(self.args.logs_dir)
             base_models_dir = str(self.args.models_dir)
@@ -489,21 +546,37 @@ class RelevancePipeline(object):
                 str(self.args.include_testset_in_kfold)))
 
             # when creating folds, the validation set is assigned fold i, test fold i+1 and training get the rest of folds
+            fold_args = []
             for fold_id in range(num_folds):
-                self.logger.info("fold={}".format(fold_id))
                 logs_dir = pathlib.Path(base_logs_dir) / self.args.run_id / \
                            "fold_{}".format(fold_id)
                 models_dir = pathlib.Path(base_models_dir) / \
                              self.args.run_id / "fold_{}".format(fold_id)
                 args.logs_dir = pathlib.Path(logs_dir).as_posix()
                 args.models_dir = pathlib.Path(models_dir).as_posix()
+                fold_args.append(copy.deepcopy(args))
+
+            num_workers = min(self.args.kfold_num_workers, num_folds)
+            if num_workers > 1 and self.args.file_handler != FileHandlerKey.LOCAL:
+                self.logger.warning(
+                    "Folds can only be run in parallel with the {} file handler. Running the folds sequentially".format(
+                        FileHandlerKey.LOCAL))
+                num_workers = 1
 
-                fold_relevance_dataset = self.get_kfold_relevance_dataset(args.kfold,
-                                                                          args.include_testset_in_kfold,
-                                                                          read_data_sets=False)
-                fold_relevance_dataset.create_folds(fold_id, merged_data, relevance_dataset)
-                pipeline = self.create_pipeline_for_kfold(args)
-                pipeline.run_pipeline(fold_relevance_dataset, fold_id)
+            try:
+                if num_workers > 1:
+                    self.run_folds_in_parallel(fold_args, folds_dir, num_workers)
+                else:
+                    for fold_id in range(num_folds):
+                        self.logger.info("fold={}".format(fold_id))
+                        fold_relevance_dataset = self.get_kfold_relevance_dataset(args.kfold,
+                                                                                  args.include_testset_in_kfold,
+                                                                                  read_data_sets=False)
+                        fold_relevance_dataset.create_folds(fold_id, merged_data, relevance_dataset, folds_dir)
+                        pipeline = self.create_pipeline_for_kfold(fold_args[fold_id])
+                        pipeline.run_pipeline(fold_relevance_dataset)
+            finally:
+                self.local_io.rm_dir(folds_dir)
 
             # removing intermediate directory and run kfold analysis
             self.local_io.rm_dir(os.path.join(self.data_dir_local, "tfrecord"))
@@ -517,6 +590,47 @@ class RelevancePipeline(object):
             job_status = "_FAILURE"
             job_info = "{}\n{}".format(str(e), traceback.format_exc())
 
+    def run_folds_in_parallel(self, fold_args: List[Namespace], folds_dir: str, num_workers: int):
+        """
+        Train and evaluate the folds of the k-fold cross validation concurrently in a pool of processes.
+        Each fold is run in its own process by the pipeline created with `create_pipeline_for_kfold`,
+        writing to its own logs and models directories.
+
+        Parameters
+        ----------
+        fold_args: list of argparse Namespace
+            arguments of the pipeline of each fold
+        folds_dir: str
+            path to the folds written by `KfoldRelevanceDataset.materialize_folds`
+        num_workers: int
+            number of folds to run concurrently
+
+        Returns
+        -------
+        list of dict
+            Experiment tracking dictionary of each fold
+        """
+        # Split the CPUs between the workers to avoid oversubscribing them
+        intra_op_threads = self.args.kfold_intra_op_threads or max(1, (os.cpu_count() or 1) // num_workers)
+        inter_op_threads = self.args.kfold_inter_op_threads or intra_op_threads
+        self.logger.info(
+            "Running {} folds with {} workers using {} intra-op and {} inter-op threads each".format(
+                len(fold_args), num_workers, intra_op_threads, inter_op_threads))
+
+        # Using spawn as tensorflow is not fork safe
+        with ProcessPoolExecutor(max_workers=num_workers,
+                                 mp_context=multiprocessing.get_context("spawn")) as executor:
+            futures = [executor.submit(_run_fold, self.__class__, args, fold_id, folds_dir,
+                                       intra_op_threads, inter_op_threads)
+                       for fold_id, args in enumerate(fold_args)]
+
+            experiment_tracking_dicts = []
+            for fold_id, future in enumerate(futures):
+                experiment_tracking_dicts.append(future.result())
+                self.logger.info("fold={} finished".format(fold_id))
+
+        return experiment_tracking_dicts
+
     def run_pipeline(self, relevance_dataset=None):
         """
         Run the pipeline to train, evaluate and save the model.
@@ -581,7 +695,24 @@ class RelevancePipeline(object):
                 # Add optimizer and learning rate schedule to experiment tracking dict
                 experiment_tracking_dict.update(relevance_model.model.optimizer.get_config())
 
-            if self.args.execution_mode in {
+            fuse_inference_evaluate = self.args.fuse_inference_evaluate and self.args.execution_mode in {
+                ExecutionModeKey.TRAIN_INFERENCE_EVALUATE,
+                ExecutionModeKey.INFERENCE_EVALUATE,
+                ExecutionModeKey.INFERENCE_EVALUATE_RESAVE,
+            }
+            if fuse_inference_evaluate:
+
+                # Predict relevance scores and evaluate with a single pass over the test data
+                _, _, _, test_metrics = relevance_model.predict_and_evaluate(
+                    test_dataset=relevance_dataset.test,
+                    inference_signature=self.args.inference_signature,
+                    additional_features={},
+                    group_metrics_min_queries=self.args.group_metrics_min_queries,
+                    logs_dir=self.logs_dir_local,
+                    logging_frequency=self.args.logging_frequency,
+                )
+
+            if not fuse_inference_evaluate and self.args.execution_mode in {
                 ExecutionModeKey.TRAIN_INFERENCE_EVALUATE,
                 ExecutionModeKey.TRAIN_EVALUATE,
                 ExecutionModeKey.EVALUATE_ONLY,
@@ -599,7 +730,7 @@ class RelevancePipeline(object):
                     logs_dir=self.logs_dir_local
                 )
 
-            if self.args.execution_mode in {
+            if not fuse_inference_evaluate and self.args.execution_mode in {
                 ExecutionModeKey.TRAIN_INFERENCE_EVALUATE,
                 ExecutionModeKey.TRAIN_INFERENCE,
                 ExecutionModeKey.INFERENCE_EVALUATE,
@@ -649,6 +780,7 @@ class RelevancePipeline(object):
                     required_fields_only=not self.args.use_all_fields_at_inference,
                     pad_sequence=self.args.pad_sequence_at_inference,
                     dataset=relevance_dataset,
+                    batch_serving_signatures=self.args.batch_serving_signatures,
                     experiment_details=experiment_tracking_dict
                 )
 
@@ -689,6 +821,7 @@ class RelevancePipeline(object):
                             pad_sequence=self.args.pad_sequence_at_inference,
                             sub_dir="final_calibrated",
                             dataset=relevance_dataset,
+                            batch_serving_signatures=self.args.batch_serving_signatures,
                             experiment_details=experiment_tracking_dict
                         )
 
@@ -1,3 +1,5 @@
+from collections.abc import Mapping
+
 import numpy as np
 import pandas as pd
 from scipy import stats
@@ -12,6 +14,262 @@ class StreamVariance:
     var = 0
 
 
+class GroupMetricStreamVariance(Mapping):
+    """
+    Accumulates the mean, variance and count of metrics for each group in batches (For power analysis evaluation)
+
+    The running stats are stored in arrays of shape [num_groups, num_metrics] and the stats of each batch
+    are merged with Chan's parallel algorithm in a single vectorized step:
+    https://en.wikipedia.org/wiki/Algorithms_for_calculating_variance#Parallel_algorithm
+
+    The accumulator can be read as a dictionary mapping each group to a dictionary of metric name
+    to `StreamVariance`, in the format used by `run_power_analysis`
+    """
+
+    def __init__(self):
+        self.group_index = dict()
+        self.metric_index = dict()
+        self.count = np.zeros((0, 0))
+        self.mean = np.zeros((0, 0))
+        self.m2 = np.zeros((0, 0))
+
+    @classmethod
+    def from_params(cls, group_metric_running_variance_params):
+        """
+        Get the accumulator for the intermediate mean, variance and sample size of the metrics
+
+        Parameters
+        ----------
+        group_metric_running_variance_params: GroupMetricStreamVariance or dict
+            Accumulator, or dictionary mapping each group to a dictionary of metric name to `StreamVariance`
+
+        Returns
+        -------
+        GroupMetricStreamVariance
+            The accumulator itself, or a new accumulator initialized with the stats in the dictionary
+        """
+        if isinstance(group_metric_running_variance_params, cls):
+            return group_metric_running_variance_params
+
+        accumulator = cls()
+        for group_name, group_params in group_metric_running_variance_params.items():
+            metrics = list(group_params)
+            accumulator.update([group_name], metrics,
+                               np.array([[group_params[metric].mean for metric in metrics]]),
+                               np.array([[group_params[metric].var for metric in metrics]]),
+                               np.array([[group_params[metric].count for metric in metrics]]))
+        return accumulator
+
+    def update_params(self, group_metric_running_variance_params):
+        """
+        Write the accumulated stats back into a dictionary of the stats, for the callers that accumulate
+        the stats in place in a dictionary
+
+        Parameters
+        ----------
+        group_metric_running_variance_params: GroupMetricStreamVariance or dict
+            Accumulator, or dictionary mapping each group to a dictionary of metric name to `StreamVariance`.
+            The accumulator itself is left unchanged
+
+        Returns
+        -------
+        GroupMetricStreamVariance
+            The accumulator
+        """
+        if group_metric_running_variance_params is not self and \
+                not isinstance(group_metric_running_variance_params, GroupMetricStreamVariance):
+            for group_name in self:
+                group_metric_running_variance_params[group_name] = self[group_name]
+        return self
+
+    def _get_indices(self, index, keys):
+        """Get the positions of the keys in the index, adding the new keys at the end"""
+        for key in keys:
+            if key not in index:
+                index[key] = len(index)
+        return np.array([index[key] for key in keys], dtype=np.int64)
+
+    def _resize(self):
+        """Grow the stats arrays to fit all the groups and metrics of the indices"""
+        num_groups, num_metrics = self.count.shape
+        if len(self.group_index) > num_groups or len(self.metric_index) > num_metrics:
+            # Reserve extra rows so that the arrays are not copied for every batch with new groups
+            num_rows = max(2 * num_groups, len(self.group_index)) if len(self.group_index) > num_groups else num_groups
+            for name in ["count", "mean", "m2"]:
+                array = np.zeros((num_rows, len(self.metric_index)))
+                array[:num_groups, :num_metrics] = getattr(self, name)
+                setattr(self, name, array)
+
+    def update(self, groups, metrics, mean, var, count):
+        """
+        Merge the mean, variance and count of the metrics computed on a new batch for each group
+
+        Parameters
+        ----------
+        groups: list
+            Names of the groups in the new batch
+        metrics: list
+            Names of the metrics in the new batch
+        mean, var, count: numpy array
+            The mean, variance and sample size of the metrics in the new batch of shape [len(groups), len(metrics)]
+        """
+        count = np.asarray(count, dtype=np.float64)
+        var = np.asarray(var, dtype=np.float64)
+        self.merge_arrays(groups, metrics, np.asarray(mean, dtype=np.float64), np.where(count > 1, var * (count - 1), 0.), count)
+
+    def merge(self, other):
+        """
+        Merge the stats accumulated independently by another accumulator, for instance on a different worker
+
+        Parameters
+        ----------
+        other: GroupMetricStreamVariance
+            The accumulator to merge
+        """
+        num_groups, num_metrics = len(other.group_index), len(other.metric_index)
+        self.merge_arrays(list(other.group_index), list(other.metric_index),
+                          other.mean[:num_groups, :num_metrics],
+                          other.m2[:num_groups, :num_metrics],
+                          other.count[:num_groups, :num_metrics])
+
+    def merge_arrays(self, groups, metrics, mean, m2, count):
+        """
+        Merge the mean, M2 (sum of squared distance from the mean) and count of the metrics for each group
+
+        Parameters
+        ----------
+        groups: list
+            Names of the unique groups to merge
+        metrics: list
+            Names of the unique metrics to merge
+        mean, m2, count: numpy array
+            The mean, M2 and sample size of the metrics of shape [len(groups), len(metrics)]
+        """
+        rows = self._get_indices(self.group_index, groups)
+        cols = self._get_indices(self.metric_index, metrics)
+        self._resize()
+        index = np.ix_(rows, cols)
+
+        count_a, mean_a, m2_a = self.count[index], self.mean[index], self.m2[index]
+        combined_count = count_a + count
+        # Groups with no samples for a metric so far and in the new batch keep a zero mean
+        safe_count = np.where(combined_count > 0, combined_count, 1.)
+        delta = mean - mean_a
+
+        self.mean[index] = mean_a + delta * count / safe_count
+        self.m2[index] = m2_a + m2 + delta ** 2 * count_a * count / safe_count
+        self.count[index] = combined_count
+
+    @property
+    def var(self):
+        """Sample variance of the metrics for each group, 0 with less than 2 samples"""
+        return np.divide(self.m2, self.count - 1, out=np.zeros_like(self.m2), where=self.count > 1)
+
+    def __getitem__(self, group_name):
+        i = self.group_index[group_name]
+        count, m2 = self.count[i], self.m2[i]
+        var = np.divide(m2, count - 1, out=np.zeros_like(m2), where=count > 1)
+        group_params = dict()
+        for metric, j in self.metric_index.items():
+            sv = StreamVariance()
+            sv.count = self.count[i, j]
+            sv.mean = self.mean[i, j]
+            sv.var = var[j]
+            group_params[metric] = sv
+        return group_params
+
+    def __iter__(self):
+        return iter(self.group_index)
+
+    def __len__(self):
+        return len(self.group_index)
+
+
+class StreamMoments:
+    """
+    Accumulates the count, mean and M2 (sum of squared distance from the mean) of a stream of values in batches
+
+    The moments of each batch are computed with NumPy and merged with the running moments with Chan's
+    parallel algorithm, so that moments accumulated independently, for instance on different workers,
+    can also be merged: https://en.wikipedia.org/wiki/Algorithms_for_calculating_variance#Parallel_algorithm
+    """
+
+    def __init__(self, count=0, mean=0., m2=0.):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+
+    def update(self, values):
+        """
+        Merge a batch of values into the running moments
+
+        Parameters
+        ----------
+        values: array-like
+            A batch of values
+
+        Returns
+        -------
+        StreamMoments
+            The updated moments
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if values.size == 0:
+            return self
+
+        batch_mean = values.mean()
+        return self.merge_moments(values.size, batch_mean, np.square(values - batch_mean).sum())
+
+    def merge(self, other):
+        """
+        Merge the moments accumulated independently on other values
+
+        Parameters
+        ----------
+        other: StreamMoments
+            The moments to merge
+
+        Returns
+        -------
+        StreamMoments
+            The updated moments
+        """
+        return self.merge_moments(other.count, other.mean, other.m2)
+
+    def merge_moments(self, count, mean, m2):
+        """
+        Merge the count, mean and M2 of other values into the running moments
+
+        Parameters
+        ----------
+        count: int
+            The number of other values
+        mean: float
+            The mean of the other values
+        m2: float
+            The sum of squared distance from the mean of the other values
+
+        Returns
+        -------
+        StreamMoments
+            The updated moments
+        """
+        if count == 0:
+            return self
+
+        combined_count = self.count + count
+        delta = mean - self.mean
+        self.mean = self.mean + delta * count / combined_count
+        self.m2 = self.m2 + m2 + delta ** 2 * self.count * count / combined_count
+        self.count = combined_count
+        return self
+
+    @property
+    def var(self):
+        """Sample variance of the values, 0 with less than 2 values"""
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.
+
+
 def power_ttest(d=None, n=None, power=None, alpha=0.05, contrast="two-samples", alternative="two-sided"):
     """
     This is extracted from: https://github.com/raphaelvallat/pingouin/blob/master/pingouin/power.py
@@ -197,7 +455,7 @@ def update_running_stats_for_t_test(clicked_records, agg_count, agg_mean, agg_M2
     Updated version of: agg_count, agg_mean, agg_M2
 
     """
-    diff = (clicked_records[metrics_helper.RankingConstants.DIFF_MRR]).to_list()
+    diff = clicked_records[metrics_helper.RankingConstants.DIFF_MRR].to_numpy()
     agg_count, agg_mean, agg_M2 = compute_stats_from_stream(diff, agg_count, agg_mean, agg_M2)
     return agg_count, agg_mean, agg_M2
 
@@ -230,11 +488,11 @@ def perform_click_rank_dist_paired_t_test(mean, variance, n):
 def compute_stats_from_stream(diff, count, mean, m2):
     """
     Compute the running mean, variance for a stream of data.
-    src: Welford's online algorithm: https://en.wikipedia.org/wiki/Algorithms_for_calculating_variance
+    The moments of the batch are merged with the running ones with `StreamMoments`
 
     Parameters
     ----------
-    diff: List
+    diff: array-like
         A batch of differences in rankings
     count: int
         Aggregates the number of samples seen so far
@@ -252,13 +510,8 @@ def compute_stats_from_stream(diff, count, mean, m2):
     m2: float
         The updated squared distance from the mean
     """
-    for i in range(len(diff)):
-        count += 1
-        delta = diff[i] - mean
-        mean += delta / count
-        delta2 = diff[i] - mean
-        m2 += delta * delta2
-    return count, mean, m2
+    moments = StreamMoments(count, mean, m2).update(diff)
+    return moments.count, moments.mean, moments.m2
 
 
 def t_test_log_results(t_test_stat, pvalue, ttest_pvalue_threshold, logger):
@@ -328,38 +581,35 @@ def compute_batched_stats(df, group_metric_running_variance_params, group_key, v
     df: dataframe
             A batch of the model's prediction
 
-    group_metric_running_variance_params: dict
-        A dictionary containing intermediate mean, variance and sample size for each group for each metric
+    group_metric_running_variance_params: GroupMetricStreamVariance or dict
+        The intermediate mean, variance and sample size for each group for each metric, updated in place
 
      group_key: list
         The list of keys used to aggregate the metrics
 
     variance_list: list
             Lists of metrics for variance computation in batches
-    """
-
-    # computing batch-wise mean and variance per metric
-    metric_stat_df_list = []
-    grouped = df.groupby(group_key)
-    for metric in variance_list:
-        grouped_agg = grouped.apply(lambda x: x[metric].mean())
-        mean_df = pd.DataFrame(
-            {str(group_key): grouped_agg.keys().values, str([metric, "mean"]): grouped_agg.values})
-
-        grouped_agg = grouped.apply(lambda x: x[metric].var())
-        var_df = pd.DataFrame({str(group_key): grouped_agg.keys().values, str([metric, "var"]): grouped_agg.values})
 
-        grouped_agg = grouped.apply(lambda x: x[metric].count())
-        count_df = pd.DataFrame(
-            {str(group_key): grouped_agg.keys().values, str([metric, "count"]): grouped_agg.values})
+    Returns
+    -------
+    GroupMetricStreamVariance
+        The updated mean, variance and sample size for each group for each metric.
+        Passing it to the next batch avoids converting the dictionary again
+    """
+    params = group_metric_running_variance_params
+    group_metric_running_variance_params = GroupMetricStreamVariance.from_params(params)
 
-        concat_df = pd.concat([mean_df, var_df, count_df], axis=1)
-        metric_stat_df_list.append(concat_df)
+    # computing batch-wise mean, variance and count for all the groups and metrics at once
+    variance_list = list(variance_list)
+    grouped = df.groupby(group_key)[variance_list]
+    batch_count = grouped.count()
+    batch_mean = grouped.mean().fillna(0)
+    batch_var = grouped.var().fillna(0)
 
-    running_stats_df = pd.concat(metric_stat_df_list, axis=1)
-    running_stats_df = running_stats_df.loc[:, ~running_stats_df.columns.duplicated()]
     # Accumulating batch-wise mean and variances
-    return compute_groupwise_running_variance_for_metrics(variance_list, group_metric_running_variance_params, running_stats_df, group_key)
+    group_metric_running_variance_params.update(batch_count.index.tolist(), variance_list,
+                                                batch_mean.values, batch_var.values, batch_count.values)
+    return group_metric_running_variance_params.update_params(params)
 
 
 def compute_groupwise_running_variance_for_metrics(metric_list, group_metric_running_variance_params, running_stats_df, group_key):
@@ -369,60 +619,52 @@ def compute_groupwise_running_variance_for_metrics(metric_list, group_metric_run
     metric_list: list
             Lists of metrics for variance computation in batches
 
-    group_metric_running_variance_params: dict
-        A dictionary containing intermediate mean, variance and sample size for each group for each metric
+    group_metric_running_variance_params: GroupMetricStreamVariance or dict
+        The intermediate mean, variance and sample size for each group for each metric, updated in place
 
     running_stats_df: pandas dataframe
         The incoming batch of mean and variance
 
     group_key: list
         The list of keys used to aggregate the metrics
+
+    Returns
+    -------
+    GroupMetricStreamVariance
+        The updated mean, variance and sample size for each group for each metric.
+        Passing it to the next batch avoids converting the dictionary again
     """
+    params = group_metric_running_variance_params
+    group_metric_running_variance_params = GroupMetricStreamVariance.from_params(params)
+
     running_stats_df = running_stats_df.fillna(0)
-    for row in running_stats_df.iterrows():
-        group_name = row[1][str(group_key)]
-        if group_name in group_metric_running_variance_params:
-            group_params = group_metric_running_variance_params[group_name]
-        else:
-            group_params = {}
-            group_metric_running_variance_params[group_name] = group_params
-
-        for metric in metric_list:
-            new_mean = row[1][str([metric, "mean"])]
-            new_var = row[1][str([metric, "var"])]
-            new_count = row[1][str([metric, "count"])]
-
-            if metric in group_params:
-                sv = group_metric_running_variance_params[group_name][metric]
-            else:
-                sv = StreamVariance()
-
-            # update the current mean and variance
-            # https://math.stackexchange.com/questions/2971315/how-do-i-combine-standard-deviations-of-two-groups
-            if (sv.count + new_count) == 0:
-                # skip the current batch when there is no new samples for the metric in the current batch.
-                # this can happen when the batch has bad queries
-                combined_count = sv.count
-                combined_mean = sv.mean
-                combined_var = sv.var
-            else:
-                combined_mean = (sv.count * sv.mean + new_count * new_mean) / (sv.count + new_count)
-
-                combined_count = sv.count + new_count
-
-                if (sv.count + new_count - 1) != 0:
-                    combined_var = (((sv.count - 1) * sv.var + (new_count - 1) * new_var) / (sv.count + new_count - 1)) + \
-                                  ((sv.count * new_count * (sv.mean - new_mean) ** 2) / (
-                                              (sv.count + new_count) * (sv.count + new_count - 1)))
-                else:
-                    combined_var = 0
-
-            sv.count = combined_count
-            sv.mean = combined_mean
-            sv.var = combined_var
+    group_metric_running_variance_params.update(
+        running_stats_df[str(group_key)].tolist(),
+        metric_list,
+        running_stats_df[[str([metric, "mean"]) for metric in metric_list]].values,
+        running_stats_df[[str([metric, "var"]) for metric in metric_list]].values,
+        running_stats_df[[str([metric, "count"]) for metric in metric_list]].values)
+    return group_metric_running_variance_params.update_params(params)
 
-            group_params[metric] = sv
-            group_metric_running_variance_params[group_name] = group_params
+
+def merge_group_metric_running_variance_params(group_metric_running_variance_params, batch_params):
+    """
+    This function updates the intermediate mean and variance for each group for each metric
+    with the ones computed independently on a new batch.
+    ----------
+    group_metric_running_variance_params: GroupMetricStreamVariance or dict
+        The intermediate mean, variance and sample size for each group for each metric
+
+    batch_params: GroupMetricStreamVariance or dict
+        The mean, variance and sample size for each group for each metric of the new batch
+
+    Returns
+    -------
+    group_metric_running_variance_params: GroupMetricStreamVariance
+        The updated mean, variance and sample size for each group for each metric
+    """
+    group_metric_running_variance_params = GroupMetricStreamVariance.from_params(group_metric_running_variance_params)
+    group_metric_running_variance_params.merge(GroupMetricStreamVariance.from_params(batch_params))
     return group_metric_running_variance_params
 
 
@@ -464,6 +706,128 @@ def compute_required_sample_size(mean1, mean2, var1, var2, statistical_power, pv
         return np.inf
 
 
+def compute_paired_ttest_power(d, n, alpha):
+    """
+    Computes the power of a two-sided paired t-test for arrays of effect sizes and sample sizes.
+    This is the vectorized counterpart of `power_ttest` with contrast="paired" and alternative="two-sided"
+    ----------
+    d: numpy array
+        Cohen d effect sizes
+    n: numpy array
+        Sample sizes
+    alpha: float
+        Significance level
+
+    Returns
+    -------
+    power: numpy array
+        The power of the test for each effect size and sample size
+    """
+    dof = n - 1
+    nc = d * np.sqrt(n)
+    tcrit = stats.t.ppf(1 - alpha / 2, dof)
+    return stats.nct.sf(tcrit, dof, nc) + stats.nct.cdf(-tcrit, dof, nc)
+
+
+def solve_paired_ttest_sample_size(d, power, alpha, rtol=1e-10, maxiter=100):
+    """
+    Computes the sample sizes required by a two-sided paired t-test to reach the power for an array of effect sizes.
+    This is the vectorized counterpart of `power_ttest` with n=None, contrast="paired" and alternative="two-sided"
+
+    All the equations are solved at once with the Illinois variant of the regula falsi method over the same
+    bracket as `power_ttest`, starting from the normal approximation of the sample size with Guenther's correction.
+    ----------
+    d: numpy array
+        Cohen d effect sizes
+    power: float
+        Test power (= 1 - type II error)
+    alpha: float
+        Significance level
+    rtol: float
+        Relative tolerance on the sample sizes
+    maxiter: int
+        Maximum number of iterations
+
+    Returns
+    -------
+    n: numpy array
+        The required sample sizes, nan when there is no solution in the bracket as with `power_ttest`
+    """
+    d = np.abs(np.asarray(d, dtype=np.float64))
+    n = np.full(d.shape, np.nan)
+    lo = np.full(d.shape, 2 + 1e-10)
+    hi = np.full(d.shape, 1e07)
+    with np.errstate(all="ignore"):
+        f_lo = compute_paired_ttest_power(d, lo, alpha) - power
+        f_hi = compute_paired_ttest_power(d, hi, alpha) - power
+
+        # The power increases with the sample size, there is no solution unless it crosses the required power
+        active = (f_lo < 0) & (f_hi > 0)
+        x = ((stats.norm.ppf(1 - alpha / 2) + stats.norm.ppf(power)) / d) ** 2 + stats.norm.ppf(1 - alpha / 2) ** 2 / 2
+        # Which end of the bracket was updated on the previous iteration, for the Illinois correction
+        last_side = np.zeros(d.shape, dtype=np.int8)
+
+        for _ in range(maxiter):
+            idx = np.flatnonzero(active)
+            if idx.size == 0:
+                break
+
+            # Fall back to bisection when the candidate falls outside of the bracket
+            x_i = x[idx]
+            outside = ~((x_i > lo[idx]) & (x_i < hi[idx]))
+            x_i[outside] = (lo[idx][outside] + hi[idx][outside]) / 2
+            f_x = compute_paired_ttest_power(d[idx], x_i, alpha) - power
+
+            below = f_x < 0
+            above = f_x > 0
+            lo_idx, hi_idx = idx[below], idx[above]
+            # Halve the function value of the end of the bracket that is kept twice in a row
+            f_hi[lo_idx[last_side[lo_idx] == -1]] /= 2
+            f_lo[hi_idx[last_side[hi_idx] == 1]] /= 2
+            lo[lo_idx], f_lo[lo_idx], last_side[lo_idx] = x_i[below], f_x[below], -1
+            hi[hi_idx], f_hi[hi_idx], last_side[hi_idx] = x_i[above], f_x[above], 1
+
+            x[idx] = (lo[idx] * f_hi[idx] - hi[idx] * f_lo[idx]) / (f_hi[idx] - f_lo[idx])
+            converged = (f_x == 0) | (np.abs(x[idx] - x_i) <= rtol * x_i) | (hi[idx] - lo[idx] <= rtol * x_i)
+            n[idx[converged]] = np.where(f_x[converged] == 0, x_i[converged], x[idx[converged]])
+            # Equations where the power could not be evaluated are left unsolved
+            active[idx[converged | np.isnan(f_x)]] = False
+
+    return n
+
+
+def compute_required_sample_sizes(mean1, mean2, var1, var2, statistical_power, pvalue):
+    """
+    Computes the required sample sizes for a statistically significant change given arrays of means and variances
+    of the metrics. This is the vectorized counterpart of `compute_required_sample_size`
+    ----------
+    mean1: numpy array
+        The means of the samples 1 (E.g. baseline MRR)
+    mean2: numpy array
+        The means of the samples 2 (E.g. new MRR)
+    var1: numpy array
+        The variances of the samples 1 (E.g. baseline MRR)
+    var2: numpy array
+        The variances of the samples 2 (E.g. new MRR)
+    statistical_power: float
+        Required statistical power
+    pvalue: float
+        Required pvalue
+
+    Returns
+    -------
+    req_sample_sz: numpy array
+        The required samples for statistically significant change
+    """
+    # compute the effect sizes (d)
+    denominator = np.sqrt((np.asarray(var1, dtype=np.float64) + np.asarray(var2, dtype=np.float64)) / 2)
+    req_sample_sz = np.full(denominator.shape, np.inf)
+    nonzero = denominator != 0
+    d = np.abs(np.asarray(mean1, dtype=np.float64) - np.asarray(mean2, dtype=np.float64))[nonzero] / denominator[nonzero]
+    req_sample_sz[nonzero] = solve_paired_ttest_sample_size(d, statistical_power, pvalue)
+    return req_sample_sz
+
+
 def run_power_analysis(metric_list, group_key, group_metric_running_variance_params, statistical_power, pvalue):
     """
     Using the input's stats (mean, variance and sample size) this function computes if the metric change is
@@ -475,8 +839,8 @@ def run_power_analysis(metric_list, group_key, group_metric_running_variance_par
     group_key: list
         The list of keys used to aggregate the metrics
 
-    group_metric_running_variance_params: dict
-        A dictionary containing mean, variance and sample size for each group for each metric
+    group_metric_running_variance_params: GroupMetricStreamVariance or dict
+        The mean, variance and sample size for each group for each metric
 
     statistical_power: float
         Required statistical power
@@ -489,21 +853,25 @@ def run_power_analysis(metric_list, group_key, group_metric_running_variance_par
     group_metrics_stat_sig: Pandas dataframe
         A dataframe listing each group and for each metric whether the change is statistically significant
     """
-    group_metrics_stat_sig = []
-    for group in group_metric_running_variance_params:
-        group_entry = {}
-        for metric in metric_list:
-            new_metric = "new_" + metric
-            old_metric = "old_" + metric
-            sv_old = group_metric_running_variance_params[group][old_metric]
-            sv_new = group_metric_running_variance_params[group][new_metric]
-            req_sample_size = compute_required_sample_size(sv_old.mean, sv_new.mean, sv_old.var, sv_new.var,
-                                                           statistical_power, pvalue)
-            if sv_new.count >= req_sample_size:
-                is_stat_sig = True
-            else:
-                is_stat_sig = False
-            group_entry[str(group_key)] = group
-            group_entry["is_"+metric+"_lift_stat_sig"] = is_stat_sig
-        group_metrics_stat_sig.append(group_entry)
+    group_metric_running_variance_params = GroupMetricStreamVariance.from_params(group_metric_running_variance_params)
+    num_groups = len(group_metric_running_variance_params)
+    if num_groups == 0:
+        return pd.DataFrame()
+    count = group_metric_running_variance_params.count[:num_groups]
+    mean = group_metric_running_variance_params.mean[:num_groups]
+    var = group_metric_running_variance_params.var[:num_groups]
+
+    group_metrics_stat_sig = {str(group_key): list(group_metric_running_variance_params)}
+    for metric in metric_list:
+        old_index = group_metric_running_variance_params.metric_index["old_" + metric]
+        new_index = group_metric_running_variance_params.metric_index["new_" + metric]
+
+        # The required sample size is at least 2, so the sample size is only solved for when it can be reached
+        is_stat_sig = np.zeros(num_groups, dtype=bool)
+        solve = count[:, new_index] >= 2
+        req_sample_size = compute_required_sample_sizes(mean[solve, old_index], mean[solve, new_index],
+                                                        var[solve, old_index], var[solve, new_index],
+                                                        statistical_power, pvalue)
+        is_stat_sig[solve] = count[solve, new_index] >= req_sample_size
+        group_metrics_stat_sig["is_" + metric + "_lift_stat_sig"] = is_stat_sig
     return pd.DataFrame(group_metrics_stat_sig)
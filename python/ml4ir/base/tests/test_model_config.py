@@ -1,6 +1,10 @@
 import yaml
+import numpy as np
+import tensorflow as tf
+from unittest.mock import MagicMock
 from ml4ir.base.tests.test_base import RelevanceTestBase
-from ml4ir.base.features.feature_config import FeatureConfig
+from ml4ir.base.config.keys import FeatureTypeKey
+from ml4ir.base.features.feature_config import FeatureConfig, ExampleFeatureConfig, SequenceExampleFeatureConfig
 from ml4ir.base.model.architectures.dnn import DNN
 
 
@@ -113,3 +117,65 @@ class DNNModelTest(RelevanceTestBase):
         assert(dnn.layer_ops[2].get_config()['units'] == 64)
         assert(dnn.layer_ops[3].get_config()['rate'] == 0.0)
         assert(dnn.layer_ops[4].get_config()['units'] == 9)
+
+    def test_factorize_context_features(self):
+        feature_config = MagicMock(spec=SequenceExampleFeatureConfig)
+        feature_config.get_context_features.return_value = ["query_embedding", "query_length"]
+
+        model_info = yaml.safe_load('''
+            architecture_key: dnn
+            layers:
+              - type: dense
+                name: first_dense
+                units: 16
+                activation: relu
+              - type: dense
+                name: final_dense
+                units: 1
+                activation: null
+        ''')
+
+        # Context features are tiled to all the records of the query by the interaction model
+        rng = np.random.default_rng(123)
+        inputs = {
+            FeatureTypeKey.TRAIN: {
+                "a_record_score": tf.constant(rng.random((4, 10, 1)), dtype=tf.float32),
+                "query_embedding": tf.tile(tf.constant(rng.random((4, 1, 8)), dtype=tf.float32), [1, 10, 1]),
+                "query_length": tf.tile(tf.constant(rng.random((4, 1, 1)), dtype=tf.float32), [1, 10, 1]),
+                "z_record_embedding": tf.constant(rng.random((4, 10, 3)), dtype=tf.float32),
+            },
+            FeatureTypeKey.METADATA: {FeatureTypeKey.MASK: tf.ones([4, 10])}
+        }
+
+        dnn = DNN(model_info, feature_config, self.file_io)
+        scores = dnn(inputs)
+        dnn.factorize_context_features = True
+        dnn.build({k: {f: v.shape for f, v in features.items()} for k, features in inputs.items()})
+        factorized_scores = dnn(inputs)
+
+        assert dnn.context_train_features == ["query_embedding", "query_length"]
+        assert dnn.record_train_features == ["a_record_score", "z_record_embedding"]
+        assert factorized_scores.shape == scores.shape
+        assert np.allclose(factorized_scores, scores, atol=1e-6)
+
+        # Context features are not tiled by the interaction model when they are factorized
+        untiled_inputs = {
+            FeatureTypeKey.TRAIN: {f: v[:, :1] if f in dnn.context_train_features else v
+                                   for f, v in inputs[FeatureTypeKey.TRAIN].items()},
+            FeatureTypeKey.METADATA: inputs[FeatureTypeKey.METADATA]
+        }
+        assert np.allclose(dnn(untiled_inputs), scores, atol=1e-6)
+
+        # Factorized models also build the first dense layer with the kernel of the concatenated features
+        model_info["factorize_context_features"] = True
+        dnn = DNN(model_info, feature_config, self.file_io)
+        dnn(untiled_inputs)
+        assert dnn.layer_ops[0].kernel.shape == (13, 16)
+        assert dnn.untiled_context_features == {"query_embedding", "query_length"}
+
+        # Only SequenceExample models have context features
+        self.assertRaises(ValueError, DNN, model_info, MagicMock(spec=ExampleFeatureConfig), self.file_io)
+
+        # The first layer must be dense to be factorized
+        model_info["layers"] = [{"type": "dropout", "rate": 0.1}] + model_info["layers"]
+        self.assertRaises(ValueError, DNN, model_info, feature_config, self.file_io)
@@ -0,0 +1,115 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from ml4ir.base.config.keys import PredictionsFormatKey
+from ml4ir.base.io import prediction_sink
+from ml4ir.base.io.file_io import FileIO
+from ml4ir.base.io.local_io import LocalIO
+from ml4ir.base.io.prediction_sink import BackgroundPredictionSink, InMemoryPredictionSink, get_prediction_sink
+
+
+def generate_batches(num_batches: int, batch_size: int):
+    """Generate batches of predictions with bytes and numeric columns"""
+    return [pd.DataFrame({
+        "query_id": ["q{}".format(i * batch_size + j).encode("utf-8") for j in range(batch_size)],
+        "score": np.arange(batch_size, dtype=np.float32) / (i + 1),
+        "new_rank": np.arange(batch_size) + 1,
+    }) for i in range(num_batches)]
+
+
+class FailingPredictionSink(InMemoryPredictionSink):
+    """Sink failing after writing a number of batches"""
+
+    def __init__(self, num_batches: int):
+        super().__init__()
+        self.num_batches = num_batches
+
+    def write(self, predictions_df: pd.DataFrame):
+        if len(self.predictions_df_list) == self.num_batches:
+            raise IOError("Disk full")
+        super().write(predictions_df)
+
+
+class PredictionSinkTest(unittest.TestCase):
+    """
+    Test class for the prediction sinks in ml4ir.base.io.prediction_sink
+    """
+
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.expected_df = pd.concat(generate_batches(num_batches=5, batch_size=7), ignore_index=True)
+        self.expected_df["query_id"] = self.expected_df["query_id"].str.decode("utf-8")
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def write_batches(self, predictions_format: str, max_queue_size: int):
+        outfile = os.path.join(self.output_dir, "model_predictions.{}".format(predictions_format))
+        with get_prediction_sink(outfile, LocalIO(), predictions_format, max_queue_size) as sink:
+            for predictions_df in generate_batches(num_batches=5, batch_size=7):
+                sink.write(predictions_df)
+
+        assert sink.get_predictions() is None
+        return outfile
+
+    def test_csv(self):
+        """Test that the batches are written in order to a CSV file with a single header"""
+        for predictions_format in [PredictionsFormatKey.CSV, PredictionsFormatKey.CSV_GZIP]:
+            for max_queue_size in [0, 2]:
+                outfile = self.write_batches(predictions_format, max_queue_size)
+                pd.testing.assert_frame_equal(pd.read_csv(outfile), self.expected_df, check_dtype=False)
+
+    @unittest.skipIf(prediction_sink.pq is None, "pyarrow is not installed")
+    def test_parquet(self):
+        """Test that the batches are written in order to a Parquet file"""
+        for max_queue_size in [0, 2]:
+            outfile = self.write_batches(PredictionsFormatKey.PARQUET, max_queue_size)
+            pd.testing.assert_frame_equal(pd.read_parquet(outfile), self.expected_df)
+
+    def test_in_memory(self):
+        """Test that the batches are concatenated in memory without an outfile"""
+        with get_prediction_sink() as sink:
+            for predictions_df in generate_batches(num_batches=5, batch_size=7):
+                sink.write(predictions_df)
+
+        assert sink.outfile is None
+        predictions_df = sink.get_predictions().reset_index(drop=True)
+        predictions_df["query_id"] = predictions_df["query_id"].str.decode("utf-8")
+        pd.testing.assert_frame_equal(predictions_df, self.expected_df)
+
+    def test_csv_print_options(self):
+        """Test that the array valued predictions are written in full without changing the numpy print options"""
+        print_options = np.get_printoptions()
+        outfile = os.path.join(self.output_dir, "model_predictions.csv")
+        with get_prediction_sink(outfile, LocalIO(), PredictionsFormatKey.CSV) as sink:
+            sink.write(pd.DataFrame({"score": [np.arange(2000)]}))
+
+        assert np.get_printoptions() == print_options
+        score = pd.read_csv(outfile)["score"][0]
+        assert "..." not in score and "\n" not in score
+
+    def test_unsupported_file_io(self):
+        """Test that writing the predictions through a file handler that cannot stream files fails"""
+        outfile = os.path.join(self.output_dir, "model_predictions.csv")
+        with self.assertRaises(NotImplementedError):
+            get_prediction_sink(outfile, FileIO(), PredictionsFormatKey.CSV)
+
+    def test_background_error(self):
+        """Test that an error in the background writer is raised to the caller"""
+        sink = BackgroundPredictionSink(FailingPredictionSink(num_batches=2), max_queue_size=1)
+        with self.assertRaises(IOError):
+            with sink:
+                for predictions_df in generate_batches(num_batches=5, batch_size=7):
+                    sink.write(predictions_df)
+
+        assert not sink.thread.is_alive()
+        assert len(sink.sink.predictions_df_list) == 2
+
+
+if __name__ == "__main__":
+    unittest.main()
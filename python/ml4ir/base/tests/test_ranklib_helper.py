@@ -0,0 +1,142 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+
+from ml4ir.base.data import ranklib_helper, ranklib_reader
+from ml4ir.base.features.feature_config import SequenceExampleFeatureConfig
+from ml4ir.base.config.keys import TFRecordTypeKey
+from ml4ir.base.io.local_io import LocalIO
+
+QUERY_ID_NAME = "qid"
+RELEVANCE_NAME = "relevance"
+FEATURE_CONFIG_PATH = "ml4ir/applications/ranking/tests/data/ranklib/feature_config.yaml"
+
+
+def generate_ranklib_lines(num_queries: int, max_sequence_size: int, num_features: int, seed: int = 123):
+    """Generate ranklib lines with sparse features and additional info"""
+    rng = np.random.default_rng(seed)
+    lines = list()
+    for qid in range(num_queries):
+        for doc in range(rng.integers(1, max_sequence_size + 1)):
+            feature_ids = np.flatnonzero(rng.random(num_features) < 0.5) + 1
+            features = " ".join("{}:{:.4f}".format(i, rng.random()) for i in feature_ids)
+            lines.append("{} qid:{} {} #docid = D{}-{} inc = {}\n".format(
+                rng.integers(0, 5), qid, features, qid, doc, rng.integers(0, 2)))
+
+    return lines
+
+
+class RanklibHelperTest(unittest.TestCase):
+    """
+    Test class for the vectorized ranklib parser in ml4ir.base.data.ranklib_helper
+    """
+
+    def setUp(self):
+        ranklib_helper.max_f_id = 0
+        self.output_dir = tempfile.mkdtemp()
+        self.lines = generate_ranklib_lines(num_queries=20, max_sequence_size=10, num_features=12)
+        self.input_file = os.path.join(self.output_dir, "sample.txt")
+        with open(self.input_file, "w") as f:
+            f.writelines(self.lines)
+            f.write("\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def test_parse_lines(self):
+        """Test that the vectorized parser matches process_line on each line"""
+        expected_df = pd.DataFrame([ranklib_helper.process_line(line, False, QUERY_ID_NAME, RELEVANCE_NAME)
+                                    for line in self.lines])
+        df = ranklib_helper.parse_lines(self.lines, False, QUERY_ID_NAME, RELEVANCE_NAME)
+
+        pd.testing.assert_frame_equal(df, expected_df[df.columns])
+        assert set(df.columns) == set(expected_df.columns)
+
+    def test_split_bodies(self):
+        """Test that the numeric fast path matches the generic key value split"""
+        bodies = [line.partition("#")[0] for line in self.lines]
+        expected = ranklib_helper._split_bodies(bodies, QUERY_ID_NAME, RELEVANCE_NAME)
+        split_bodies = ranklib_helper._split_numeric_bodies(bodies, QUERY_ID_NAME)
+
+        assert split_bodies[0] == expected[0]
+        assert split_bodies[3] == sorted(expected[3], key=int)
+        for i in [1, 2, 5]:
+            assert np.array_equal(split_bodies[i], expected[i])
+        # Feature codes index into differently ordered feature keys
+        assert [split_bodies[3][c] for c in split_bodies[4]] == [expected[3][c] for c in expected[4]]
+
+        # Lines with non numeric values fall back to the generic split
+        assert ranklib_helper._split_numeric_bodies(["1 qid:1 1:a"], QUERY_ID_NAME) is None
+        assert ranklib_helper._split_numeric_bodies(["1 1:0.5 qid:1"], QUERY_ID_NAME) is None
+
+    def test_parse_non_numeric_values(self):
+        """Test that non numeric feature values are not silently coerced to NaN"""
+        with self.assertRaises(ValueError):
+            ranklib_helper.parse_lines(["1 qid:1 1:0.5 2:a\n"], False, QUERY_ID_NAME, RELEVANCE_NAME)
+
+        df = ranklib_helper.parse_lines(["1 qid:1 1:0.5 2:nan\n"], False, QUERY_ID_NAME, RELEVANCE_NAME)
+        assert np.isnan(df["f_2"][0])
+
+    def test_convert(self):
+        """Test the conversion in chunks with additional info and non zero features only"""
+        df = ranklib_helper.convert(self.input_file, True, 1, False, QUERY_ID_NAME, RELEVANCE_NAME, chunk_size=7)
+
+        assert df.shape[0] == len(self.lines)
+        assert df[QUERY_ID_NAME].nunique() == 20
+        assert sorted(df[RELEVANCE_NAME].unique()) == [0, 1]
+        assert df["f_docid"].tolist() == [line.split("docid = ")[1].split()[0] for line in self.lines]
+        assert df["f_inc"].dtype == np.float64
+        assert df["f_1"].isna().any()
+
+        # Non zero features only keeps the features with IDs below the largest feature ID, as process_line did
+        df = ranklib_helper.convert(self.input_file, False, 0, True, QUERY_ID_NAME, RELEVANCE_NAME, chunk_size=7)
+
+        assert ranklib_helper.max_f_id == 12
+        assert list(df.columns) == [QUERY_ID_NAME, RELEVANCE_NAME] + ["f_{}".format(i) for i in range(12)] + ["rank"]
+        assert not df.isna().any().any()
+        assert (df["f_0"] == 0).all()
+
+        df = ranklib_helper.convert(self.input_file, False, 0, True, QUERY_ID_NAME, RELEVANCE_NAME, chunk_size=7,
+                                    feature_names=[QUERY_ID_NAME, RELEVANCE_NAME, "rank", "f_2", "f_5", "f_12", "f_20"])
+
+        assert list(df.columns) == [QUERY_ID_NAME, RELEVANCE_NAME, "f_2", "f_5", "rank"]
+        assert not df.isna().any().any()
+
+
+    def test_convert_files(self):
+        """Test that each ranklib file is converted into its own tfrecord file in parallel"""
+        ranklib_files = list()
+        for i in range(3):
+            ranklib_files.append(os.path.join(self.output_dir, "part-{}.txt".format(i)))
+            with open(ranklib_files[-1], "w") as f:
+                f.writelines(generate_ranklib_lines(num_queries=10, max_sequence_size=10, num_features=12, seed=i))
+        feature_config = SequenceExampleFeatureConfig(LocalIO().read_yaml(FEATURE_CONFIG_PATH), None)
+
+        protos = list()
+        for num_workers in [1, 2]:
+            tfrecord_dir = os.path.join(self.output_dir, "tfrecord_{}".format(num_workers))
+            os.makedirs(tfrecord_dir)
+            tfrecord_files = ranklib_reader.convert_files(
+                ranklib_files=ranklib_files,
+                tfrecord_dir=tfrecord_dir,
+                feature_config=feature_config,
+                tfrecord_type=TFRecordTypeKey.SEQUENCE_EXAMPLE,
+                non_zero_features_only=False,
+                num_workers=num_workers,
+            )
+            assert len(tfrecord_files) == 3
+            protos.append([[tf.train.SequenceExample.FromString(proto.numpy())
+                            for proto in tf.data.TFRecordDataset(tfrecord_file)]
+                           for tfrecord_file in tfrecord_files])
+
+        assert [len(file_protos) for file_protos in protos[0]] == [10, 10, 10]
+        assert protos[0] == protos[1]
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -32,6 +32,20 @@ def create_parse_args(data_dir, feature_config, model_config, logs_dir, num_fold
     return args
 
 
+class KfoldMarkerRankingPipeline(RankingPipeline):
+    """
+    RankingPipeline marking the models directory of each fold pipeline it creates, to check that the folds
+    are created with create_pipeline_for_kfold in the worker processes too
+    """
+
+    @classmethod
+    def create_pipeline_for_kfold(cls, args):
+        pipeline = super().create_pipeline_for_kfold(args)
+        pipeline.logger.info("Pipeline created for kfold")
+        (pathlib.Path(pipeline.models_dir_local) / "created_for_kfold").touch()
+        return pipeline
+
+
 class TestML4IRKfoldCV(unittest.TestCase):
     """
     Test kfold cross validation
@@ -112,7 +126,8 @@ class TestML4IRKfoldCV(unittest.TestCase):
         query_ids = set([q[0]['query_id'].numpy()[0] for q in all_data])
         assert len(query_ids) == expected_num_queries
 
-    def run_folds_creation_test(self, dataset_name, num_features, num_folds, use_testset_in_folds):
+    def run_folds_creation_test(self, dataset_name, num_features, num_folds, use_testset_in_folds,
+                                materialize_folds=False):
         """
         Read and merge datasets, then create folds. A successful fold creation should have different, non
         overlapping train, validation and test sets.
@@ -127,6 +142,8 @@ class TestML4IRKfoldCV(unittest.TestCase):
             number of folds
         use_testset_in_folds: bool
             whether to include the testset in the merge
+        materialize_folds: bool
+            whether to write the folds to TFRecord files before creating them
         """
         args = self.setup_data(dataset_name, num_features, num_folds, use_testset_in_folds)
 
@@ -135,10 +152,15 @@ class TestML4IRKfoldCV(unittest.TestCase):
                                                            read_data_sets=True)
 
         all_data = relevance_dataset.merge_datasets()
+        folds_dir = None
+        if materialize_folds:
+            folds_dir = (pathlib.Path(self.working_dir.path) / "folds").as_posix()
+            relevance_dataset.materialize_folds(all_data, folds_dir)
+            all_qids = set([q[0]['query_id'].numpy()[0] for q in all_data])
         for i in range(num_folds):
             fold_relevance_dataset = rp.get_kfold_relevance_dataset(args.kfold, args.include_testset_in_kfold,
                                                                read_data_sets=False)
-            fold_relevance_dataset.create_folds(i, all_data, relevance_dataset)
+            fold_relevance_dataset.create_folds(i, all_data, relevance_dataset, folds_dir)
             train = fold_relevance_dataset.train.unbatch()
             validation = fold_relevance_dataset.validation.unbatch()
             if use_testset_in_folds:
@@ -151,6 +173,10 @@ class TestML4IRKfoldCV(unittest.TestCase):
                 assert len(set.intersection(train_qids, test_qids)) == 0
                 assert len(set.intersection(validation_qids, test_qids)) == 0
             assert len(set.intersection(train_qids, validation_qids)) == 0
+            if materialize_folds:
+                # every query of the merged data is assigned to exactly one fold
+                fold_qids = set.union(train_qids, validation_qids, test_qids if use_testset_in_folds else set())
+                assert fold_qids == all_qids
 
     def test_merge_datasets_1(self):
         """
@@ -234,6 +260,123 @@ class TestML4IRKfoldCV(unittest.TestCase):
         num_folds = 10
         self.run_folds_creation_test(dataset_name, num_features, num_folds, use_testset_in_folds)
 
+    def test_materialized_folds_creation_1(self):
+        """
+        Testing creating folds from the materialized folds. Train, validation and test sets should be different
+        with no over lap and cover all the queries
+        """
+        dataset_name = "dataset1.csv"
+        num_features = 2
+        use_testset_in_folds = True
+        num_folds = 5
+        self.run_folds_creation_test(dataset_name, num_features, num_folds, use_testset_in_folds,
+                                     materialize_folds=True)
+
+    def test_materialized_folds_creation_2(self):
+        """
+        Testing creating folds from the materialized folds. Train, validation and test sets should be different
+        with no over lap and cover all the queries
+        """
+        dataset_name = "dataset2.csv"
+        num_features = 2
+        use_testset_in_folds = False
+        num_folds = 10
+        self.run_folds_creation_test(dataset_name, num_features, num_folds, use_testset_in_folds,
+                                     materialize_folds=True)
+
+    def test_materialized_folds_match_merged_data(self):
+        """
+        Testing that the materialized folds hold the same tensors as the merged dataset
+        """
+        args = self.setup_data("dataset1.csv", 2, 3, True)
+
+        rp = RankingPipeline(args=args)
+        relevance_dataset = rp.get_kfold_relevance_dataset(args.kfold, args.include_testset_in_kfold,
+                                                           read_data_sets=True)
+        all_data = relevance_dataset.merge_datasets()
+        folds_dir = (pathlib.Path(self.working_dir.path) / "folds").as_posix()
+        relevance_dataset.materialize_folds(all_data, folds_dir)
+
+        queries = {q[0]['query_id'].numpy()[0]: q for q in all_data}
+        fold_data = relevance_dataset.read_folds(folds_dir, list(range(3)))
+        assert fold_data.element_spec == all_data.element_spec
+        num_queries = 0
+        for features, labels in fold_data:
+            expected_features, expected_labels = queries[features['query_id'].numpy()[0]]
+            for name, feature in features.items():
+                assert np.array_equal(feature.numpy(), expected_features[name].numpy())
+            assert np.array_equal(labels.numpy(), expected_labels.numpy())
+            num_queries += 1
+        assert num_queries == len(queries)
+
+    def test_materialize_empty_folds(self):
+        """
+        Testing that materializing fewer queries than folds fails on the empty folds
+        """
+        args = self.setup_data("dataset1.csv", 2, 3, True)
+
+        rp = RankingPipeline(args=args)
+        relevance_dataset = rp.get_kfold_relevance_dataset(args.kfold, args.include_testset_in_kfold,
+                                                           read_data_sets=True)
+        all_data = relevance_dataset.merge_datasets()
+        folds_dir = (pathlib.Path(self.working_dir.path) / "folds").as_posix()
+        with self.assertRaises(ValueError):
+            relevance_dataset.materialize_folds(all_data.take(2), folds_dir)
+
+    def test_materialize_folds_to_remote_dir(self):
+        """
+        Testing that the folds can only be materialized to a local directory
+        """
+        args = self.setup_data("dataset1.csv", 2, 3, True)
+
+        rp = RankingPipeline(args=args)
+        relevance_dataset = rp.get_kfold_relevance_dataset(args.kfold, args.include_testset_in_kfold,
+                                                           read_data_sets=True)
+        all_data = relevance_dataset.merge_datasets()
+        with self.assertRaises(ValueError):
+            relevance_dataset.materialize_folds(all_data, "hdfs://namenode/folds")
+        with self.assertRaises(ValueError):
+            relevance_dataset.read_folds("hdfs://namenode/folds", list(range(3)))
+
+    def run_kfold_pipeline_test(self, num_workers):
+        """
+        Run the pipeline in kfold cross validation mode. Each fold should be trained and evaluated
+        successfully with its own logs and models directories.
+
+        Parameters
+        ----------
+        num_workers: int
+            number of processes to run the folds in
+        """
+        num_folds = 3
+        args = self.setup_data("dataset1.csv", 2, num_folds, True)
+        args.models_dir = self.working_dir.makedir("models")
+        args.kfold_num_workers = num_workers
+
+        KfoldMarkerRankingPipeline(args=args).run()
+
+        for i in range(num_folds):
+            fold_logs_dir = pathlib.Path(args.logs_dir) / args.run_id / "fold_{}".format(i) / args.run_id
+            fold_models_dir = pathlib.Path(args.models_dir) / args.run_id / "fold_{}".format(i) / args.run_id
+            assert (fold_logs_dir / "_SUCCESS").exists()
+            assert (fold_models_dir / "final").exists()
+            assert (fold_models_dir / "created_for_kfold").exists()
+        assert not (pathlib.Path(args.data_dir) / "tfrecord").exists()
+        # The materialized folds are removed from the models directory
+        assert not (pathlib.Path(args.models_dir) / args.run_id / "folds").exists()
+
+    def test_kfold_pipeline(self):
+        """
+        Testing running the folds sequentially
+        """
+        self.run_kfold_pipeline_test(num_workers=1)
+
+    def test_kfold_pipeline_parallel(self):
+        """
+        Testing running the folds in parallel processes
+        """
+        self.run_kfold_pipeline_test(num_workers=3)
+
 
 if __name__ == "__main__":
     unittest.main()
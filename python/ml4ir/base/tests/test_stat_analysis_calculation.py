@@ -5,7 +5,9 @@ from scipy import stats
 import unittest
 import warnings
 from ml4ir.base.stats.t_test import perform_click_rank_dist_paired_t_test, compute_stats_from_stream, \
-    compute_groupwise_running_variance_for_metrics, StreamVariance, run_power_analysis, compute_required_sample_size
+    compute_groupwise_running_variance_for_metrics, StreamVariance, run_power_analysis, compute_required_sample_size, \
+    compute_batched_stats, merge_group_metric_running_variance_params, GroupMetricStreamVariance, power_ttest, \
+    solve_paired_ttest_sample_size, StreamMoments
 
 warnings.filterwarnings("ignore")
 
@@ -102,6 +104,131 @@ class TestStatisticalAnalysisCalculation(unittest.TestCase):
 
         self.running_power_analysis_test(metric_list, group_key, group_metric_running_variance_params)
 
+    def test_merge_stream_variance(self):
+        """Test that merging the stats of independent batches in order matches the sequential accumulation"""
+        rng = np.random.default_rng(123)
+        group_key = ["group_id"]
+        variance_list = ["old_metric1", "new_metric1"]
+        batches = []
+        for batch_size in [10, 1, 25, 3, 40]:
+            # Groups with a single sample and groups missing in some batches
+            df = pd.DataFrame({"group_id": rng.choice(["A", "B", "C", "D"], batch_size, p=[0.6, 0.3, 0.08, 0.02])})
+            for metric in variance_list:
+                df[metric] = rng.random(batch_size)
+            batches.append(df)
+
+        sequential_params = {}
+        merged_params = {}
+        for df in batches:
+            sequential_params = compute_batched_stats(df, sequential_params, group_key, variance_list)
+            merged_params = merge_group_metric_running_variance_params(
+                merged_params, compute_batched_stats(df, {}, group_key, variance_list))
+
+        df = pd.concat(batches)
+        assert sequential_params.keys() == merged_params.keys()
+        for group_name, group_params in sequential_params.items():
+            for metric in variance_list:
+                sequential_sv, merged_sv = group_params[metric], merged_params[group_name][metric]
+                assert (sequential_sv.count, sequential_sv.mean, sequential_sv.var) == \
+                       (merged_sv.count, merged_sv.mean, merged_sv.var)
+
+                values = df[df.group_id == group_name][metric]
+                assert merged_sv.count == len(values)
+                assert np.isclose(merged_sv.mean, values.mean())
+                assert np.isclose(merged_sv.var, values.var() if len(values) > 1 else 0)
+
+    def test_batched_stats_update_dict_in_place(self):
+        """Test that the stats accumulated in a dictionary are updated in place"""
+        rng = np.random.default_rng(123)
+        group_key = ["group_id"]
+        variance_list = ["old_metric1", "new_metric1"]
+        df = pd.DataFrame({"group_id": rng.choice(["A", "B"], 50)})
+        for metric in variance_list:
+            df[metric] = rng.random(len(df))
+
+        group_metric_running_variance_params = {}
+        for batch in np.array_split(df, 5):
+            accumulator = compute_batched_stats(batch, group_metric_running_variance_params, group_key, variance_list)
+
+        assert group_metric_running_variance_params.keys() == accumulator.keys()
+        grouped = df.groupby(group_key[0])[variance_list]
+        for group_name, group_params in group_metric_running_variance_params.items():
+            for metric in variance_list:
+                assert group_params[metric].count == grouped.count().loc[group_name, metric]
+                assert np.isclose(group_params[metric].mean, grouped.mean().loc[group_name, metric])
+                assert np.isclose(group_params[metric].var, grouped.var().loc[group_name, metric])
+
+    def test_group_metric_stream_variance(self):
+        """Test the vectorized accumulation of the stats with multiple group keys and missing metric values"""
+        rng = np.random.default_rng(123)
+        group_key = ["domain", "locale"]
+        variance_list = ["old_metric1", "new_metric1", "new_metric2"]
+        batches = []
+        for batch_size in [50, 7, 200, 1]:
+            df = pd.DataFrame({"domain": rng.integers(0, 20, batch_size), "locale": rng.choice(["en", "fr"], batch_size)})
+            for metric in variance_list:
+                df[metric] = rng.random(batch_size)
+            # Metric values missing for some of the records
+            df.loc[rng.random(batch_size) < 0.1, "new_metric2"] = np.nan
+            batches.append(df)
+
+        group_metric_running_variance_params = GroupMetricStreamVariance()
+        for df in batches:
+            group_metric_running_variance_params = compute_batched_stats(
+                df, group_metric_running_variance_params, group_key, variance_list)
+
+        grouped = pd.concat(batches).groupby(group_key)[variance_list]
+        expected_mean, expected_var, expected_count = grouped.mean(), grouped.var().fillna(0), grouped.count()
+        assert len(group_metric_running_variance_params) == len(expected_count)
+        for group_name in expected_count.index:
+            for metric in variance_list:
+                sv = group_metric_running_variance_params[group_name][metric]
+                assert sv.count == expected_count.loc[group_name, metric]
+                if sv.count > 0:
+                    assert np.isclose(sv.mean, expected_mean.loc[group_name, metric])
+                assert np.isclose(sv.var, expected_var.loc[group_name, metric])
+
+    def test_solve_paired_ttest_sample_size(self):
+        """Test the vectorized sample size solver against the scalar solver"""
+        rng = np.random.default_rng(123)
+        d = np.concatenate([rng.random(200) * 2, [0., 1e-4, 1e-3, 5., 20.]])
+        for power, alpha in [(0.8, 0.1), (0.9, 0.05)]:
+            expected_n = np.array([power_ttest(d_i, None, power, alpha, contrast="paired") for d_i in d])
+            n = solve_paired_ttest_sample_size(d, power, alpha)
+            assert np.allclose(n, expected_n, rtol=1e-6, equal_nan=True)
+
+    def test_vectorized_power_analysis(self):
+        """Test that the power analysis matches the required sample size computed for each group"""
+        rng = np.random.default_rng(123)
+        group_key = ["group_id"]
+        metric_list = ["MRR", "ACR"]
+        df = pd.DataFrame({"group_id": rng.integers(0, 300, 5000)})
+        for metric in metric_list:
+            df["old_" + metric] = rng.random(len(df))
+            df["new_" + metric] = df["old_" + metric] + rng.normal(0.05, 0.3, len(df))
+        group_metric_running_variance_params = compute_batched_stats(
+            df, {}, group_key, ["old_MRR", "new_MRR", "old_ACR", "new_ACR"])
+
+        group_metrics_stat_sig = run_power_analysis(metric_list, group_key, group_metric_running_variance_params,
+                                                    0.8, 0.1)
+        assert group_metrics_stat_sig[str(group_key)].tolist() == list(group_metric_running_variance_params)
+        for metric in metric_list:
+            expected_stat_sig = []
+            for group_name, group_params in group_metric_running_variance_params.items():
+                sv_old, sv_new = group_params["old_" + metric], group_params["new_" + metric]
+                expected_stat_sig.append(sv_new.count >= compute_required_sample_size(
+                    sv_old.mean, sv_new.mean, sv_old.var, sv_new.var, 0.8, 0.1))
+            assert group_metrics_stat_sig["is_" + metric + "_lift_stat_sig"].tolist() == expected_stat_sig
+            # Both outcomes are covered
+            assert len(set(expected_stat_sig)) == 2
+
+    def test_power_analysis_without_groups(self):
+        """Test that the power analysis returns an empty dataframe when no groups were accumulated"""
+        for group_metric_running_variance_params in [{}, GroupMetricStreamVariance()]:
+            group_metrics_stat_sig = run_power_analysis(["MRR", "ACR"], ["group_id"],
+                                                        group_metric_running_variance_params, 0.8, 0.1)
+            assert group_metrics_stat_sig.empty
+
     def running_power_analysis_test(self, metric_list, group_key, group_metric_running_variance_params):
         # performing power analysis
         group_metrics_stat_sig = run_power_analysis(metric_list,
@@ -118,6 +245,30 @@ class TestStatisticalAnalysisCalculation(unittest.TestCase):
                 else:
                     assert row[1][stat_check] == False
 
+    def test_stream_moments(self):
+        """Test the batched moments and their merge across independently accumulated streams"""
+        values = np.random.randn(1000) * 3 + 1
+        batches = np.split(values, [0, 1, 10, 10, 250, 600, 999])
+
+        moments = StreamMoments()
+        for batch in batches:
+            moments.update(batch)
+        assert moments.count == len(values)
+        assert np.isclose(moments.mean, np.mean(values))
+        assert np.isclose(moments.var, np.var(values, ddof=1))
+
+        # Merging the moments of two workers gives the moments of the whole stream
+        worker_moments = [StreamMoments(), StreamMoments()]
+        for i, batch in enumerate(batches):
+            worker_moments[i % 2].update(batch)
+        merged_moments = StreamMoments().merge(worker_moments[0]).merge(worker_moments[1])
+        assert merged_moments.count == len(values)
+        assert np.isclose(merged_moments.mean, moments.mean)
+        assert np.isclose(merged_moments.m2, moments.m2)
+
+        count, mean, m2 = compute_stats_from_stream(values[500:], *compute_stats_from_stream(values[:500], 0, 0, 0))
+        assert (count, np.isclose(mean, moments.mean), np.isclose(m2, moments.m2)) == (len(values), True, True)
+
     def test_t_test_calculations(self):
         with self.subTest("Sample size=100, batch size=10, increment=1"):
             n = 100
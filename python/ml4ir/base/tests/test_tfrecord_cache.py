@@ -0,0 +1,126 @@
+import os
+import shutil
+import tempfile
+import unittest
+import logging
+from unittest import mock
+
+from ml4ir.base.data import csv_reader, tfrecord_writer
+from ml4ir.base.data.tfrecord_cache import TFRecordCache
+from ml4ir.base.features.feature_config import FeatureConfig
+from ml4ir.base.config.keys import TFRecordTypeKey
+from ml4ir.base.io.local_io import LocalIO
+
+CSV_PATH = "ml4ir/applications/ranking/tests/data/csv/train/file_0.csv"
+FEATURE_CONFIG_PATH = "ml4ir/applications/ranking/tests/data/configs/feature_config.yaml"
+
+
+class TFRecordCacheTest(unittest.TestCase):
+    """
+    Test class for the TFRecord conversion cache in ml4ir.base.data.tfrecord_cache
+    """
+
+    def setUp(self):
+        self.file_io = LocalIO()
+        self.logger = logging.getLogger()
+        self.output_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.output_dir, "cache")
+        self.csv_dir = os.path.join(self.output_dir, "csv")
+        os.makedirs(self.csv_dir)
+        shutil.copy(CSV_PATH, self.csv_dir)
+        self.feature_config = FeatureConfig.get_instance(
+            tfrecord_type=TFRecordTypeKey.SEQUENCE_EXAMPLE,
+            feature_config_dict=self.file_io.read_yaml(FEATURE_CONFIG_PATH),
+            logger=self.logger,
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def write_entry(self, cache: TFRecordCache, key: str, size: int):
+        """Add a cache entry with a single file of the given size"""
+        def convert_fn(output_dir):
+            with open(os.path.join(output_dir, "file_0.tfrecord"), "wb") as fp:
+                fp.write(b"0" * size)
+
+        return cache.put(key, convert_fn)
+
+    def test_get_key(self):
+        """Test that the cache key changes with the input files, feature config and conversion arguments"""
+        cache = TFRecordCache(self.cache_dir, self.file_io)
+        csv_files = [os.path.join(self.csv_dir, "file_0.csv")]
+        key = cache.get_key(csv_files, self.feature_config, TFRecordTypeKey.SEQUENCE_EXAMPLE)
+
+        assert key == cache.get_key(csv_files, self.feature_config, TFRecordTypeKey.SEQUENCE_EXAMPLE)
+        assert key != cache.get_key(csv_files, self.feature_config, TFRecordTypeKey.EXAMPLE)
+        assert key != cache.get_key(csv_files, self.feature_config, TFRecordTypeKey.SEQUENCE_EXAMPLE, chunked=True)
+
+        # Change the default value of a feature
+        feature_config = FeatureConfig.get_instance(
+            tfrecord_type=TFRecordTypeKey.SEQUENCE_EXAMPLE,
+            feature_config_dict=self.file_io.read_yaml(FEATURE_CONFIG_PATH),
+            logger=self.logger,
+        )
+        feature_config.get_sequence_features()[0]["serving_info"]["default_value"] = -1
+        assert key != cache.get_key(csv_files, feature_config, TFRecordTypeKey.SEQUENCE_EXAMPLE)
+
+        # Modify the input file
+        with open(csv_files[0], "a") as fp:
+            fp.write("\n")
+        assert key != cache.get_key(csv_files, self.feature_config, TFRecordTypeKey.SEQUENCE_EXAMPLE)
+
+    def test_evict(self):
+        """Test that the least recently used entries are evicted when the cache is full"""
+        # Entries of a previous run
+        previous_cache = TFRecordCache(self.cache_dir, self.file_io)
+        for i, key in enumerate(["a", "b", "c"]):
+            self.write_entry(previous_cache, key, 100)
+            os.utime(os.path.join(self.cache_dir, key), (i, i))
+
+        # Use "a" so that "b" is the least recently used entry
+        cache = TFRecordCache(self.cache_dir, self.file_io, max_size=350)
+        assert cache.get("a") == os.path.join(self.cache_dir, "a")
+        self.write_entry(cache, "d", 100)
+
+        assert sorted(key for key, _, _ in cache.get_entries()) == ["a", "c", "d"]
+        assert cache.get("b") is None
+
+        # Entries used by the cache are not evicted even if the cache is over its maximum size
+        cache.max_size = 150
+        self.write_entry(cache, "e", 100)
+        assert sorted(key for key, _, _ in cache.get_entries()) == ["a", "d", "e"]
+
+    def test_csv_reader_cache_hit(self):
+        """Test that the second read of unchanged CSV files reuses the cached TFRecord files"""
+        cache = TFRecordCache(self.cache_dir, self.file_io, logger=self.logger)
+        tfrecord_dir = os.path.join(self.output_dir, "tfrecord")
+        kwargs = dict(
+            data_dir=self.csv_dir,
+            feature_config=self.feature_config,
+            tfrecord_type=TFRecordTypeKey.SEQUENCE_EXAMPLE,
+            tfrecord_dir=tfrecord_dir,
+            file_io=self.file_io,
+            batch_size=128,
+            max_sequence_size=25,
+            tfrecord_cache=cache,
+        )
+        num_batches = len(list(csv_reader.read(**kwargs)))
+        assert len(cache.get_entries()) == 1
+        # The TFRecord files are read in place from the cache
+        assert not os.path.exists(tfrecord_dir)
+
+        with mock.patch.object(tfrecord_writer, "write_from_files") as write_from_files:
+            dataset = csv_reader.read(**kwargs)
+            write_from_files.assert_not_called()
+        assert len(list(dataset)) == num_batches
+
+        # Modified input files are converted again
+        with open(os.path.join(self.csv_dir, "file_0.csv"), "a") as fp:
+            fp.write("\n")
+        with mock.patch.object(tfrecord_writer, "write_from_files") as write_from_files:
+            csv_reader.read(**kwargs)
+            write_from_files.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+import logging
+
+import numpy as np
+import tensorflow as tf
+
+from ml4ir.base.data import tfrecord_helper
+from ml4ir.base.features.feature_config import FeatureConfig
+from ml4ir.base.config.keys import TFRecordTypeKey
+from ml4ir.base.io.local_io import LocalIO
+
+CSV_PATH = "ml4ir/applications/ranking/tests/data/csv/train/file_0.csv"
+FEATURE_CONFIG_PATH = "ml4ir/applications/ranking/tests/data/configs/feature_config.yaml"
+
+
+class ColumnarProtoBuilderTest(unittest.TestCase):
+    """
+    Test class for the columnar protobuf builders in ml4ir.base.data.tfrecord_helper
+    """
+
+    def setUp(self):
+        file_io = LocalIO()
+        # Shuffle the records so that the queries are not contiguous
+        self.df = file_io.read_df(CSV_PATH).sample(frac=1., random_state=123).reset_index(drop=True)
+        self.feature_config = FeatureConfig.get_instance(
+            tfrecord_type=TFRecordTypeKey.SEQUENCE_EXAMPLE,
+            feature_config_dict=file_io.read_yaml(FEATURE_CONFIG_PATH),
+            logger=logging.getLogger(),
+        )
+
+    def test_get_sequence_example_protos(self):
+        """Test that the columnar SequenceExample protobufs match get_sequence_example_proto on a groupby"""
+        expected_protos = self.df.groupby(self.feature_config.get_context_features("name")).apply(
+            lambda g: tfrecord_helper.get_sequence_example_proto(
+                group=g,
+                context_features=self.feature_config.get_context_features(),
+                sequence_features=self.feature_config.get_sequence_features(),
+            )).tolist()
+
+        protos = tfrecord_helper.get_sequence_example_protos(
+            df=self.df,
+            context_features=self.feature_config.get_context_features(),
+            sequence_features=self.feature_config.get_sequence_features(),
+        )
+
+        assert len(protos) == len(expected_protos)
+        for proto, expected_proto in zip(protos, expected_protos):
+            assert tf.train.SequenceExample.FromString(proto) == expected_proto
+
+    def test_get_example_protos(self):
+        """Test that the columnar Example protobufs match get_example_proto with missing values filled"""
+        features = [dict(f, default_value=self.feature_config.get_default_value(f))
+                    for f in self.feature_config.get_all_features() if f["dtype"] != tf.int64]
+        df = self.df.head(50).copy()
+        df.loc[::7, "quality_score"] = np.nan
+
+        expected_protos = df.apply(lambda row: tfrecord_helper.get_example_proto(row=row, features=features),
+                                   axis=1).tolist()
+        protos = tfrecord_helper.get_example_protos(df=df, features=features)
+
+        assert len(protos) == len(expected_protos)
+        for proto, expected_proto in zip(protos, expected_protos):
+            assert tf.train.Example.FromString(proto) == expected_proto
+
+    def test_get_query_boundaries(self):
+        """Test the query boundaries computed from a single sort of the records"""
+        df = self.df.head(0).reindex(range(6))
+        df["query_id"] = ["q2", "q1", "q2", None, "q1", "q3"]
+
+        row_order, query_starts, query_ends = tfrecord_helper.get_query_boundaries(df, ["query_id"])
+
+        assert row_order.tolist() == [1, 4, 0, 2, 5]
+        assert query_starts.tolist() == [0, 2, 4]
+        assert query_ends.tolist() == [2, 4, 5]
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,12 @@
+import os
+import shutil
+import tempfile
 import unittest
+import numpy as np
 import tensorflow as tf
 import logging
 
+from ml4ir.base.data import tfrecord_reader
 from ml4ir.base.data.tfrecord_reader import TFRecordSequenceExampleParser
 from ml4ir.base.features.feature_config import FeatureConfig
 from ml4ir.base.config.keys import TFRecordTypeKey
@@ -209,3 +214,233 @@ class SequenceExampleParserTest(unittest.TestCase):
                 assert features[feature].shape == (2,)
         assert labels.shape == (2,)
         self.pad_sequence = True
+
+
+class InterleavedReadTest(unittest.TestCase):
+    """
+    Test class for the interleaved and sharded file reading in ml4ir.base.data.tfrecord_reader.read
+    """
+
+    def setUp(self):
+        self.file_io = LocalIO()
+        self.data_dir = tempfile.mkdtemp()
+        self.feature_config = FeatureConfig.get_instance(
+            tfrecord_type=TFRecordTypeKey.SEQUENCE_EXAMPLE,
+            feature_config_dict=self.file_io.read_yaml(FEATURE_CONFIG_PATH),
+            logger=logging.getLogger(),
+        )
+
+        # Split the records into multiple part files
+        self.protos = [proto.numpy() for proto in tf.data.TFRecordDataset(DATASET_PATH)]
+        self.num_files = 4
+        for i in range(self.num_files):
+            with tf.io.TFRecordWriter(os.path.join(self.data_dir, "file_{}.tfrecord".format(i))) as writer:
+                for proto in self.protos[i::self.num_files]:
+                    writer.write(proto)
+
+    def tearDown(self):
+        shutil.rmtree(self.data_dir)
+
+    def read_protos(self, **kwargs):
+        dataset = tfrecord_reader.read(
+            data_dir=self.data_dir,
+            feature_config=self.feature_config,
+            tfrecord_type=TFRecordTypeKey.SEQUENCE_EXAMPLE,
+            file_io=self.file_io,
+            parse_tfrecord=False,
+            **kwargs
+        )
+        return [proto.numpy() for proto in dataset]
+
+    def test_interleaved_read(self):
+        """Test that interleaving the files reads all the records"""
+        sequential_protos = self.read_protos()
+        assert sorted(sequential_protos) == sorted(self.protos)
+
+        # With a cycle over all the files, deterministic interleaving restores the original order
+        protos = self.read_protos(num_parallel_reads=2, cycle_length=self.num_files, deterministic=True)
+        assert protos == self.protos
+
+        protos = self.read_protos(num_parallel_reads=-1, deterministic=False)
+        assert sorted(protos) == sorted(self.protos)
+
+    def test_interleaved_read_file_paths(self):
+        """Test that the file paths are read as is, without matching them as glob patterns"""
+        assert [proto.numpy() for proto in tfrecord_reader.read_interleaved([], num_parallel_reads=2)] == []
+
+        # As a glob pattern, the path would match file_0.tfrecord instead
+        glob_path = os.path.join(self.data_dir, "file_[0].tfrecord")
+        with tf.io.TFRecordWriter(glob_path) as writer:
+            writer.write(self.protos[1])
+        protos = [proto.numpy() for proto in tfrecord_reader.read_interleaved([glob_path], num_parallel_reads=2)]
+        assert protos == [self.protos[1]]
+
+    def test_file_shards(self):
+        """Test that each worker reads a disjoint shard of the files"""
+        for kwargs in [dict(), dict(num_parallel_reads=2)]:
+            shards = [self.read_protos(num_file_shards=2, file_shard_index=i, **kwargs) for i in range(2)]
+
+            assert len(shards[0]) > 0 and len(shards[1]) > 0
+            assert not set(shards[0]) & set(shards[1])
+            assert sorted(shards[0] + shards[1]) == sorted(self.protos)
+
+
+class BatchParseFnTest(unittest.TestCase):
+    """
+    Test class for the batched parsing function in ml4ir.base.data.tfrecord_reader.get_batch_parse_fn
+    """
+
+    def setUp(self):
+        self.file_io = LocalIO()
+        self.logger = logging.getLogger()
+
+    def get_feature_config(self, tfrecord_type, feature_config_path):
+        return FeatureConfig.get_instance(
+            tfrecord_type=tfrecord_type,
+            feature_config_dict=self.file_io.read_yaml(feature_config_path),
+            logger=self.logger,
+        )
+
+    def check_batch_parse_fn(self, protos, **kwargs):
+        """Check that the batched parse matches the per proto parse on each record"""
+        parse_fn = tfrecord_reader.get_parse_fn(**kwargs)
+        batch_features, batch_labels = tfrecord_reader.get_batch_parse_fn(**kwargs)(tf.constant(protos))
+
+        for i, proto in enumerate(protos):
+            features, labels = parse_fn(proto)
+            features["label"] = labels
+            batch_features["label"] = batch_labels
+            for feature, feature_tensor in features.items():
+                # Records beyond the sequence of the proto are padded
+                batch_feature_tensor = batch_features[feature][i]
+                num_values = tf.shape(feature_tensor)[0]
+                assert batch_feature_tensor.dtype == feature_tensor.dtype
+                assert tf.reduce_all(tf.equal(batch_feature_tensor[:num_values], feature_tensor))
+                assert tf.reduce_all(tf.equal(
+                    batch_feature_tensor[num_values:], tf.zeros_like(batch_feature_tensor[num_values:])))
+
+        return batch_features
+
+    def test_example(self):
+        """Test the batched parse of Example protos with batched and per record preprocessing"""
+        feature_config = self.get_feature_config(
+            TFRecordTypeKey.EXAMPLE, "ml4ir/applications/classification/tests/data/configs/feature_config.yaml")
+        protos = [proto.numpy() for proto in tf.data.TFRecordDataset(
+            "ml4ir/applications/classification/tests/data/tfrecord/test/file_0.tfrecord").take(16)]
+
+        batch_features = self.check_batch_parse_fn(
+            protos,
+            tfrecord_type=TFRecordTypeKey.EXAMPLE,
+            feature_config=feature_config,
+            preprocessing_keys_to_fns={},
+        )
+        assert batch_features["query_text"].shape == (16, 1)
+
+        # Custom preprocessing functions are mapped over the records of the batch
+        @tf.function
+        def first_token(feature_tensor):
+            return tf.strings.split(feature_tensor).to_tensor()[:, 0]
+
+        feature_config.get_feature("query_text")["preprocessing_info"].append({"fn": "first_token"})
+        self.check_batch_parse_fn(
+            protos,
+            tfrecord_type=TFRecordTypeKey.EXAMPLE,
+            feature_config=feature_config,
+            preprocessing_keys_to_fns={"first_token": first_token},
+        )
+
+    def test_sequence_example(self):
+        """Test the batched parse of SequenceExample protos with and without padding"""
+        feature_config = self.get_feature_config(TFRecordTypeKey.SEQUENCE_EXAMPLE, FEATURE_CONFIG_PATH)
+        protos = [proto.numpy() for proto in tf.data.TFRecordDataset(DATASET_PATH).take(16)]
+
+        for pad_sequence in [True, False]:
+            batch_features = self.check_batch_parse_fn(
+                protos,
+                tfrecord_type=TFRecordTypeKey.SEQUENCE_EXAMPLE,
+                feature_config=feature_config,
+                preprocessing_keys_to_fns={},
+                max_sequence_size=MAX_SEQUENCE_SIZE,
+                pad_sequence=pad_sequence,
+            )
+
+            num_records = [tf.shape(tfrecord_reader.get_parse_fn(
+                tfrecord_type=TFRecordTypeKey.SEQUENCE_EXAMPLE,
+                feature_config=feature_config,
+                preprocessing_keys_to_fns={},
+                pad_sequence=False,
+            )(proto)[0]["mask"])[0] for proto in protos]
+            sequence_size = MAX_SEQUENCE_SIZE if pad_sequence else max(num_records)
+            assert batch_features["mask"].shape == (16, sequence_size)
+            assert tf.reduce_all(tf.equal(tf.reduce_sum(batch_features["mask"], axis=1), num_records))
+            for feature in feature_config.get_context_features("node_name"):
+                assert batch_features[feature].shape == (16, 1)
+
+
+class BucketedBatchingTest(unittest.TestCase):
+    """
+    Test class for the sequence length bucketed batching in ml4ir.base.data.tfrecord_reader.read
+    """
+
+    def setUp(self):
+        self.file_io = LocalIO()
+        self.feature_config = FeatureConfig.get_instance(
+            tfrecord_type=TFRecordTypeKey.SEQUENCE_EXAMPLE,
+            feature_config_dict=self.file_io.read_yaml(FEATURE_CONFIG_PATH),
+            logger=logging.getLogger(),
+        )
+
+    def read_queries(self, **kwargs):
+        """Read the batches and index the unpadded features of each query by its query key"""
+        dataset = tfrecord_reader.read(
+            data_dir=os.path.dirname(DATASET_PATH),
+            feature_config=self.feature_config,
+            tfrecord_type=TFRecordTypeKey.SEQUENCE_EXAMPLE,
+            file_io=self.file_io,
+            max_sequence_size=MAX_SEQUENCE_SIZE,
+            batch_size=32,
+            **kwargs
+        )
+        query_key = self.feature_config.get_query_key("node_name")
+        queries, batch_shapes = dict(), list()
+        for features, labels in dataset:
+            features["label"] = labels
+            num_records = tf.reduce_sum(tf.cast(features["mask"], tf.int32), axis=1).numpy()
+            batch_shapes.append((features["mask"].shape[0], features["mask"].shape[1], num_records.max()))
+            for i, num_query_records in enumerate(num_records):
+                queries[features[query_key][i, 0].numpy()] = {
+                    name: tensor[i, :1].numpy() if tensor.shape[1] == 1 else tensor[i, :num_query_records].numpy()
+                    for name, tensor in features.items()
+                }
+        return queries, batch_shapes
+
+    def test_bucketed_batching(self):
+        """Test that bucketing pads each batch to its longest query and keeps the features of all queries"""
+        queries, batch_shapes = self.read_queries()
+        assert all(sequence_size == MAX_SEQUENCE_SIZE for _, sequence_size, _ in batch_shapes)
+
+        for scale_bucket_batch_sizes in [False, True]:
+            bucketed_queries, bucketed_batch_shapes = self.read_queries(
+                num_length_buckets=4, scale_bucket_batch_sizes=scale_bucket_batch_sizes)
+
+            assert sorted(bucketed_queries) == sorted(queries)
+            for query_id, features in queries.items():
+                for name, feature_tensor in features.items():
+                    np.testing.assert_array_equal(bucketed_queries[query_id][name], feature_tensor)
+
+            assert len(set(sequence_size for _, sequence_size, _ in bucketed_batch_shapes)) > 1
+            for batch_size, sequence_size, max_num_records in bucketed_batch_shapes:
+                assert sequence_size == max_num_records
+                max_batch_size = 32 * MAX_SEQUENCE_SIZE // sequence_size if scale_bucket_batch_sizes else 32
+                assert batch_size <= max_batch_size
+
+    def test_get_bucket_boundaries(self):
+        """Test that the bucket boundaries split the queries at the quantiles of their lengths"""
+        lengths = [1] * 10 + [2] * 10 + [5] * 10 + [9] * 10
+        dataset = tf.data.Dataset.from_tensor_slices(lengths).map(
+            lambda length: ({"mask": tf.ones([length])}, tf.zeros([length])))
+
+        assert tfrecord_reader.get_bucket_boundaries(dataset, 10, 4) == [2, 3, 6]
+        assert tfrecord_reader.get_bucket_boundaries(dataset, 10, 2) == [3]
+        # Buckets can not hold queries longer than max_sequence_size
+        assert tfrecord_reader.get_bucket_boundaries(dataset, 9, 1) == []
@@ -0,0 +1,159 @@
+import os
+import shutil
+import tempfile
+import unittest
+import logging
+from unittest.mock import patch
+
+import tensorflow as tf
+
+from ml4ir.base.data import csv_reader, tfrecord_reader, tfrecord_writer
+from ml4ir.base.features.feature_config import FeatureConfig
+from ml4ir.base.config.keys import TFRecordTypeKey
+from ml4ir.base.io.local_io import LocalIO
+
+CSV_DIR = "ml4ir/applications/ranking/tests/data/csv/train"
+CSV_PATH = os.path.join(CSV_DIR, "file_0.csv")
+FEATURE_CONFIG_PATH = "ml4ir/applications/ranking/tests/data/configs/feature_config.yaml"
+
+
+class ShardedTFRecordWriterTest(unittest.TestCase):
+    """
+    Test class for the sharded and chunked writers in ml4ir.base.data.tfrecord_writer
+    """
+
+    def setUp(self):
+        self.file_io = LocalIO()
+        self.logger = logging.getLogger()
+        self.output_dir = tempfile.mkdtemp()
+        self.df = self.file_io.read_df(CSV_PATH)
+        self.feature_config = FeatureConfig.get_instance(
+            tfrecord_type=TFRecordTypeKey.SEQUENCE_EXAMPLE,
+            feature_config_dict=self.file_io.read_yaml(FEATURE_CONFIG_PATH),
+            logger=self.logger,
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def read_protos(self, tfrecord_files, compression_type=None):
+        """Read the SequenceExample protobufs keyed by the query ID"""
+        protos = dict()
+        for proto in tf.data.TFRecordDataset(tfrecord_files, compression_type=compression_type):
+            proto = tf.train.SequenceExample.FromString(proto.numpy())
+            protos[proto.context.feature["query_id"].bytes_list.value[0]] = proto
+        return protos
+
+    def test_get_shard_file(self):
+        """Test the naming of the tfrecord shards"""
+        assert tfrecord_writer.get_shard_file("out/combined.tfrecord", 1, 4) == "out/combined-00001-of-00004.tfrecord"
+        assert tfrecord_writer.get_shard_file("out/file_0.tfrecord.gz", 0, 2) == "out/file_0-00000-of-00002.tfrecord.gz"
+
+    def test_write_sharded_from_df(self):
+        """Test that the sharded protobufs match the single file protobufs and queries are not split across shards"""
+        tfrecord_file = os.path.join(self.output_dir, "file_0.tfrecord")
+        tfrecord_writer.write_from_df(self.df, tfrecord_file, self.feature_config, TFRecordTypeKey.SEQUENCE_EXAMPLE)
+        expected_protos = self.read_protos(tfrecord_file)
+
+        for num_workers, compression_type in [(1, None), (2, "GZIP")]:
+            shard_files = tfrecord_writer.write_sharded_from_df(
+                df=self.df,
+                tfrecord_file=os.path.join(self.output_dir, "sharded.tfrecord"),
+                feature_config=self.feature_config,
+                tfrecord_type=TFRecordTypeKey.SEQUENCE_EXAMPLE,
+                num_shards=3,
+                num_workers=num_workers,
+                compression_type=compression_type,
+            )
+            assert len(shard_files) == 3
+
+            shard_protos = [self.read_protos(f, compression_type) for f in shard_files]
+            assert sum(len(protos) for protos in shard_protos) == len(expected_protos)
+
+            # Each query should be written to a single shard
+            protos = dict()
+            for shard in shard_protos:
+                protos.update(shard)
+            assert protos == expected_protos
+
+    def test_get_protos_from_files(self):
+        """Test that queries spanning chunk boundaries are carried over to a single protobuf"""
+        tfrecord_file = os.path.join(self.output_dir, "file_0.tfrecord")
+        tfrecord_writer.write_from_df(self.df, tfrecord_file, self.feature_config, TFRecordTypeKey.SEQUENCE_EXAMPLE)
+        expected_protos = self.read_protos(tfrecord_file)
+
+        chunked_file = os.path.join(self.output_dir, "chunked.tfrecord")
+        tfrecord_writer.write_from_files(
+            csv_files=[CSV_PATH],
+            tfrecord_file=chunked_file,
+            feature_config=self.feature_config,
+            tfrecord_type=TFRecordTypeKey.SEQUENCE_EXAMPLE,
+            file_io=self.file_io,
+            chunk_size=7,
+        )
+        num_protos = sum(1 for _ in tf.data.TFRecordDataset(chunked_file))
+
+        assert num_protos == len(expected_protos)
+        assert self.read_protos(chunked_file) == expected_protos
+
+    def test_chunked_write_with_shards(self):
+        """Test that writing in chunks and sharding can not be combined"""
+        with self.assertRaises(ValueError):
+            tfrecord_writer.write_from_files(
+                csv_files=[CSV_PATH],
+                tfrecord_file=os.path.join(self.output_dir, "chunked.tfrecord"),
+                feature_config=self.feature_config,
+                tfrecord_type=TFRecordTypeKey.SEQUENCE_EXAMPLE,
+                file_io=self.file_io,
+                num_shards=4,
+                chunk_size=7,
+            )
+        assert os.listdir(self.output_dir) == []
+
+    def test_csv_reader_from_generator(self):
+        """Test that the CSV dataset streamed from a generator matches the dataset read from tfrecord files"""
+        kwargs = dict(
+            data_dir=CSV_DIR,
+            feature_config=self.feature_config,
+            tfrecord_type=TFRecordTypeKey.SEQUENCE_EXAMPLE,
+            tfrecord_dir=os.path.join(self.output_dir, "tfrecord"),
+            file_io=self.file_io,
+            batch_size=128,
+            max_sequence_size=25,
+        )
+        dataset = csv_reader.read(**kwargs)
+        generator_dataset = csv_reader.read(chunk_size=500, from_generator=True, **kwargs)
+
+        batches = list(dataset)
+        generator_batches = list(generator_dataset)
+        assert len(generator_batches) == len(batches)
+        for (X, y), (generator_X, generator_y) in zip(batches, generator_batches):
+            assert set(generator_X.keys()) == set(X.keys())
+            assert generator_y.shape == y.shape
+
+        # Queries are in file order when streamed, so compare the totals across batches
+        assert sum(tf.reduce_sum(y).numpy() for _, y in generator_batches) == \
+            sum(tf.reduce_sum(y).numpy() for _, y in batches)
+        # The generator dataset can be iterated multiple times
+        assert len(list(generator_dataset)) == len(batches)
+
+    def test_csv_reader_output_name(self):
+        """Test that both CSV reading paths parse the protobufs with the output name of the model"""
+        kwargs = dict(
+            data_dir=CSV_DIR,
+            feature_config=self.feature_config,
+            tfrecord_type=TFRecordTypeKey.SEQUENCE_EXAMPLE,
+            tfrecord_dir=os.path.join(self.output_dir, "tfrecord"),
+            file_io=self.file_io,
+            batch_size=128,
+            max_sequence_size=25,
+            output_name="ranking_score",
+        )
+        for from_generator in [False, True]:
+            with patch.object(tfrecord_reader, "get_parse_fn", wraps=tfrecord_reader.get_parse_fn) as get_parse_fn:
+                csv_reader.read(from_generator=from_generator, **kwargs)
+                assert get_parse_fn.call_args.kwargs["output_name"] == "ranking_score"
+
+
+if __name__ == "__main__":
+    unittest.main()